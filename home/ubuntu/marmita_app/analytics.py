@@ -0,0 +1,107 @@
+import sqlite3
+
+import pandas as pd
+
+import database as db
+
+# Semanas mostradas por padrão no comparativo
+ANALISE_SEMANAS_PADRAO = 12
+
+# Lê rollup_vendas_cliente (uma linha por semana/cliente, mantida por triggers) só nas semanas
+# da janela mais a anterior a ela; o histórico completo só é consultado para a primeira semana
+# dos clientes que aparecem na janela (índice idx_rollup_vendas_cliente_cliente). Novo =
+# primeira compra naquela semana; retido = cliente que também comprou na semana anterior.
+# As variações em relação à semana anterior saem de LAG, tudo numa única consulta.
+# As semanas são ordenadas por data de início e, sem data, pela ordem de cadastro.
+_SQL_TENDENCIAS = """
+WITH semanas_ord AS (
+    SELECT id, nome_semana,
+           ROW_NUMBER() OVER (ORDER BY data_inicio IS NULL, data_inicio, id) AS ordem
+    FROM semanas
+),
+limite AS (
+    SELECT COALESCE((SELECT ordem FROM semanas_ord WHERE id = :ate), (SELECT MAX(ordem) FROM semanas_ord)) AS ultima
+),
+janela AS (
+    SELECT s.id, s.nome_semana, s.ordem
+    FROM semanas_ord s, limite
+    WHERE s.ordem BETWEEN limite.ultima - :n AND limite.ultima
+),
+linhas AS (
+    SELECT j.ordem, r.cliente_id, r.pedidos, r.total
+    FROM janela j
+    JOIN rollup_vendas_cliente r ON r.semana_id = j.id
+),
+primeira AS (
+    SELECT r.cliente_id, MIN(s.ordem) AS ordem
+    FROM rollup_vendas_cliente r
+    JOIN semanas_ord s ON s.id = r.semana_id
+    WHERE r.cliente_id IN (SELECT cliente_id FROM linhas WHERE cliente_id <> 0)
+    GROUP BY r.cliente_id
+),
+por_semana AS (
+    -- cliente_id 0 = cliente excluído: entra na receita e nos pedidos, não nas contagens de clientes
+    SELECT l.ordem,
+           SUM(l.pedidos) AS pedidos,
+           SUM(l.total) AS receita,
+           SUM(l.cliente_id <> 0) AS clientes,
+           SUM(p.ordem = l.ordem) AS novos,
+           SUM(a.cliente_id IS NOT NULL) AS retidos
+    FROM linhas l
+    LEFT JOIN primeira p ON p.cliente_id = l.cliente_id
+    LEFT JOIN linhas a ON a.ordem = l.ordem - 1 AND a.cliente_id = l.cliente_id AND a.cliente_id <> 0
+    GROUP BY l.ordem
+),
+serie AS (
+    SELECT j.ordem, j.id AS semana_id, j.nome_semana,
+           COALESCE(w.receita, 0) AS receita,
+           COALESCE(w.pedidos, 0) AS pedidos,
+           COALESCE(w.clientes, 0) AS clientes,
+           COALESCE(w.novos, 0) AS novos,
+           COALESCE(w.retidos, 0) AS retidos,
+           LAG(COALESCE(w.receita, 0)) OVER anteriores AS receita_anterior,
+           LAG(COALESCE(w.pedidos, 0)) OVER anteriores AS pedidos_anterior,
+           LAG(COALESCE(w.clientes, 0)) OVER anteriores AS clientes_anterior
+    FROM janela j
+    LEFT JOIN por_semana w ON w.ordem = j.ordem
+    WINDOW anteriores AS (ORDER BY j.ordem)
+)
+SELECT ordem, semana_id, nome_semana AS Semana,
+       receita AS "Receita ($)",
+       pedidos AS Pedidos,
+       receita / NULLIF(pedidos, 0) AS "Ticket Médio ($)",
+       clientes AS Clientes,
+       novos AS "Clientes Novos",
+       clientes - novos AS "Clientes Recorrentes",
+       CAST(retidos AS REAL) / NULLIF(clientes_anterior, 0) AS "Retenção",
+       receita / NULLIF(receita_anterior, 0) - 1 AS "Receita vs Semana Anterior",
+       CAST(pedidos AS REAL) / NULLIF(pedidos_anterior, 0) - 1 AS "Pedidos vs Semana Anterior",
+       receita / NULLIF(pedidos, 0) / NULLIF(receita_anterior / NULLIF(pedidos_anterior, 0), 0) - 1
+           AS "Ticket vs Semana Anterior"
+FROM serie
+WHERE ordem > (SELECT ultima FROM limite) - :n
+ORDER BY ordem
+"""
+
+@db.cached_query("pedidos", "clientes", "semanas")
+def get_tendencias_semanais(conn, n_semanas=ANALISE_SEMANAS_PADRAO, ate_semana_id=None):
+    """Métricas semana a semana das últimas n_semanas (até ate_semana_id, ou até a mais recente).
+
+    Uma linha por semana, em ordem cronológica: receita, pedidos, ticket médio, clientes
+    (novos = primeira compra naquela semana; recorrentes = os demais), retenção (fração dos
+    clientes da semana anterior que voltaram a comprar) e variações em relação à semana
+    anterior (0.1 = +10%). Semanas sem pedidos aparecem com zero.
+    """
+    if not conn: return pd.DataFrame()
+    try:
+        ate = int(ate_semana_id) if ate_semana_id is not None else None
+        df = pd.read_sql_query(_SQL_TENDENCIAS, conn, params={"ate": ate, "n": int(n_semanas)})
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        db._falha_leitura(f"Erro ao calcular as tendências semanais: {e}")
+        return pd.DataFrame()
+    return df
+
+def formato_longo(df, metricas):
+    """Converte colunas de métricas em linhas (Semana, Métrica, Valor) para gráficos com uma série por métrica."""
+    longo = df.melt(id_vars=["ordem", "Semana"], value_vars=list(metricas), var_name="Métrica", value_name="Valor")
+    return longo.sort_values(["ordem", "Métrica"], kind="stable").reset_index(drop=True)
@@ -1,39 +1,27 @@
 import streamlit as st
 import database as db
-import os
-
-# --- Page Config (MUST be the first Streamlit command) ---
-st.set_page_config(
-    page_title="Gestão Marmitas App",
-    page_icon="🍲",
-    layout="wide"
-)
-
-# --- Conexão e Criação de Tabelas ---
-# Cria conexão no início do script
-conn = db.create_connection()
-
-# Cria tabelas se não existirem (importante na primeira execução)
-# Isso também adiciona o usuário admin padrão se necessário
-if conn:
-    db.create_tables(conn)
-else:
-    # Se a conexão falhar aqui, o app não pode continuar
-    st.error("Falha crítica: Não foi possível conectar ao banco de dados principal.")
-    st.stop()
+import auth
+import bootstrap
+
+# Configuração da página, conexão do pool, schema/migrações e backups automáticos
+# e login (esta página mostra o formulário em vez de parar)
+conn, logado = bootstrap.setup_page("Início", "Gestão Marmitas App", "🍲", exigir_login=False)
 
 # --- Autenticação Functions ---
 def login_page():
     st.title("Login - Gestão de Marmitas")
-    st.info("Use usuário 	'admin	' e senha 	'admin	' no primeiro acesso.")
+    st.info("Use usuário 'admin' e senha 'admin' no primeiro acesso.")
+    if not auth.rota_sessao_ativa:
+        # `streamlit run app.py`: sem as rotas de server.py não há cookie de sessão
+        st.caption("App iniciado sem o server.py: o login vale só para esta aba e será pedido de novo "
+                   "ao recarregar a página. Use `streamlit run server.py` para manter a sessão.")
     with st.form("login_form"):
         username = st.text_input("Usuário")
         password = st.text_input("Senha", type="password")
         submitted = st.form_submit_button("Entrar")
         if submitted:
             if db.verify_user(conn, username, password):
-                st.session_state["logged_in"] = True
-                st.session_state["username"] = username
+                auth.iniciar_sessao(username, db.get_auth_secret(conn), db.get_estado_sessao(conn, username))
                 # Não mostrar mensagem de sucesso aqui, apenas fazer o rerun
                 st.rerun()
             else:
@@ -44,13 +32,17 @@ def main_app_content():
     
     # --- Logout Button --- 
     with st.sidebar:
-        st.write(f"Usuário: {st.session_state.get(	'username	', 	'N/A	')}")
-        if st.button("Sair"):
-            # Limpar estado da sessão relacionado ao login
-            st.session_state["logged_in"] = False
-            if "username" in st.session_state: del st.session_state["username"]
-            # Limpar outros estados de sessão que possam persistir entre logins (opcional)
-            # Ex: st.session_state.pop("itens_pedido_atual", None)
+        st.write(f"Usuário: {st.session_state.get('username', 'N/A')}")
+        sair = st.button("Sair")
+        sair_todos = st.button("Sair de Todos os Dispositivos", help="Encerra as sessões deste usuário em todos os navegadores.")
+        if sair or sair_todos:
+            if sair:
+                # Limpar estado da sessão relacionado ao login (só o token desta sessão é revogado)
+                auth.encerrar_sessao(db.get_auth_secret(conn), lambda jti, expira: db.revogar_sessao(conn, jti, expira))
+            else:
+                auth.encerrar_todas_sessoes(lambda username: db.encerrar_sessoes(conn, username))
+            # O pedido em edição não passa para o próximo login
+            st.session_state.pop("carrinho_pedido", None)
             st.rerun() # Recarrega para mostrar a tela de login
 
     # --- Interface Principal --- 
@@ -68,17 +60,11 @@ def main_app_content():
     *   **Relatórios:** Visualize informações filtradas por semana.
     """)
 
-    # Exibir logo
+    # Exibir logo (reduzido uma vez por processo; não mostra erro se o arquivo não existir)
     try:
-        # Tenta construir o caminho relativo ao diretório do script app.py
-        base_dir = os.path.dirname(__file__)
-        logo_path = os.path.join(base_dir, "assets", "logo.jpeg")
-        if os.path.exists(logo_path):
-             st.sidebar.image(logo_path, use_column_width=True)
-        else:
-             # Não mostra erro se o logo não for encontrado, apenas não exibe
-             # st.sidebar.warning(f"Logo não encontrado em: {logo_path}")
-             pass
+        logo = bootstrap.logo()
+        if logo:
+            st.sidebar.image(logo, width="stretch")
     except Exception as e:
         st.sidebar.error(f"Erro ao carregar logo: {e}")
 
@@ -88,32 +74,32 @@ def main_app_content():
     st.divider()
     st.subheader("Resumo Rápido")
     try:
-        # Usar a conexão global 'conn' que já foi estabelecida
-        total_clientes = len(db.get_all_clientes(conn))
-        pedidos_df_total = db.get_all_pedidos_info(conn) # Sem filtro para contagem total
-        total_pedidos = len(pedidos_df_total)
-
-        col1, col2 = st.columns(2)
-        col1.metric("Total de Clientes", total_clientes)
-        col2.metric("Total de Pedidos Registrados", total_pedidos)
+        # Totais mantidos por triggers: custo constante, independente do volume de pedidos
+        metricas = db.get_dashboard_metrics(conn)
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total de Clientes", metricas.get("total_clientes", 0))
+        col2.metric("Total de Pedidos Registrados", metricas.get("total_pedidos", 0))
+        col3.metric("Receita Total", f"${metricas.get('receita_total', 0):.2f}")
+
+        col4, col5 = st.columns(2)
+        col4.metric(
+            "Pagamentos Pendentes",
+            f"${metricas.get('pagamento_pendente_valor', 0):.2f}",
+            f"{metricas.get('pagamento_pendente_pedidos', 0)} pedidos",
+            delta_color="off",
+        )
+        col5.metric("Entregas Pendentes", metricas.get("entrega_pendente_pedidos", 0))
 
     except Exception as e:
         st.error(f"Erro ao buscar dados para o resumo: {e}")
 
 # --- Controle de Fluxo Principal (Login/App) ---
-# Garante que o estado de login exista
-if "logged_in" not in st.session_state:
-    st.session_state["logged_in"] = False
-
-# Verifica o estado e mostra a página apropriada
-if st.session_state["logged_in"]:
+# Sessão já logada ou recuperada do cookie (nova aba, recarregamento), conferida no setup_page
+if logado:
     main_app_content() # Mostra o conteúdo principal do app
 else:
     login_page() # Mostra a tela de login
 
-# Fechar conexão no final do script (opcional, mas pode ser útil)
-# finally:
-#     if conn:
-#         conn.close()
-#         print("Connection closed in app.py")
 
+# A conexão pertence ao pool de database.py e não deve ser fechada aqui.
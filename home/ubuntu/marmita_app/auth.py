@@ -0,0 +1,319 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+# Senhas: PBKDF2-HMAC-SHA256 com sal aleatório, no formato "pbkdf2_sha256$iterações$sal$hash".
+# Hashes antigos (SHA-256 puro, 64 hex) ainda são aceitos e trocados pelo formato novo no
+# próximo login, assim como hashes com menos iterações que AUTH_PBKDF2_ITERATIONS.
+# Sessões: token assinado com HMAC (usuário, geração das sessões, impressão do hash da senha,
+# validade e um id único, o jti) guardado num cookie HttpOnly, para que uma nova aba ou um
+# recarregamento continue logado sem expor o token ao JavaScript nem à URL. O cookie é gravado
+# pela rota de server.py (rodar com `streamlit run server.py`, que liga rota_sessao_ativa); com
+# `streamlit run app.py` não há rota nem cookie, e o login vale só para a sessão do navegador.
+# Logout revoga só o token da sessão (jti na tabela sessoes_revogadas); "sair de todos os
+# dispositivos" (geração incrementada no banco) e troca de senha invalidam todos os tokens do usuário.
+
+# Custo do KDF: cada login novo leva ~0,1 s com 200 mil iterações
+AUTH_PBKDF2_ITERATIONS = int(os.environ.get("MARMITA_AUTH_ITERATIONS", "200000"))
+# Validade dos tokens de sessão (horas)
+AUTH_TOKEN_TTL_HOURS = float(os.environ.get("MARMITA_AUTH_TOKEN_TTL_HOURS", "12"))
+# Tokens já conferidos no banco mantidos em memória, e por quanto tempo (segundos) valem sem
+# nova consulta: logout e troca de senha feitos neste processo valem na hora, os feitos em
+# outro processo depois de no máximo AUTH_STATE_TTL
+AUTH_CACHE_SIZE = 1024
+AUTH_STATE_TTL = float(os.environ.get("MARMITA_AUTH_STATE_TTL", "30"))
+# Cookie com o token e rotas de server.py que o gravam e apagam
+COOKIE_SESSAO = "marmita_sessao"
+ROTA_SESSAO = "/api/sessao"
+ROTA_SAIR = "/api/sair"
+# Validade (segundos) do bilhete que troca o login pelo cookie
+BILHETE_TTL = 60
+
+_ALGORITMO = "pbkdf2_sha256"
+# Ligado por server.py, que registra as rotas do cookie
+rota_sessao_ativa = False
+
+class _LRU:
+    """Dict com limite de tamanho que descarta o item usado há mais tempo (thread-safe)."""
+
+    def __init__(self, tamanho=AUTH_CACHE_SIZE):
+        self.tamanho = tamanho
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chave):
+        with self._lock:
+            valor = self._itens.get(chave)
+            if valor is not None:
+                self._itens.move_to_end(chave)
+            return valor
+
+    def put(self, chave, valor):
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+    def pop(self, chave):
+        with self._lock:
+            return self._itens.pop(chave, None)
+
+    def descartar(self, condicao):
+        """Remove os itens para os quais condicao(chave, valor) é verdadeira."""
+        with self._lock:
+            for chave in [c for c, v in self._itens.items() if condicao(c, v)]:
+                del self._itens[chave]
+
+    def clear(self):
+        with self._lock:
+            self._itens.clear()
+
+# (segredo, token) -> (usuário, geração, impressão, expira, jti, conferido_em)
+_tokens_validos = _LRU()
+# Bilhetes de uso único entregues ao navegador após o login: bilhete -> (token, expira)
+_bilhetes = _LRU()
+
+# --- Senhas ---
+
+def _b64(dados):
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode("ascii")
+
+def _b64_decode(texto):
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+def hash_password(password, iteracoes=None):
+    """Hash novo da senha (PBKDF2-HMAC-SHA256, sal de 16 bytes)."""
+    iteracoes = iteracoes or AUTH_PBKDF2_ITERATIONS
+    sal = secrets.token_bytes(16)
+    derivada = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), sal, iteracoes)
+    return f"{_ALGORITMO}${iteracoes}${_b64(sal)}${_b64(derivada)}"
+
+def _hash_legado(password):
+    return hashlib.sha256(password.encode("utf-8")).hexdigest()
+
+def _eh_legado(hash_armazenado):
+    return len(hash_armazenado) == 64 and "$" not in hash_armazenado
+
+def verificar_senha(password, hash_armazenado):
+    """Confere a senha com o hash guardado (formato novo ou legado), em tempo constante.
+
+    Sem cache: todo login paga o KDF, acerte ou erre a senha (o tempo de resposta não indica
+    se a senha já foi usada com sucesso antes).
+    """
+    if not hash_armazenado:
+        return False
+    if _eh_legado(hash_armazenado):
+        return hmac.compare_digest(_hash_legado(password), hash_armazenado)
+    try:
+        algoritmo, iteracoes, sal, esperado = hash_armazenado.split("$")
+        if algoritmo != _ALGORITMO:
+            return False
+        derivada = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), _b64_decode(sal), int(iteracoes))
+    except ValueError:
+        return False
+    return hmac.compare_digest(_b64(derivada), esperado)
+
+def simular_verificacao(password):
+    """Mesmo custo de uma verificação, para usuário inexistente (não revela quais usuários existem)."""
+    hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), b"\0" * 16, AUTH_PBKDF2_ITERATIONS)
+
+def precisa_atualizar(hash_armazenado):
+    """True para hash legado ou com menos iterações que a configuração atual."""
+    if _eh_legado(hash_armazenado):
+        return True
+    try:
+        return int(hash_armazenado.split("$")[1]) < AUTH_PBKDF2_ITERATIONS
+    except (IndexError, ValueError):
+        return True
+
+# --- Tokens de Sessão ---
+
+def _assinar(segredo, dados):
+    return _b64(hmac.new(segredo.encode("utf-8"), dados.encode("utf-8"), hashlib.sha256).digest())
+
+def _impressao(segredo, password_hash):
+    # Trocar a senha muda o hash e, com ele, a impressão: os tokens antigos deixam de valer
+    return _assinar(segredo, "senha\0" + password_hash)[:22]
+
+def gerar_token(username, segredo, geracao, password_hash, validade_horas=None):
+    """Token "dados.assinatura" com usuário, geração, impressão da senha, validade e jti, assinado com HMAC-SHA256."""
+    expira = int(time.time() + 3600 * (validade_horas if validade_horas is not None else AUTH_TOKEN_TTL_HOURS))
+    jti = secrets.token_urlsafe(16)
+    dados = _b64(f"{username}\n{geracao}\n{_impressao(segredo, password_hash)}\n{expira}\n{jti}".encode("utf-8"))
+    return f"{dados}.{_assinar(segredo, dados)}"
+
+def _ler_token(token, segredo):
+    # (usuário, geração, impressão, expira, jti) de um token com assinatura válida, ou None
+    try:
+        dados, assinatura = token.split(".")
+        if not hmac.compare_digest(_assinar(segredo, dados), assinatura):
+            return None
+        username, geracao, impressao, expira, jti = _b64_decode(dados).decode("utf-8").rsplit("\n", 4)
+        return username, int(geracao), impressao, int(expira), jti
+    except (ValueError, UnicodeError):
+        return None
+
+def validar_token(token, segredo, estado_sessao):
+    """Usuário do token, ou None se inválido, expirado ou revogado.
+
+    Um token conferido fica em memória com a geração e a impressão da senha e, por
+    AUTH_STATE_TTL segundos, é validado sem consultar o banco. Só na falta (ou depois disso)
+    estado_sessao(username, jti) é chamado e devolve (geração, hash da senha, jti revogado)
+    atuais do banco, ou None. Logout e troca de senha descartam as entradas na hora.
+    """
+    if not token or not segredo:
+        return None
+    agora = time.time()
+    chave = (segredo, token)
+    validado = _tokens_validos.get(chave)
+    if validado is not None and agora - validado[5] < AUTH_STATE_TTL:
+        return validado[0] if validado[3] > agora else None
+    lido = validado[:5] if validado is not None else _ler_token(token, segredo)
+    if lido is None:
+        return None
+    username, geracao, impressao, expira, jti = lido
+    estado = estado_sessao(username, jti) if expira > agora else None
+    if not estado or estado[2] or estado[0] != geracao or not hmac.compare_digest(_impressao(segredo, estado[1]), impressao):
+        _tokens_validos.pop(chave)
+        return None
+    _tokens_validos.put(chave, (*lido, agora))
+    return username
+
+def invalidar_usuario(username):
+    """Descarta os tokens do usuário guardados em memória (troca de senha, sair de todos os dispositivos)."""
+    _tokens_validos.descartar(lambda chave, validado: validado[0] == username)
+
+def limpar_cache():
+    """Descarta todos os tokens guardados em memória (ex.: o banco foi restaurado de um backup)."""
+    _tokens_validos.clear()
+
+def consumir_bilhete(bilhete):
+    """Token do bilhete (uso único), ou None se não existir ou tiver expirado. Usado pela rota de server.py."""
+    item = _bilhetes.pop(bilhete) if bilhete else None
+    if not item or item[1] <= time.time():
+        return None
+    return item[0]
+
+# --- Sessão do Streamlit ---
+
+def _chamar_rota(rota, corpo=""):
+    # POST para a rota de server.py; a resposta grava/apaga o cookie HttpOnly
+    if not rota_sessao_ativa: # `streamlit run app.py`: sem rota e sem cookie
+        return
+    st.html(f"<script>fetch({rota!r}, {{method: 'POST', body: {corpo!r}, credentials: 'same-origin'}});</script>",
+            unsafe_allow_javascript=True)
+
+def iniciar_sessao(username, segredo, estado):
+    """Marca a sessão como logada. O cookie é pedido na próxima execução, por um bilhete de uso único.
+
+    estado: (geração, hash da senha, ...) de db.get_estado_sessao, lido depois da verificação da senha.
+    Sem a rota de server.py (rota_sessao_ativa falso) não há bilhete: o token fica só na sessão.
+    """
+    token = gerar_token(username, segredo, estado[0], estado[1])
+    st.session_state["logged_in"] = True
+    st.session_state["username"] = username
+    st.session_state["token_sessao"] = token
+    if rota_sessao_ativa:
+        bilhete = secrets.token_urlsafe(32)
+        _bilhetes.put(bilhete, (token, time.time() + BILHETE_TTL))
+        st.session_state["bilhete_sessao"] = bilhete
+
+def restaurar_sessao(segredo, estado_sessao):
+    """True se a sessão está logada com um token válido, recuperando-o do cookie (nova aba, recarregamento) se preciso.
+
+    O token é validado a cada execução (em memória; estado_sessao consulta o banco só na falta,
+    ver validar_token), então um logout em outro processo vale em até AUTH_STATE_TTL segundos.
+    """
+    token = st.session_state.get("token_sessao") or st.context.cookies.get(COOKIE_SESSAO)
+    username = validar_token(token, segredo, estado_sessao)
+    if username is None:
+        _limpar_sessao()
+        if st.session_state.pop("apagar_cookie", False):
+            _chamar_rota(ROTA_SAIR)
+        return False
+    st.session_state["logged_in"] = True
+    st.session_state["username"] = username
+    st.session_state["token_sessao"] = token
+    # Depois de um st.rerun o script anterior é interrompido: o cookie é pedido aqui, já na nova execução
+    bilhete = st.session_state.pop("bilhete_sessao", None)
+    if bilhete:
+        _chamar_rota(ROTA_SESSAO, bilhete)
+    return True
+
+def _limpar_sessao():
+    for chave in ("token_sessao", "bilhete_sessao", "username"):
+        st.session_state.pop(chave, None)
+    st.session_state["logged_in"] = False
+
+def encerrar_sessao(segredo, revogar):
+    """Logout desta sessão: revogar(jti, expira) grava o jti do token na lista de revogados do banco.
+
+    Só o token desta sessão (e das abas que usam o mesmo cookie) deixa de valer; as sessões
+    do usuário em outros navegadores continuam.
+    """
+    token = st.session_state.get("token_sessao")
+    lido = _ler_token(token, segredo) if token and segredo else None
+    if lido is not None:
+        revogar(lido[4], lido[3])
+        _tokens_validos.pop((segredo, token))
+    _limpar_sessao()
+    st.session_state["apagar_cookie"] = True # o cookie é apagado na próxima execução
+
+def encerrar_todas_sessoes(encerrar_sessoes):
+    """Sair de todos os dispositivos. encerrar_sessoes(username) incrementa a geração no banco
+    (todos os tokens do usuário deixam de valer)."""
+    username = st.session_state.get("username")
+    if username:
+        encerrar_sessoes(username)
+        invalidar_usuario(username)
+    _limpar_sessao()
+    st.session_state["apagar_cookie"] = True
+
+# --- Benchmark ---
+
+def benchmark(repeticoes=20):
+    """Tempo (ms) de cada etapa: login com KDF, hash legado, geração e validação de token."""
+    segredo = secrets.token_hex(32)
+    novo = hash_password("senha-benchmark")
+    legado = _hash_legado("senha-benchmark")
+
+    def medir(fn, n=repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(n):
+            fn()
+        return (time.perf_counter() - inicio) / n * 1000
+
+    estado = (0, novo, False)
+    estado_sessao = lambda username, jti: estado
+    token = gerar_token("admin", segredo, 0, novo)
+    def token_sem_cache():
+        _tokens_validos.clear()
+        validar_token(token, segredo, estado_sessao)
+
+    resultados = [
+        ("hash_password (KDF)", medir(lambda: hash_password("senha-benchmark"), 3)),
+        ("verificar_senha (KDF)", medir(lambda: verificar_senha("senha-benchmark", novo), 3)),
+        ("verificar_senha (legado)", medir(lambda: verificar_senha("senha-benchmark", legado), 10000)),
+        ("gerar_token", medir(lambda: gerar_token("admin", segredo, 0, novo), 10000)),
+        ("validar_token (HMAC)", medir(token_sem_cache, 10000)),
+        ("validar_token (cache)", medir(lambda: validar_token(token, segredo, estado_sessao), 10000)),
+    ]
+    _tokens_validos.clear()
+    return resultados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da autenticação (KDF e tokens de sessão).")
+    parser.add_argument("--iteracoes", type=int, default=AUTH_PBKDF2_ITERATIONS)
+    args = parser.parse_args()
+    AUTH_PBKDF2_ITERATIONS = args.iteracoes
+    for nome, ms in benchmark():
+        print(f"{nome:<28} {ms:10.4f} ms")
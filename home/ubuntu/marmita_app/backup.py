@@ -0,0 +1,302 @@
+import argparse
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import database as db
+import jobs
+
+# Diretório dos backups (padrão: "backups" ao lado do banco em uso) e quantos manter
+BACKUP_DIR = os.environ.get("MARMITA_BACKUP_DIR")
+BACKUP_RETENTION = int(os.environ.get("MARMITA_BACKUP_RETENTION", "14"))
+# Intervalo (horas) dos backups automáticos; 0 desliga o agendamento
+BACKUP_INTERVAL_HOURS = float(os.environ.get("MARMITA_BACKUP_INTERVAL_HOURS", "24"))
+BACKUP_COMPRESS = os.environ.get("MARMITA_BACKUP_COMPRESS", "1") != "0"
+# Páginas copiadas por passo e pausa entre passos: o banco fica livre entre um passo e outro
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP = 0.005
+# Uma escrita de outra conexão reinicia a cópia incremental; depois de tantos reinícios
+# o restante é copiado num passo único (em WAL isso não bloqueia os escritores)
+BACKUP_MAX_RESTARTS = 3
+PREFIXO = "marmita_"
+
+class _MuitosReinicios(Exception):
+    pass
+
+def diretorio_backups():
+    return BACKUP_DIR or os.path.join(os.path.dirname(db.DB_FILE) or ".", "backups")
+
+def _nome_backup(sufixo=""):
+    return f"{PREFIXO}{datetime.now():%Y%m%d_%H%M%S_%f}{sufixo}.db"
+
+def criar_backup(diretorio=None, comprimir=BACKUP_COMPRESS, paginas_por_passo=BACKUP_PAGES_PER_STEP,
+                 pausa=BACKUP_STEP_SLEEP, progresso=None, sufixo=""):
+    """Copia o banco em uso com a API de backup do SQLite, em passos de poucas páginas.
+
+    progresso(copiadas, total), se informado, é chamado após cada passo. Retorna um dict
+    com arquivo, paginas, bytes, segundos, reinicios e se a cópia terminou num passo único.
+    """
+    diretorio = diretorio or diretorio_backups()
+    os.makedirs(diretorio, exist_ok=True)
+    destino = os.path.join(diretorio, _nome_backup(sufixo))
+    temporario = destino + ".tmp"
+    inicio = time.perf_counter()
+    estado = {"restante": None, "total": 0, "reinicios": 0}
+
+    def _passo(status, restante, total):
+        if estado["restante"] is not None and restante > estado["restante"]:
+            estado["reinicios"] += 1
+            if estado["reinicios"] > BACKUP_MAX_RESTARTS:
+                raise _MuitosReinicios()
+        estado["restante"], estado["total"] = restante, total
+        if progresso:
+            progresso(total - restante, total)
+        if restante and pausa:
+            # O parâmetro sleep de Connection.backup só vale para SQLITE_BUSY; a pausa entre
+            # passos (sem nenhum lock do backup) é feita aqui
+            time.sleep(pausa)
+
+    fonte = sqlite3.connect(db.DB_FILE)
+    passo_unico = False
+    try:
+        copia = sqlite3.connect(temporario)
+        try:
+            try:
+                fonte.backup(copia, pages=paginas_por_passo, progress=_passo)
+            except _MuitosReinicios:
+                # O banco muda rápido demais para a cópia incremental terminar
+                passo_unico = True
+                fonte.backup(copia, pages=-1)
+            # O backup é um arquivo único, sem -wal ao lado
+            copia.execute("PRAGMA journal_mode = DELETE")
+            if copia.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+                raise sqlite3.DatabaseError("A cópia não passou no PRAGMA quick_check.")
+            paginas = copia.execute("PRAGMA page_count").fetchone()[0]
+        finally:
+            copia.close()
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+    finally:
+        fonte.close()
+
+    if comprimir:
+        with open(temporario, "rb") as f_in, gzip.open(temporario + ".gz", "wb", compresslevel=6) as f_out:
+            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        os.remove(temporario)
+        temporario, destino = temporario + ".gz", destino + ".gz"
+    os.replace(temporario, destino)
+    resultado = {
+        "arquivo": destino, "paginas": paginas, "bytes": os.path.getsize(destino),
+        "segundos": time.perf_counter() - inicio, "reinicios": estado["reinicios"], "passo_unico": passo_unico,
+    }
+    print(f"Backup {destino}: {paginas} pages, {resultado['bytes']} bytes in {resultado['segundos']:.2f}s "
+          f"({estado['reinicios']} restarts{', single step' if passo_unico else ''}).")
+    return resultado
+
+def listar_backups(diretorio=None):
+    """Backups do diretório, do mais recente para o mais antigo: lista de (caminho, bytes, modificado_em)."""
+    diretorio = diretorio or diretorio_backups()
+    arquivos = glob.glob(os.path.join(diretorio, f"{PREFIXO}*.db")) + glob.glob(os.path.join(diretorio, f"{PREFIXO}*.db.gz"))
+    backups = [(a, os.path.getsize(a), datetime.fromtimestamp(os.path.getmtime(a))) for a in arquivos]
+    return sorted(backups, key=lambda b: os.path.basename(b[0]), reverse=True)
+
+def rotacionar(diretorio=None, manter=BACKUP_RETENTION):
+    """Apaga os backups além dos `manter` mais recentes. Retorna os caminhos apagados."""
+    apagados = []
+    for caminho, _, _ in listar_backups(diretorio)[manter:]:
+        try:
+            os.remove(caminho)
+            apagados.append(caminho)
+        except OSError as e:
+            print(f"Error removing old backup {caminho}: {e}")
+    return apagados
+
+def restaurar(arquivo, diretorio=None):
+    """Substitui o conteúdo do banco em uso pelo backup (.db ou .db.gz).
+
+    Antes, faz um backup de segurança do estado atual. A cópia é feita por db.restaurar_de
+    (pool drenado, cópia na thread de escrita, cache limpo); depois disso as migrações são
+    aplicadas, já que o backup pode ser de uma versão anterior do schema.
+    """
+    if not os.path.exists(arquivo):
+        raise FileNotFoundError(arquivo)
+    seguranca = criar_backup(diretorio, sufixo="_antes_restauracao")
+    temporario = None
+    origem = arquivo
+    if arquivo.endswith(".gz"):
+        fd, temporario = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        with gzip.open(arquivo, "rb") as f_in, open(temporario, "wb") as f_out:
+            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        origem = temporario
+    inicio = time.perf_counter()
+    try:
+        fonte = sqlite3.connect(origem, check_same_thread=False) # usada na thread de escrita
+        try:
+            if fonte.execute("PRAGMA quick_check").fetchone()[0] != "ok":
+                raise sqlite3.DatabaseError(f"O backup {arquivo} está corrompido (PRAGMA quick_check).")
+            paginas = fonte.execute("PRAGMA page_count").fetchone()[0]
+            db.restaurar_de(fonte)
+        finally:
+            fonte.close()
+    finally:
+        if temporario:
+            os.remove(temporario)
+    db.init_db(db.get_connection())
+    segundos = time.perf_counter() - inicio
+    print(f"Database restored from {arquivo}: {paginas} pages in {segundos:.2f}s (previous state saved to {seguranca['arquivo']}).")
+    return {"arquivo": arquivo, "paginas": paginas, "segundos": segundos, "backup_anterior": seguranca["arquivo"]}
+
+@jobs.tarefa("backup", "Backup do banco")
+def _backup_job(conn, job, comprimir=BACKUP_COMPRESS, manter=BACKUP_RETENTION):
+    resultado = criar_backup(comprimir=comprimir,
+                             progresso=lambda copiadas, total: job.progresso(copiadas / total if total else None,
+                                                                             f"{copiadas}/{total} páginas"))
+    resultado["apagados"] = rotacionar(manter=manter)
+    return resultado
+
+# --- Agendamento ---
+
+# Espera mínima (segundos) antes de um backup agendado, para não competir com a subida do app
+ESPERA_MINIMA = 60.0
+# Intervalo (segundos) entre consultas ao estado do job agendado e teto da espera após falhas
+ESPERA_STATUS = 5.0
+ESPERA_MAXIMA_FALHAS = 3600.0
+
+class BackupScheduler:
+    """Thread que envia um job de backup a cada `intervalo_horas`, contados a partir do backup mais recente.
+
+    Sem nenhum backup no diretório, o primeiro é feito ESPERA_MINIMA depois de iniciar, e
+    nunca antes disso, mesmo que o último backup já esteja vencido. A thread espera o job
+    terminar; se ele falhar, tenta de novo depois de ESPERA_MINIMA, dobrando a espera a cada
+    falha seguida (até ESPERA_MAXIMA_FALHAS). Com várias instâncias do app no mesmo banco,
+    só uma cria o job de cada horário (jobs.submit_job com exclusivo_segundos).
+    """
+
+    def __init__(self, intervalo_horas=BACKUP_INTERVAL_HOURS):
+        self.intervalo = intervalo_horas * 3600
+        self.falhas = 0
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="marmita-backup-scheduler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._parar.set()
+
+    def _run(self):
+        espera = self._proxima_espera()
+        while not self._parar.wait(espera):
+            try:
+                espera = self._executar()
+            finally:
+                db.release_connection() # a thread passa horas parada: não segura conexão do pool
+
+    def _executar(self):
+        """Envia o job de backup e espera o resultado. Retorna a espera (segundos) até a próxima vez."""
+        try:
+            # Um backup concluído por outro processo há menos de meio intervalo vale por este
+            job_id = jobs.submit_job("backup", usar_cache=False, criado_por="agendamento",
+                                     exclusivo_segundos=max(ESPERA_MINIMA, self.intervalo / 2))
+        except (RuntimeError, sqlite3.Error) as e:
+            print(f"Error scheduling backup: {e}")
+            return self._apos_falha()
+        finally:
+            db.release_connection()
+        if job_id is None:
+            # Outro processo já fez (ou está fazendo) o backup deste horário
+            self.falhas = 0
+            return self._proxima_espera()
+        status = self._aguardar(job_id)
+        if status is None: # parando
+            return 0
+        if status != "concluido":
+            print(f"Scheduled backup job {job_id} ended with status '{status}'.")
+            return self._apos_falha()
+        self.falhas = 0
+        return self._proxima_espera()
+
+    def _aguardar(self, job_id):
+        # Status final do job, ou None se o agendamento for parado antes
+        while not self._parar.wait(ESPERA_STATUS):
+            try:
+                status = jobs.get_job_status(job_id)
+            finally:
+                db.release_connection()
+            if status is None:
+                return "erro"
+            if status["status"] not in db.JOB_STATUS_ATIVOS:
+                return status["status"]
+        return None
+
+    def _apos_falha(self):
+        self.falhas += 1
+        espera = min(ESPERA_MINIMA * 2 ** (self.falhas - 1), ESPERA_MAXIMA_FALHAS, max(self.intervalo, ESPERA_MINIMA))
+        print(f"Scheduled backup failed ({self.falhas} in a row); retrying in {espera:.0f}s.")
+        return espera
+
+    def _proxima_espera(self):
+        # Conta a partir do backup mais recente, para que reinícios do app não adiem o backup
+        backups = listar_backups()
+        if not backups:
+            return ESPERA_MINIMA
+        decorrido = (datetime.now() - backups[0][2]).total_seconds()
+        return max(ESPERA_MINIMA, self.intervalo - decorrido)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def iniciar_agendamento(intervalo_horas=BACKUP_INTERVAL_HOURS):
+    """Inicia (uma vez por processo) os backups automáticos, no horário de BackupScheduler. Não faz nada com intervalo 0."""
+    global _scheduler
+    if intervalo_horas <= 0:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = BackupScheduler(intervalo_horas)
+            _scheduler.start()
+        return _scheduler
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backup online do banco de dados SQLite das marmitas.")
+    parser.add_argument("--db", default=db.DB_FILE, help="caminho do banco SQLite")
+    parser.add_argument("--dir", default=None, help="diretório dos backups (padrão: backups/ ao lado do banco)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    criar = sub.add_parser("criar", help="faz um backup agora e aplica a rotação")
+    criar.add_argument("--sem-compressao", action="store_true")
+    criar.add_argument("--manter", type=int, default=BACKUP_RETENTION)
+    sub.add_parser("listar", help="lista os backups existentes")
+    rest = sub.add_parser("restaurar", help="restaura o banco a partir de um backup")
+    rest.add_argument("arquivo")
+    agendar = sub.add_parser("agendar", help="roda backups periódicos em primeiro plano")
+    agendar.add_argument("--horas", type=float, default=BACKUP_INTERVAL_HOURS or 24)
+    agendar.add_argument("--manter", type=int, default=BACKUP_RETENTION)
+    args = parser.parse_args()
+
+    db.use_database(args.db)
+    if args.comando == "criar":
+        r = criar_backup(args.dir, comprimir=not args.sem_compressao)
+        for apagado in rotacionar(args.dir, args.manter):
+            print(f"removed {apagado}")
+    elif args.comando == "listar":
+        for caminho, tamanho, data in listar_backups(args.dir):
+            print(f"{data:%Y-%m-%d %H:%M:%S}  {tamanho:>12}  {caminho}")
+    elif args.comando == "restaurar":
+        restaurar(args.arquivo, args.dir)
+    elif args.comando == "agendar":
+        try:
+            while True:
+                criar_backup(args.dir)
+                rotacionar(args.dir, args.manter)
+                time.sleep(args.horas * 3600)
+        except KeyboardInterrupt:
+            pass
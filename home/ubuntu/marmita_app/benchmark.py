@@ -0,0 +1,292 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import database as db
+import analytics
+
+# Escalas padrão (número de pedidos) e orçamento de tempo por função medida
+ESCALAS_PADRAO = [1_000, 100_000, 1_000_000]
+TEMPO_POR_FUNCAO = 2.0   # segundos
+MIN_ITERACOES = 5
+MAX_ITERACOES = 2000
+# Pedidos gerados por chamada de add_pedidos_bulk
+LOTE_GERACAO = 50_000
+# Regressão: p95 pior que o baseline em mais de TOLERANCIA e em mais de MIN_DIFERENCA_MS
+TOLERANCIA = 0.25
+MIN_DIFERENCA_MS = 0.1
+
+# --- Geração de Dados Sintéticos ---
+
+def _pesos_zipf(n, s):
+    # Acumulados para random.choices: poucos clientes/marmitas concentram a maior parte dos pedidos
+    acumulado = 0.0
+    pesos = []
+    for i in range(n):
+        acumulado += 1.0 / (i + 1) ** s
+        pesos.append(acumulado)
+    return pesos
+
+def gerar_dados(conn, n_pedidos, n_clientes=None, n_semanas=52, n_marmitas=30, max_itens=5, seed=42):
+    """Preenche o banco atual com dados sintéticos reproduzíveis (mesma seed = mesmos dados).
+
+    Clientes e marmitas seguem distribuição de Zipf, os pedidos se espalham pelas semanas
+    com horário dentro da semana, e semanas antigas ficam quase todas pagas/entregues.
+    """
+    rng = random.Random(seed)
+    n_clientes = n_clientes or max(50, n_pedidos // 20)
+    inicio = datetime(2025, 1, 6)
+
+    semana_ids = []
+    for i in range(n_semanas):
+        data_inicio = inicio + timedelta(days=7 * i)
+        data_fim = data_inicio + timedelta(days=6)
+        nome = f"Semana {data_inicio:%d/%m} a {data_fim:%d/%m/%Y}"
+        semana_ids.append(db.add_semana(conn, nome, data_inicio.date().isoformat(), data_fim.date().isoformat()))
+
+    categorias = ["Tradicional", "Fit", "Vegetariana", "Low Carb"]
+    marmitas = []
+    for i in range(n_marmitas):
+        preco = round(rng.uniform(9.0, 18.0), 2)
+        marmita_id = db.add_marmita(conn, f"Marmita {i + 1:03d}", "Gerada para benchmark", preco, categorias[i % len(categorias)], rng.random() < 0.7)
+        marmitas.append((marmita_id, preco))
+
+    cliente_ids = []
+    for i in range(n_clientes):
+        cliente_ids.append(db.add_cliente(conn, f"Cliente {i + 1:06d}", f"{rng.randint(1, 9999)} Main St, Cidade {i % 97}, FL, {32000 + i % 900:05d}", "", f"+1 555-{i:07d}"))
+
+    pesos_clientes = _pesos_zipf(n_clientes, 1.1)
+    pesos_marmitas = _pesos_zipf(n_marmitas, 0.8)
+    formas = db.FORMAS_PAGAMENTO
+
+    gerados = 0
+    while gerados < n_pedidos:
+        lote = []
+        for _ in range(min(LOTE_GERACAO, n_pedidos - gerados)):
+            # Mais pedidos nas semanas recentes
+            k = min(n_semanas - 1, int(n_semanas * rng.random() ** 0.7))
+            data_hora = inicio + timedelta(days=7 * k, seconds=rng.randrange(7 * 24 * 3600))
+            antiga = k < n_semanas - 1
+            itens = {}
+            for _ in range(1 + min(max_itens - 1, int(rng.expovariate(1.2)))):
+                marmita_id, preco = rng.choices(marmitas, cum_weights=pesos_marmitas)[0]
+                item = itens.setdefault(marmita_id, {"marmita_id": marmita_id, "quantidade": 0, "preco_unitario": preco})
+                item["quantidade"] += rng.randint(1, 3)
+            lote.append({
+                "cliente_id": rng.choices(cliente_ids, cum_weights=pesos_clientes)[0],
+                "semana_id": semana_ids[k],
+                "data_hora": data_hora.strftime("%Y-%m-%d %H:%M:%S"),
+                "valor_total": round(sum(i["quantidade"] * i["preco_unitario"] for i in itens.values()), 2),
+                "forma_pagamento": rng.choice(formas),
+                "status_pagamento": "Pago" if antiga or rng.random() < 0.4 else "Pendente",
+                "status_entrega": "Entregue" if antiga else rng.choice(db.STATUS_ENTREGA),
+                "itens": list(itens.values()),
+            })
+        db.add_pedidos_bulk(conn, lote)
+        gerados += len(lote)
+    return {"pedidos": n_pedidos, "clientes": n_clientes, "semanas": n_semanas, "marmitas": n_marmitas}
+
+# --- Medição ---
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return 0.0
+    k = (len(ordenados) - 1) * p
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+def medir(fn, tempo_max=TEMPO_POR_FUNCAO, min_iter=MIN_ITERACOES, max_iter=MAX_ITERACOES):
+    """Chama fn() repetidamente (após 1 aquecimento) e devolve p50/p95/p99 em ms e vazão."""
+    fn()
+    latencias = []
+    inicio = time.perf_counter()
+    while len(latencias) < max_iter and (len(latencias) < min_iter or time.perf_counter() - inicio < tempo_max):
+        t = time.perf_counter()
+        fn()
+        latencias.append((time.perf_counter() - t) * 1000)
+    total = time.perf_counter() - inicio
+    latencias.sort()
+    return {
+        "iteracoes": len(latencias),
+        "p50_ms": round(_percentil(latencias, 0.50), 4),
+        "p95_ms": round(_percentil(latencias, 0.95), 4),
+        "p99_ms": round(_percentil(latencias, 0.99), 4),
+        "ops_por_segundo": round(len(latencias) / total, 1) if total > 0 else 0.0,
+    }
+
+def casos(conn, rng):
+    """(nome, função sem argumentos) para cada função pública de database.py."""
+    semanas = [s[0] for s in db.get_all_semanas(conn)]
+    clientes = [c[0] for c in db.get_all_clientes(conn)]
+    marmitas = [(m[0], m[3]) for m in db.get_all_marmitas(conn)]
+    max_pedido = conn.execute("SELECT MAX(id) FROM pedidos").fetchone()[0] or 1
+    # Pedidos existentes (em ordem aleatória) para as exclusões
+    para_excluir = [r[0] for r in conn.execute("SELECT id FROM pedidos ORDER BY random() LIMIT ?", (MAX_ITERACOES + 1,))]
+
+    def novo_pedido():
+        marmita_id, preco = rng.choice(marmitas)
+        db.add_pedido(conn, rng.choice(clientes), rng.choice(semanas), 2 * preco, "Pix", "Pendente", "Pendente",
+                      [{"marmita_id": marmita_id, "quantidade": 2, "preco_unitario": preco}])
+
+    def excluir_pedido():
+        if para_excluir:
+            db.delete_pedido(conn, para_excluir.pop())
+
+    contador = iter(range(10**9))
+    clientes_bench = []
+
+    def novo_cliente():
+        clientes_bench.append(db.add_cliente(conn, "Cliente Bench", "1 Bench St", "", f"+1 999-{next(contador):07d}"))
+
+    def lote_pedidos():
+        marmita_id, preco = rng.choice(marmitas)
+        db.add_pedidos_bulk(conn, [{
+            "cliente_id": rng.choice(clientes), "semana_id": rng.choice(semanas), "data_hora": "2025-06-01 12:00:00",
+            "valor_total": preco, "forma_pagamento": "Pix", "status_pagamento": "Pendente", "status_entrega": "Pendente",
+            "itens": [{"marmita_id": marmita_id, "quantidade": 1, "preco_unitario": preco}],
+        } for _ in range(1000)])
+
+    return [
+        ("get_all_semanas", lambda: db.get_all_semanas(conn)),
+        ("get_all_clientes", lambda: db.get_all_clientes(conn)),
+        ("get_cliente_by_id", lambda: db.get_cliente_by_id(conn, rng.choice(clientes))),
+        ("get_cliente_by_phone", lambda: db.get_cliente_by_phone(conn, f"555{rng.randrange(len(clientes)):07d}")),
+        ("search_clientes", lambda: db.search_clientes(conn, f"Cliente {rng.randint(1, 999):03d}")),
+        ("get_all_marmitas", lambda: db.get_all_marmitas(conn)),
+        ("get_marmitas_disponiveis", lambda: db.get_marmitas_disponiveis(conn)),
+        ("get_marmita_by_id", lambda: db.get_marmita_by_id(conn, rng.choice(marmitas)[0])),
+        ("verify_user", lambda: db.verify_user(conn, "admin", "admin")),
+        ("get_dashboard_metrics", lambda: db.get_dashboard_metrics(conn)),
+        ("count_pedidos", lambda: db.count_pedidos(conn, semana_id_filter=rng.choice(semanas))),
+        ("get_all_pedidos_info", lambda: db.get_all_pedidos_info(conn, semana_id_filter=rng.choice(semanas))),
+        ("get_pedidos_page", lambda: db.get_pedidos_page(conn, semana_id_filter=rng.choice(semanas), page_size=50)),
+        ("get_pedido_itens", lambda: db.get_pedido_itens(conn, rng.randint(1, max_pedido))),
+        ("get_itens_por_pedidos_100", lambda: db.get_itens_por_pedidos(conn, tuple(rng.randint(1, max_pedido) for _ in range(100)))),
+        ("get_itens_por_pedidos_semana", lambda: db.get_itens_por_pedidos(conn, semana_id=rng.choice(semanas))),
+        ("get_vendas_por_cliente", lambda: db.get_vendas_por_cliente(conn, semana_id_filter=rng.choice(semanas))),
+        ("get_vendas_por_cliente_todas", lambda: db.get_vendas_por_cliente(conn)),
+        ("get_marmitas_por_cliente", lambda: db.get_marmitas_por_cliente(conn, rng.choice(clientes[:50]))),
+        ("get_vendas_geral", lambda: db.get_vendas_geral(conn, semana_id_filter=rng.choice(semanas))),
+        ("get_vendas_geral_todas", lambda: db.get_vendas_geral(conn)),
+        ("get_marmitas_mais_vendidas", lambda: db.get_marmitas_mais_vendidas(conn, semana_id_filter=rng.choice(semanas))),
+        ("get_marmitas_mais_vendidas_todas", lambda: db.get_marmitas_mais_vendidas(conn)),
+        ("get_plano_producao", lambda: db.get_plano_producao(conn, rng.choice(semanas))),
+        ("get_entregas_semana", lambda: db.get_entregas_semana(conn, rng.choice(semanas))),
+        ("get_tendencias_semanais", lambda: analytics.get_tendencias_semanais(conn, 12, rng.choice(semanas))),
+        ("get_tendencias_semanais_52", lambda: analytics.get_tendencias_semanais(conn, 52)),
+        ("add_pedido", novo_pedido),
+        ("update_pedido_status", lambda: db.update_pedido_status(conn, rng.randint(1, max_pedido), "Pago", rng.choice(db.STATUS_ENTREGA))),
+        ("delete_pedido", excluir_pedido),
+        ("add_cliente", novo_cliente),
+        ("update_cliente", lambda: db.update_cliente(conn, clientes_bench[-1], "Cliente Bench 2", "2 Bench St", "", f"+1 998-{next(contador):07d}")),
+        ("delete_cliente", lambda: clientes_bench and db.delete_cliente(conn, clientes_bench.pop())),
+        ("add_pedidos_bulk_1000", lote_pedidos),
+    ]
+
+def _remover_banco(caminho):
+    for sufixo in ("", "-wal", "-shm"):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+
+def rodar_escala(n_pedidos, diretorio, reusar=False, com_cache=False, seed=42, tempo_max=TEMPO_POR_FUNCAO, filtro=None):
+    # O banco gerado fica intacto; as medições (que também escrevem) rodam numa cópia
+    caminho = os.path.join(diretorio, f"marmita_bench_{n_pedidos}.db")
+    copia = os.path.join(diretorio, f"marmita_bench_{n_pedidos}_execucao.db")
+    gerar = not (reusar and os.path.exists(caminho))
+    geracao = 0.0
+    if gerar:
+        _remover_banco(caminho)
+        db.use_database(caminho)
+        conn = db.get_connection()
+        db.init_db(conn)
+        t = time.perf_counter()
+        dados = gerar_dados(conn, n_pedidos, seed=seed)
+        geracao = time.perf_counter() - t
+        print(f"[{n_pedidos}] dados gerados em {geracao:.1f}s: {dados}")
+        db.shutdown() # fecha as conexões e faz o checkpoint do WAL
+    _remover_banco(copia)
+    shutil.copyfile(caminho, copia)
+    db.use_database(copia)
+    conn = db.get_connection()
+    db.init_db(conn)
+
+    rng = random.Random(seed)
+    resultados = {}
+    for nome, fn in casos(conn, rng):
+        if filtro and filtro not in nome:
+            continue
+        if com_cache:
+            r = medir(fn, tempo_max)
+        else:
+            with db.bypass_query_cache():
+                r = medir(fn, tempo_max)
+        resultados[nome] = r
+        print(f"[{n_pedidos}] {nome:34s} p50={r['p50_ms']:9.3f}ms p95={r['p95_ms']:9.3f}ms p99={r['p99_ms']:9.3f}ms {r['ops_por_segundo']:10.1f} ops/s")
+    db.shutdown()
+    _remover_banco(copia)
+    return {"geracao_segundos": round(geracao, 2) if gerar else None, "funcoes": resultados}
+
+def comparar(atual, baseline, tolerancia=TOLERANCIA, min_diferenca_ms=MIN_DIFERENCA_MS):
+    """Lista de regressões de p95 entre dois resultados (mesma escala e função)."""
+    regressoes = []
+    for escala, dados in atual["escalas"].items():
+        base = baseline.get("escalas", {}).get(escala, {}).get("funcoes", {})
+        for nome, r in dados["funcoes"].items():
+            if nome not in base:
+                continue
+            antes, agora = base[nome]["p95_ms"], r["p95_ms"]
+            if agora > antes * (1 + tolerancia) and agora - antes > min_diferenca_ms:
+                regressoes.append(f"{escala} pedidos / {nome}: p95 {antes:.3f}ms -> {agora:.3f}ms")
+    return regressoes
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark das funções de database.py sobre dados sintéticos.")
+    parser.add_argument("--escalas", default=",".join(str(e) for e in ESCALAS_PADRAO),
+                        help="números de pedidos separados por vírgula (padrão: 1000,100000,1000000)")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="diretório dos bancos de rascunho")
+    parser.add_argument("--reusar", action="store_true", help="reaproveita bancos já gerados")
+    parser.add_argument("--com-cache", action="store_true", help="mede com o cache de leituras ligado")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tempo", type=float, default=TEMPO_POR_FUNCAO, help="segundos de medição por função")
+    parser.add_argument("--filtro", help="mede apenas funções cujo nome contém este texto")
+    parser.add_argument("--saida", default="benchmark_resultados.json")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    args = parser.parse_args()
+
+    resultado = {
+        "meta": {
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "seed": args.seed,
+            "com_cache": args.com_cache,
+        },
+        "escalas": {},
+    }
+    for escala in [int(e) for e in args.escalas.split(",") if e.strip()]:
+        resultado["escalas"][str(escala)] = rodar_escala(escala, args.dir, args.reusar, args.com_cache, args.seed, args.tempo, args.filtro)
+
+    with open(args.saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {args.saida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressoes = comparar(resultado, json.load(f), args.tolerancia)
+        if regressoes:
+            print("REGRESSÕES:")
+            for r in regressoes:
+                print(f"  {r}")
+            sys.exit(1)
+        print("Nenhuma regressão em relação ao baseline.")
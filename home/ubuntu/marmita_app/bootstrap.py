@@ -0,0 +1,61 @@
+import functools
+import io
+import os
+
+import streamlit as st
+import database as db
+import auth
+import backup
+import instrumentation
+
+# Início comum de todas as páginas (app.py e pages/*): configuração da página, conexão do
+# pool, schema, login e instrumentação. Cada etapa custa uma comparação em memória depois da
+# primeira execução do processo (init_db, agendamento de backups) ou da sessão (login).
+
+MENSAGEM_LOGIN = "⚠️ Você precisa fazer login para acessar esta página."
+MENSAGEM_CONEXAO = "Falha crítica: Não foi possível conectar ao banco de dados nesta página."
+LOGO_PATH = os.path.join(os.path.dirname(__file__), "assets", "logo.jpeg")
+# Largura (px) do logo já reduzido: a barra lateral tem ~300 px, o dobro cobre telas de alta densidade
+LOGO_LARGURA = 600
+
+def setup_page(pagina, titulo, icone, exigir_login=True):
+    """Prepara a execução da página e retorna (conexão do pool, sessão logada).
+
+    Para a página (st.stop) se não houver conexão ou, com exigir_login, se a sessão não
+    estiver logada nem puder ser recuperada do cookie de sessão (nova aba, recarregamento).
+    """
+    instrumentation.page_begin(pagina) # tempo da execução (até o fim do script, mesmo com st.stop) e consultas
+    # Primeiro comando do Streamlit na página
+    st.set_page_config(page_title=titulo, page_icon=icone, layout="wide")
+
+    # Conexão desta thread no pool compartilhado (não abre conexão nova a cada rerun)
+    conn = db.get_connection()
+    # Schema/migrações só na primeira execução do processo, qualquer que seja a página aberta
+    if not conn or not db.init_db(conn):
+        st.error(MENSAGEM_CONEXAO)
+        st.stop()
+    # Backups automáticos em segundo plano (uma thread por processo; MARMITA_BACKUP_INTERVAL_HOURS=0 desliga)
+    backup.iniciar_agendamento()
+
+    # Token da sessão ou do cookie, conferido em memória; o banco (geração, senha e revogação) só na falta
+    logado = auth.restaurar_sessao(db.get_auth_secret(conn), lambda username, jti: db.get_estado_sessao(conn, username, jti))
+    if exigir_login and not logado:
+        st.error(MENSAGEM_LOGIN)
+        st.stop()
+    return conn, logado
+
+@functools.lru_cache(maxsize=1)
+def logo():
+    """Bytes do logo reduzido a LOGO_LARGURA, calculados uma vez por processo (None se não existir).
+
+    Com o arquivo original (1600 px) o Streamlit decodifica e redimensiona a imagem a cada
+    rerun (~80 ms); já pequeno, ele só lê o cabeçalho.
+    """
+    if not os.path.exists(LOGO_PATH):
+        return None
+    from PIL import Image # dependência do próprio Streamlit
+    with Image.open(LOGO_PATH) as imagem:
+        imagem.thumbnail((LOGO_LARGURA, LOGO_LARGURA))
+        saida = io.BytesIO()
+        imagem.convert("RGB").save(saida, format="JPEG", quality=85)
+    return saida.getvalue()
@@ -0,0 +1,208 @@
+import argparse
+import os
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+import database as db
+
+# Formato do arquivo: uma linha por item de pedido. Linhas com o mesmo valor em "pedido"
+# formam um único pedido (sem a coluna, cada linha vira um pedido).
+# Cliente, semana e marmita podem vir pelo nome/telefone ou pelo ID.
+COLUNAS_CLIENTE = ("telefone", "cliente_id")
+COLUNAS_SEMANA = ("semana", "semana_id")
+COLUNAS_MARMITA = ("marmita", "marmita_id")
+COLUNAS_OPCIONAIS = ("pedido", "quantidade", "preco_unitario", "forma_pagamento", "status_pagamento", "status_entrega", "data_hora")
+# Campos do pedido (e não do item): as linhas de um mesmo pedido não podem divergir neles
+CAMPOS_PEDIDO = ("forma_pagamento", "status_pagamento", "status_entrega", "data_hora")
+ROTULOS_CAMPOS = {"forma_pagamento": "forma de pagamento", "status_pagamento": "status de pagamento",
+                  "status_entrega": "status de entrega", "data_hora": "data/hora"}
+
+MODELO_CSV = (
+    "pedido,telefone,semana,marmita,quantidade,preco_unitario,forma_pagamento,status_pagamento,status_entrega,data_hora\n"
+    "1,+1 555-123-4567,Semana 05/Mai a 11/Mai,Frango Grelhado,2,,Pix,Pendente,Pendente,\n"
+    "1,+1 555-123-4567,Semana 05/Mai a 11/Mai,Feijoada,1,,Pix,Pendente,Pendente,\n"
+)
+
+def ler_arquivo(arquivo, nome_arquivo=None):
+    """Lê um arquivo CSV, JSON (lista de registros) ou Excel num DataFrame de texto."""
+    nome = (nome_arquivo or getattr(arquivo, "name", None) or str(arquivo)).lower()
+    if nome.endswith(".csv"):
+        df = pd.read_csv(arquivo, dtype=str, keep_default_na=False)
+    elif nome.endswith(".json"):
+        df = pd.read_json(arquivo, orient="records", dtype=False)
+    elif nome.endswith((".xlsx", ".xls")):
+        try:
+            df = pd.read_excel(arquivo, dtype=str)
+        except ImportError as e:
+            raise ValueError(f"Para importar Excel instale o pacote openpyxl ({e}).")
+    else:
+        raise ValueError("Formato não suportado. Use .csv, .json ou .xlsx.")
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    return df.fillna("").astype(str)
+
+def _texto(valor):
+    return valor.strip() if isinstance(valor, str) else str(valor).strip()
+
+def _numero(valor, tipo):
+    texto = _texto(valor).replace("$", "").replace(",", ".")
+    if tipo is not int:
+        return tipo(texto)
+    numero = float(texto) # planilhas costumam trazer inteiros como "2.0"
+    if not numero.is_integer():
+        raise ValueError(f"'{_texto(valor)}' não é um número inteiro")
+    return int(numero)
+
+def _data_hora_utc(texto):
+    # Mesma convenção de CURRENT_TIMESTAMP: UTC sem fuso. Datas com fuso são convertidas;
+    # datas sem fuso são gravadas como vieram
+    momento = pd.Timestamp(texto)
+    if momento.tzinfo is not None:
+        momento = momento.tz_convert("UTC").tz_localize(None)
+    return momento.strftime("%Y-%m-%d %H:%M:%S")
+
+def validar_linhas(conn, df):
+    """Valida as linhas em memória contra clientes, marmitas e semanas já cadastrados.
+
+    Retorna (pedidos, erros): pedidos no formato de db.add_pedidos_bulk e erros como
+    lista de (linha, mensagem). Um pedido com qualquer linha inválida é descartado inteiro.
+    """
+    erros = []
+    for grupo, nome in ((COLUNAS_CLIENTE, "cliente"), (COLUNAS_SEMANA, "semana"), (COLUNAS_MARMITA, "marmita")):
+        if not any(col in df.columns for col in grupo):
+            erros.append((0, f"Falta a coluna de {nome}: use uma de {', '.join(grupo)}."))
+    if erros:
+        return [], erros
+
+    # Cadastros carregados uma única vez (consultas cacheadas)
+    clientes = db.get_all_clientes(conn)
+    clientes_por_telefone = {db.normalize_phone(c[4]): c[0] for c in clientes if c[4]}
+    clientes_ids = {c[0] for c in clientes}
+    marmitas = db.get_all_marmitas(conn)
+    marmitas_por_nome = {m[1].strip().lower(): (m[0], m[3]) for m in marmitas}
+    marmitas_por_id = {m[0]: (m[0], m[3]) for m in marmitas}
+    semanas = db.get_all_semanas(conn)
+    semanas_por_nome = {s[1].strip().lower(): s[0] for s in semanas}
+    semanas_ids = {s[0] for s in semanas}
+
+    agora = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S") # igual a CURRENT_TIMESTAMP
+    pedidos = {}    # referência -> pedido
+    definidos = {}  # referência -> campos do pedido preenchidos em alguma linha
+    invalidos = set()
+
+    # Linha 2 = primeira linha de dados (a linha 1 é o cabeçalho)
+    for linha, row in enumerate(df.to_dict("records"), start=2):
+        ref = _texto(row.get("pedido", "")) or f"linha-{linha}"
+        try:
+            if _texto(row.get("cliente_id", "")):
+                cliente_id = int(_numero(row["cliente_id"], int))
+                if cliente_id not in clientes_ids:
+                    raise ValueError(f"cliente_id {cliente_id} não existe")
+            else:
+                telefone = _texto(row.get("telefone", ""))
+                cliente_id = clientes_por_telefone.get(db.normalize_phone(telefone))
+                if cliente_id is None:
+                    raise ValueError(f"telefone '{telefone}' não cadastrado")
+
+            if _texto(row.get("semana_id", "")):
+                semana_id = int(_numero(row["semana_id"], int))
+                if semana_id not in semanas_ids:
+                    raise ValueError(f"semana_id {semana_id} não existe")
+            else:
+                nome_semana = _texto(row.get("semana", ""))
+                if nome_semana.lower() not in semanas_por_nome:
+                    raise ValueError(f"semana '{nome_semana}' não cadastrada")
+                semana_id = semanas_por_nome[nome_semana.lower()]
+
+            if _texto(row.get("marmita_id", "")):
+                marmita = marmitas_por_id.get(int(_numero(row["marmita_id"], int)))
+            else:
+                marmita = marmitas_por_nome.get(_texto(row.get("marmita", "")).lower())
+            if marmita is None:
+                raise ValueError(f"marmita '{_texto(row.get('marmita', row.get('marmita_id', '')))}' não cadastrada")
+
+            quantidade = _numero(row.get("quantidade", "") or 1, int)
+            if quantidade <= 0:
+                raise ValueError("quantidade deve ser maior que zero")
+            preco = _numero(row["preco_unitario"], float) if _texto(row.get("preco_unitario", "")) else marmita[1]
+            if preco is None or preco < 0:
+                raise ValueError("preço unitário inválido")
+
+            # Campos do pedido em branco ficam com o valor das outras linhas do pedido (ou o padrão)
+            campos = {campo: _texto(row.get(campo, "")) or None for campo in CAMPOS_PEDIDO}
+            if campos["forma_pagamento"] not in (None, *db.FORMAS_PAGAMENTO):
+                raise ValueError(f"forma de pagamento '{campos['forma_pagamento']}' inválida")
+            if campos["status_pagamento"] not in (None, *db.STATUS_PAGAMENTO):
+                raise ValueError(f"status de pagamento '{campos['status_pagamento']}' inválido")
+            if campos["status_entrega"] not in (None, *db.STATUS_ENTREGA):
+                raise ValueError(f"status de entrega '{campos['status_entrega']}' inválido")
+            if campos["data_hora"] is not None:
+                campos["data_hora"] = _data_hora_utc(campos["data_hora"])
+        except (ValueError, TypeError, KeyError) as e:
+            erros.append((linha, f"Pedido {ref}: {e}"))
+            invalidos.add(ref)
+            continue
+
+        pedido = pedidos.get(ref)
+        if pedido is None:
+            pedido = pedidos[ref] = {"cliente_id": cliente_id, "semana_id": semana_id, "valor_total": 0.0, "itens": []}
+            definidos[ref] = {}
+        elif (pedido["cliente_id"], pedido["semana_id"]) != (cliente_id, semana_id):
+            erros.append((linha, f"Pedido {ref}: cliente/semana diferente das outras linhas do mesmo pedido"))
+            invalidos.add(ref)
+            continue
+        conflitos = [campo for campo, valor in campos.items()
+                     if valor is not None and definidos[ref].get(campo, valor) != valor]
+        if conflitos:
+            erros.append((linha, f"Pedido {ref}: {', '.join(ROTULOS_CAMPOS[c] for c in conflitos)} diferente das outras linhas do mesmo pedido"))
+            invalidos.add(ref)
+            continue
+        definidos[ref].update((campo, valor) for campo, valor in campos.items() if valor is not None)
+        pedido["itens"].append({"marmita_id": marmita[0], "quantidade": quantidade, "preco_unitario": preco})
+        pedido["valor_total"] += quantidade * preco
+
+    padroes = {"forma_pagamento": "Outro", "status_pagamento": "Pendente", "status_entrega": "Pendente", "data_hora": agora}
+    for ref, pedido in pedidos.items():
+        pedido.update({campo: definidos[ref].get(campo, padrao) for campo, padrao in padroes.items()})
+    return [p for ref, p in pedidos.items() if ref not in invalidos], erros
+
+def importar_pedidos(conn, arquivo, nome_arquivo=None, batch_size=db.BULK_BATCH_SIZE):
+    """Lê, valida e grava os pedidos do arquivo. Retorna um resumo com erros por linha e vazão."""
+    inicio = time.perf_counter()
+    resultado = {"pedidos_importados": 0, "itens_importados": 0, "erros": [], "segundos": 0.0, "pedidos_por_segundo": 0.0}
+    try:
+        df = ler_arquivo(arquivo, nome_arquivo)
+    except (ValueError, OSError) as e:
+        resultado["erros"].append((0, f"Não foi possível ler o arquivo: {e}"))
+        return resultado
+
+    pedidos, erros = validar_linhas(conn, df)
+    resultado["erros"] = erros
+    try:
+        ids = db.add_pedidos_bulk(conn, pedidos, batch_size=batch_size) if pedidos else []
+    except db.ImportacaoInterrompida as e:
+        ids = e.ids
+        resultado["erros"].append((0, str(e)))
+    resultado["pedidos_importados"] = len(ids)
+    resultado["itens_importados"] = sum(len(p["itens"]) for p in pedidos[:len(ids)])
+    resultado["segundos"] = time.perf_counter() - inicio
+    if resultado["segundos"] > 0:
+        resultado["pedidos_por_segundo"] = len(ids) / resultado["segundos"]
+    return resultado
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa pedidos em lote de um arquivo CSV/JSON/Excel.")
+    parser.add_argument("arquivo")
+    parser.add_argument("--db", default=db.DB_FILE, help="caminho do banco SQLite")
+    parser.add_argument("--batch-size", type=int, default=db.BULK_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db.use_database(args.db)
+    conn = db.get_connection()
+    db.init_db(conn)
+    res = importar_pedidos(conn, args.arquivo, os.path.basename(args.arquivo), batch_size=args.batch_size)
+    for linha, msg in res["erros"]:
+        print(f"linha {linha}: {msg}")
+    print(f"{res['pedidos_importados']} pedidos / {res['itens_importados']} itens em {res['segundos']:.2f}s "
+          f"({res['pedidos_por_segundo']:.0f} pedidos/s), {len(res['erros'])} erros")
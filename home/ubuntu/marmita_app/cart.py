@@ -0,0 +1,121 @@
+import database as db
+
+# Carrinho do pedido em edição (guardado em st.session_state entre os reruns da página).
+# Os itens ficam num dict por marmita_id: juntar/remover um item não percorre a lista, e o
+# total (em centavos, sem acumular erro de ponto flutuante) e a quantidade de marmitas são
+# atualizados a cada alteração.
+
+class MarmitaCardapio:
+    """Marmita disponível no cardápio: ID, nome, preço e o rótulo mostrado no seletor."""
+    __slots__ = ("id", "nome", "preco", "rotulo")
+
+    def __init__(self, marmita_id, nome, preco):
+        self.id = marmita_id
+        self.nome = nome
+        self.preco = preco
+        self.rotulo = f"{nome} (${preco:.2f})"
+
+class Cardapio:
+    """Retrato das marmitas disponíveis: dict marmita_id -> MarmitaCardapio, em ordem de nome."""
+    __slots__ = ("marmitas",)
+
+    def __init__(self, linhas):
+        self.marmitas = {m_id: MarmitaCardapio(m_id, nome, preco) for m_id, nome, preco in linhas}
+
+    def __len__(self):
+        return len(self.marmitas)
+
+    def __contains__(self, marmita_id):
+        return marmita_id in self.marmitas
+
+    def __getitem__(self, marmita_id):
+        return self.marmitas[marmita_id]
+
+    def ids(self):
+        return list(self.marmitas)
+
+    def rotulo(self, marmita_id):
+        return self.marmitas[marmita_id].rotulo
+
+@db.cached_query("marmitas")
+def get_cardapio(conn):
+    """Cardápio da semana, montado uma vez por versão da tabela marmitas (não a cada rerun)."""
+    return Cardapio(db.get_marmitas_disponiveis(conn))
+
+class ItemCarrinho:
+    """Linha do carrinho. O preço fica fixo a partir do momento em que a marmita entrou no carrinho."""
+    __slots__ = ("marmita_id", "nome", "preco_unitario", "quantidade", "_preco_centavos")
+
+    def __init__(self, marmita_id, nome, preco_unitario, quantidade):
+        self.marmita_id = marmita_id
+        self.nome = nome
+        self.preco_unitario = preco_unitario
+        self.quantidade = quantidade
+        self._preco_centavos = round(preco_unitario * 100)
+
+    @property
+    def subtotal(self):
+        return self._preco_centavos * self.quantidade / 100
+
+class Carrinho:
+    """Itens do pedido em edição, por marmita_id, com total e quantidade mantidos a cada alteração."""
+    __slots__ = ("itens", "_total_centavos", "_quantidade_total")
+
+    def __init__(self):
+        self.itens = {} # marmita_id -> ItemCarrinho, na ordem em que foram adicionados
+        self._total_centavos = 0
+        self._quantidade_total = 0
+
+    def __len__(self):
+        return len(self.itens)
+
+    def __iter__(self):
+        return iter(self.itens.values())
+
+    @property
+    def total(self):
+        return self._total_centavos / 100
+
+    @property
+    def quantidade_total(self):
+        return self._quantidade_total
+
+    def adicionar(self, marmita, quantidade=1):
+        """Adiciona uma MarmitaCardapio; se ela já está no carrinho, soma a quantidade (mantendo o preço fixado)."""
+        if quantidade <= 0:
+            raise ValueError("A quantidade deve ser positiva.")
+        item = self.itens.get(marmita.id)
+        if item is None:
+            item = self.itens[marmita.id] = ItemCarrinho(marmita.id, marmita.nome, marmita.preco, 0)
+        item.quantidade += quantidade
+        self._total_centavos += item._preco_centavos * quantidade
+        self._quantidade_total += quantidade
+        return item
+
+    def definir_quantidade(self, marmita_id, quantidade):
+        """Muda a quantidade de um item; zero ou menos remove o item."""
+        item = self.itens.get(marmita_id)
+        if item is None:
+            return
+        if quantidade <= 0:
+            self.remover(marmita_id)
+            return
+        self._total_centavos += item._preco_centavos * (quantidade - item.quantidade)
+        self._quantidade_total += quantidade - item.quantidade
+        item.quantidade = quantidade
+
+    def remover(self, marmita_id):
+        item = self.itens.pop(marmita_id, None)
+        if item is not None:
+            self._total_centavos -= item._preco_centavos * item.quantidade
+            self._quantidade_total -= item.quantidade
+
+    def limpar(self):
+        self.itens.clear()
+        self._total_centavos = 0
+        self._quantidade_total = 0
+
+    def itens_pedido(self):
+        """Itens no formato de db.add_pedido."""
+        return [{"marmita_id": item.marmita_id, "quantidade": item.quantidade, "preco_unitario": item.preco_unitario}
+                for item in self.itens.values()]
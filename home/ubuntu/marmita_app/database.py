@@ -2,20 +2,80 @@ import streamlit as st
 import sqlite3
 import pandas as pd
 import os
-import hashlib # For basic password hashing
-from datetime import datetime
+import re
+import json
+import copy
+import math
+import time
+import atexit
+import threading
+import types
+import queue
+import functools
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import instrumentation
+import auth
 
 DB_FILE = ".streamlit/marmita_data.db"
 
+# Tamanho máximo do pool de conexões compartilhado pelo processo
+POOL_MAX_SIZE = int(os.environ.get("MARMITA_POOL_SIZE", "8"))
+# Tempo máximo (segundos) esperando uma conexão livre no pool
+POOL_TIMEOUT = float(os.environ.get("MARMITA_POOL_TIMEOUT", "10"))
+
+# Configuração de armazenamento aplicada a toda conexão aberta pelo app.
+# WAL permite que leitores nunca esperem pelo escritor (e vice-versa).
+STORAGE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),     # seguro em WAL, evita fsync a cada commit
+    ("cache_size", "-20000"),      # ~20 MB de cache de páginas por conexão
+    ("mmap_size", "268435456"),    # 256 MB de leitura via mmap
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", "5000"),      # ms esperando locks antes de SQLITE_BUSY
+)
+# Tentativas extras do escritor quando o banco continua bloqueado após o busy_timeout
+WRITE_RETRIES = 5
+WRITE_RETRY_BACKOFF = 0.05
+# Cache de leituras: validade (segundos) e número máximo de entradas (LRU)
+QUERY_CACHE_TTL = float(os.environ.get("MARMITA_CACHE_TTL", "300"))
+QUERY_CACHE_MAX_ENTRIES = int(os.environ.get("MARMITA_CACHE_MAX_ENTRIES", "512"))
+# Pedidos por transação na inserção em lote
+BULK_BATCH_SIZE = 5000
+
+# Valores aceitos nos campos de pedido
+FORMAS_PAGAMENTO = ["Dinheiro", "Cartão", "Pix", "Outro"]
+STATUS_PAGAMENTO = ["Pendente", "Pago"]
+STATUS_ENTREGA = ["Pendente", "Em Preparo", "Saiu para Entrega", "Entregue", "Cancelado"]
+
 # --- Conexão e Criação de Tabelas ---
 
+def _open_connection(db_file):
+    """Abre uma conexão SQLite configurada para o app (levanta exceção em caso de falha)."""
+    db_dir = os.path.dirname(db_file)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(db_file, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                           factory=instrumentation.connection_factory())
+    conn.execute("PRAGMA foreign_keys = ON;") # Enable foreign key constraints
+    configure_storage(conn)
+    print(f"SQLite connection to {db_file} established.")
+    return conn
+
+def configure_storage(conn):
+    """Aplica STORAGE_PRAGMAS à conexão. journal_mode=WAL é persistente no arquivo."""
+    for pragma, value in STORAGE_PRAGMAS:
+        conn.execute(f"PRAGMA {pragma} = {value};")
+
 def create_connection():
+    # Abre uma conexão avulsa (fora do pool). As páginas devem usar get_connection().
     conn = None
     try:
-        os.makedirs(os.path.dirname(DB_FILE), exist_ok=True)
-        conn = sqlite3.connect(DB_FILE, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-        conn.execute("PRAGMA foreign_keys = ON;") # Enable foreign key constraints
-        print(f"SQLite connection to {DB_FILE} established.")
+        conn = _open_connection(DB_FILE)
     except sqlite3.Error as e:
         print(f"Error connecting to database: {e}")
         st.error(f"Erro ao conectar ao banco de dados: {e}")
@@ -24,12 +84,470 @@ def create_connection():
         st.error(f"Erro de permissão ou sistema de arquivos ao tentar criar diretório para DB: {e}")
     return conn
 
+class ConnectionPool:
+    """Pool de conexões SQLite compartilhado por todas as sessões e threads do processo.
+
+    Cada thread recebe no máximo uma conexão (checkout por thread). As reruns do
+    Streamlit rodam em threads que terminam; conexões presas a threads mortas são
+    devolvidas automaticamente ao pool no próximo checkout.
+    """
+
+    def __init__(self, db_file, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT):
+        self.db_file = db_file
+        self.max_size = max_size
+        self.timeout = timeout
+        self.closed = False
+        self._cond = threading.Condition()
+        self._idle = []      # conexões livres
+        self._in_use = {}    # thread -> conexão
+        self._size = 0       # total de conexões abertas (livres + em uso)
+
+    def _is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        self._size -= 1
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _reset(self, conn):
+        # Nunca devolve ao pool uma conexão com transação aberta
+        if conn.in_transaction:
+            conn.rollback()
+
+    def _reclaim_dead_threads(self):
+        dead = [t for t in self._in_use if not t.is_alive()]
+        for thread in dead:
+            conn = self._in_use.pop(thread)
+            try:
+                self._reset(conn)
+                self._idle.append(conn)
+            except sqlite3.Error:
+                self._discard(conn)
+
+    def checkout(self):
+        """Retorna a conexão da thread atual, pegando uma do pool se necessário."""
+        thread = threading.current_thread()
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            if self.closed:
+                raise sqlite3.ProgrammingError("Connection pool is closed.")
+            conn = self._in_use.get(thread)
+            if conn is not None:
+                return conn
+            while True:
+                self._reclaim_dead_threads()
+                while self._idle:
+                    conn = self._idle.pop()
+                    if self._is_healthy(conn):
+                        self._in_use[thread] = conn
+                        return conn
+                    self._discard(conn)
+                if self._size < self.max_size:
+                    conn = _open_connection(self.db_file)
+                    self._size += 1
+                    self._in_use[thread] = conn
+                    return conn
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(f"Connection pool exhausted ({self.max_size} connections in use).")
+                # Acorda periodicamente para recuperar conexões de threads que morreram
+                self._cond.wait(min(remaining, 0.1))
+
+    def release(self):
+        """Devolve ao pool a conexão da thread atual (se houver)."""
+        thread = threading.current_thread()
+        with self._cond:
+            conn = self._in_use.pop(thread, None)
+            if conn is None:
+                return
+            if self.closed:
+                self._discard(conn)
+                return
+            try:
+                self._reset(conn)
+                self._idle.append(conn)
+            except sqlite3.Error:
+                self._discard(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Checkout com escopo: devolve a conexão ao sair, a menos que a thread já a tivesse."""
+        already_held = threading.current_thread() in self._in_use
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            if not already_held:
+                self.release()
+
+    def drain(self, timeout=None):
+        """Espera (até timeout, padrão self.timeout) as outras threads devolverem suas conexões e fecha o pool."""
+        thread = threading.current_thread()
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._cond:
+            while True:
+                self._reclaim_dead_threads()
+                ocupadas = [t.name for t in self._in_use if t is not thread]
+                remaining = deadline - time.monotonic()
+                if not ocupadas or remaining <= 0:
+                    break
+                self._cond.wait(min(remaining, 0.1))
+        if ocupadas:
+            print(f"Closing connection pool with connections still in use by: {', '.join(ocupadas)}")
+        self.close()
+
+    def close(self):
+        """Fecha todas as conexões (livres e em uso) e impede novos checkouts."""
+        with self._cond:
+            self.closed = True
+            for conn in self._idle + list(self._in_use.values()):
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._idle.clear()
+            self._in_use.clear()
+            self._size = 0
+            self._cond.notify_all()
+        print(f"Connection pool for {self.db_file} closed.")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    # Pool único por processo, criado sob demanda
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = ConnectionPool(DB_FILE)
+        return _pool
+
+def get_connection():
+    """Conexão do pool para a thread atual. Substitui create_connection() nas páginas."""
+    try:
+        return get_pool().checkout()
+    except sqlite3.Error as e:
+        print(f"Error getting pooled connection: {e}")
+        st.error(f"Erro ao conectar ao banco de dados: {e}")
+    except OSError as e:
+        print(f"Error creating directory for DB: {e}")
+        st.error(f"Erro de permissão ou sistema de arquivos ao tentar criar diretório para DB: {e}")
+    return None
+
+def release_connection():
+    """Devolve ao pool a conexão da thread atual.
+
+    Para threads de fundo (jobs, agendamentos) que usam o banco só de vez em quando: sem
+    isso a conexão fica presa à thread enquanto ela viver.
+    """
+    # Sem _pool_lock: restaurar_de segura o lock enquanto espera as conexões voltarem
+    pool = _pool
+    if pool is not None:
+        pool.release()
+
+def restaurar_de(fonte):
+    """Substitui o conteúdo do banco em uso pelo do banco aberto em `fonte` (conexão sqlite3).
+
+    Novos checkouts esperam; as leituras em andamento terminam e o pool é fechado (drain),
+    e a cópia roda na thread de escrita, sem nenhuma escrita do app no meio. Depois disso o
+    schema é verificado de novo no próximo init_db e os caches (leituras e tokens) são limpos. `fonte` é
+    usada na thread de escrita: deve ser aberta com check_same_thread=False.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.drain()
+            _pool = None
+        try:
+            _write(lambda c: fonte.backup(c))
+        finally:
+            reset_schema_state()
+            query_cache.clear()
+            auth.limpar_cache() # usuários, senhas e revogações voltam ao estado do backup
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+class WriteQueue:
+    """Serializa todas as escritas numa única thread com conexão própria.
+
+    Cada tarefa é uma função fn(conn) executada dentro de uma transação; a thread
+    faz commit se fn terminar sem erro e rollback caso contrário. Exceções são
+    repassadas a quem enviou a tarefa através do Future.
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="marmita-db-writer", daemon=True)
+        self._ready = threading.Event()
+        self._startup_error = None
+        self._thread.start()
+        self._ready.wait()
+        if self._startup_error is not None:
+            raise self._startup_error
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    def submit(self, fn):
+        future = Future()
+        if threading.current_thread() is self._thread:
+            # Escrita aninhada (fn chamou outra escrita): executa direto para não travar a fila
+            future.set_result(fn(self._conn))
+            return future
+        # O contexto (página/sessão de origem) acompanha a tarefa até a thread de escrita
+        self._queue.put((fn, future, contextvars.copy_context()))
+        return future
+
+    def stop(self):
+        if self.alive:
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        try:
+            self._conn = _open_connection(self.db_file)
+            # Pega o lock de escrita já no BEGIN, evitando SQLITE_BUSY no meio da transação
+            self._conn.isolation_level = "IMMEDIATE"
+        except (sqlite3.Error, OSError) as e:
+            self._startup_error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            fn, future, ctx = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = ctx.run(self._execute_with_retry, fn)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+        self._conn.close()
+        print(f"Writer thread for {self.db_file} stopped.")
+
+    def _execute_with_retry(self, fn):
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                result = fn(self._conn)
+                if self._conn.in_transaction:
+                    self._conn.commit()
+                return result
+            except sqlite3.OperationalError as e:
+                if self._conn.in_transaction:
+                    self._conn.rollback()
+                busy = "locked" in str(e) or "busy" in str(e)
+                if not busy or attempt == WRITE_RETRIES:
+                    raise
+                print(f"Database busy, retrying write ({attempt + 1}/{WRITE_RETRIES}): {e}")
+                time.sleep(WRITE_RETRY_BACKOFF * (2 ** attempt))
+            except BaseException:
+                if self._conn.in_transaction:
+                    self._conn.rollback()
+                raise
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    # Thread de escrita única por processo, criada sob demanda
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.alive:
+            _writer = WriteQueue(DB_FILE)
+        return _writer
+
+def _write(fn, *tabelas):
+    """Executa fn(conn) na thread de escrita e devolve o resultado (exceções são repassadas).
+
+    tabelas são as tabelas lógicas afetadas (incluindo efeitos de FK); as entradas do
+    cache de leitura que dependem delas são invalidadas. Sem tabelas, o cache todo é limpo.
+    """
+    try:
+        return get_writer().submit(fn).result()
+    finally:
+        if tabelas:
+            query_cache.invalidate(*tabelas)
+        else:
+            query_cache.clear()
+
+# --- Cache de Leituras ---
+
+class QueryCache:
+    """Cache LRU com TTL dos resultados das funções de leitura.
+
+    É compartilhado por todas as sessões, já que os dados são os mesmos para todas;
+    cada entrada registra as tabelas de que depende e toda escrita feita via _write
+    invalida exatamente essas entradas. O TTL limita o tempo de vida de dados
+    alterados por fora do app (outro processo, sqlite3 na linha de comando).
+    """
+
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES, ttl=QUERY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # chave -> (expira_em, tabelas, valor)
+        self._versions = {}            # tabela -> contador de escritas (None = limpeza geral)
+
+    def versions(self, tabelas):
+        with self._lock:
+            return tuple(self._versions.get(t, 0) for t in tabelas)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[2]
+
+    def put(self, key, tabelas, versions, value):
+        with self._lock:
+            # Houve escrita durante a leitura: o resultado pode estar desatualizado
+            if tuple(self._versions.get(t, 0) for t in tabelas) != versions:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, tabelas, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tabelas):
+        with self._lock:
+            for t in tabelas:
+                self._versions[t] = self._versions.get(t, 0) + 1
+            afetadas = set(tabelas)
+            for key in [k for k, e in self._entries.items() if afetadas.intersection(e[1])]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._versions[None] = self._versions.get(None, 0) + 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+query_cache = QueryCache()
+_cache_state = threading.local()
+
+def _falha_leitura(mensagem):
+    # Mostra o erro e impede que o resultado padrão (vazio) vá para o cache
+    _cache_state.falhou = True
+    st.error(mensagem)
+
+@contextmanager
+def bypass_query_cache():
+    """Dentro do bloco as leituras vão sempre ao banco (e não alimentam o cache)."""
+    anterior = getattr(_cache_state, "bypass", False)
+    _cache_state.bypass = True
+    try:
+        yield
+    finally:
+        _cache_state.bypass = anterior
+
+# Tipos devolvidos sem cópia. MappingProxyType: resultados somente leitura, montados só com
+# valores imutáveis (ex.: get_itens_por_pedidos)
+_IMUTAVEIS = frozenset((str, int, float, bool, bytes, date, datetime, pd.Timestamp, type(None), types.MappingProxyType))
+# Dentro de listas e dicts, tuplas são linhas do banco (só valores imutáveis)
+_LINHA = _IMUTAVEIS | {tuple}
+
+def _copiar(valor):
+    # Quem chama pode alterar o resultado (DataFrame, lista de dicts, dicts aninhados, objetos)
+    # sem afetar o cache: cópia profunda de tudo que não é imutável
+    tipo = type(valor)
+    if tipo in _IMUTAVEIS:
+        return valor
+    if tipo is tuple: # resultado em partes, ex.: (DataFrame, próximo_cursor)
+        return tuple(map(_copiar, valor))
+    if tipo is list:
+        if all(map(_LINHA.__contains__, map(type, valor))):
+            return list(valor)
+        return [_copiar(v) for v in valor]
+    if tipo is dict:
+        if all(map(_LINHA.__contains__, map(type, valor.values()))):
+            return dict(valor)
+        return {k: _copiar(v) for k, v in valor.items()}
+    if isinstance(valor, pd.DataFrame):
+        return valor.copy()
+    return copy.deepcopy(valor)
+
+def cached_query(*tabelas):
+    """Decorator das funções de leitura fn(conn, ...) cujo resultado depende de `tabelas`."""
+    dependencias = tabelas + (None,) # None: qualquer limpeza geral do cache
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(conn, *args, **kwargs):
+            if not conn or getattr(_cache_state, "bypass", False):
+                return fn(conn, *args, **kwargs)
+            key = (DB_FILE, fn.__name__, args, tuple(sorted(kwargs.items())))
+            try:
+                hit, valor = query_cache.get(key)
+            except TypeError: # argumento não-hashable: não cacheia
+                return fn(conn, *args, **kwargs)
+            if hit:
+                return _copiar(valor)
+            versions = query_cache.versions(dependencias)
+            _cache_state.falhou = False
+            valor = fn(conn, *args, **kwargs)
+            if not _cache_state.falhou:
+                query_cache.put(key, dependencias, versions, _copiar(valor))
+            return valor
+        return wrapper
+    return decorator
+
+def stop_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+            _writer = None
+
+def shutdown():
+    """Para a thread de escrita e fecha o pool de conexões."""
+    stop_writer()
+    close_pool()
+
+atexit.register(shutdown)
+
+def use_database(db_file):
+    """Aponta o módulo para outro arquivo de banco (benchmarks, scripts de linha de comando)."""
+    global DB_FILE
+    shutdown()
+    DB_FILE = db_file
+    query_cache.clear()
+
 def create_tables(conn):
     if not conn:
         st.error("Conexão com banco de dados inválida para criar tabelas.")
         return
-    try:
-        cursor = conn.cursor()
+    # DDL também passa pela thread de escrita
+    def _criar(c):
+        cursor = c.cursor()
         # Tabela de Usuários (para login)
         cursor.execute("""
         CREATE TABLE IF NOT EXISTS usuarios (
@@ -96,27 +614,682 @@ def create_tables(conn):
             FOREIGN KEY (marmita_id) REFERENCES marmitas (id) ON DELETE SET NULL
         );
         """)
-        conn.commit()
+        _migrar(c)
+    try:
+        _write(_criar)
         print("Tables checked/created successfully.")
-        # Adicionar usuário admin padrão se não existir
-        add_default_admin(conn)
     except sqlite3.Error as e:
         print(f"Error creating tables: {e}")
         st.error(f"Erro ao criar/verificar tabelas no banco de dados: {e}")
 
-# --- Funções de Autenticação --- 
+# --- Migrações de Schema ---
+# A versão do schema fica em PRAGMA user_version. Cada migração roda uma única vez,
+# em ordem e dentro de uma transação própria. Toda mudança de schema futura deve
+# entrar como um novo item no fim de MIGRATIONS (nunca editar uma já publicada).
+# Um passo pode ser um comando SQL ou uma função fn(conn).
+
+def normalize_phone(telefone):
+    """Telefone no formato E.164 ("+15551234567"), ou None se não houver dígitos.
+
+    Números de 10 dígitos sem código de país são tratados como dos EUA (+1);
+    ramais ("x123", "ext. 123") são descartados.
+    """
+    if not telefone:
+        return None
+    texto = re.split(r"(?i)\s*(?:ext\.?|x|#)\s*\d*\s*$", str(telefone).strip())[0]
+    digitos = re.sub(r"\D", "", texto)
+    if not digitos:
+        return None
+    if texto.startswith("+"):
+        return f"+{digitos}"
+    if texto.startswith("00"):
+        return f"+{digitos[2:]}"
+    if len(digitos) == 10:
+        return f"+1{digitos}"
+    return f"+{digitos}"
+
+def _normalizar_telefones_existentes(c):
+    # Preenche telefone_normalizado e junta clientes com o mesmo telefone: fica o de
+    # menor id, que recebe os pedidos (e o endereço, se não tiver) dos duplicados
+    mantidos = {}
+    for cliente_id, telefone, endereco, complemento in c.execute(
+            "SELECT id, telefone, endereco, complemento FROM clientes ORDER BY id").fetchall():
+        normalizado = normalize_phone(telefone)
+        if normalizado is None:
+            continue
+        mantido = mantidos.get(normalizado)
+        if mantido is None:
+            mantidos[normalizado] = cliente_id
+            c.execute("UPDATE clientes SET telefone_normalizado = ? WHERE id = ?", (normalizado, cliente_id))
+            continue
+        c.execute("UPDATE pedidos SET cliente_id = ? WHERE cliente_id = ?", (mantido, cliente_id))
+        c.execute("""
+        UPDATE clientes SET endereco = COALESCE(NULLIF(endereco, ''), ?), complemento = COALESCE(NULLIF(complemento, ''), ?)
+        WHERE id = ?
+        """, (endereco, complemento, mantido))
+        c.execute("DELETE FROM clientes WHERE id = ?", (cliente_id,))
+        print(f"Cliente {cliente_id} merged into {mantido} (same phone {normalizado}).")
+
+def _telefone_busca_sql(coluna):
+    # Telefone só com dígitos seguido dos finais de 10, 7 e 4 dígitos, para que a busca
+    # por prefixo encontre "5551234567", "1234567" ou "4567" em "+1 555-123-4567"
+    digitos = f"COALESCE({coluna}, '')"
+    for separador in (" ", "-", "(", ")", "+", "."):
+        digitos = f"replace({digitos}, '{separador}', '')"
+    return f"{digitos} || ' ' || substr({digitos}, -10) || ' ' || substr({digitos}, -7) || ' ' || substr({digitos}, -4)"
+
+MIGRATIONS = [
+    (1, "Índices para as FKs de pedidos/itens_pedido e índices de cobertura dos relatórios", [
+        # Histórico filtrado por semana (ORDER BY data_hora) e vendas por dia da semana
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_semana_data ON pedidos (semana_id, data_hora, valor_total)",
+        # Histórico geral ordenado por data
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_data_hora ON pedidos (data_hora)",
+        # Vendas por cliente / marmitas por cliente (cobre cliente_id, semana_id e valor_total)
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_cliente_semana ON pedidos (cliente_id, semana_id, valor_total)",
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_semana_cliente ON pedidos (semana_id, cliente_id, valor_total)",
+        # Itens de um pedido (get_pedido_itens, joins e ON DELETE CASCADE de delete_pedido)
+        "CREATE INDEX IF NOT EXISTS idx_itens_pedido_pedido ON itens_pedido (pedido_id, marmita_id, quantidade, preco_unitario)",
+        # ON DELETE SET NULL de delete_marmita
+        "CREATE INDEX IF NOT EXISTS idx_itens_pedido_marmita ON itens_pedido (marmita_id)",
+    ]),
+    (2, "Totais do dashboard mantidos por triggers", [
+        """
+        CREATE TABLE IF NOT EXISTS dashboard_totais (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_clientes INTEGER NOT NULL DEFAULT 0,
+            total_pedidos INTEGER NOT NULL DEFAULT 0,
+            receita_total REAL NOT NULL DEFAULT 0,
+            pagamento_pendente_pedidos INTEGER NOT NULL DEFAULT 0,
+            pagamento_pendente_valor REAL NOT NULL DEFAULT 0,
+            entrega_pendente_pedidos INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_dashboard_cliente_ins AFTER INSERT ON clientes
+        BEGIN
+            UPDATE dashboard_totais SET total_clientes = total_clientes + 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_dashboard_cliente_del AFTER DELETE ON clientes
+        BEGIN
+            UPDATE dashboard_totais SET total_clientes = total_clientes - 1 WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_dashboard_pedido_ins AFTER INSERT ON pedidos
+        BEGIN
+            UPDATE dashboard_totais SET
+                total_pedidos = total_pedidos + 1,
+                receita_total = receita_total + COALESCE(NEW.valor_total, 0),
+                pagamento_pendente_pedidos = pagamento_pendente_pedidos + (NEW.status_pagamento = 'Pendente'),
+                pagamento_pendente_valor = pagamento_pendente_valor
+                    + CASE WHEN NEW.status_pagamento = 'Pendente' THEN COALESCE(NEW.valor_total, 0) ELSE 0 END,
+                entrega_pendente_pedidos = entrega_pendente_pedidos
+                    + (NEW.status_entrega NOT IN ('Entregue', 'Cancelado'))
+            WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_dashboard_pedido_del AFTER DELETE ON pedidos
+        BEGIN
+            UPDATE dashboard_totais SET
+                total_pedidos = total_pedidos - 1,
+                receita_total = receita_total - COALESCE(OLD.valor_total, 0),
+                pagamento_pendente_pedidos = pagamento_pendente_pedidos - (OLD.status_pagamento = 'Pendente'),
+                pagamento_pendente_valor = pagamento_pendente_valor
+                    - CASE WHEN OLD.status_pagamento = 'Pendente' THEN COALESCE(OLD.valor_total, 0) ELSE 0 END,
+                entrega_pendente_pedidos = entrega_pendente_pedidos
+                    - (OLD.status_entrega NOT IN ('Entregue', 'Cancelado'))
+            WHERE id = 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_dashboard_pedido_upd
+        AFTER UPDATE OF valor_total, status_pagamento, status_entrega ON pedidos
+        BEGIN
+            UPDATE dashboard_totais SET
+                receita_total = receita_total - COALESCE(OLD.valor_total, 0) + COALESCE(NEW.valor_total, 0),
+                pagamento_pendente_pedidos = pagamento_pendente_pedidos
+                    - (OLD.status_pagamento = 'Pendente') + (NEW.status_pagamento = 'Pendente'),
+                pagamento_pendente_valor = pagamento_pendente_valor
+                    - CASE WHEN OLD.status_pagamento = 'Pendente' THEN COALESCE(OLD.valor_total, 0) ELSE 0 END
+                    + CASE WHEN NEW.status_pagamento = 'Pendente' THEN COALESCE(NEW.valor_total, 0) ELSE 0 END,
+                entrega_pendente_pedidos = entrega_pendente_pedidos
+                    - (OLD.status_entrega NOT IN ('Entregue', 'Cancelado'))
+                    + (NEW.status_entrega NOT IN ('Entregue', 'Cancelado'))
+            WHERE id = 1;
+        END
+        """,
+        lambda c: _recalcular_dashboard(c),
+    ]),
+    # Rollups por semana/cliente/marmita/dia. Chaves NULL (cliente/semana/marmita excluídos)
+    # são gravadas como 0 e dia NULL como '' para que o UPSERT funcione.
+    (3, "Tabelas de rollup de vendas mantidas por triggers", [
+        """
+        CREATE TABLE IF NOT EXISTS rollup_vendas_cliente (
+            semana_id INTEGER NOT NULL,
+            cliente_id INTEGER NOT NULL,
+            pedidos INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (semana_id, cliente_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS rollup_vendas_dia (
+            semana_id INTEGER NOT NULL,
+            dia TEXT NOT NULL,
+            pedidos INTEGER NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (semana_id, dia)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS rollup_marmitas (
+            semana_id INTEGER NOT NULL,
+            cliente_id INTEGER NOT NULL,
+            marmita_id INTEGER NOT NULL,
+            quantidade INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (semana_id, cliente_id, marmita_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_rollup_marmitas_cliente ON rollup_marmitas (cliente_id, semana_id, marmita_id, quantidade)",
+        # --- pedidos: vendas por cliente e por dia ---
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_pedido_ins AFTER INSERT ON pedidos
+        BEGIN
+            INSERT INTO rollup_vendas_cliente (semana_id, cliente_id, pedidos, total)
+            VALUES (COALESCE(NEW.semana_id, 0), COALESCE(NEW.cliente_id, 0), 1, COALESCE(NEW.valor_total, 0))
+            ON CONFLICT (semana_id, cliente_id) DO UPDATE SET pedidos = pedidos + 1, total = total + excluded.total;
+            INSERT INTO rollup_vendas_dia (semana_id, dia, pedidos, total)
+            VALUES (COALESCE(NEW.semana_id, 0), COALESCE(strftime('%Y-%m-%d', NEW.data_hora), ''), 1, COALESCE(NEW.valor_total, 0))
+            ON CONFLICT (semana_id, dia) DO UPDATE SET pedidos = pedidos + 1, total = total + excluded.total;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_pedido_del AFTER DELETE ON pedidos
+        BEGIN
+            UPDATE rollup_vendas_cliente SET pedidos = pedidos - 1, total = total - COALESCE(OLD.valor_total, 0)
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND cliente_id = COALESCE(OLD.cliente_id, 0);
+            DELETE FROM rollup_vendas_cliente
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND cliente_id = COALESCE(OLD.cliente_id, 0) AND pedidos <= 0;
+            UPDATE rollup_vendas_dia SET pedidos = pedidos - 1, total = total - COALESCE(OLD.valor_total, 0)
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND dia = COALESCE(strftime('%Y-%m-%d', OLD.data_hora), '');
+            DELETE FROM rollup_vendas_dia
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND dia = COALESCE(strftime('%Y-%m-%d', OLD.data_hora), '') AND pedidos <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_pedido_upd
+        AFTER UPDATE OF cliente_id, semana_id, valor_total, data_hora ON pedidos
+        BEGIN
+            UPDATE rollup_vendas_cliente SET pedidos = pedidos - 1, total = total - COALESCE(OLD.valor_total, 0)
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND cliente_id = COALESCE(OLD.cliente_id, 0);
+            INSERT INTO rollup_vendas_cliente (semana_id, cliente_id, pedidos, total)
+            VALUES (COALESCE(NEW.semana_id, 0), COALESCE(NEW.cliente_id, 0), 1, COALESCE(NEW.valor_total, 0))
+            ON CONFLICT (semana_id, cliente_id) DO UPDATE SET pedidos = pedidos + 1, total = total + excluded.total;
+            DELETE FROM rollup_vendas_cliente
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND cliente_id = COALESCE(OLD.cliente_id, 0) AND pedidos <= 0;
+            UPDATE rollup_vendas_dia SET pedidos = pedidos - 1, total = total - COALESCE(OLD.valor_total, 0)
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND dia = COALESCE(strftime('%Y-%m-%d', OLD.data_hora), '');
+            INSERT INTO rollup_vendas_dia (semana_id, dia, pedidos, total)
+            VALUES (COALESCE(NEW.semana_id, 0), COALESCE(strftime('%Y-%m-%d', NEW.data_hora), ''), 1, COALESCE(NEW.valor_total, 0))
+            ON CONFLICT (semana_id, dia) DO UPDATE SET pedidos = pedidos + 1, total = total + excluded.total;
+            DELETE FROM rollup_vendas_dia
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND dia = COALESCE(strftime('%Y-%m-%d', OLD.data_hora), '') AND pedidos <= 0;
+        END
+        """,
+        # --- pedidos: quantidades de marmitas ---
+        # No ON DELETE CASCADE os itens já não enxergam o pedido, então o desconto é feito aqui
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_pedido_del_itens BEFORE DELETE ON pedidos
+        BEGIN
+            UPDATE rollup_marmitas SET quantidade = quantidade - (
+                SELECT COALESCE(SUM(ip.quantidade), 0) FROM itens_pedido ip
+                WHERE ip.pedido_id = OLD.id AND COALESCE(ip.marmita_id, 0) = rollup_marmitas.marmita_id
+            )
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND cliente_id = COALESCE(OLD.cliente_id, 0)
+              AND marmita_id IN (SELECT COALESCE(marmita_id, 0) FROM itens_pedido WHERE pedido_id = OLD.id);
+            DELETE FROM rollup_marmitas
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND cliente_id = COALESCE(OLD.cliente_id, 0) AND quantidade <= 0;
+        END
+        """,
+        # Pedido mudou de cliente/semana (inclusive ON DELETE SET NULL): move as quantidades
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_pedido_mover_itens
+        AFTER UPDATE OF cliente_id, semana_id ON pedidos
+        WHEN COALESCE(OLD.cliente_id, 0) <> COALESCE(NEW.cliente_id, 0)
+          OR COALESCE(OLD.semana_id, 0) <> COALESCE(NEW.semana_id, 0)
+        BEGIN
+            UPDATE rollup_marmitas SET quantidade = quantidade - (
+                SELECT COALESCE(SUM(ip.quantidade), 0) FROM itens_pedido ip
+                WHERE ip.pedido_id = NEW.id AND COALESCE(ip.marmita_id, 0) = rollup_marmitas.marmita_id
+            )
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND cliente_id = COALESCE(OLD.cliente_id, 0)
+              AND marmita_id IN (SELECT COALESCE(marmita_id, 0) FROM itens_pedido WHERE pedido_id = NEW.id);
+            INSERT INTO rollup_marmitas (semana_id, cliente_id, marmita_id, quantidade)
+            SELECT COALESCE(NEW.semana_id, 0), COALESCE(NEW.cliente_id, 0), COALESCE(marmita_id, 0), SUM(COALESCE(quantidade, 0))
+            FROM itens_pedido WHERE pedido_id = NEW.id GROUP BY COALESCE(marmita_id, 0)
+            ON CONFLICT (semana_id, cliente_id, marmita_id) DO UPDATE SET quantidade = quantidade + excluded.quantidade;
+            DELETE FROM rollup_marmitas
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND cliente_id = COALESCE(OLD.cliente_id, 0) AND quantidade <= 0;
+        END
+        """,
+        # --- itens_pedido ---
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_item_ins AFTER INSERT ON itens_pedido
+        BEGIN
+            INSERT INTO rollup_marmitas (semana_id, cliente_id, marmita_id, quantidade)
+            SELECT COALESCE(p.semana_id, 0), COALESCE(p.cliente_id, 0), COALESCE(NEW.marmita_id, 0), COALESCE(NEW.quantidade, 0)
+            FROM pedidos p WHERE p.id = NEW.pedido_id
+            ON CONFLICT (semana_id, cliente_id, marmita_id) DO UPDATE SET quantidade = quantidade + excluded.quantidade;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_item_del AFTER DELETE ON itens_pedido
+        BEGIN
+            UPDATE rollup_marmitas SET quantidade = quantidade - COALESCE(OLD.quantidade, 0)
+            WHERE (semana_id, cliente_id) = (SELECT COALESCE(p.semana_id, 0), COALESCE(p.cliente_id, 0) FROM pedidos p WHERE p.id = OLD.pedido_id)
+              AND marmita_id = COALESCE(OLD.marmita_id, 0);
+            DELETE FROM rollup_marmitas
+            WHERE (semana_id, cliente_id) = (SELECT COALESCE(p.semana_id, 0), COALESCE(p.cliente_id, 0) FROM pedidos p WHERE p.id = OLD.pedido_id)
+              AND marmita_id = COALESCE(OLD.marmita_id, 0) AND quantidade <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_item_upd
+        AFTER UPDATE OF pedido_id, marmita_id, quantidade ON itens_pedido
+        BEGIN
+            UPDATE rollup_marmitas SET quantidade = quantidade - COALESCE(OLD.quantidade, 0)
+            WHERE (semana_id, cliente_id) = (SELECT COALESCE(p.semana_id, 0), COALESCE(p.cliente_id, 0) FROM pedidos p WHERE p.id = OLD.pedido_id)
+              AND marmita_id = COALESCE(OLD.marmita_id, 0);
+            INSERT INTO rollup_marmitas (semana_id, cliente_id, marmita_id, quantidade)
+            SELECT COALESCE(p.semana_id, 0), COALESCE(p.cliente_id, 0), COALESCE(NEW.marmita_id, 0), COALESCE(NEW.quantidade, 0)
+            FROM pedidos p WHERE p.id = NEW.pedido_id
+            ON CONFLICT (semana_id, cliente_id, marmita_id) DO UPDATE SET quantidade = quantidade + excluded.quantidade;
+            DELETE FROM rollup_marmitas
+            WHERE (semana_id, cliente_id) = (SELECT COALESCE(p.semana_id, 0), COALESCE(p.cliente_id, 0) FROM pedidos p WHERE p.id = OLD.pedido_id)
+              AND marmita_id = COALESCE(OLD.marmita_id, 0) AND quantidade <= 0;
+        END
+        """,
+        lambda c: _recalcular_rollups(c),
+    ]),
+    # A paginação keyset do histórico por (data_hora, id) usa idx_pedidos_semana_data e
+    # idx_pedidos_data_hora, que já terminam no rowid: não precisa de índice próprio
+    (4, "Paginação keyset do histórico (usa os índices da migração 1)", []),
+    (5, "Índice FTS5 para a busca de clientes por nome, endereço e telefone", [
+        # Contentless: guarda só o índice; os dados continuam em clientes (rowid = clientes.id)
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS clientes_fts USING fts5(
+            nome, endereco, telefone,
+            content='', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_clientes_fts_ins AFTER INSERT ON clientes
+        BEGIN
+            INSERT INTO clientes_fts(rowid, nome, endereco, telefone)
+            VALUES (NEW.id, NEW.nome, COALESCE(NEW.endereco, ''), {_telefone_busca_sql("NEW.telefone")});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_clientes_fts_del AFTER DELETE ON clientes
+        BEGIN
+            INSERT INTO clientes_fts(clientes_fts, rowid, nome, endereco, telefone)
+            VALUES ('delete', OLD.id, OLD.nome, COALESCE(OLD.endereco, ''), {_telefone_busca_sql("OLD.telefone")});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_clientes_fts_upd AFTER UPDATE OF nome, endereco, telefone ON clientes
+        BEGIN
+            INSERT INTO clientes_fts(clientes_fts, rowid, nome, endereco, telefone)
+            VALUES ('delete', OLD.id, OLD.nome, COALESCE(OLD.endereco, ''), {_telefone_busca_sql("OLD.telefone")});
+            INSERT INTO clientes_fts(rowid, nome, endereco, telefone)
+            VALUES (NEW.id, NEW.nome, COALESCE(NEW.endereco, ''), {_telefone_busca_sql("NEW.telefone")});
+        END
+        """,
+        f"""
+        INSERT INTO clientes_fts(rowid, nome, endereco, telefone)
+        SELECT id, nome, COALESCE(endereco, ''), {_telefone_busca_sql("telefone")} FROM clientes
+        """,
+    ]),
+    (6, "Telefone normalizado (único) e deduplicação de clientes pelo telefone", [
+        "ALTER TABLE clientes ADD COLUMN telefone_normalizado TEXT",
+        lambda c: _normalizar_telefones_existentes(c),
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_clientes_telefone_normalizado ON clientes (telefone_normalizado)",
+        # A busca passa a indexar o telefone normalizado: recria os triggers e o índice FTS
+        "DROP TRIGGER IF EXISTS trg_clientes_fts_ins",
+        "DROP TRIGGER IF EXISTS trg_clientes_fts_del",
+        "DROP TRIGGER IF EXISTS trg_clientes_fts_upd",
+        "INSERT INTO clientes_fts(clientes_fts) VALUES ('delete-all')",
+        f"""
+        CREATE TRIGGER trg_clientes_fts_ins AFTER INSERT ON clientes
+        BEGIN
+            INSERT INTO clientes_fts(rowid, nome, endereco, telefone)
+            VALUES (NEW.id, NEW.nome, COALESCE(NEW.endereco, ''), {_telefone_busca_sql("NEW.telefone_normalizado")});
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_clientes_fts_del AFTER DELETE ON clientes
+        BEGIN
+            INSERT INTO clientes_fts(clientes_fts, rowid, nome, endereco, telefone)
+            VALUES ('delete', OLD.id, OLD.nome, COALESCE(OLD.endereco, ''), {_telefone_busca_sql("OLD.telefone_normalizado")});
+        END
+        """,
+        f"""
+        CREATE TRIGGER trg_clientes_fts_upd AFTER UPDATE OF nome, endereco, telefone_normalizado ON clientes
+        BEGIN
+            INSERT INTO clientes_fts(clientes_fts, rowid, nome, endereco, telefone)
+            VALUES ('delete', OLD.id, OLD.nome, COALESCE(OLD.endereco, ''), {_telefone_busca_sql("OLD.telefone_normalizado")});
+            INSERT INTO clientes_fts(rowid, nome, endereco, telefone)
+            VALUES (NEW.id, NEW.nome, COALESCE(NEW.endereco, ''), {_telefone_busca_sql("NEW.telefone_normalizado")});
+        END
+        """,
+        f"""
+        INSERT INTO clientes_fts(rowid, nome, endereco, telefone)
+        SELECT id, nome, COALESCE(endereco, ''), {_telefone_busca_sql("telefone_normalizado")} FROM clientes
+        """,
+    ]),
+    (7, "Tabela de jobs em segundo plano", [
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            parametros TEXT NOT NULL DEFAULT '{}',  -- JSON
+            chave TEXT NOT NULL,                    -- tipo + parâmetros (reuso de resultados)
+            status TEXT NOT NULL DEFAULT 'pendente' CHECK (status IN ('pendente', 'executando', 'concluido', 'erro', 'cancelado')),
+            progresso REAL,
+            mensagem TEXT,
+            resultado TEXT,                         -- JSON
+            erro TEXT,
+            criado_por TEXT,
+            criado_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            iniciado_em TIMESTAMP,
+            terminado_em TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_criado_em ON jobs (criado_em)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)",
+    ]),
+    # Porções por semana/marmita/status de entrega para o plano de produção da cozinha.
+    # Mesmas convenções dos rollups: semana/marmita NULL viram 0 e status NULL vira ''.
+    (8, "Rollup de produção por semana, marmita e status de entrega", [
+        """
+        CREATE TABLE IF NOT EXISTS rollup_producao (
+            semana_id INTEGER NOT NULL,
+            marmita_id INTEGER NOT NULL,
+            status_entrega TEXT NOT NULL,
+            quantidade INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (semana_id, marmita_id, status_entrega)
+        ) WITHOUT ROWID
+        """,
+        # --- itens_pedido ---
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_producao_item_ins AFTER INSERT ON itens_pedido
+        BEGIN
+            INSERT INTO rollup_producao (semana_id, marmita_id, status_entrega, quantidade)
+            SELECT COALESCE(p.semana_id, 0), COALESCE(NEW.marmita_id, 0), COALESCE(p.status_entrega, ''), COALESCE(NEW.quantidade, 0)
+            FROM pedidos p WHERE p.id = NEW.pedido_id
+            ON CONFLICT (semana_id, marmita_id, status_entrega) DO UPDATE SET quantidade = quantidade + excluded.quantidade;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_producao_item_del AFTER DELETE ON itens_pedido
+        BEGIN
+            UPDATE rollup_producao SET quantidade = quantidade - COALESCE(OLD.quantidade, 0)
+            WHERE (semana_id, status_entrega) = (SELECT COALESCE(p.semana_id, 0), COALESCE(p.status_entrega, '') FROM pedidos p WHERE p.id = OLD.pedido_id)
+              AND marmita_id = COALESCE(OLD.marmita_id, 0);
+            DELETE FROM rollup_producao
+            WHERE (semana_id, status_entrega) = (SELECT COALESCE(p.semana_id, 0), COALESCE(p.status_entrega, '') FROM pedidos p WHERE p.id = OLD.pedido_id)
+              AND marmita_id = COALESCE(OLD.marmita_id, 0) AND quantidade <= 0;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_producao_item_upd
+        AFTER UPDATE OF pedido_id, marmita_id, quantidade ON itens_pedido
+        BEGIN
+            UPDATE rollup_producao SET quantidade = quantidade - COALESCE(OLD.quantidade, 0)
+            WHERE (semana_id, status_entrega) = (SELECT COALESCE(p.semana_id, 0), COALESCE(p.status_entrega, '') FROM pedidos p WHERE p.id = OLD.pedido_id)
+              AND marmita_id = COALESCE(OLD.marmita_id, 0);
+            INSERT INTO rollup_producao (semana_id, marmita_id, status_entrega, quantidade)
+            SELECT COALESCE(p.semana_id, 0), COALESCE(NEW.marmita_id, 0), COALESCE(p.status_entrega, ''), COALESCE(NEW.quantidade, 0)
+            FROM pedidos p WHERE p.id = NEW.pedido_id
+            ON CONFLICT (semana_id, marmita_id, status_entrega) DO UPDATE SET quantidade = quantidade + excluded.quantidade;
+            DELETE FROM rollup_producao
+            WHERE (semana_id, status_entrega) = (SELECT COALESCE(p.semana_id, 0), COALESCE(p.status_entrega, '') FROM pedidos p WHERE p.id = OLD.pedido_id)
+              AND marmita_id = COALESCE(OLD.marmita_id, 0) AND quantidade <= 0;
+        END
+        """,
+        # --- pedidos ---
+        # No ON DELETE CASCADE os itens já não enxergam o pedido, então o desconto é feito aqui
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_producao_pedido_del BEFORE DELETE ON pedidos
+        BEGIN
+            UPDATE rollup_producao SET quantidade = quantidade - (
+                SELECT COALESCE(SUM(ip.quantidade), 0) FROM itens_pedido ip
+                WHERE ip.pedido_id = OLD.id AND COALESCE(ip.marmita_id, 0) = rollup_producao.marmita_id
+            )
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND status_entrega = COALESCE(OLD.status_entrega, '')
+              AND marmita_id IN (SELECT COALESCE(marmita_id, 0) FROM itens_pedido WHERE pedido_id = OLD.id);
+            DELETE FROM rollup_producao
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND status_entrega = COALESCE(OLD.status_entrega, '') AND quantidade <= 0;
+        END
+        """,
+        # Pedido mudou de semana ou de status de entrega: move as porções para a nova chave
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_producao_pedido_mover
+        AFTER UPDATE OF semana_id, status_entrega ON pedidos
+        WHEN COALESCE(OLD.semana_id, 0) <> COALESCE(NEW.semana_id, 0)
+          OR COALESCE(OLD.status_entrega, '') <> COALESCE(NEW.status_entrega, '')
+        BEGIN
+            UPDATE rollup_producao SET quantidade = quantidade - (
+                SELECT COALESCE(SUM(ip.quantidade), 0) FROM itens_pedido ip
+                WHERE ip.pedido_id = NEW.id AND COALESCE(ip.marmita_id, 0) = rollup_producao.marmita_id
+            )
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND status_entrega = COALESCE(OLD.status_entrega, '')
+              AND marmita_id IN (SELECT COALESCE(marmita_id, 0) FROM itens_pedido WHERE pedido_id = NEW.id);
+            INSERT INTO rollup_producao (semana_id, marmita_id, status_entrega, quantidade)
+            SELECT COALESCE(NEW.semana_id, 0), COALESCE(marmita_id, 0), COALESCE(NEW.status_entrega, ''), SUM(COALESCE(quantidade, 0))
+            FROM itens_pedido WHERE pedido_id = NEW.id GROUP BY COALESCE(marmita_id, 0)
+            ON CONFLICT (semana_id, marmita_id, status_entrega) DO UPDATE SET quantidade = quantidade + excluded.quantidade;
+            DELETE FROM rollup_producao
+            WHERE semana_id = COALESCE(OLD.semana_id, 0) AND status_entrega = COALESCE(OLD.status_entrega, '') AND quantidade <= 0;
+        END
+        """,
+        lambda c: _recalcular_rollup_producao(c),
+    ]),
+    (9, "Centroides de ZIP e cache de coordenadas dos clientes com grade espacial", [
+        # Tabela de referência offline (ex.: arquivo Gazetteer de ZCTAs do Census), carregada pelo usuário
+        """
+        CREATE TABLE IF NOT EXISTS zip_centroides (
+            zip TEXT PRIMARY KEY,
+            latitude REAL NOT NULL,
+            longitude REAL NOT NULL
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS clientes_geo (
+            cliente_id INTEGER PRIMARY KEY REFERENCES clientes (id) ON DELETE CASCADE,
+            endereco TEXT,          -- endereço que foi geocodificado
+            zip TEXT,
+            latitude REAL,          -- NULL: endereço sem ZIP ou ZIP fora da tabela
+            longitude REAL,
+            celula_lat INTEGER,     -- grade espacial: floor(coordenada / GRADE_GRAUS)
+            celula_lon INTEGER,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_clientes_geo_celula ON clientes_geo (celula_lat, celula_lon)",
+        # Endereço alterado: a coordenada em cache deixa de valer
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_clientes_geo_endereco AFTER UPDATE OF endereco ON clientes
+        WHEN OLD.endereco IS NOT NEW.endereco
+        BEGIN
+            DELETE FROM clientes_geo WHERE cliente_id = NEW.id;
+        END
+        """,
+    ]),
+    (10, "Índice (cliente_id, semana_id) no rollup de vendas por cliente para o comparativo semanal", [
+        "CREATE INDEX IF NOT EXISTS idx_rollup_vendas_cliente_cliente ON rollup_vendas_cliente (cliente_id, semana_id)",
+    ]),
+    (11, "Tabela de configurações com o segredo dos tokens de sessão", [
+        """
+        CREATE TABLE IF NOT EXISTS configuracoes (
+            chave TEXT PRIMARY KEY,
+            valor TEXT NOT NULL
+        ) WITHOUT ROWID
+        """,
+        "INSERT OR IGNORE INTO configuracoes (chave, valor) VALUES ('auth_segredo', lower(hex(randomblob(32))))",
+    ]),
+    # Bancos que aplicaram a versão antiga da migração 4: o índice era prefixo de idx_pedidos_semana_data
+    (12, "Remove o índice redundante idx_pedidos_semana_historico", [
+        "DROP INDEX IF EXISTS idx_pedidos_semana_historico",
+    ]),
+    # Dono e sinal de vida dos jobs: ao iniciar, um processo só encerra jobs de processos parados
+    (13, "Processo dono e heartbeat dos jobs", [
+        "ALTER TABLE jobs ADD COLUMN processo TEXT",
+        "ALTER TABLE jobs ADD COLUMN heartbeat_em TIMESTAMP",
+    ]),
+    # Sair de todos os dispositivos: incrementar a geração invalida os tokens do usuário em todos os processos
+    (14, "Geração das sessões de cada usuário", [
+        "ALTER TABLE usuarios ADD COLUMN sessao_geracao INTEGER NOT NULL DEFAULT 0",
+    ]),
+    # Logout: o jti do token da sessão fica aqui até o token expirar (expira_em em segundos Unix)
+    (15, "Tokens de sessão revogados", [
+        """
+        CREATE TABLE IF NOT EXISTS sessoes_revogadas (
+            jti TEXT PRIMARY KEY,
+            expira_em INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_sessoes_revogadas_expira ON sessoes_revogadas (expira_em)",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _migrar(c):
+    # Executado na thread de escrita
+    atual = get_schema_version(c)
+    for versao, descricao, passos in MIGRATIONS:
+        if versao <= atual:
+            continue
+        c.execute("BEGIN IMMEDIATE")
+        try:
+            for passo in passos:
+                if callable(passo):
+                    passo(c)
+                else:
+                    c.execute(passo)
+            c.execute(f"PRAGMA user_version = {versao}")
+            c.commit()
+        except sqlite3.Error:
+            c.rollback()
+            raise
+        print(f"Migration {versao} applied: {descricao}")
+        atual = versao
+    return atual
+
+def apply_migrations(conn):
+    """Aplica as migrações pendentes e devolve a versão final do schema."""
+    if not conn: return None
+    try:
+        return _write(_migrar)
+    except sqlite3.Error as e:
+        print(f"Error applying migrations: {e}")
+        st.error(f"Erro ao atualizar o schema do banco de dados: {e}")
+        return None
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+# Inicialização memoizada por processo: guarda o DB_FILE cujo schema já está pronto
+_schema_ready_for = None
+_schema_lock = threading.Lock()
+
+def reset_schema_state():
+    # Faz o próximo init_db verificar o schema de novo (ex.: o banco foi restaurado de um backup)
+    global _schema_ready_for
+    with _schema_lock:
+        _schema_ready_for = None
+
+def init_db(conn):
+    """Garante o schema uma única vez por processo.
+
+    Depois da primeira chamada bem-sucedida é só uma comparação em memória; reruns
+    não executam DDL nem consultas. Se o banco já estiver em SCHEMA_VERSION (outro
+    processo criou), basta a leitura de user_version e a checagem do admin padrão.
+    """
+    global _schema_ready_for
+    if _schema_ready_for == DB_FILE:
+        return True
+    if not conn: return False
+    with _schema_lock:
+        if _schema_ready_for == DB_FILE:
+            return True
+        try:
+            if get_schema_version(conn) < SCHEMA_VERSION:
+                create_tables(conn)
+            if get_schema_version(conn) >= SCHEMA_VERSION:
+                # Também num banco já migrado cujos usuários foram todos excluídos
+                add_default_admin(conn)
+                _schema_ready_for = DB_FILE
+        except sqlite3.Error as e:
+            print(f"Error checking schema version: {e}")
+            st.error(f"Erro ao verificar o schema do banco de dados: {e}")
+    return _schema_ready_for == DB_FILE
+
+# --- Verificação dos Planos de Consulta ---
+
+def explain_query_plans(conn, semana_id=1, cliente_id=1, pedido_id=1):
+    """Executa as consultas de histórico/relatório capturando o SQL e devolve
+    {nome_da_função: [linhas do EXPLAIN QUERY PLAN]}."""
+    chamadas = [
+        ("get_all_pedidos_info", lambda: get_all_pedidos_info(conn, semana_id_filter=semana_id)),
+        ("get_pedidos_page", lambda: get_pedidos_page(conn, semana_id_filter=semana_id, cursor=("2000-01-01 00:00:00", 1))),
+        ("get_pedido_itens", lambda: get_pedido_itens(conn, pedido_id)),
+        ("get_vendas_por_cliente", lambda: get_vendas_por_cliente(conn, semana_id_filter=semana_id)),
+        ("get_marmitas_por_cliente", lambda: get_marmitas_por_cliente(conn, cliente_id, semana_id_filter=semana_id)),
+        ("get_vendas_geral", lambda: get_vendas_geral(conn, semana_id_filter=semana_id)),
+        ("get_marmitas_mais_vendidas", lambda: get_marmitas_mais_vendidas(conn, semana_id_filter=semana_id)),
+        ("get_plano_producao", lambda: get_plano_producao(conn, semana_id)),
+    ]
+    planos = {}
+    for nome, chamada in chamadas:
+        capturado = []
+        conn.set_trace_callback(capturado.append) # recebe o SQL já com os parâmetros
+        try:
+            with bypass_query_cache():
+                chamada()
+        finally:
+            conn.set_trace_callback(None)
+        detalhes = []
+        for sql in capturado:
+            if sql.lstrip().upper().startswith("SELECT"):
+                detalhes += [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+        planos[nome] = detalhes
+    return planos
+
+def _full_table_scans(detalhes):
+    # "SCAN p" sem "INDEX" = leitura da tabela inteira
+    return [d for d in detalhes if d.startswith("SCAN") and "INDEX" not in d]
+
+def assert_query_plans_use_indexes(conn, **kwargs):
+    """Falha (AssertionError) se alguma consulta de relatório fizer varredura completa de tabela."""
+    planos = explain_query_plans(conn, **kwargs)
+    problemas = {nome: _full_table_scans(d) or ["nenhuma consulta executada"]
+                 for nome, d in planos.items() if not d or _full_table_scans(d)}
+    assert not problemas, f"Consultas sem índice: {problemas}"
+    return planos
+
+# --- Funções de Autenticação --- 
 
 def add_user(conn, username, password):
     if not conn: return False
-    password_hash = hash_password(password)
+    password_hash = auth.hash_password(password)
     sql = 'INSERT INTO usuarios(username, password_hash) VALUES(?,?)'
-    cursor = conn.cursor()
     try:
-        cursor.execute(sql, (username, password_hash))
-        conn.commit()
+        _write(lambda c: c.execute(sql, (username, password_hash)), "usuarios")
         print(f"User {username} added.")
         return True
     except sqlite3.IntegrityError:
@@ -135,29 +1308,99 @@ def add_default_admin(conn):
         add_user(conn, "admin", "admin")
 
 def verify_user(conn, username, password):
+    """Confere usuário e senha. Hash legado (SHA-256) ou com custo abaixo do atual é regravado no formato novo."""
     if not conn: return False
     cursor = conn.cursor()
     try:
         cursor.execute("SELECT password_hash FROM usuarios WHERE username=?", (username,))
         result = cursor.fetchone()
-        if result:
-            stored_hash = result[0]
-            if stored_hash == hash_password(password):
-                return True # Senha correta
     except sqlite3.Error as e:
         print(f"Error verifying user: {e}")
-    return False # Usuário não encontrado ou senha incorreta
+        return False
+    if not result:
+        auth.simular_verificacao(password) # mesmo tempo de resposta para usuário inexistente
+        return False # Usuário não encontrado
+    stored_hash = result[0]
+    if not auth.verificar_senha(password, stored_hash):
+        return False # Senha incorreta
+    if auth.precisa_atualizar(stored_hash):
+        update_password_hash(conn, username, auth.hash_password(password))
+    return True
+
+def update_password_hash(conn, username, password_hash):
+    if not conn: return False
+    try:
+        _write(lambda c: c.execute("UPDATE usuarios SET password_hash = ? WHERE username = ?", (password_hash, username)), "usuarios")
+        auth.invalidar_usuario(username) # tokens com a impressão da senha antiga
+        print(f"Password hash of {username} upgraded.")
+        return True
+    except sqlite3.Error as e:
+        print(f"Error updating password hash: {e}")
+        return False
+
+def get_estado_sessao(conn, username, jti=None):
+    """(geração das sessões, hash da senha, jti revogado) do usuário, ou None se não existir.
+
+    Sem cache aqui: é chamado por auth.validar_token só quando o token não está no cache dele.
+    """
+    if not conn: return None
+    sql = """
+    SELECT sessao_geracao, password_hash, EXISTS (SELECT 1 FROM sessoes_revogadas WHERE jti = ?)
+    FROM usuarios WHERE username = ?
+    """
+    try:
+        row = conn.execute(sql, (jti, username)).fetchone()
+        return (row[0], row[1], bool(row[2])) if row else None
+    except sqlite3.Error as e:
+        print(f"Error reading session state: {e}")
+        return None
+
+def revogar_sessao(conn, jti, expira_em):
+    """Logout: o token com este jti deixa de valer em todos os processos. Apaga as revogações
+    de tokens já expirados, que não precisam mais ser guardadas."""
+    if not conn: return False
+    def _revogar(c):
+        c.execute("INSERT OR IGNORE INTO sessoes_revogadas (jti, expira_em) VALUES (?, ?)", (jti, int(expira_em)))
+        c.execute("DELETE FROM sessoes_revogadas WHERE expira_em < CAST(strftime('%s', 'now') AS INTEGER)")
+    try:
+        _write(_revogar, "sessoes_revogadas")
+        return True
+    except sqlite3.Error as e:
+        print(f"Error revoking session: {e}")
+        return False
+
+def encerrar_sessoes(conn, username):
+    """Sair de todos os dispositivos: invalida todos os tokens de sessão do usuário (qualquer aba, navegador ou processo)."""
+    if not conn: return False
+    try:
+        _write(lambda c: c.execute("UPDATE usuarios SET sessao_geracao = sessao_geracao + 1 WHERE username = ?",
+                                   (username,)), "usuarios")
+        auth.invalidar_usuario(username)
+        return True
+    except sqlite3.Error as e:
+        print(f"Error ending sessions of {username}: {e}")
+        return False
+
+@cached_query("configuracoes")
+def get_auth_secret(conn):
+    """Segredo que assina os tokens de sessão (gerado na migração 11; MARMITA_AUTH_SECRET tem prioridade)."""
+    if os.environ.get("MARMITA_AUTH_SECRET"):
+        return os.environ["MARMITA_AUTH_SECRET"]
+    if not conn: return None
+    try:
+        row = conn.execute("SELECT valor FROM configuracoes WHERE chave = 'auth_segredo'").fetchone()
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        _falha_leitura(f"Erro ao ler a configuração de autenticação: {e}")
+        return None
 
 # --- Funções CRUD para Semanas ---
 
 def add_semana(conn, nome_semana, data_inicio=None, data_fim=None):
     if not conn: return None
     sql = 'INSERT INTO semanas(nome_semana, data_inicio, data_fim) VALUES(?,?,?)'
-    cursor = conn.cursor()
     try:
-        cursor.execute(sql, (nome_semana, data_inicio, data_fim))
-        conn.commit()
-        return cursor.lastrowid
+        return _write(lambda c: c.execute(sql, (nome_semana, data_inicio, data_fim)).lastrowid, "semanas")
     except sqlite3.IntegrityError:
         st.error(f"Erro: Semana com nome '{nome_semana}' já existe.")
         return None
@@ -166,6 +1409,7 @@ def add_semana(conn, nome_semana, data_inicio=None, data_fim=None):
         st.error(f"Erro inesperado ao adicionar semana: {e}")
         return None
 
+@cached_query("semanas")
 def get_all_semanas(conn):
     if not conn: return []
     cursor = conn.cursor()
@@ -174,7 +1418,7 @@ def get_all_semanas(conn):
         cursor.execute("SELECT id, nome_semana, data_inicio, data_fim FROM semanas ORDER BY data_inicio DESC, nome_semana")
         return cursor.fetchall()
     except sqlite3.Error as e:
-        st.error(f"Erro ao buscar semanas: {e}")
+        _falha_leitura(f"Erro ao buscar semanas: {e}")
         return []
 
 # ... (Update e Delete para Semanas podem ser adicionados se necessário)
@@ -183,10 +1427,8 @@ def delete_semana(conn, semana_id):
     if not conn: return False
     # ON DELETE SET NULL na FK de pedidos deve tratar a referência
     sql = 'DELETE FROM semanas WHERE id=?'
-    cursor = conn.cursor()
     try:
-        cursor.execute(sql, (semana_id,))
-        conn.commit()
+        _write(lambda c: c.execute(sql, (semana_id,)), "semanas", "pedidos")
         return True
     except sqlite3.Error as e:
         print(f"Error deleting semana: {e}")
@@ -197,12 +1439,10 @@ def delete_semana(conn, semana_id):
 
 def add_cliente(conn, nome, endereco, complemento, telefone):
     if not conn: return None
-    sql = 'INSERT INTO clientes(nome, endereco, complemento, telefone) VALUES(?,?,?,?)'
-    cursor = conn.cursor()
+    sql = 'INSERT INTO clientes(nome, endereco, complemento, telefone, telefone_normalizado) VALUES(?,?,?,?,?)'
+    normalizado = normalize_phone(telefone)
     try:
-        cursor.execute(sql, (nome, endereco, complemento, telefone))
-        conn.commit()
-        return cursor.lastrowid
+        return _write(lambda c: c.execute(sql, (nome, endereco, complemento, telefone, normalizado)).lastrowid, "clientes")
     except sqlite3.IntegrityError:
         st.error(f"Erro: Telefone '{telefone}' já cadastrado.")
         return None
@@ -211,6 +1451,7 @@ def add_cliente(conn, nome, endereco, complemento, telefone):
         st.error(f"Erro inesperado ao adicionar cliente: {e}")
         return None
 
+@cached_query("clientes")
 def get_all_clientes(conn):
     if not conn: return []
     cursor = conn.cursor()
@@ -218,9 +1459,10 @@ def get_all_clientes(conn):
         cursor.execute("SELECT id, nome, endereco, complemento, telefone FROM clientes ORDER BY nome")
         return cursor.fetchall()
     except sqlite3.Error as e:
-        st.error(f"Erro ao buscar clientes: {e}")
+        _falha_leitura(f"Erro ao buscar clientes: {e}")
         return []
 
+@cached_query("clientes")
 def get_cliente_by_id(conn, cliente_id):
     if not conn: return None
     cursor = conn.cursor()
@@ -228,16 +1470,61 @@ def get_cliente_by_id(conn, cliente_id):
         cursor.execute("SELECT id, nome, endereco, complemento, telefone FROM clientes WHERE id=?", (cliente_id,))
         return cursor.fetchone()
     except sqlite3.Error as e:
-        st.error(f"Erro ao buscar cliente por ID: {e}")
+        _falha_leitura(f"Erro ao buscar cliente por ID: {e}")
+        return None
+
+@cached_query("clientes")
+def get_cliente_by_phone(conn, telefone):
+    """Cliente pelo telefone em qualquer formato (busca no índice único do telefone normalizado)."""
+    if not conn: return None
+    normalizado = normalize_phone(telefone)
+    if normalizado is None: return None
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, nome, endereco, complemento, telefone FROM clientes WHERE telefone_normalizado = ?", (normalizado,))
+        return cursor.fetchone()
+    except sqlite3.Error as e:
+        _falha_leitura(f"Erro ao buscar cliente por telefone: {e}")
         return None
 
+# Clientes retornados por busca (seletores de cliente)
+CLIENTES_BUSCA_LIMITE = 20
+
+def _consulta_fts(texto):
+    # Telefone digitado com separadores vira um único número; cada palavra vira um
+    # prefixo ("pala"*) e todas precisam aparecer (AND implícito do FTS5)
+    texto = (texto or "").strip()
+    if re.fullmatch(r"[\d\s().+-]+", texto):
+        texto = re.sub(r"\D", "", texto)
+    return " ".join(f'"{palavra}"*' for palavra in re.findall(r"\w+", texto))
+
+@cached_query("clientes")
+def search_clientes(conn, texto, limite=CLIENTES_BUSCA_LIMITE):
+    """Os `limite` clientes mais relevantes para o texto digitado (nome, endereço ou telefone)."""
+    if not conn: return []
+    consulta = _consulta_fts(texto)
+    if not consulta: return []
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        SELECT c.id, c.nome, c.endereco, c.complemento, c.telefone
+        FROM clientes_fts f
+        JOIN clientes c ON c.id = f.rowid
+        WHERE clientes_fts MATCH ?
+        ORDER BY f.rank, c.nome
+        LIMIT ?
+        """, (consulta, limite))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        _falha_leitura(f"Erro ao buscar clientes: {e}")
+        return []
+
 def update_cliente(conn, cliente_id, nome, endereco, complemento, telefone):
     if not conn: return False
-    sql = 'UPDATE clientes SET nome = ?, endereco = ?, complemento = ?, telefone = ? WHERE id = ?'
-    cursor = conn.cursor()
+    sql = 'UPDATE clientes SET nome = ?, endereco = ?, complemento = ?, telefone = ?, telefone_normalizado = ? WHERE id = ?'
+    normalizado = normalize_phone(telefone)
     try:
-        cursor.execute(sql, (nome, endereco, complemento, telefone, cliente_id))
-        conn.commit()
+        _write(lambda c: c.execute(sql, (nome, endereco, complemento, telefone, normalizado, cliente_id)), "clientes")
         return True
     except sqlite3.IntegrityError:
         st.error(f"Erro: Telefone '{telefone}' já pertence a outro cliente.")
@@ -250,10 +1537,8 @@ def update_cliente(conn, cliente_id, nome, endereco, complemento, telefone):
 def delete_cliente(conn, cliente_id):
     if not conn: return False
     sql = 'DELETE FROM clientes WHERE id=?'
-    cursor = conn.cursor()
     try:
-        cursor.execute(sql, (cliente_id,))
-        conn.commit()
+        _write(lambda c: c.execute(sql, (cliente_id,)), "clientes", "pedidos")
         return True
     except sqlite3.Error as e:
         print(f"Error deleting cliente: {e}")
@@ -265,11 +1550,8 @@ def delete_cliente(conn, cliente_id):
 def add_marmita(conn, nome, descricao, preco, categoria, disponivel_semana, imagem_path=None):
     if not conn: return None
     sql = 'INSERT INTO marmitas(nome, descricao, preco, categoria, disponivel_semana, imagem_path) VALUES(?,?,?,?,?,?)'
-    cursor = conn.cursor()
     try:
-        cursor.execute(sql, (nome, descricao, preco, categoria, disponivel_semana, imagem_path))
-        conn.commit()
-        return cursor.lastrowid
+        return _write(lambda c: c.execute(sql, (nome, descricao, preco, categoria, disponivel_semana, imagem_path)).lastrowid, "marmitas")
     except sqlite3.IntegrityError:
         st.error(f"Erro: Marmita com nome '{nome}' já existe.")
         return None
@@ -278,6 +1560,7 @@ def add_marmita(conn, nome, descricao, preco, categoria, disponivel_semana, imag
         st.error(f"Erro inesperado ao adicionar marmita: {e}")
         return None
 
+@cached_query("marmitas")
 def get_all_marmitas(conn):
     if not conn: return []
     cursor = conn.cursor()
@@ -285,9 +1568,10 @@ def get_all_marmitas(conn):
         cursor.execute("SELECT id, nome, descricao, preco, categoria, disponivel_semana, imagem_path FROM marmitas ORDER BY nome")
         return cursor.fetchall()
     except sqlite3.Error as e:
-        st.error(f"Erro ao buscar marmitas: {e}")
+        _falha_leitura(f"Erro ao buscar marmitas: {e}")
         return []
 
+@cached_query("marmitas")
 def get_marmitas_disponiveis(conn):
     if not conn: return []
     cursor = conn.cursor()
@@ -295,9 +1579,10 @@ def get_marmitas_disponiveis(conn):
         cursor.execute("SELECT id, nome, preco FROM marmitas WHERE disponivel_semana = TRUE ORDER BY nome")
         return cursor.fetchall()
     except sqlite3.Error as e:
-        st.error(f"Erro ao buscar marmitas disponíveis: {e}")
+        _falha_leitura(f"Erro ao buscar marmitas disponíveis: {e}")
         return []
 
+@cached_query("marmitas")
 def get_marmita_by_id(conn, marmita_id):
     if not conn: return None
     cursor = conn.cursor()
@@ -305,16 +1590,14 @@ def get_marmita_by_id(conn, marmita_id):
         cursor.execute("SELECT id, nome, descricao, preco, categoria, disponivel_semana, imagem_path FROM marmitas WHERE id=?", (marmita_id,))
         return cursor.fetchone()
     except sqlite3.Error as e:
-        st.error(f"Erro ao buscar marmita por ID: {e}")
+        _falha_leitura(f"Erro ao buscar marmita por ID: {e}")
         return None
 
 def update_marmita(conn, marmita_id, nome, descricao, preco, categoria, disponivel_semana, imagem_path):
     if not conn: return False
     sql = 'UPDATE marmitas SET nome = ?, descricao = ?, preco = ?, categoria = ?, disponivel_semana = ?, imagem_path = ? WHERE id = ?'
-    cursor = conn.cursor()
     try:
-        cursor.execute(sql, (nome, descricao, preco, categoria, disponivel_semana, imagem_path, marmita_id))
-        conn.commit()
+        _write(lambda c: c.execute(sql, (nome, descricao, preco, categoria, disponivel_semana, imagem_path, marmita_id)), "marmitas")
         return True
     except sqlite3.IntegrityError:
         st.error(f"Erro: Marmita com nome '{nome}' já existe.")
@@ -327,10 +1610,8 @@ def update_marmita(conn, marmita_id, nome, descricao, preco, categoria, disponiv
 def delete_marmita(conn, marmita_id):
     if not conn: return False
     sql = 'DELETE FROM marmitas WHERE id=?'
-    cursor = conn.cursor()
     try:
-        cursor.execute(sql, (marmita_id,))
-        conn.commit()
+        _write(lambda c: c.execute(sql, (marmita_id,)), "marmitas", "itens_pedido")
         return True
     except sqlite3.Error as e:
         print(f"Error deleting marmita: {e}")
@@ -341,25 +1622,77 @@ def delete_marmita(conn, marmita_id):
 
 def add_pedido(conn, cliente_id, semana_id, valor_total, forma_pagamento, status_pagamento, status_entrega, itens):
     if not conn: return None
-    conn.execute('BEGIN TRANSACTION')
-    try:
-        sql_pedido = 'INSERT INTO pedidos(cliente_id, semana_id, valor_total, forma_pagamento, status_pagamento, status_entrega) VALUES(?,?,?,?,?,?)'
-        cursor = conn.cursor()
-        cursor.execute(sql_pedido, (cliente_id, semana_id, valor_total, forma_pagamento, status_pagamento, status_entrega))
-        pedido_id = cursor.lastrowid
-
-        sql_item = 'INSERT INTO itens_pedido(pedido_id, marmita_id, quantidade, preco_unitario) VALUES(?,?,?,?)'
-        for item in itens:
-            cursor.execute(sql_item, (pedido_id, item['marmita_id'], item['quantidade'], item['preco_unitario']))
+    sql_pedido = 'INSERT INTO pedidos(cliente_id, semana_id, valor_total, forma_pagamento, status_pagamento, status_entrega) VALUES(?,?,?,?,?,?)'
+    sql_item = 'INSERT INTO itens_pedido(pedido_id, marmita_id, quantidade, preco_unitario) VALUES(?,?,?,?)'
 
-        conn.commit()
+    # Pedido e itens na mesma transação (commit/rollback feitos pela thread de escrita)
+    def _inserir(c):
+        cursor = c.execute(sql_pedido, (cliente_id, semana_id, valor_total, forma_pagamento, status_pagamento, status_entrega))
+        pedido_id = cursor.lastrowid
+        c.executemany(sql_item, [(pedido_id, item['marmita_id'], item['quantidade'], item['preco_unitario']) for item in itens])
         return pedido_id
+
+    try:
+        return _write(_inserir, "pedidos", "itens_pedido")
     except sqlite3.Error as e:
-        conn.rollback()
         print(f"Error adding pedido: {e}")
         st.error(f"Erro inesperado ao adicionar pedido: {e}")
         return None
 
+class ImportacaoInterrompida(Exception):
+    """Erro no meio de add_pedidos_bulk. `ids` tem os pedidos dos lotes já gravados."""
+
+    def __init__(self, ids, erro):
+        super().__init__(f"Erro ao importar pedidos (lotes já gravados: {len(ids)} pedidos): {erro}")
+        self.ids = ids
+
+def add_pedidos_bulk(conn, pedidos, batch_size=BULK_BATCH_SIZE):
+    """Insere muitos pedidos de uma vez com executemany, um lote de pedidos por transação.
+
+    pedidos: lista de dicts com cliente_id, semana_id, data_hora, valor_total,
+    forma_pagamento, status_pagamento, status_entrega e itens (como em add_pedido).
+    Retorna a lista de IDs criados, na mesma ordem. Em caso de erro, os lotes já
+    gravados permanecem e é levantada ImportacaoInterrompida com os IDs deles (sem st.error:
+    também é chamada pela linha de comando e pelo benchmark).
+    """
+    if not conn: return []
+    sql_pedido = 'INSERT INTO pedidos(id, cliente_id, semana_id, data_hora, valor_total, forma_pagamento, status_pagamento, status_entrega) VALUES(?,?,?,?,?,?,?,?)'
+    sql_item = 'INSERT INTO itens_pedido(pedido_id, marmita_id, quantidade, preco_unitario) VALUES(?,?,?,?)'
+
+    def _inserir_lote(lote):
+        def _inserir(c):
+            # IDs atribuídos aqui para ligar os itens sem depender de lastrowid. A transação
+            # começa antes da leitura do próximo ID: o lock de escrita impede que outro
+            # processo (outra instância do app, restauração de backup) use os mesmos IDs
+            if not c.in_transaction:
+                c.execute("BEGIN IMMEDIATE")
+            proximo_id = c.execute("""
+            SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'pedidos'), 0),
+                       COALESCE((SELECT MAX(id) FROM pedidos), 0)) + 1
+            """).fetchone()[0]
+            ids = list(range(proximo_id, proximo_id + len(lote)))
+            c.executemany(sql_pedido, [
+                (pedido_id, p['cliente_id'], p['semana_id'], p['data_hora'], p['valor_total'],
+                 p['forma_pagamento'], p['status_pagamento'], p['status_entrega'])
+                for pedido_id, p in zip(ids, lote)
+            ])
+            c.executemany(sql_item, [
+                (pedido_id, item['marmita_id'], item['quantidade'], item['preco_unitario'])
+                for pedido_id, p in zip(ids, lote) for item in p['itens']
+            ])
+            return ids
+        return _inserir
+
+    ids_criados = []
+    try:
+        for inicio in range(0, len(pedidos), batch_size):
+            lote = pedidos[inicio:inicio + batch_size]
+            ids_criados.extend(_write(_inserir_lote(lote), "pedidos", "itens_pedido"))
+    except sqlite3.Error as e:
+        print(f"Error in bulk pedido insert: {e}")
+        raise ImportacaoInterrompida(ids_criados, e) from e
+    return ids_criados
+
 def get_all_pedidos_info(conn, semana_id_filter=None):
     if not conn: return pd.DataFrame()
     base_sql = """
@@ -386,6 +1719,75 @@ def get_all_pedidos_info(conn, semana_id_filter=None):
         st.error(f"Erro ao buscar histórico de pedidos: {e}")
         return pd.DataFrame()
 
+@cached_query("pedidos", "clientes", "semanas")
+def get_pedidos_page(conn, semana_id_filter=None, page_size=50, cursor=None):
+    """Uma página do histórico, do mais recente para o mais antigo, via keyset pagination.
+
+    cursor é a tupla (data_hora, id) do último pedido da página anterior (None = primeira
+    página). Só a janela pedida é lida, usando os índices (data_hora) e
+    (semana_id, data_hora, valor_total), que terminam no rowid (id). Retorna
+    (DataFrame, próximo_cursor); o próximo_cursor é None na última página.
+    """
+    if not conn: return pd.DataFrame(), None
+    sql = """
+    SELECT
+        p.id, strftime('%Y-%m-%d %H:%M', p.data_hora) as data_hora,
+        COALESCE(c.nome, 'Cliente Excluído') as nome_cliente,
+        COALESCE(s.nome_semana, 'Semana Excluída') as nome_semana,
+        p.valor_total, p.forma_pagamento, p.status_pagamento, p.status_entrega,
+        p.data_hora as cursor_data_hora
+    FROM pedidos p
+    LEFT JOIN clientes c ON p.cliente_id = c.id
+    LEFT JOIN semanas s ON p.semana_id = s.id
+    """
+    condicoes = []
+    params = []
+    if semana_id_filter:
+        condicoes.append("p.semana_id = ?")
+        params.append(semana_id_filter)
+    if cursor is not None:
+        condicoes.append("(p.data_hora, p.id) < (?, ?)")
+        params.extend(cursor)
+    if condicoes:
+        sql += " WHERE " + " AND ".join(condicoes)
+
+    # Uma linha a mais indica se existe próxima página
+    sql += " ORDER BY p.data_hora DESC, p.id DESC LIMIT ?"
+    params.append(page_size + 1)
+
+    try:
+        df = pd.read_sql_query(sql, conn, params=params)
+    except Exception as e:
+        _falha_leitura(f"Erro ao buscar histórico de pedidos: {e}")
+        return pd.DataFrame(), None
+
+    proximo_cursor = None
+    if len(df) > page_size:
+        df = df.iloc[:page_size]
+        ultimo = df.iloc[-1]
+        # O cursor compara com a própria coluna: o Timestamp do pandas volta a ser datetime,
+        # que o sqlite3 grava no mesmo formato do valor armazenado
+        data_hora = ultimo["cursor_data_hora"]
+        proximo_cursor = (None if pd.isna(data_hora) else data_hora.to_pydatetime(), int(ultimo["id"]))
+    return df.drop(columns=["cursor_data_hora"]), proximo_cursor
+
+@cached_query("pedidos")
+def count_pedidos(conn, semana_id_filter=None):
+    """Total de pedidos lido dos totais/rollups mantidos por triggers (não conta a tabela)."""
+    if not conn: return 0
+    cursor = conn.cursor()
+    try:
+        if semana_id_filter:
+            cursor.execute("SELECT COALESCE(SUM(pedidos), 0) FROM rollup_vendas_cliente WHERE semana_id = ?", (semana_id_filter,))
+        else:
+            cursor.execute("SELECT total_pedidos FROM dashboard_totais WHERE id = 1")
+        row = cursor.fetchone()
+        return row[0] if row else 0
+    except sqlite3.Error as e:
+        _falha_leitura(f"Erro ao contar pedidos: {e}")
+        return 0
+
+@cached_query("itens_pedido", "marmitas")
 def get_pedido_itens(conn, pedido_id):
     # Sem alterações aqui
     if not conn: return []
@@ -401,17 +1803,64 @@ def get_pedido_itens(conn, pedido_id):
         cursor.execute(sql, (pedido_id,))
         return cursor.fetchall()
     except sqlite3.Error as e:
-        st.error(f"Erro ao buscar itens do pedido {pedido_id}: {e}")
+        _falha_leitura(f"Erro ao buscar itens do pedido {pedido_id}: {e}")
         return []
 
+@cached_query("pedidos", "itens_pedido", "marmitas")
+def get_itens_por_pedidos(conn, pedido_ids=None, semana_id=None):
+    """Itens de vários pedidos numa única consulta, em vez de uma chamada de get_pedido_itens por pedido.
+
+    Recebe os IDs (tupla, para aproveitar o cache) ou uma semana. Retorna um mapeamento somente
+    leitura de colunas em tuplas paralelas (pedido_id, quantidade, nome_marmita, preco_unitario),
+    ordenadas por pedido, e "faixas": pedido_id -> (início, fim) das linhas do pedido nas colunas.
+    Para ler um pedido, use itens_do_pedido.
+    """
+    vazio = types.MappingProxyType({"pedido_id": (), "quantidade": (), "nome_marmita": (), "preco_unitario": (),
+                                    "faixas": types.MappingProxyType({})})
+    if not conn: return vazio
+    sql = """
+    SELECT ip.pedido_id, ip.quantidade, COALESCE(m.nome, 'Marmita Excluída') as nome_marmita, ip.preco_unitario
+    FROM itens_pedido ip
+    LEFT JOIN marmitas m ON ip.marmita_id = m.id
+    """
+    if pedido_ids is not None:
+        # Lista de IDs como um único parâmetro JSON: sem limite de variáveis e o mesmo SQL para qualquer tamanho
+        sql += " WHERE ip.pedido_id IN (SELECT value FROM json_each(?))"
+        params = (json.dumps([int(p) for p in pedido_ids]),)
+    elif semana_id is not None:
+        sql += " WHERE ip.pedido_id IN (SELECT id FROM pedidos WHERE semana_id = ?)"
+        params = (semana_id,)
+    else:
+        return vazio
+    sql += " ORDER BY ip.pedido_id"
+    try:
+        linhas = conn.execute(sql, params).fetchall()
+    except sqlite3.Error as e:
+        _falha_leitura(f"Erro ao buscar os itens dos pedidos: {e}")
+        return vazio
+    if not linhas:
+        return vazio
+    pedidos, quantidades, nomes, precos = zip(*linhas)
+    faixas = {}
+    inicio = 0
+    for i in range(1, len(pedidos) + 1):
+        if i == len(pedidos) or pedidos[i] != pedidos[inicio]:
+            faixas[pedidos[inicio]] = (inicio, i)
+            inicio = i
+    return types.MappingProxyType({"pedido_id": pedidos, "quantidade": quantidades, "nome_marmita": nomes,
+                                   "preco_unitario": precos, "faixas": types.MappingProxyType(faixas)})
+
+def itens_do_pedido(itens, pedido_id):
+    """Itens de um pedido do resultado de get_itens_por_pedidos, como em get_pedido_itens: (quantidade, nome, preço)."""
+    inicio, fim = itens["faixas"].get(pedido_id, (0, 0))
+    return list(zip(itens["quantidade"][inicio:fim], itens["nome_marmita"][inicio:fim], itens["preco_unitario"][inicio:fim]))
+
 def update_pedido_status(conn, pedido_id, status_pagamento, status_entrega):
     # Sem alterações aqui
     if not conn: return False
     sql = 'UPDATE pedidos SET status_pagamento = ?, status_entrega = ? WHERE id = ?'
-    cursor = conn.cursor()
     try:
-        cursor.execute(sql, (status_pagamento, status_entrega, pedido_id))
-        conn.commit()
+        _write(lambda c: c.execute(sql, (status_pagamento, status_entrega, pedido_id)), "pedidos")
         return True
     except sqlite3.Error as e:
         print(f"Error updating pedido status: {e}")
@@ -422,106 +1871,603 @@ def delete_pedido(conn, pedido_id):
     # Sem alterações aqui
     if not conn: return False
     sql = 'DELETE FROM pedidos WHERE id=?'
-    cursor = conn.cursor()
     try:
-        cursor.execute(sql, (pedido_id,))
-        conn.commit()
+        _write(lambda c: c.execute(sql, (pedido_id,)), "pedidos", "itens_pedido")
         return True
     except sqlite3.Error as e:
         print(f"Error deleting pedido: {e}")
         st.error(f"Erro ao excluir pedido: {e}")
         return False
 
-# --- Funções para Relatórios (adicionar filtro de semana) ---
+# --- Jobs em Segundo Plano (tabela usada por jobs.py) ---
 
-def get_vendas_por_cliente(conn, semana_id_filter=None):
+JOB_STATUS_ATIVOS = ("pendente", "executando")
+# Colunas que update_job pode alterar
+_JOB_CAMPOS = ("status", "progresso", "mensagem", "resultado", "erro", "iniciado_em", "terminado_em")
+
+def add_job(conn, job_id, tipo, parametros, chave, criado_por=None, processo=None):
+    if not conn: return None
+    sql = 'INSERT INTO jobs(id, tipo, parametros, chave, criado_por, processo, heartbeat_em) VALUES(?,?,?,?,?,?,CURRENT_TIMESTAMP)'
+    try:
+        _write(lambda c: c.execute(sql, (job_id, tipo, parametros, chave, criado_por, processo)), "jobs")
+        return job_id
+    except sqlite3.Error as e:
+        print(f"Error adding job: {e}")
+        return None
+
+def claim_job(conn, job_id, tipo, parametros, chave, criado_por, processo, janela_segundos):
+    """Registra o job só se nenhum outro do mesmo tipo e criado_por estiver ativo ou tiver
+    terminado sem erro nos últimos `janela_segundos` (em qualquer processo).
+
+    A verificação e o INSERT são um único comando na thread de escrita: entre processos que
+    disputam o mesmo agendamento, só um registra o job. Retorna job_id, False se outro
+    processo já tem o job, ou None em caso de erro.
+    """
+    if not conn: return None
+    sql = f"""
+    INSERT INTO jobs(id, tipo, parametros, chave, criado_por, processo, heartbeat_em)
+    SELECT ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP
+    WHERE NOT EXISTS (
+        SELECT 1 FROM jobs
+        WHERE tipo = ? AND criado_por IS ?
+          AND (status IN ({",".join("?" * len(JOB_STATUS_ATIVOS))})
+               OR (status = 'concluido' AND criado_em > datetime('now', ?)))
+    )
+    """
+    parametros_sql = (job_id, tipo, parametros, chave, criado_por, processo,
+                      tipo, criado_por, *JOB_STATUS_ATIVOS, f"-{int(janela_segundos)} seconds")
+    try:
+        inseridos = _write(lambda c: c.execute(sql, parametros_sql).rowcount, "jobs")
+        return job_id if inseridos else False
+    except sqlite3.Error as e:
+        print(f"Error claiming job: {e}")
+        return None
+
+def update_job(conn, job_id, **campos):
+    if not conn or not campos: return False
+    invalidos = set(campos) - set(_JOB_CAMPOS)
+    if invalidos:
+        raise ValueError(f"Campos de job inválidos: {', '.join(sorted(invalidos))}")
+    colunas = ", ".join(f"{campo} = ?" for campo in campos)
+    sql = f'UPDATE jobs SET {colunas} WHERE id = ?'
+    try:
+        _write(lambda c: c.execute(sql, (*campos.values(), job_id)), "jobs")
+        return True
+    except sqlite3.Error as e:
+        print(f"Error updating job {job_id}: {e}")
+        return False
+
+def get_job(conn, job_id):
+    """Job como dict (None se não existir)."""
+    if not conn: return None
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        SELECT id, tipo, parametros, chave, status, progresso, mensagem, resultado, erro, criado_por,
+               criado_em, iniciado_em, terminado_em
+        FROM jobs WHERE id = ?
+        """, (job_id,))
+        row = cursor.fetchone()
+        return dict(zip([col[0] for col in cursor.description], row)) if row else None
+    except sqlite3.Error as e:
+        print(f"Error fetching job {job_id}: {e}")
+        return None
+
+def get_recent_jobs(conn, limite=50):
+    """Últimos jobs (sem o resultado) para acompanhamento."""
     if not conn: return pd.DataFrame()
     sql = """
-    SELECT COALESCE(c.nome, 'Cliente Excluído') as Cliente, COUNT(p.id) as "Pedidos", SUM(p.valor_total) as "Total Gasto ($)"
+    SELECT id, tipo, status, progresso, mensagem, erro, criado_por, criado_em, iniciado_em, terminado_em
+    FROM jobs ORDER BY criado_em DESC, rowid DESC LIMIT ?
+    """
+    try:
+        return pd.read_sql_query(sql, conn, params=(limite,))
+    except (sqlite3.Error, pd.errors.DatabaseError) as e:
+        st.error(f"Erro ao buscar jobs: {e}")
+        return pd.DataFrame()
+
+def heartbeat_jobs(conn, processo):
+    """Renova o heartbeat dos jobs ativos do processo. Retorna quantos foram atualizados."""
+    if not conn: return 0
+    sql = f"""
+    UPDATE jobs SET heartbeat_em = CURRENT_TIMESTAMP
+    WHERE processo = ? AND status IN ({",".join("?" * len(JOB_STATUS_ATIVOS))})
+    """
+    try:
+        return _write(lambda c: c.execute(sql, (processo, *JOB_STATUS_ATIVOS)).rowcount, "jobs")
+    except sqlite3.Error as e:
+        print(f"Error updating job heartbeat: {e}")
+        return 0
+
+def fail_interrupted_jobs(conn, processo, limite_segundos):
+    """Marca como erro os jobs pendentes/executando de outros processos sem heartbeat há
+    mais de `limite_segundos` (o processo parou). Jobs de processos ativos não são tocados."""
+    if not conn: return 0
+    sql = f"""
+    UPDATE jobs SET status = 'erro', erro = 'Interrompido: o processo do app parou', terminado_em = CURRENT_TIMESTAMP
+    WHERE status IN ({",".join("?" * len(JOB_STATUS_ATIVOS))})
+      AND processo IS NOT ?
+      AND COALESCE(heartbeat_em, iniciado_em, criado_em) < datetime('now', ?)
+    """
+    try:
+        return _write(lambda c: c.execute(sql, (*JOB_STATUS_ATIVOS, processo, f"-{int(limite_segundos)} seconds")).rowcount, "jobs")
+    except sqlite3.Error as e:
+        print(f"Error updating interrupted jobs: {e}")
+        return 0
+
+def delete_old_jobs(conn, dias=30):
+    if not conn: return 0
+    sql = "DELETE FROM jobs WHERE terminado_em < datetime('now', ?)"
+    try:
+        return _write(lambda c: c.execute(sql, (f"-{int(dias)} days",)).rowcount, "jobs")
+    except sqlite3.Error as e:
+        print(f"Error deleting old jobs: {e}")
+        return 0
+
+# --- Geolocalização de Clientes (tabelas usadas por delivery.py) ---
+
+# Tamanho (graus) das células da grade espacial de clientes_geo (~1,1 km de latitude)
+GRADE_GRAUS = 0.01
+# Parâmetros por consulta IN (...)
+_LOTE_PARAMETROS = 500
+
+def save_zip_centroides(conn, linhas):
+    """Grava (zip, latitude, longitude) em zip_centroides, substituindo os existentes.
+
+    As coordenadas em cache dos clientes são descartadas para serem recalculadas com a tabela nova.
+    Retorna o número de linhas gravadas.
+    """
+    if not conn: return 0
+    linhas = list(linhas)
+    def _gravar(c):
+        c.executemany("INSERT OR REPLACE INTO zip_centroides (zip, latitude, longitude) VALUES (?,?,?)", linhas)
+        c.execute("DELETE FROM clientes_geo")
+        return len(linhas)
+    try:
+        return _write(_gravar, "zip_centroides", "clientes_geo")
+    except sqlite3.Error as e:
+        print(f"Error saving ZIP centroids: {e}")
+        st.error(f"Erro ao gravar a tabela de ZIPs: {e}")
+        return 0
+
+@cached_query("zip_centroides")
+def count_zip_centroides(conn):
+    if not conn: return 0
+    try:
+        return conn.execute("SELECT COUNT(*) FROM zip_centroides").fetchone()[0]
+    except sqlite3.Error as e:
+        _falha_leitura(f"Erro ao contar os ZIPs: {e}")
+        return 0
+
+def get_zip_centroides(conn, zips):
+    """{zip: (latitude, longitude)} dos ZIPs encontrados na tabela."""
+    if not conn: return {}
+    zips = list(dict.fromkeys(zips))
+    encontrados = {}
+    try:
+        for inicio in range(0, len(zips), _LOTE_PARAMETROS):
+            lote = zips[inicio:inicio + _LOTE_PARAMETROS]
+            cursor = conn.execute(
+                f"SELECT zip, latitude, longitude FROM zip_centroides WHERE zip IN ({','.join('?' * len(lote))})", lote)
+            encontrados.update((z, (lat, lon)) for z, lat, lon in cursor)
+        return encontrados
+    except sqlite3.Error as e:
+        _falha_leitura(f"Erro ao buscar ZIPs: {e}")
+        return {}
+
+def get_clientes_sem_geo(conn, cliente_ids=None):
+    """(id, endereco) dos clientes ainda não geocodificados (todos, ou só entre cliente_ids)."""
+    if not conn: return []
+    sql = """
+    SELECT c.id, c.endereco FROM clientes c
+    LEFT JOIN clientes_geo g ON g.cliente_id = c.id
+    WHERE g.cliente_id IS NULL
+    """
+    try:
+        if cliente_ids is None:
+            return conn.execute(sql).fetchall()
+        cliente_ids = list(cliente_ids)
+        linhas = []
+        for inicio in range(0, len(cliente_ids), _LOTE_PARAMETROS):
+            lote = cliente_ids[inicio:inicio + _LOTE_PARAMETROS]
+            linhas += conn.execute(sql + f" AND c.id IN ({','.join('?' * len(lote))})", lote).fetchall()
+        return linhas
+    except sqlite3.Error as e:
+        _falha_leitura(f"Erro ao buscar clientes sem coordenadas: {e}")
+        return []
+
+def save_clientes_geo(conn, linhas):
+    """Grava (cliente_id, endereco, zip, latitude, longitude) em clientes_geo, com a célula da grade.
+
+    latitude/longitude None registram que o endereço não foi encontrado (não é tentado de novo
+    até o endereço ou a tabela de ZIPs mudar).
+    """
+    if not conn: return 0
+    def _celula(coordenada):
+        return None if coordenada is None else math.floor(coordenada / GRADE_GRAUS)
+    valores = [(cliente_id, endereco, zip_, lat, lon, _celula(lat), _celula(lon))
+               for cliente_id, endereco, zip_, lat, lon in linhas]
+    sql = """
+    INSERT OR REPLACE INTO clientes_geo (cliente_id, endereco, zip, latitude, longitude, celula_lat, celula_lon)
+    VALUES (?,?,?,?,?,?,?)
+    """
+    try:
+        return _write(lambda c: c.executemany(sql, valores).rowcount, "clientes_geo")
+    except sqlite3.Error as e:
+        print(f"Error saving client coordinates: {e}")
+        st.error(f"Erro ao gravar as coordenadas dos clientes: {e}")
+        return 0
+
+@cached_query("clientes", "clientes_geo")
+def get_clientes_proximos(conn, latitude, longitude, raio_km, limite=20):
+    """Clientes a até raio_km do ponto, do mais próximo ao mais distante.
+
+    Lê só as células da grade que cobrem o raio (índice idx_clientes_geo_celula).
+    Retorna lista de (id, nome, endereco, telefone, distancia_km).
+    """
+    if not conn: return []
+    dlat = raio_km / 110.574
+    dlon = raio_km / (111.320 * max(math.cos(math.radians(latitude)), 0.01))
+    params = (math.floor((latitude - dlat) / GRADE_GRAUS), math.floor((latitude + dlat) / GRADE_GRAUS),
+              math.floor((longitude - dlon) / GRADE_GRAUS), math.floor((longitude + dlon) / GRADE_GRAUS))
+    try:
+        linhas = conn.execute("""
+        SELECT c.id, c.nome, c.endereco, c.telefone, g.latitude, g.longitude
+        FROM clientes_geo g
+        JOIN clientes c ON c.id = g.cliente_id
+        WHERE g.celula_lat BETWEEN ? AND ? AND g.celula_lon BETWEEN ? AND ?
+        """, params).fetchall()
+    except sqlite3.Error as e:
+        _falha_leitura(f"Erro ao buscar clientes próximos: {e}")
+        return []
+    proximos = []
+    for cliente_id, nome, endereco, telefone, lat, lon in linhas:
+        distancia = distancia_km(latitude, longitude, lat, lon)
+        if distancia <= raio_km:
+            proximos.append((cliente_id, nome, endereco, telefone, distancia))
+    proximos.sort(key=lambda p: p[4])
+    return proximos[:limite]
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distância (haversine) em km entre dois pontos."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(min(1.0, a)))
+
+@cached_query("pedidos", "itens_pedido", "clientes", "clientes_geo")
+def get_entregas_semana(conn, semana_id, status_entrega=("Pendente", "Em Preparo")):
+    """Uma parada por cliente com pedidos da semana nos status informados.
+
+    Retorna lista de dicts com cliente_id, nome, endereco, complemento, telefone, pedidos
+    (tupla de IDs), marmitas (porções), latitude e longitude (None se não geocodificado).
+    """
+    if not conn or not status_entrega: return []
+    sql = f"""
+    SELECT p.cliente_id, c.nome, c.endereco, c.complemento, c.telefone,
+           GROUP_CONCAT(p.id) as pedidos,
+           SUM((SELECT COALESCE(SUM(ip.quantidade), 0) FROM itens_pedido ip WHERE ip.pedido_id = p.id)) as marmitas,
+           g.latitude, g.longitude
     FROM pedidos p
-    LEFT JOIN clientes c ON p.cliente_id = c.id
+    JOIN clientes c ON c.id = p.cliente_id
+    LEFT JOIN clientes_geo g ON g.cliente_id = p.cliente_id
+    WHERE p.semana_id = ? AND p.status_entrega IN ({",".join("?" * len(status_entrega))})
+    GROUP BY p.cliente_id
+    ORDER BY c.nome
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, (semana_id, *status_entrega))
+        colunas = [col[0] for col in cursor.description]
+        entregas = [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+    except sqlite3.Error as e:
+        _falha_leitura(f"Erro ao buscar as entregas da semana: {e}")
+        return []
+    for entrega in entregas:
+        entrega["pedidos"] = tuple(int(p) for p in entrega["pedidos"].split(","))
+    return entregas
+
+@cached_query("pedidos", "clientes")
+def get_pedidos_impressao(conn, semana_id, status_entrega=("Pendente", "Em Preparo")):
+    """Pedidos da semana nos status informados, com os dados do cliente, para comandas e etiquetas.
+
+    Lista de dicts (id, data_hora, forma_pagamento, status_pagamento, valor_total, nome,
+    endereco, complemento, telefone), em ordem de cliente. Os itens vêm de get_itens_por_pedidos.
+    """
+    if not conn or not status_entrega: return []
+    sql = f"""
+    SELECT p.id, strftime('%d/%m %H:%M', p.data_hora) as data_hora, p.forma_pagamento, p.status_pagamento,
+           p.valor_total, COALESCE(c.nome, 'Cliente Excluído') as nome, c.endereco, c.complemento, c.telefone
+    FROM pedidos p
+    LEFT JOIN clientes c ON c.id = p.cliente_id
+    WHERE p.semana_id = ? AND p.status_entrega IN ({",".join("?" * len(status_entrega))})
+    ORDER BY c.nome, p.id
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, (semana_id, *status_entrega))
+        colunas = [col[0] for col in cursor.description]
+        return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+    except sqlite3.Error as e:
+        _falha_leitura(f"Erro ao buscar os pedidos para impressão: {e}")
+        return []
+
+def set_status_entrega(conn, pedido_ids, status_entrega):
+    """Muda o status de entrega de vários pedidos numa única transação."""
+    if not conn: return False
+    try:
+        _write(lambda c: c.executemany("UPDATE pedidos SET status_entrega = ? WHERE id = ?",
+                                       [(status_entrega, pedido_id) for pedido_id in pedido_ids]), "pedidos")
+        return True
+    except sqlite3.Error as e:
+        print(f"Error updating delivery status: {e}")
+        st.error(f"Erro ao atualizar o status de entrega dos pedidos: {e}")
+        return False
+
+# --- Manutenção ---
+
+def optimize_database(conn, vacuum=True):
+    """PRAGMA optimize, VACUUM (opcional) e checkpoint do WAL. Retorna o tamanho antes/depois (bytes)."""
+    if not conn: return None
+    def tamanho():
+        return sum(os.path.getsize(DB_FILE + sufixo) for sufixo in ("", "-wal") if os.path.exists(DB_FILE + sufixo))
+    antes = tamanho()
+    def _otimizar(c):
+        c.execute("PRAGMA optimize")
+        if vacuum:
+            c.execute("VACUUM") # fora de transação: o writer só abre BEGIN antes de DML
+        c.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    try:
+        _write(_otimizar, "jobs")
+    except sqlite3.Error as e:
+        print(f"Error optimizing database: {e}")
+        st.error(f"Erro ao otimizar o banco de dados: {e}")
+        return None
+    return {"bytes_antes": antes, "bytes_depois": tamanho()}
+
+# --- Dashboard (Resumo Rápido) ---
+
+# Recalcula a linha de dashboard_totais a partir das tabelas (migração e reparo)
+_SQL_RECALCULAR_DASHBOARD = """
+INSERT OR REPLACE INTO dashboard_totais (
+    id, total_clientes, total_pedidos, receita_total,
+    pagamento_pendente_pedidos, pagamento_pendente_valor, entrega_pendente_pedidos
+)
+SELECT
+    1,
+    (SELECT COUNT(*) FROM clientes),
+    COUNT(*),
+    COALESCE(SUM(valor_total), 0),
+    COALESCE(SUM(status_pagamento = 'Pendente'), 0),
+    COALESCE(SUM(CASE WHEN status_pagamento = 'Pendente' THEN valor_total ELSE 0 END), 0),
+    COALESCE(SUM(status_entrega NOT IN ('Entregue', 'Cancelado')), 0)
+FROM pedidos
+"""
+
+def _recalcular_dashboard(c):
+    c.execute(_SQL_RECALCULAR_DASHBOARD)
+
+def refresh_dashboard_metrics(conn):
+    """Reconstrói os totais do dashboard do zero (normalmente desnecessário: os triggers os mantêm)."""
+    if not conn: return False
+    try:
+        _write(_recalcular_dashboard, "pedidos", "clientes")
+        return True
+    except sqlite3.Error as e:
+        print(f"Error refreshing dashboard metrics: {e}")
+        st.error(f"Erro ao recalcular os totais do dashboard: {e}")
+        return False
+
+@cached_query("pedidos", "clientes")
+def get_dashboard_metrics(conn):
+    """Totais do Resumo Rápido numa única leitura de dashboard_totais (custo constante).
+
+    Retorna dict com total_clientes, total_pedidos, receita_total,
+    pagamento_pendente_pedidos, pagamento_pendente_valor e entrega_pendente_pedidos.
+    """
+    if not conn: return {}
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        SELECT total_clientes, total_pedidos, receita_total,
+               pagamento_pendente_pedidos, pagamento_pendente_valor, entrega_pendente_pedidos
+        FROM dashboard_totais WHERE id = 1
+        """)
+        row = cursor.fetchone()
+        if row is None:
+            return {}
+        return dict(zip([col[0] for col in cursor.description], row))
+    except sqlite3.Error as e:
+        _falha_leitura(f"Erro ao buscar totais do dashboard: {e}")
+        return {}
+
+# --- Funções para Relatórios (leem os rollups mantidos por triggers) ---
+# O custo depende do número de linhas de rollup, não do histórico de pedidos.
+
+def _recalcular_rollups(c):
+    # Reconstrói os rollups a partir de pedidos/itens_pedido (migração e reparo)
+    c.execute("DELETE FROM rollup_vendas_cliente")
+    c.execute("DELETE FROM rollup_vendas_dia")
+    c.execute("DELETE FROM rollup_marmitas")
+    c.execute("""
+    INSERT INTO rollup_vendas_cliente (semana_id, cliente_id, pedidos, total)
+    SELECT COALESCE(semana_id, 0), COALESCE(cliente_id, 0), COUNT(*), COALESCE(SUM(valor_total), 0)
+    FROM pedidos GROUP BY 1, 2
+    """)
+    c.execute("""
+    INSERT INTO rollup_vendas_dia (semana_id, dia, pedidos, total)
+    SELECT COALESCE(semana_id, 0), COALESCE(strftime('%Y-%m-%d', data_hora), ''), COUNT(*), COALESCE(SUM(valor_total), 0)
+    FROM pedidos GROUP BY 1, 2
+    """)
+    c.execute("""
+    INSERT INTO rollup_marmitas (semana_id, cliente_id, marmita_id, quantidade)
+    SELECT COALESCE(p.semana_id, 0), COALESCE(p.cliente_id, 0), COALESCE(ip.marmita_id, 0), SUM(COALESCE(ip.quantidade, 0))
+    FROM itens_pedido ip JOIN pedidos p ON ip.pedido_id = p.id
+    GROUP BY 1, 2, 3
+    HAVING SUM(COALESCE(ip.quantidade, 0)) > 0
+    """)
+
+def _recalcular_rollup_producao(c):
+    # Separado de _recalcular_rollups: a tabela só existe a partir da migração 8
+    c.execute("DELETE FROM rollup_producao")
+    c.execute("""
+    INSERT INTO rollup_producao (semana_id, marmita_id, status_entrega, quantidade)
+    SELECT COALESCE(p.semana_id, 0), COALESCE(ip.marmita_id, 0), COALESCE(p.status_entrega, ''), SUM(COALESCE(ip.quantidade, 0))
+    FROM itens_pedido ip JOIN pedidos p ON ip.pedido_id = p.id
+    GROUP BY 1, 2, 3
+    HAVING SUM(COALESCE(ip.quantidade, 0)) > 0
+    """)
+
+def refresh_rollups(conn):
+    """Reconstrói as tabelas de rollup do zero (normalmente desnecessário: os triggers as mantêm)."""
+    if not conn: return False
+    def _recalcular(c):
+        _recalcular_rollups(c)
+        _recalcular_rollup_producao(c)
+    try:
+        _write(_recalcular, "pedidos", "itens_pedido")
+        return True
+    except sqlite3.Error as e:
+        print(f"Error refreshing rollups: {e}")
+        st.error(f"Erro ao recalcular os rollups de vendas: {e}")
+        return False
+
+@cached_query("pedidos", "clientes")
+def get_vendas_por_cliente(conn, semana_id_filter=None):
+    if not conn: return pd.DataFrame()
+    sql = """
+    SELECT COALESCE(c.nome, 'Cliente Excluído') as Cliente, SUM(r.pedidos) as "Pedidos", SUM(r.total) as "Total Gasto ($)"
+    FROM rollup_vendas_cliente r
+    LEFT JOIN clientes c ON r.cliente_id = c.id
     """
     params = []
     if semana_id_filter:
-        sql += " WHERE p.semana_id = ?"
+        sql += " WHERE r.semana_id = ?"
         params.append(semana_id_filter)
 
-    sql += " GROUP BY p.cliente_id ORDER BY \"Total Gasto ($)\" DESC"
+    sql += " GROUP BY r.cliente_id ORDER BY \"Total Gasto ($)\" DESC"
 
     try:
         df = pd.read_sql_query(sql, conn, params=params)
         return df
     except Exception as e:
-        st.error(f"Erro ao gerar relatório de vendas por cliente: {e}")
+        _falha_leitura(f"Erro ao gerar relatório de vendas por cliente: {e}")
         return pd.DataFrame()
 
+@cached_query("pedidos", "itens_pedido", "marmitas")
 def get_marmitas_por_cliente(conn, cliente_id, semana_id_filter=None):
     if not conn: return pd.DataFrame()
     sql = """
-    SELECT COALESCE(m.nome, 'Marmita Excluída') as Marmita, SUM(ip.quantidade) as Quantidade
-    FROM itens_pedido ip
-    JOIN pedidos p ON ip.pedido_id = p.id
-    LEFT JOIN marmitas m ON ip.marmita_id = m.id
-    WHERE p.cliente_id = ?
+    SELECT COALESCE(m.nome, 'Marmita Excluída') as Marmita, SUM(r.quantidade) as Quantidade
+    FROM rollup_marmitas r
+    LEFT JOIN marmitas m ON r.marmita_id = m.id
+    WHERE r.cliente_id = ?
     """
     params = [cliente_id]
     if semana_id_filter:
-        sql += " AND p.semana_id = ?"
+        sql += " AND r.semana_id = ?"
         params.append(semana_id_filter)
 
-    sql += " GROUP BY ip.marmita_id ORDER BY Quantidade DESC"
+    sql += " GROUP BY r.marmita_id ORDER BY Quantidade DESC"
 
     try:
         df = pd.read_sql_query(sql, conn, params=params)
         return df
     except Exception as e:
-        st.error(f"Erro ao gerar relatório de marmitas para o cliente: {e}")
+        _falha_leitura(f"Erro ao gerar relatório de marmitas para o cliente: {e}")
         return pd.DataFrame()
 
+@cached_query("pedidos")
 def get_vendas_geral(conn, semana_id_filter=None):
     if not conn: return pd.DataFrame()
     sql = """
     SELECT
-        strftime('%Y-%m-%d', p.data_hora) as Dia,
-        COUNT(p.id) as Pedidos,
-        SUM(p.valor_total) as "Vendas ($)"
-    FROM pedidos p
+        NULLIF(r.dia, '') as Dia,
+        SUM(r.pedidos) as Pedidos,
+        SUM(r.total) as "Vendas ($)"
+    FROM rollup_vendas_dia r
     """
     params = []
     if semana_id_filter:
-        sql += " WHERE p.semana_id = ?"
+        sql += " WHERE r.semana_id = ?"
         params.append(semana_id_filter)
 
-    sql += " GROUP BY Dia ORDER BY Dia DESC"
+    sql += " GROUP BY r.dia ORDER BY Dia DESC"
 
     try:
         df = pd.read_sql_query(sql, conn, params=params)
         return df
     except Exception as e:
-        st.error(f"Erro ao gerar relatório geral de vendas: {e}")
+        _falha_leitura(f"Erro ao gerar relatório geral de vendas: {e}")
         return pd.DataFrame()
 
+@cached_query("pedidos", "itens_pedido", "marmitas")
 def get_marmitas_mais_vendidas(conn, semana_id_filter=None):
     if not conn: return pd.DataFrame()
     sql = """
-    SELECT COALESCE(m.nome, 'Marmita Excluída') as Marmita, SUM(ip.quantidade) as Quantidade
-    FROM itens_pedido ip
+    SELECT COALESCE(m.nome, 'Marmita Excluída') as Marmita, SUM(r.quantidade) as Quantidade
+    FROM rollup_marmitas r
+    LEFT JOIN marmitas m ON r.marmita_id = m.id
     """
     params = []
     if semana_id_filter:
-        sql += " JOIN pedidos p ON ip.pedido_id = p.id WHERE p.semana_id = ?"
+        sql += " WHERE r.semana_id = ?"
         params.append(semana_id_filter)
 
-    sql += " LEFT JOIN marmitas m ON ip.marmita_id = m.id GROUP BY ip.marmita_id ORDER BY Quantidade DESC"
+    sql += " GROUP BY r.marmita_id ORDER BY Quantidade DESC"
 
     try:
-        # Need to adjust the join if filter is not applied
-        if not semana_id_filter:
-             sql = sql.replace("LEFT JOIN marmitas", " JOIN pedidos p ON ip.pedido_id = p.id LEFT JOIN marmitas")
-
         df = pd.read_sql_query(sql, conn, params=params)
         return df
     except Exception as e:
-        st.error(f"Erro ao gerar relatório de marmitas mais vendidas: {e}")
+        _falha_leitura(f"Erro ao gerar relatório de marmitas mais vendidas: {e}")
+        return pd.DataFrame()
+
+# --- Plano de Produção (lê rollup_producao, mantido por triggers) ---
+
+# Status cujas porções ainda precisam ser preparadas pela cozinha
+STATUS_A_PRODUZIR = ("Pendente", "Em Preparo")
+_STATUS_PRODUCAO = [s for s in STATUS_ENTREGA if s != "Cancelado"]
+
+@cached_query("pedidos", "itens_pedido", "marmitas")
+def get_plano_producao(conn, semana_id):
+    """Porções por marmita na semana, por status de entrega, sem os pedidos cancelados.
+
+    Uma única leitura do intervalo semana_id da chave primária de rollup_producao (poucas
+    linhas por semana, independente do número de pedidos). Colunas: Marmita, Categoria,
+    uma por status de entrega, "A Produzir" (Pendente + Em Preparo) e Total.
+    """
+    if not conn: return pd.DataFrame()
+    colunas = ",\n        ".join(
+        f'SUM(CASE WHEN r.status_entrega = ? THEN r.quantidade ELSE 0 END) as "{status}"' for status in _STATUS_PRODUCAO
+    )
+    sql = f"""
+    SELECT
+        COALESCE(m.nome, 'Marmita Excluída') as Marmita,
+        m.categoria as Categoria,
+        {colunas},
+        SUM(CASE WHEN r.status_entrega IN ({", ".join("?" * len(STATUS_A_PRODUZIR))}) THEN r.quantidade ELSE 0 END) as "A Produzir",
+        SUM(r.quantidade) as Total
+    FROM rollup_producao r
+    LEFT JOIN marmitas m ON r.marmita_id = m.id
+    WHERE r.semana_id = ? AND r.status_entrega <> 'Cancelado'
+    GROUP BY r.marmita_id
+    HAVING Total > 0
+    ORDER BY "A Produzir" DESC, Total DESC, Marmita
+    """
+    params = [*_STATUS_PRODUCAO, *STATUS_A_PRODUZIR, semana_id or 0]
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    except Exception as e:
+        _falha_leitura(f"Erro ao gerar o plano de produção: {e}")
         return pd.DataFrame()
 
+if __name__ == "__main__":
+    # python database.py  -> aplica migrações e verifica os planos das consultas de relatório
+    conn = get_connection()
+    init_db(conn)
+    print(f"Schema version: {get_schema_version(conn)}")
+    for nome, detalhes in assert_query_plans_use_indexes(conn).items():
+        print(f"{nome}:")
+        for d in detalhes:
+            print(f"    {d}")
+    print("All report queries use indexes.")
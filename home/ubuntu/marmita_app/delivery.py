@@ -0,0 +1,317 @@
+import argparse
+import csv
+import io
+import math
+import random
+import re
+import time
+from collections import defaultdict
+
+import database as db
+
+# Limites padrão de um lote (uma viagem de um entregador); None = sem limite de marmitas
+LOTE_MAX_PARADAS = 25
+LOTE_MAX_MARMITAS = None
+# Rodadas máximas de melhoria 2-opt por rota
+ROTA_MAX_RODADAS_2OPT = 50
+
+# Nomes de coluna aceitos no arquivo de ZIPs (CSV/TSV). O Gazetteer de ZCTAs do Census
+# (2020_Gaz_zcta_national.txt) usa GEOID, INTPTLAT e INTPTLONG.
+_COLUNAS_ZIP = ("zip", "zipcode", "zip_code", "zcta", "zcta5", "geoid", "postal_code")
+_COLUNAS_LAT = ("latitude", "lat", "intptlat")
+_COLUNAS_LON = ("longitude", "lon", "lng", "long", "intptlong")
+
+_RE_ZIP = re.compile(r"\b(\d{5})(?:-\d{4})?\b")
+_RE_ESTADO_ZIP = re.compile(r"\b([A-Za-z]{2})\.?,?\s+\d{5}(?:-\d{4})?\s*$")
+
+# --- Endereços e Geocodificação (offline, pela tabela de centroides de ZIP) ---
+
+def parse_endereco(endereco):
+    """Separa um endereço americano em linha 1 (número e rua), cidade, estado e ZIP.
+
+    Ex.: "123 Main St, Apt 4, Orlando, FL 32801" -> {"logradouro": "123 Main St, Apt 4",
+    "cidade": "Orlando", "estado": "FL", "zip": "32801"}. Campos não encontrados ficam None.
+    """
+    resultado = {"logradouro": None, "cidade": None, "estado": None, "zip": None}
+    texto = " ".join((endereco or "").split())
+    if not texto:
+        return resultado
+    zips = _RE_ZIP.findall(texto)
+    if zips:
+        # O último número de 5 dígitos é o ZIP (o primeiro costuma ser o número da casa)
+        resultado["zip"] = zips[-1]
+    estado = _RE_ESTADO_ZIP.search(texto)
+    if estado:
+        resultado["estado"] = estado.group(1).upper()
+        texto = texto[:estado.start()]
+    elif zips:
+        texto = texto[:texto.rfind(zips[-1])]
+    partes = [p.strip() for p in texto.split(",") if p.strip()]
+    if len(partes) > 1 and (estado or zips):
+        resultado["cidade"] = partes.pop()
+    resultado["logradouro"] = ", ".join(partes) or None
+    return resultado
+
+def _coluna(cabecalho, nomes):
+    for i, nome in enumerate(cabecalho):
+        if nome.strip().lower() in nomes:
+            return i
+    return None
+
+def ler_zip_centroides(arquivo):
+    """Lê (zip, latitude, longitude) de um CSV/TSV com cabeçalho (caminho ou arquivo aberto em texto/bytes)."""
+    if isinstance(arquivo, str):
+        with open(arquivo, encoding="utf-8-sig", newline="") as f:
+            return ler_zip_centroides(f)
+    conteudo = arquivo.read()
+    if isinstance(conteudo, bytes):
+        conteudo = conteudo.decode("utf-8-sig")
+    primeira_linha = conteudo.split("\n", 1)[0]
+    delimitador = "\t" if "\t" in primeira_linha else ("|" if "|" in primeira_linha else ",")
+    leitor = csv.reader(io.StringIO(conteudo), delimiter=delimitador)
+    cabecalho = next(leitor, [])
+    i_zip, i_lat, i_lon = (_coluna(cabecalho, nomes) for nomes in (_COLUNAS_ZIP, _COLUNAS_LAT, _COLUNAS_LON))
+    if None in (i_zip, i_lat, i_lon):
+        raise ValueError("O arquivo precisa das colunas de ZIP, latitude e longitude "
+                         f"(ex.: zip,latitude,longitude). Cabeçalho encontrado: {cabecalho}")
+    linhas = []
+    for registro in leitor:
+        try:
+            zip_ = registro[i_zip].strip().zfill(5)
+            linhas.append((zip_, float(registro[i_lat]), float(registro[i_lon])))
+        except (IndexError, ValueError):
+            continue # linha vazia ou malformada
+    return linhas
+
+def carregar_zip_centroides(conn, arquivo):
+    """Carrega o arquivo de centroides de ZIP no banco. Retorna o número de ZIPs gravados."""
+    return db.save_zip_centroides(conn, ler_zip_centroides(arquivo))
+
+def geocodificar_clientes(conn, cliente_ids=None):
+    """Calcula e guarda em cache (clientes_geo) as coordenadas dos clientes ainda sem cache.
+
+    A coordenada é o centroide do ZIP do endereço. Retorna {"geocodificados", "sem_zip",
+    "zip_desconhecido"} com as contagens desta execução.
+    """
+    pendentes = db.get_clientes_sem_geo(conn, cliente_ids)
+    contagem = {"geocodificados": 0, "sem_zip": 0, "zip_desconhecido": 0}
+    if not pendentes:
+        return contagem
+    zips = {cliente_id: parse_endereco(endereco)["zip"] for cliente_id, endereco in pendentes}
+    centroides = db.get_zip_centroides(conn, [z for z in zips.values() if z])
+    linhas = []
+    for cliente_id, endereco in pendentes:
+        zip_ = zips[cliente_id]
+        lat, lon = centroides.get(zip_, (None, None))
+        if lat is not None:
+            contagem["geocodificados"] += 1
+        elif zip_:
+            contagem["zip_desconhecido"] += 1
+        else:
+            contagem["sem_zip"] += 1
+        linhas.append((cliente_id, endereco, zip_, lat, lon))
+    db.save_clientes_geo(conn, linhas)
+    return contagem
+
+# --- Montagem de Lotes de Entrega ---
+
+def _projetar(pontos, origem):
+    # Projeção equiretangular em km em torno da origem: precisa o bastante na escala de uma cidade
+    lat0, lon0 = origem
+    kx = 111.320 * math.cos(math.radians(lat0))
+    return [((lon - lon0) * kx, (lat - lat0) * 110.574) for lat, lon in pontos]
+
+class _Grade:
+    """Grade uniforme em memória para achar o ponto restante mais próximo sem percorrer todos."""
+
+    def __init__(self, xy, celula):
+        self.xy = xy
+        self.celula = celula
+        self.celulas = defaultdict(set)
+        for i, (x, y) in enumerate(xy):
+            self.celulas[self._chave(x, y)].add(i)
+        # Anéis necessários para cobrir a grade inteira a partir de qualquer ponto dentro dela
+        kxs, kys = [k[0] for k in self.celulas], [k[1] for k in self.celulas]
+        self.max_anel = max(max(kxs) - min(kxs), max(kys) - min(kys)) + 1
+
+    def _chave(self, x, y):
+        return (math.floor(x / self.celula), math.floor(y / self.celula))
+
+    def remover(self, i):
+        chave = self._chave(*self.xy[i])
+        self.celulas[chave].discard(i)
+        if not self.celulas[chave]:
+            del self.celulas[chave]
+
+    def mais_proximo(self, x, y):
+        cx, cy = self._chave(x, y)
+        melhor, melhor_d2 = None, math.inf
+        for anel in range(self.max_anel + 1):
+            if not self.celulas:
+                return None
+            # Nenhum ponto fora dos anéis já vistos pode estar a menos de (anel - 1) células
+            if melhor is not None and math.sqrt(melhor_d2) <= (anel - 1) * self.celula:
+                break
+            for chave in _anel(cx, cy, anel):
+                for i in self.celulas.get(chave, ()):
+                    px, py = self.xy[i]
+                    d2 = (px - x) ** 2 + (py - y) ** 2
+                    if d2 < melhor_d2:
+                        melhor, melhor_d2 = i, d2
+        return melhor
+
+def _anel(cx, cy, r):
+    if r == 0:
+        yield (cx, cy)
+        return
+    for dx in range(-r, r + 1):
+        yield (cx + dx, cy - r)
+        yield (cx + dx, cy + r)
+    for dy in range(-r + 1, r):
+        yield (cx - r, cy + dy)
+        yield (cx + r, cy + dy)
+
+def _distancia(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+def _ordenar_rota(indices, xy, inicio):
+    """Vizinho mais próximo a partir de `inicio` seguido de 2-opt (rota aberta, sem volta)."""
+    restantes = set(indices)
+    rota = []
+    atual = inicio
+    while restantes:
+        proximo = min(restantes, key=lambda i: _distancia(atual, xy[i]))
+        rota.append(proximo)
+        restantes.discard(proximo)
+        atual = xy[proximo]
+    pontos = [inicio] + [xy[i] for i in rota]
+    for _ in range(ROTA_MAX_RODADAS_2OPT):
+        melhorou = False
+        for i in range(1, len(pontos) - 1):
+            for j in range(i + 1, len(pontos)):
+                # Inverte pontos[i..j]: troca as arestas (i-1, i) e (j, j+1) por (i-1, j) e (i, j+1)
+                antes = _distancia(pontos[i - 1], pontos[i])
+                depois = _distancia(pontos[i - 1], pontos[j])
+                if j + 1 < len(pontos):
+                    antes += _distancia(pontos[j], pontos[j + 1])
+                    depois += _distancia(pontos[i], pontos[j + 1])
+                if depois < antes - 1e-9:
+                    pontos[i:j + 1] = pontos[i:j + 1][::-1]
+                    rota[i - 1:j] = rota[i - 1:j][::-1]
+                    melhorou = True
+        if not melhorou:
+            break
+    distancia = sum(_distancia(pontos[k], pontos[k + 1]) for k in range(len(pontos) - 1))
+    return rota, distancia
+
+def montar_lotes(paradas, max_paradas=LOTE_MAX_PARADAS, max_marmitas=LOTE_MAX_MARMITAS, deposito=None):
+    """Agrupa paradas em lotes de entrega e define a ordem de visita de cada lote.
+
+    paradas: dicts com latitude, longitude e (opcional) marmitas; não são alterados.
+    deposito: (latitude, longitude) de onde os entregadores saem; sem ele, usa o centro das paradas.
+
+    Heurística: a parada restante mais distante do depósito abre um lote, que recebe as
+    paradas mais próximas do seu centro (busca numa grade em memória) até atingir
+    max_paradas ou max_marmitas. Cada lote é ordenado por vizinho mais próximo + 2-opt.
+    Retorna lista de {"paradas": [...] na ordem de visita, "marmitas", "distancia_km"}, com
+    a distância a partir do depósito (rota aberta, em linha reta).
+    """
+    paradas = [p for p in paradas if p.get("latitude") is not None and p.get("longitude") is not None]
+    if not paradas:
+        return []
+    max_paradas = max(1, int(max_paradas or len(paradas)))
+    coordenadas = [(p["latitude"], p["longitude"]) for p in paradas]
+    if deposito is None:
+        deposito = (sum(c[0] for c in coordenadas) / len(coordenadas), sum(c[1] for c in coordenadas) / len(coordenadas))
+    xy = _projetar(coordenadas, deposito)
+    cargas = [p.get("marmitas") or 0 for p in paradas]
+
+    # Células com ~2 paradas em média
+    xs, ys = [p[0] for p in xy], [p[1] for p in xy]
+    area = max((max(xs) - min(xs)) * (max(ys) - min(ys)), 1e-6)
+    grade = _Grade(xy, max(math.sqrt(2 * area / len(xy)), 0.05))
+
+    atribuido = [False] * len(xy)
+    sementes = sorted(range(len(xy)), key=lambda i: -(xy[i][0] ** 2 + xy[i][1] ** 2))
+    lotes = []
+    for semente in sementes:
+        if atribuido[semente]:
+            continue
+        lote = [semente]
+        atribuido[semente] = True
+        grade.remover(semente)
+        carga = cargas[semente]
+        sx, sy = xy[semente]
+        while len(lote) < max_paradas:
+            i = grade.mais_proximo(sx / len(lote), sy / len(lote))
+            if i is None or (max_marmitas and carga + cargas[i] > max_marmitas):
+                break
+            lote.append(i)
+            atribuido[i] = True
+            grade.remover(i)
+            carga += cargas[i]
+            sx += xy[i][0]
+            sy += xy[i][1]
+        rota, distancia = _ordenar_rota(lote, xy, (0.0, 0.0))
+        lotes.append({"paradas": [paradas[i] for i in rota], "marmitas": carga, "distancia_km": distancia})
+    return lotes
+
+# --- Benchmark ---
+
+# Centro (Orlando, FL) das paradas sintéticas do benchmark
+_CENTRO_BENCHMARK = (28.5383, -81.3792)
+
+def paradas_sinteticas(n, centro=_CENTRO_BENCHMARK, raio_km=25.0, seed=42):
+    """n paradas aleatórias em bairros (aglomerados) ao redor do centro, só para benchmark."""
+    rng = random.Random(seed)
+    kx = 111.320 * math.cos(math.radians(centro[0]))
+    bairros = [(rng.uniform(-raio_km, raio_km), rng.uniform(-raio_km, raio_km)) for _ in range(max(1, n // 100))]
+    paradas = []
+    for i in range(n):
+        bx, by = rng.choice(bairros)
+        x, y = rng.gauss(bx, 2.0), rng.gauss(by, 2.0)
+        paradas.append({"cliente_id": i + 1, "latitude": centro[0] + y / 110.574, "longitude": centro[1] + x / kx,
+                        "marmitas": rng.randint(1, 6)})
+    return paradas
+
+def benchmark_lotes(n=5000, max_paradas=LOTE_MAX_PARADAS, max_marmitas=LOTE_MAX_MARMITAS, seed=42):
+    """Mede montar_lotes com n paradas sintéticas e compara com lotes na ordem de entrada."""
+    paradas = paradas_sinteticas(n, seed=seed)
+    centro = _CENTRO_BENCHMARK
+    inicio = time.perf_counter()
+    lotes = montar_lotes(paradas, max_paradas, max_marmitas, deposito=centro)
+    segundos = time.perf_counter() - inicio
+    # Referência: lotes fatiados na ordem dos pedidos, cada um ordenado com a mesma heurística
+    xy = _projetar([(p["latitude"], p["longitude"]) for p in paradas], centro)
+    ingenuo = sum(_ordenar_rota(list(range(i, min(i + max_paradas, n))), xy, (0.0, 0.0))[1]
+                  for i in range(0, n, max_paradas))
+    total = sum(l["distancia_km"] for l in lotes)
+    return {"paradas": n, "lotes": len(lotes), "segundos": segundos, "distancia_km": total,
+            "distancia_ordem_entrada_km": ingenuo, "km_por_parada": total / n}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Geocodificação offline e lotes de entrega.")
+    parser.add_argument("--db", default=db.DB_FILE, help="caminho do banco SQLite")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    zips = sub.add_parser("carregar-zips", help="carrega um CSV/TSV de centroides de ZIP (ex.: Gazetteer de ZCTAs do Census)")
+    zips.add_argument("arquivo")
+    sub.add_parser("geocodificar", help="geocodifica os clientes ainda sem coordenadas")
+    bench = sub.add_parser("benchmark", help="mede a montagem de lotes com paradas sintéticas")
+    bench.add_argument("--paradas", type=int, default=5000)
+    bench.add_argument("--max-paradas", type=int, default=LOTE_MAX_PARADAS)
+    bench.add_argument("--max-marmitas", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.comando == "benchmark":
+        r = benchmark_lotes(args.paradas, args.max_paradas, args.max_marmitas)
+        print(f"{r['paradas']} stops -> {r['lotes']} batches in {r['segundos'] * 1000:.0f} ms; "
+              f"{r['distancia_km']:.0f} km total ({r['km_por_parada']:.2f} km/stop) vs "
+              f"{r['distancia_ordem_entrada_km']:.0f} km batching in input order.")
+    else:
+        db.use_database(args.db)
+        conn = db.get_connection()
+        db.init_db(conn)
+        if args.comando == "carregar-zips":
+            print(f"{carregar_zip_centroides(conn, args.arquivo)} ZIP centroids loaded.")
+        elif args.comando == "geocodificar":
+            print(geocodificar_clientes(conn))
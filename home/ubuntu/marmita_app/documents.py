@@ -0,0 +1,344 @@
+import argparse
+import glob
+import os
+import random
+import tempfile
+import time
+import unicodedata
+import zlib
+
+import streamlit as st
+
+import database as db
+import export
+import jobs
+
+# Comandas da cozinha e etiquetas de endereço em PDF, geradas sem bibliotecas externas:
+# o PDF usa as fontes padrão Helvetica (sem embutir fontes) e cada página é um fluxo de
+# texto comprimido. As páginas são montadas na thread do job (jobs.py) e gravadas em arquivo.
+
+# Página Letter, em pontos (1/72 pol.)
+PAGINA_LARGURA, PAGINA_ALTURA = 612, 792
+# Comandas: 2 x 2 por página (um quarto de página cada)
+COMANDAS_COLUNAS, COMANDAS_LINHAS = 2, 2
+# Etiquetas no padrão Avery 5160: 3 x 10 por página, 2,625" x 1"
+ETIQUETAS_COLUNAS, ETIQUETAS_LINHAS = 3, 10
+ETIQUETA_LARGURA, ETIQUETA_ALTURA = 189, 72
+ETIQUETA_MARGEM_ESQUERDA, ETIQUETA_MARGEM_TOPO, ETIQUETA_ESPACO = 13.5, 36, 9
+
+# Páginas renderizadas entre duas atualizações do progresso do job
+PAGINAS_POR_LOTE = 40
+DOCUMENT_DIR = os.path.join(tempfile.gettempdir(), "marmita_documentos")
+# PDFs gerados mais antigos que isso são apagados na próxima geração
+DOCUMENT_MAX_AGE = 3600
+
+# Larguras (milésimos do corpo) dos caracteres 32..126 das fontes padrão do PDF
+_LARGURAS = {
+    "F1": [278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556, 556, 556, 556,
+           556, 556, 556, 556, 278, 278, 584, 584, 584, 556, 1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667,
+           556, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556, 333, 556,
+           556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556, 556, 556, 333, 500, 278, 556, 500, 722,
+           500, 500, 500, 334, 260, 334, 584],
+    "F2": [278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278, 556, 556, 556, 556, 556, 556,
+           556, 556, 556, 556, 333, 333, 584, 584, 584, 611, 975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722,
+           611, 833, 722, 778, 667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556, 333, 556,
+           611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611, 611, 611, 389, 556, 333, 611, 556, 778,
+           556, 556, 500, 389, 280, 389, 584],
+}
+_FONTES = {"F1": "Helvetica", "F2": "Helvetica-Bold"}
+
+# --- Texto ---
+
+def _largura_caractere(c, fonte):
+    codigo = ord(c)
+    if 32 <= codigo <= 126:
+        return _LARGURAS[fonte][codigo - 32]
+    base = unicodedata.normalize("NFD", c)[0] # letras acentuadas: largura da letra sem acento
+    if 32 <= ord(base) <= 126:
+        return _LARGURAS[fonte][ord(base) - 32]
+    return 556
+
+def largura_texto(texto, fonte, tamanho):
+    """Largura do texto em pontos."""
+    return sum(_largura_caractere(c, fonte) for c in texto) * tamanho / 1000
+
+def _cortar(texto, fonte, tamanho, largura):
+    # Corta o texto com reticências para caber na largura
+    texto = " ".join(str(texto or "").split())
+    if largura_texto(texto, fonte, tamanho) <= largura:
+        return texto
+    limite = largura - largura_texto("…", fonte, tamanho)
+    total = 0.0
+    for i, c in enumerate(texto):
+        total += _largura_caractere(c, fonte) * tamanho / 1000
+        if total > limite:
+            return texto[:i].rstrip() + "…"
+    return texto
+
+def _literal(texto):
+    # String PDF em WinAnsiEncoding (cp1252 cobre os acentos do português)
+    dados = texto.encode("cp1252", errors="replace")
+    return b"(" + dados.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+class _Pagina:
+    """Comandos de desenho de uma página."""
+
+    def __init__(self):
+        self.partes = []
+
+    def texto(self, x, y, texto, tamanho=9, fonte="F1", largura=None):
+        if largura is not None:
+            texto = _cortar(texto, fonte, tamanho, largura)
+        if texto:
+            self.partes.append(b"BT /%s %g Tf %.2f %.2f Td %s Tj ET" % (fonte.encode(), tamanho, x, y, _literal(texto)))
+
+    def linha(self, x1, y1, x2, y2, tracejada=False):
+        self.partes.append(b"%s %.2f %.2f m %.2f %.2f l S" % (b"[4 3] 0 d" if tracejada else b"[] 0 d", x1, y1, x2, y2))
+
+    def comprimida(self):
+        return zlib.compress(b"\n".join(self.partes), 6)
+
+# --- Layout ---
+
+def _comanda(pagina, x, y_topo, largura, altura, pedido):
+    # pedido: (id, data_hora, nome, telefone, endereco, complemento, forma_pagamento, status_pagamento, valor_total, itens)
+    pedido_id, data_hora, nome, telefone, endereco, complemento, forma, status_pgto, valor, itens = pedido
+    margem = 18
+    x += margem
+    largura -= 2 * margem
+    y = y_topo - margem - 14
+    pagina.texto(x, y, f"Pedido #{pedido_id}", 16, "F2")
+    pagina.texto(x, y - 14, f"{data_hora or ''}  ·  {forma or ''}  ·  Pagamento: {status_pgto or ''}", 8, largura=largura)
+    y -= 32
+    pagina.texto(x, y, nome, 11, "F2", largura)
+    for detalhe in (endereco, complemento, telefone):
+        if detalhe:
+            y -= 11
+            pagina.texto(x, y, detalhe, 8, largura=largura)
+    y -= 8
+    pagina.linha(x, y, x + largura, y)
+    y -= 16
+
+    base = y_topo - altura + margem + 18 # espaço reservado para o total
+    cabem = max(1, int((y - base) // 15) + 1)
+    visiveis = itens if len(itens) <= cabem else itens[:cabem - 1]
+    for quantidade, marmita in visiveis:
+        pagina.texto(x, y, f"{quantidade}x", 12, "F2")
+        pagina.texto(x + 32, y, marmita, 12, largura=largura - 32)
+        y -= 15
+    if len(visiveis) < len(itens):
+        pagina.texto(x, y, f"+ {len(itens) - len(visiveis)} itens (ver o pedido no sistema)", 9)
+
+    pagina.linha(x, base + 12, x + largura, base + 12)
+    pagina.texto(x, base, f"Total: {sum(q for q, _ in itens)} marmitas", 11, "F2")
+    valor_texto = f"${valor or 0:.2f}"
+    pagina.texto(x + largura - largura_texto(valor_texto, "F2", 11), base, valor_texto, 11, "F2")
+
+def _pagina_comandas(pedidos):
+    pagina = _Pagina()
+    largura = PAGINA_LARGURA / COMANDAS_COLUNAS
+    altura = PAGINA_ALTURA / COMANDAS_LINHAS
+    for n, pedido in enumerate(pedidos):
+        linha, coluna = divmod(n, COMANDAS_COLUNAS)
+        _comanda(pagina, coluna * largura, PAGINA_ALTURA - linha * altura, largura, altura, pedido)
+    # Linhas de corte
+    for coluna in range(1, COMANDAS_COLUNAS):
+        pagina.linha(coluna * largura, 0, coluna * largura, PAGINA_ALTURA, tracejada=True)
+    for linha in range(1, COMANDAS_LINHAS):
+        pagina.linha(0, linha * altura, PAGINA_LARGURA, linha * altura, tracejada=True)
+    return pagina
+
+def _pagina_etiquetas(etiquetas):
+    # etiqueta: (id, nome, endereco, complemento, telefone, marmitas)
+    pagina = _Pagina()
+    margem = 8
+    largura = ETIQUETA_LARGURA - 2 * margem
+    for n, (pedido_id, nome, endereco, complemento, telefone, marmitas) in enumerate(etiquetas):
+        linha, coluna = divmod(n, ETIQUETAS_COLUNAS)
+        x = ETIQUETA_MARGEM_ESQUERDA + coluna * (ETIQUETA_LARGURA + ETIQUETA_ESPACO) + margem
+        y = PAGINA_ALTURA - ETIQUETA_MARGEM_TOPO - linha * ETIQUETA_ALTURA - margem - 9
+        pagina.texto(x, y, nome, 10, "F2", largura)
+        for detalhe in (endereco, complemento, telefone):
+            if detalhe:
+                y -= 11
+                pagina.texto(x, y, detalhe, 8, largura=largura)
+        pagina.texto(x, PAGINA_ALTURA - ETIQUETA_MARGEM_TOPO - (linha + 1) * ETIQUETA_ALTURA + margem,
+                     f"Pedido #{pedido_id}  ·  {marmitas} marmitas", 7)
+    return pagina
+
+_LAYOUTS = {"comandas": (_pagina_comandas, COMANDAS_COLUNAS * COMANDAS_LINHAS),
+            "etiquetas": (_pagina_etiquetas, ETIQUETAS_COLUNAS * ETIQUETAS_LINHAS)}
+
+# --- Arquivo PDF ---
+
+def gravar_pdf(fluxos, destino):
+    """Grava um PDF com uma página Letter por fluxo de conteúdo (já comprimido com zlib)."""
+    offsets = []
+    with open(destino, "wb") as f:
+        def objeto(conteudo):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % len(offsets) + conteudo + b"\nendobj\n")
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        objeto(b"<< /Type /Catalog /Pages 2 0 R >>")
+        kids = b" ".join(b"%d 0 R" % (5 + 2 * i) for i in range(len(fluxos)))
+        objeto(b"<< /Type /Pages /Kids [%s] /Count %d /MediaBox [0 0 %d %d] >>" % (kids, len(fluxos), PAGINA_LARGURA, PAGINA_ALTURA))
+        for fonte in ("F1", "F2"):
+            objeto(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % _FONTES[fonte].encode())
+        for i, fluxo in enumerate(fluxos):
+            objeto(b"<< /Type /Page /Parent 2 0 R /Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>" % (6 + 2 * i))
+            objeto(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(fluxo) + fluxo + b"\nendstream")
+        inicio_xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(offsets) + 1))
+        f.write(b"".join(b"%010d 00000 n \n" % o for o in offsets))
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(offsets) + 1, inicio_xref))
+
+def renderizar_paginas(paginas, progresso=None):
+    """Renderiza [(layout, registros)] em fluxos comprimidos, na mesma ordem, no processo do app."""
+    fluxos = []
+    for inicio in range(0, len(paginas), PAGINAS_POR_LOTE):
+        fluxos.extend(_LAYOUTS[layout][0](registros).comprimida() for layout, registros in paginas[inicio:inicio + PAGINAS_POR_LOTE])
+        if progresso:
+            progresso(len(fluxos) / len(paginas))
+    return fluxos
+
+# --- Dados ---
+
+def montar_paginas(pedidos, itens, tipos=("comandas", "etiquetas")):
+    """Distribui os pedidos nas páginas de cada tipo de documento.
+
+    pedidos: dicts de db.get_pedidos_impressao; itens: resultado de db.get_itens_por_pedidos.
+    """
+    comandas, etiquetas = [], []
+    for p in pedidos:
+        itens_pedido = [(quantidade, nome) for quantidade, nome, _ in db.itens_do_pedido(itens, p["id"])]
+        comandas.append((p["id"], p["data_hora"], p["nome"], p["telefone"], p["endereco"], p["complemento"],
+                         p["forma_pagamento"], p["status_pagamento"], p["valor_total"], itens_pedido))
+        etiquetas.append((p["id"], p["nome"], p["endereco"], p["complemento"], p["telefone"],
+                          sum(q for q, _ in itens_pedido)))
+    paginas = []
+    for tipo, registros in (("comandas", comandas), ("etiquetas", etiquetas)):
+        if tipo in tipos:
+            por_pagina = _LAYOUTS[tipo][1]
+            paginas.extend((tipo, registros[i:i + por_pagina]) for i in range(0, len(registros), por_pagina))
+    return paginas
+
+def _limpar_documentos_antigos():
+    limite = time.time() - DOCUMENT_MAX_AGE
+    for caminho in glob.glob(os.path.join(DOCUMENT_DIR, "*.pdf")):
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+def gerar_documentos(conn, semana_id, tipos=("comandas", "etiquetas"), status_entrega=db.STATUS_A_PRODUZIR,
+                     destino=None, progresso=None):
+    """PDF com comandas e/ou etiquetas dos pedidos da semana nos status informados.
+
+    Os dados vêm de duas consultas (pedidos com clientes; itens de todos os pedidos).
+    Retorna dict com caminho, pedidos, paginas e segundos; caminho é None sem pedidos.
+    """
+    inicio = time.perf_counter()
+    pedidos = db.get_pedidos_impressao(conn, semana_id, tuple(status_entrega))
+    if not pedidos:
+        return {"caminho": None, "pedidos": 0, "paginas": 0, "segundos": time.perf_counter() - inicio}
+    itens = db.get_itens_por_pedidos(conn, tuple(p["id"] for p in pedidos))
+    paginas = montar_paginas(pedidos, itens, tipos)
+    fluxos = renderizar_paginas(paginas, progresso)
+    if destino is None:
+        os.makedirs(DOCUMENT_DIR, exist_ok=True)
+        _limpar_documentos_antigos()
+        fd, destino = tempfile.mkstemp(prefix=f"documentos_semana{semana_id}_", suffix=".pdf", dir=DOCUMENT_DIR)
+        os.close(fd)
+    gravar_pdf(fluxos, destino)
+    return {"caminho": destino, "pedidos": len(pedidos), "paginas": len(fluxos), "segundos": time.perf_counter() - inicio}
+
+@jobs.tarefa("documentos", "Comandas e etiquetas")
+def _documentos_job(conn, job, semana_id, tipos=("comandas", "etiquetas")):
+    job.progresso(None, "Lendo os pedidos")
+    return gerar_documentos(conn, semana_id, tuple(tipos),
+                            progresso=lambda fracao: job.progresso(fracao, "Gerando as páginas"))
+
+def botao_documentos(semana_id, key="documentos"):
+    """Escolha dos documentos + geração num job em segundo plano + botão de download do PDF."""
+    col_tipos, col_botao = st.columns([3, 1])
+    tipos = col_tipos.multiselect("Documentos:", options=["comandas", "etiquetas"], default=["comandas", "etiquetas"],
+                                  format_func={"comandas": "Comandas da cozinha", "etiquetas": "Etiquetas de endereço"}.get,
+                                  key=f"{key}_tipos")
+    estado = f"{key}_job"
+    if col_botao.button("Gerar PDF", disabled=not tipos, key=f"{key}_gerar", width="stretch"):
+        try:
+            job_id = jobs.submit_job("documentos", {"semana_id": semana_id, "tipos": tipos}, usar_cache=False,
+                                     criado_por=st.session_state.get("username"))
+            st.session_state[estado] = (job_id, semana_id, tuple(tipos))
+        except (RuntimeError, ValueError) as e:
+            st.error(f"Erro ao gerar os documentos: {e}")
+
+    pendente = st.session_state.get(estado)
+    if not pendente or pendente[1:] != (semana_id, tuple(tipos)):
+        return
+    status = jobs.painel_job(pendente[0], key=key)
+    if not status or status["status"] != "concluido":
+        return
+    resultado = jobs.get_job_result(pendente[0])
+    if not resultado or not resultado["caminho"]:
+        st.info("Nenhum pedido Pendente ou Em Preparo nesta semana.")
+        return
+    if not os.path.exists(resultado["caminho"]):
+        st.info("O PDF gerado expirou. Clique em Gerar PDF novamente.")
+        return
+    st.caption(f"{resultado['pedidos']} pedidos, {resultado['paginas']} páginas em {resultado['segundos']:.2f}s.")
+    export.botao_download("⬇️ Baixar PDF", resultado["caminho"], f"comandas_etiquetas_semana_{semana_id}.pdf",
+                          "application/pdf", key=f"{key}_download")
+
+# --- Benchmark ---
+
+def pedidos_sinteticos(n=2000, seed=42):
+    """n pedidos aleatórios (com itens) no formato de montar_paginas, só para benchmark."""
+    rng = random.Random(seed)
+    marmitas = [f"Marmita {nome} {i}" for i, nome in enumerate(["Frango Grelhado", "Carne de Panela", "Feijoada", "Strogonoff",
+                                                                "Lasanha", "Peixe com Legumes", "Escondidinho"])]
+    pedidos, itens = [], {"pedido_id": [], "quantidade": [], "nome_marmita": [], "preco_unitario": [], "faixas": {}}
+    for pedido_id in range(1, n + 1):
+        pedidos.append({"id": pedido_id, "data_hora": "03/03 12:30", "forma_pagamento": "Pix", "status_pagamento": "Pago",
+                        "valor_total": rng.uniform(10, 200), "nome": f"Cliente Sintético {pedido_id:05d}",
+                        "endereco": f"{rng.randint(1, 9999)} Main Street, Orlando, FL 328{rng.randint(0, 99):02d}",
+                        "complemento": rng.choice([None, "Apt 12", "Casa dos fundos"]), "telefone": f"407555{pedido_id:04d}"})
+        inicio = len(itens["pedido_id"])
+        for marmita in rng.sample(marmitas, rng.randint(1, 5)):
+            for coluna, valor in (("pedido_id", pedido_id), ("quantidade", rng.randint(1, 4)), ("nome_marmita", marmita),
+                                  ("preco_unitario", 12.0)):
+                itens[coluna].append(valor)
+        itens["faixas"][pedido_id] = (inicio, len(itens["pedido_id"]))
+    return pedidos, itens
+
+def benchmark(n=2000):
+    """Tempo para gerar o PDF de n pedidos (comandas + etiquetas)."""
+    pedidos, itens = pedidos_sinteticos(n)
+    inicio = time.perf_counter()
+    paginas = montar_paginas(pedidos, itens)
+    with tempfile.TemporaryDirectory() as pasta:
+        destino = os.path.join(pasta, "documentos.pdf")
+        gravar_pdf(renderizar_paginas(paginas), destino)
+        return {"pedidos": n, "paginas": len(paginas), "segundos": time.perf_counter() - inicio,
+                "bytes": os.path.getsize(destino)}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comandas e etiquetas de entrega em PDF.")
+    parser.add_argument("--db", default=db.DB_FILE, help="caminho do banco SQLite")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    gerar = sub.add_parser("gerar", help="gera o PDF dos pedidos pendentes de uma semana")
+    gerar.add_argument("semana_id", type=int)
+    gerar.add_argument("saida")
+    gerar.add_argument("--tipos", nargs="+", choices=["comandas", "etiquetas"], default=["comandas", "etiquetas"])
+    bench = sub.add_parser("benchmark", help="mede a geração com pedidos sintéticos")
+    bench.add_argument("--pedidos", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.comando == "gerar":
+        db.use_database(args.db)
+        r = gerar_documentos(db.get_connection(), args.semana_id, tuple(args.tipos), destino=args.saida)
+        print(f"{r['pedidos']} orders, {r['paginas']} pages in {r['segundos']:.2f}s -> {r['caminho']}")
+    else:
+        r = benchmark(args.pedidos)
+        print(f"{r['pedidos']} orders  {r['paginas']} pages  {r['segundos'] * 1000:8.1f} ms  {r['bytes'] / 1e6:.2f} MB")
@@ -0,0 +1,244 @@
+import csv
+import glob
+import os
+import secrets
+import tempfile
+import threading
+import time
+
+import streamlit as st
+
+import jobs
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError: # Parquet é opcional
+    pa = None
+    pq = None
+
+# Linhas lidas do cursor por vez: a memória usada não depende do tamanho do histórico
+EXPORT_CHUNK_SIZE = 5000
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "marmita_exports")
+# Arquivos exportados mais antigos que isso são apagados na próxima exportação
+EXPORT_MAX_AGE = 3600
+# Com `streamlit run server.py` os arquivos são baixados pela rota ROTA_DOWNLOAD, lidos do disco em
+# blocos. Sem ela (`streamlit run app.py`), st.download_button carrega o arquivo inteiro na memória
+# do servidor: só até DOWNLOAD_MAX_MB
+ROTA_DOWNLOAD = "/api/download"
+DOWNLOAD_MAX_MB = float(os.environ.get("MARMITA_DOWNLOAD_MAX_MB", "50"))
+# Ligado por server.py ao registrar a rota
+rota_download_ativa = False
+
+# nome -> (rótulo, colunas [(nome, tipo)], SQL, coluna usada no filtro de semana)
+EXPORTACOES = {
+    "pedidos": ("Pedidos", [
+        ("id", "int"), ("data_hora", "str"), ("cliente", "str"), ("telefone", "str"), ("semana", "str"),
+        ("valor_total", "float"), ("forma_pagamento", "str"), ("status_pagamento", "str"), ("status_entrega", "str"),
+    ], """
+    SELECT p.id, CAST(p.data_hora AS TEXT), COALESCE(c.nome, 'Cliente Excluído'), c.telefone,
+           COALESCE(s.nome_semana, 'Semana Excluída'), p.valor_total, p.forma_pagamento,
+           p.status_pagamento, p.status_entrega
+    FROM pedidos p
+    LEFT JOIN clientes c ON p.cliente_id = c.id
+    LEFT JOIN semanas s ON p.semana_id = s.id
+    {where}
+    ORDER BY p.id
+    """, "p.semana_id"),
+    "itens_pedido": ("Itens dos Pedidos", [
+        ("pedido_id", "int"), ("marmita", "str"), ("quantidade", "int"), ("preco_unitario", "float"), ("subtotal", "float"),
+    ], """
+    SELECT ip.pedido_id, COALESCE(m.nome, 'Marmita Excluída'), ip.quantidade, ip.preco_unitario,
+           ip.quantidade * ip.preco_unitario
+    FROM pedidos p
+    JOIN itens_pedido ip ON ip.pedido_id = p.id
+    LEFT JOIN marmitas m ON ip.marmita_id = m.id
+    {where}
+    ORDER BY ip.pedido_id
+    """, "p.semana_id"),
+    "vendas_por_cliente": ("Vendas por Cliente", [
+        ("cliente", "str"), ("pedidos", "int"), ("total_gasto", "float"),
+    ], """
+    SELECT COALESCE(c.nome, 'Cliente Excluído'), SUM(r.pedidos), SUM(r.total)
+    FROM rollup_vendas_cliente r
+    LEFT JOIN clientes c ON r.cliente_id = c.id
+    {where}
+    GROUP BY r.cliente_id ORDER BY SUM(r.total) DESC
+    """, "r.semana_id"),
+    "vendas_por_dia": ("Vendas por Dia", [
+        ("dia", "str"), ("pedidos", "int"), ("vendas", "float"),
+    ], """
+    SELECT NULLIF(r.dia, ''), SUM(r.pedidos), SUM(r.total)
+    FROM rollup_vendas_dia r
+    {where}
+    GROUP BY r.dia ORDER BY r.dia DESC
+    """, "r.semana_id"),
+    "marmitas_mais_vendidas": ("Marmitas Mais Vendidas", [
+        ("marmita", "str"), ("quantidade", "int"),
+    ], """
+    SELECT COALESCE(m.nome, 'Marmita Excluída'), SUM(r.quantidade)
+    FROM rollup_marmitas r
+    LEFT JOIN marmitas m ON r.marmita_id = m.id
+    {where}
+    GROUP BY r.marmita_id ORDER BY SUM(r.quantidade) DESC
+    """, "r.semana_id"),
+}
+
+def parquet_disponivel():
+    return pa is not None
+
+def _consulta(nome, semana_id=None):
+    _, colunas, sql, coluna_semana = EXPORTACOES[nome]
+    if semana_id:
+        return colunas, sql.format(where=f"WHERE {coluna_semana} = ?"), (semana_id,)
+    return colunas, sql.format(where=""), ()
+
+def iter_lotes(conn, nome, semana_id=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Gera lotes de até chunk_size linhas direto do cursor (fetchmany), sem carregar tudo."""
+    _, sql, params = _consulta(nome, semana_id)
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    try:
+        while True:
+            lote = cursor.fetchmany(chunk_size)
+            if not lote:
+                break
+            yield lote
+    finally:
+        cursor.close()
+
+def exportar_csv(conn, nome, destino, semana_id=None, chunk_size=EXPORT_CHUNK_SIZE, progresso=None):
+    """Escreve a exportação em CSV no caminho destino. Retorna o número de linhas.
+
+    progresso(linhas), se informado, é chamado após cada lote gravado.
+    """
+    colunas = EXPORTACOES[nome][1]
+    linhas = 0
+    # utf-8-sig para o Excel reconhecer os acentos
+    with open(destino, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow([col for col, _ in colunas])
+        for lote in iter_lotes(conn, nome, semana_id, chunk_size):
+            writer.writerows(lote)
+            linhas += len(lote)
+            if progresso:
+                progresso(linhas)
+    return linhas
+
+def exportar_parquet(conn, nome, destino, semana_id=None, chunk_size=EXPORT_CHUNK_SIZE, progresso=None):
+    """Escreve a exportação em Parquet (um row group por lote). Requer pyarrow."""
+    if pa is None:
+        raise RuntimeError("Exportação Parquet requer o pacote pyarrow.")
+    colunas = EXPORTACOES[nome][1]
+    tipos = {"int": pa.int64(), "float": pa.float64(), "str": pa.string()}
+    schema = pa.schema([(col, tipos[tipo]) for col, tipo in colunas])
+    linhas = 0
+    with pq.ParquetWriter(destino, schema) as writer:
+        for lote in iter_lotes(conn, nome, semana_id, chunk_size):
+            arrays = [pa.array(valores, type=schema.field(i).type) for i, valores in enumerate(zip(*lote))]
+            writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+            linhas += len(lote)
+            if progresso:
+                progresso(linhas)
+    return linhas
+
+def _limpar_exportacoes_antigas():
+    limite = time.time() - EXPORT_MAX_AGE
+    for caminho in glob.glob(os.path.join(EXPORT_DIR, "*")):
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+# --- Download ---
+
+# Bilhete (parte da URL da rota) -> (caminho, nome do arquivo, mime, expira)
+_downloads = {}
+_downloads_lock = threading.Lock()
+
+def registrar_download(caminho, nome_arquivo, mime):
+    """URL da rota de server.py que serve o arquivo, válida por EXPORT_MAX_AGE."""
+    bilhete = secrets.token_urlsafe(32)
+    agora = time.time()
+    with _downloads_lock:
+        for expirado in [b for b, d in _downloads.items() if d[3] < agora]:
+            del _downloads[expirado]
+        _downloads[bilhete] = (caminho, nome_arquivo, mime, agora + EXPORT_MAX_AGE)
+    return f"{ROTA_DOWNLOAD}/{bilhete}"
+
+def abrir_download(bilhete):
+    """(caminho, nome do arquivo, mime) do bilhete, ou None se não existir, expirou ou o arquivo foi apagado."""
+    with _downloads_lock:
+        download = _downloads.get(bilhete)
+    if download is None or download[3] < time.time() or not os.path.exists(download[0]):
+        return None
+    return download[:3]
+
+def botao_download(rotulo, caminho, nome_arquivo, mime, key):
+    """Botão de download de um arquivo gerado em disco (exportações, PDFs), sem lê-lo para a memória."""
+    if rota_download_ativa:
+        # Um bilhete por arquivo e sessão, não um a cada rerun
+        link = st.session_state.get(f"{key}_link")
+        if not link or link[0] != caminho:
+            link = st.session_state[f"{key}_link"] = (caminho, registrar_download(caminho, nome_arquivo, mime))
+        st.link_button(rotulo, link[1])
+        return
+    tamanho_mb = os.path.getsize(caminho) / (1024 * 1024)
+    if tamanho_mb > DOWNLOAD_MAX_MB:
+        st.warning(f"O arquivo tem {tamanho_mb:.0f} MB, acima do limite de {DOWNLOAD_MAX_MB:.0f} MB para download "
+                   "sem a rota de server.py. Rode o app com `streamlit run server.py` ou filtre por semana.")
+        return
+    with open(caminho, "rb") as f:
+        st.download_button(rotulo, data=f, file_name=nome_arquivo, mime=mime, key=key)
+
+def exportar_para_arquivo(conn, nome, formato="csv", semana_id=None, progresso=None):
+    """Exporta para um arquivo temporário em EXPORT_DIR. Retorna (caminho, linhas, segundos)."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _limpar_exportacoes_antigas()
+    fd, caminho = tempfile.mkstemp(prefix=f"{nome}_", suffix=f".{formato}", dir=EXPORT_DIR)
+    os.close(fd)
+    inicio = time.perf_counter()
+    if formato == "parquet":
+        linhas = exportar_parquet(conn, nome, caminho, semana_id, progresso=progresso)
+    else:
+        linhas = exportar_csv(conn, nome, caminho, semana_id, progresso=progresso)
+    return caminho, linhas, time.perf_counter() - inicio
+
+@jobs.tarefa("exportacao", "Exportação")
+def _exportar_job(conn, job, nome, formato="csv", semana_id=None):
+    job.progresso(None, f"Exportando {EXPORTACOES[nome][0]}")
+    caminho, linhas, segundos = exportar_para_arquivo(
+        conn, nome, formato, semana_id, progresso=lambda n: job.progresso(None, f"{n} linhas exportadas"))
+    return {"caminho": caminho, "linhas": linhas, "segundos": segundos}
+
+def botoes_exportacao(conn, nomes, semana_id=None, key="exportar"):
+    """Seletor de exportação + botão que gera o arquivo num job em segundo plano + botão de download."""
+    formatos = ["csv", "parquet"] if parquet_disponivel() else ["csv"]
+    col1, col2, col3 = st.columns([2, 1, 1])
+    nome = col1.selectbox("Exportar", options=nomes, format_func=lambda n: EXPORTACOES[n][0], key=f"{key}_nome")
+    formato = col2.selectbox("Formato", options=formatos, format_func=str.upper, key=f"{key}_formato")
+    estado = f"{key}_job"
+    if col3.button("Preparar Arquivo", key=f"{key}_preparar"):
+        try:
+            # Cada clique gera um arquivo novo (os antigos são apagados após EXPORT_MAX_AGE)
+            job_id = jobs.submit_job("exportacao", {"nome": nome, "formato": formato, "semana_id": semana_id},
+                                     usar_cache=False, criado_por=st.session_state.get("username"))
+            st.session_state[estado] = (job_id, nome, formato, semana_id)
+        except (RuntimeError, ValueError) as e:
+            st.error(f"Erro ao exportar {EXPORTACOES[nome][0]}: {e}")
+
+    pendente = st.session_state.get(estado)
+    if not pendente or pendente[1:] != (nome, formato, semana_id):
+        return
+    status = jobs.painel_job(pendente[0], key=key)
+    if not status or status["status"] != "concluido":
+        return
+    resultado = jobs.get_job_result(pendente[0])
+    if not resultado or not os.path.exists(resultado["caminho"]):
+        st.info("O arquivo exportado expirou. Clique em Preparar Arquivo novamente.")
+        return
+    st.caption(f"{resultado['linhas']} linhas exportadas em {resultado['segundos']:.2f}s.")
+    mime = "text/csv" if formato == "csv" else "application/octet-stream"
+    botao_download(f"⬇️ Baixar {EXPORTACOES[nome][0]} ({formato.upper()})", resultado["caminho"],
+                   f"{nome}.{formato}", mime, key=f"{key}_download")
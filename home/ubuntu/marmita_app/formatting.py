@@ -0,0 +1,128 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Apresentação das tabelas: o formato fica na configuração das colunas (aplicado pelo
+# navegador), e o DataFrame mantém os tipos numéricos/datas, então a ordenação ao clicar
+# no cabeçalho continua correta e nada é convertido linha a linha em Python.
+
+MOEDA = st.column_config.NumberColumn(format="$%.2f")
+MILISSEGUNDOS = st.column_config.NumberColumn(format="%.2f")
+QUILOMETROS = st.column_config.NumberColumn(format="%.1f km")
+MEGABYTES = st.column_config.NumberColumn(format="%.1f MB")
+PERCENTUAL = st.column_config.ProgressColumn(format="percent", min_value=0.0, max_value=1.0)
+VARIACAO = st.column_config.NumberColumn(format="percent") # 0.1 = +10%, pode ser negativa
+SIM_NAO = st.column_config.CheckboxColumn()
+DATA_HORA = st.column_config.DatetimeColumn(format="DD/MM/YYYY HH:mm")
+
+def _config_por_nome(nome):
+    # Convenções dos rótulos usados nas páginas: "Total ($)", "Média (ms)", "Distância (km)"...
+    if nome.endswith("($)"):
+        return MOEDA
+    if nome.endswith("(ms)"):
+        return MILISSEGUNDOS
+    if nome.endswith("(km)"):
+        return QUILOMETROS
+    if nome.endswith("(MB)"):
+        return MEGABYTES
+    return None
+
+def column_config(df, extras=None):
+    """Configuração de colunas para o DataFrame, a partir do nome e do tipo de cada coluna.
+
+    extras (dict nome -> config ou rótulo) tem prioridade sobre as regras automáticas.
+    """
+    config = {}
+    for nome, tipo in df.dtypes.items():
+        if pd.api.types.is_bool_dtype(tipo):
+            config[nome] = SIM_NAO
+        elif pd.api.types.is_datetime64_any_dtype(tipo):
+            config[nome] = DATA_HORA
+        elif pd.api.types.is_numeric_dtype(tipo) and isinstance(nome, str):
+            formato = _config_por_nome(nome)
+            if formato is not None:
+                config[nome] = formato
+    config.update(extras or {})
+    return config
+
+def tabela(df, colunas=None, **kwargs):
+    """st.dataframe com as convenções do app (sem índice, largura total, colunas formatadas).
+
+    colunas: configurações extras por coluna, como em column_config.
+    """
+    kwargs.setdefault("hide_index", True)
+    kwargs.setdefault("width", "stretch")
+    return st.dataframe(df, column_config=column_config(df, colunas), **kwargs)
+
+def para_datetime(serie):
+    """Converte textos de data/hora do SQLite em datetime64 de uma vez (valores inválidos viram NaT)."""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    return pd.to_datetime(serie, errors="coerce", format="mixed")
+
+# --- Benchmark ---
+
+def _serializar(df):
+    # O que st.dataframe faz a cada rerun: converte o DataFrame em Arrow para o navegador
+    # (módulo interno do Streamlit, importado só aqui, no benchmark)
+    from streamlit import dataframe_util
+    return dataframe_util.convert_pandas_df_to_arrow_bytes(df)
+
+def benchmark(n=100_000, repeticoes=5, seed=42):
+    """Tempo de preparar + serializar tabelas de n linhas: formatação por linha (apply) x tipos nativos."""
+    rng = np.random.default_rng(seed)
+    marmitas = pd.DataFrame({
+        "ID": np.arange(1, n + 1), "Nome": [f"Marmita {i}" for i in range(n)],
+        "Preço ($)": rng.uniform(8, 25, n).round(2), "Disponível": rng.integers(0, 2, n),
+    })
+    pedidos = pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        "data_hora": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86400, n), unit="s"),
+        "valor_total": rng.uniform(10, 200, n).round(2),
+    })
+
+    def marmitas_apply():
+        df = marmitas.copy()
+        df["Disponível"] = df["Disponível"].apply(lambda x: "Sim" if x else "Não")
+        df["Preço ($)"] = df["Preço ($)"].apply(lambda x: f"{x:.2f}")
+        return df
+
+    def marmitas_vetorizado():
+        df = marmitas.copy()
+        df["Disponível"] = df["Disponível"].astype(bool)
+        return df
+
+    def pedidos_apply():
+        df = pedidos.copy()
+        df["valor_total"] = df["valor_total"].apply(lambda x: f"${x:.2f}")
+        return df
+
+    casos = [
+        ("marmitas (apply)", marmitas_apply), ("marmitas (column_config)", marmitas_vetorizado),
+        ("pedidos (apply)", pedidos_apply), ("pedidos (column_config)", pedidos.copy),
+    ]
+    resultados = []
+    for nome, preparar in casos:
+        tempos_preparo, tempos_total = [], []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            df = preparar()
+            meio = time.perf_counter()
+            column_config(df)
+            _serializar(df)
+            tempos_preparo.append(meio - inicio)
+            tempos_total.append(time.perf_counter() - inicio)
+        resultados.append({"caso": nome, "linhas": n, "preparo_ms": np.median(tempos_preparo) * 1000,
+                           "total_ms": np.median(tempos_total) * 1000})
+    return resultados
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark da formatação das tabelas.")
+    parser.add_argument("--linhas", type=int, default=100_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+    for r in benchmark(args.linhas, args.repeticoes):
+        print(f"{r['caso']:<28} {r['linhas']:>8} rows  prepare {r['preparo_ms']:8.1f} ms  prepare+serialize {r['total_ms']:8.1f} ms")
@@ -0,0 +1,424 @@
+import contextvars
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+
+try:
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+except ImportError: # fora do Streamlit (CLI, benchmark) não há sessão
+    get_script_run_ctx = None
+
+# Liga/desliga a instrumentação das conexões (MARMITA_INSTRUMENTATION=0 desliga)
+ENABLED = os.environ.get("MARMITA_INSTRUMENTATION", "1") != "0"
+# Consultas mais lentas que isso (ms) vão para o log de consultas lentas
+SLOW_QUERY_MS = float(os.environ.get("MARMITA_SLOW_QUERY_MS", "100"))
+# Arquivo no formato texto do Prometheus (ex.: para o textfile collector do node_exporter).
+# Gerado em execução: o padrão fica fora da pasta do código
+METRICS_FILE = os.environ.get("MARMITA_METRICS_FILE", os.path.join(tempfile.gettempdir(), "marmita_metrics.prom"))
+METRICS_INTERVAL = 15  # segundos entre gravações automáticas do arquivo
+# Limites (ms) dos buckets dos histogramas
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+AMOSTRAS = 256           # durações recentes guardadas por consulta/página (percentis)
+MAX_CONSULTAS = 500      # fingerprints distintos; o excedente é somado em "outras"
+SLOW_LOG_SIZE = 200
+
+# Página e sessão que originaram o trabalho atual; a thread de escrita recebe uma
+# cópia do contexto de quem enviou a tarefa
+_origem = contextvars.ContextVar("marmita_origem", default=("-", "-"))
+# Consultas da execução de página atual ([n], compartilhado com a thread de escrita)
+_contador = contextvars.ContextVar("marmita_contador", default=None)
+
+def _sem_comentarios(sql):
+    return re.sub(r"--[^\n]*", "", sql)
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """SQL normalizado: literais viram ?, listas IN (...) colapsam e espaços são unificados."""
+    texto = re.sub(r"'(?:[^']|'')*'", "?", sql)
+    texto = re.sub(r"\b\d+(?:\.\d+)?\b", "?", _sem_comentarios(texto))
+    texto = re.sub(r"\s+", " ", texto).strip().rstrip(";")
+    return re.sub(r"\bIN \(\?(?:\s*,\s*\?)*\)", "IN (?)", texto, flags=re.IGNORECASE)
+
+def query_id(fp):
+    return hashlib.md5(fp.encode("utf-8")).hexdigest()[:12]
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round((len(ordenados) - 1) * p)))]
+
+class _Serie:
+    """Contadores de uma consulta ou página: chamadas, tempo, histograma e amostras recentes."""
+    __slots__ = ("chamadas", "total_ms", "max_ms", "linhas", "erros", "buckets", "amostras", "origens")
+
+    def __init__(self):
+        self.chamadas = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.linhas = 0
+        self.erros = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.amostras = deque(maxlen=AMOSTRAS)
+        self.origens = {}
+
+    def observar(self, ms):
+        self.chamadas += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.amostras.append(ms)
+        for i, limite in enumerate(BUCKETS_MS):
+            if ms <= limite:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+class Metricas:
+    """Registro em memória (por processo) das consultas, páginas e consultas lentas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.consultas = {}   # fingerprint -> _Serie
+            self.paginas = {}     # página -> _Serie (origens = consultas por execução)
+            self.interrompidas = {}
+            self.lentas = deque(maxlen=SLOW_LOG_SIZE)
+            self.total_lentas = 0
+            self.desde = time.time()
+
+    def _serie(self, fp):
+        serie = self.consultas.get(fp)
+        if serie is None:
+            if len(self.consultas) >= MAX_CONSULTAS:
+                fp = "outras"
+                serie = self.consultas.get(fp)
+            if serie is None:
+                serie = self.consultas[fp] = _Serie()
+        return serie
+
+    def registrar(self, fp, ms, linhas, pagina, erro=False):
+        with self._lock:
+            serie = self._serie(fp)
+            serie.observar(ms)
+            serie.linhas += linhas
+            serie.erros += erro
+            serie.origens[pagina] = serie.origens.get(pagina, 0) + 1
+
+    def registrar_lenta(self, sql, ms, linhas):
+        pagina, sessao = _origem.get()
+        print(f"Slow query ({ms:.1f} ms, {linhas} rows) [{pagina} / {sessao}]: {fingerprint(sql)}")
+        with self._lock:
+            self.total_lentas += 1
+            self.lentas.append({
+                "quando": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "ms": round(ms, 2), "linhas": linhas,
+                "pagina": pagina, "sessao": sessao, "sql": " ".join(_sem_comentarios(sql).split()),
+            })
+
+    def registrar_pagina(self, pagina, ms, consultas):
+        with self._lock:
+            serie = self.paginas.setdefault(pagina, _Serie())
+            serie.observar(ms)
+            serie.linhas += consultas
+
+    def registrar_interrompida(self, pagina):
+        with self._lock:
+            self.interrompidas[pagina] = self.interrompidas.get(pagina, 0) + 1
+
+    def resumo_consultas(self):
+        """Lista de dicts por consulta, da que mais consumiu tempo para a que menos consumiu."""
+        with self._lock:
+            itens = [(fp, s.chamadas, s.total_ms, s.max_ms, s.linhas, s.erros, list(s.amostras), dict(s.origens))
+                     for fp, s in self.consultas.items()]
+        linhas = []
+        for fp, chamadas, total, maximo, rows, erros, amostras, origens in itens:
+            linhas.append({
+                "id": query_id(fp), "consulta": fp, "chamadas": chamadas, "total_ms": total,
+                "media_ms": total / chamadas if chamadas else 0.0,
+                "p50_ms": _percentil(amostras, 0.50), "p95_ms": _percentil(amostras, 0.95),
+                "max_ms": maximo, "linhas": rows, "erros": erros,
+                "paginas": ", ".join(f"{p} ({n})" for p, n in sorted(origens.items(), key=lambda o: -o[1])),
+            })
+        return sorted(linhas, key=lambda l: l["total_ms"], reverse=True)
+
+    def resumo_paginas(self):
+        with self._lock:
+            itens = [(p, s.chamadas, s.total_ms, s.max_ms, s.linhas, list(s.amostras)) for p, s in self.paginas.items()]
+            interrompidas = dict(self.interrompidas)
+        linhas = []
+        for pagina, execucoes, total, maximo, consultas, amostras in itens:
+            linhas.append({
+                "pagina": pagina, "execucoes": execucoes, "interrompidas": interrompidas.pop(pagina, 0),
+                "media_ms": total / execucoes if execucoes else 0.0,
+                "p50_ms": _percentil(amostras, 0.50), "p95_ms": _percentil(amostras, 0.95), "max_ms": maximo,
+                "consultas_por_execucao": consultas / execucoes if execucoes else 0.0,
+            })
+        for pagina, n in interrompidas.items():
+            linhas.append({"pagina": pagina, "execucoes": 0, "interrompidas": n, "media_ms": 0.0,
+                           "p50_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0, "consultas_por_execucao": 0.0})
+        return sorted(linhas, key=lambda l: l["media_ms"], reverse=True)
+
+    def consultas_lentas(self):
+        with self._lock:
+            return list(reversed(self.lentas))
+
+    def prometheus(self):
+        """Métricas no formato texto de exposição do Prometheus."""
+        with self._lock:
+            consultas = [(fp, s.chamadas, s.total_ms, s.linhas, s.erros, list(s.buckets)) for fp, s in self.consultas.items()]
+            paginas = [(p, s.chamadas, s.total_ms, list(s.buckets)) for p, s in self.paginas.items()]
+            interrompidas = dict(self.interrompidas)
+            total_lentas = self.total_lentas
+        saida = []
+
+        def histograma(nome, ajuda, series):
+            saida.append(f"# HELP {nome} {ajuda}")
+            saida.append(f"# TYPE {nome} histogram")
+            for rotulos, chamadas, total_ms, buckets in series:
+                acumulado = 0
+                for limite, n in zip(BUCKETS_MS, buckets):
+                    acumulado += n
+                    saida.append(f'{nome}_bucket{{{rotulos},le="{limite / 1000:g}"}} {acumulado}')
+                saida.append(f'{nome}_bucket{{{rotulos},le="+Inf"}} {chamadas}')
+                saida.append(f"{nome}_sum{{{rotulos}}} {total_ms / 1000:.6f}")
+                saida.append(f"{nome}_count{{{rotulos}}} {chamadas}")
+
+        def contador(nome, ajuda, valores, tipo="counter"):
+            saida.append(f"# HELP {nome} {ajuda}")
+            saida.append(f"# TYPE {nome} {tipo}")
+            for rotulos, valor in valores:
+                saida.append(f"{nome}{{{rotulos}}} {valor}" if rotulos else f"{nome} {valor}")
+
+        rotulo = lambda fp: f'query="{query_id(fp)}"'
+        histograma("marmita_query_duration_seconds", "Duração das consultas SQL (execute + fetch).",
+                   [(rotulo(fp), c, t, b) for fp, c, t, _, _, b in consultas])
+        contador("marmita_query_rows_total", "Linhas retornadas ou alteradas.", [(rotulo(fp), r) for fp, _, _, r, _, _ in consultas])
+        contador("marmita_query_errors_total", "Consultas que terminaram em erro.", [(rotulo(fp), e) for fp, _, _, _, e, _ in consultas])
+        contador("marmita_query_info", "Texto normalizado de cada consulta.",
+                 [(f'{rotulo(fp)},sql="{_escapar(fp[:300])}"', 1) for fp, *_ in consultas], tipo="gauge")
+        histograma("marmita_page_render_seconds", "Duração de cada execução de página.",
+                   [(f'page="{_escapar(p)}"', c, t, b) for p, c, t, b in paginas])
+        contador("marmita_page_interrupted_total", "Execuções de página interrompidas por st.rerun.",
+                 [(f'page="{_escapar(p)}"', n) for p, n in interrompidas.items()])
+        contador("marmita_slow_queries_total", "Consultas acima do limite de consulta lenta.", [("", total_lentas)])
+        return "\n".join(saida) + "\n"
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+metricas = Metricas()
+_limiar_ms = SLOW_QUERY_MS
+
+def get_slow_query_threshold():
+    return _limiar_ms
+
+def set_slow_query_threshold(ms):
+    global _limiar_ms
+    _limiar_ms = float(ms)
+
+# --- Conexões Instrumentadas ---
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que mede cada consulta do execute até a última linha lida (fetch* ou iteração).
+
+    A execução é registrada uma vez, quando termina: escrita logo após o execute,
+    leitura quando o cursor se esgota, é reexecutado, fechado ou descartado.
+    """
+    _execucao = None  # [fingerprint, sql, ms, linhas, página]
+
+    def _medir_execucao(self, metodo, sql, parametros):
+        self._finalizar()
+        pagina = _origem.get()[0]
+        contador = _contador.get()
+        if contador is not None:
+            contador[0] += 1
+        inicio = time.perf_counter()
+        try:
+            resultado = metodo(sql, parametros)
+        except Exception:
+            metricas.registrar(fingerprint(sql), (time.perf_counter() - inicio) * 1000, 0, pagina, erro=True)
+            raise
+        ms = (time.perf_counter() - inicio) * 1000
+        if self.description is None: # sem linhas para ler (INSERT/UPDATE/DELETE/PRAGMA ...)
+            self._registrar(fingerprint(sql), sql, ms, max(self.rowcount, 0), pagina)
+        else:
+            self._execucao = [fingerprint(sql), sql, ms, 0, pagina]
+        return resultado
+
+    def _medir_leitura(self, metodo, esgotou, *args):
+        inicio = time.perf_counter()
+        resultado = metodo(*args)
+        execucao = self._execucao
+        if execucao is not None:
+            execucao[2] += (time.perf_counter() - inicio) * 1000
+            execucao[3] += len(resultado) if isinstance(resultado, list) else int(resultado is not None)
+            if esgotou(resultado):
+                self._finalizar()
+        return resultado
+
+    def _finalizar(self):
+        execucao = self._execucao
+        if execucao is not None:
+            self._execucao = None
+            self._registrar(*execucao)
+
+    @staticmethod
+    def _registrar(fp, sql, ms, linhas, pagina):
+        metricas.registrar(fp, ms, linhas, pagina)
+        if ms >= _limiar_ms:
+            metricas.registrar_lenta(sql, ms, linhas)
+
+    def execute(self, sql, parameters=()):
+        return self._medir_execucao(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._medir_execucao(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        return self._medir_leitura(super().fetchone, lambda r: r is None)
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        return self._medir_leitura(super().fetchmany, lambda r: len(r) < size, size)
+
+    def fetchall(self):
+        return self._medir_leitura(super().fetchall, lambda r: True)
+
+    # `for linha in conn.execute(...)`: cada linha lida entra no tempo da consulta
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        execucao = self._execucao
+        if execucao is None:
+            return super().__next__()
+        inicio = time.perf_counter()
+        try:
+            linha = super().__next__()
+        except StopIteration:
+            execucao[2] += (time.perf_counter() - inicio) * 1000
+            self._finalizar()
+            raise
+        execucao[2] += (time.perf_counter() - inicio) * 1000
+        execucao[3] += 1
+        return linha
+
+    def close(self):
+        self._finalizar()
+        super().close()
+
+    def __del__(self):
+        self._finalizar()
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Fábrica de conexão (sqlite3.connect(factory=...)) cujos cursores são instrumentados."""
+
+    def cursor(self, factory=None):
+        return super().cursor(factory or InstrumentedCursor)
+
+    # Connection.execute* não passa por self.cursor(), por isso são redefinidos aqui
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def connection_factory():
+    return InstrumentedConnection if ENABLED else sqlite3.Connection
+
+# --- Perfil das Páginas ---
+
+_abertas = {}  # sessão -> (página, início, contador de consultas)
+_abertas_lock = threading.Lock()
+_ultima_gravacao = 0.0
+
+def _sessao():
+    ctx = get_script_run_ctx(suppress_warning=True) if get_script_run_ctx else None
+    return ctx.session_id if ctx is not None else threading.current_thread().name
+
+def set_origin(pagina, sessao=None):
+    """Atribui o trabalho seguinte desta thread/contexto a `pagina` (ex.: um job em segundo plano)."""
+    _origem.set((pagina, sessao or threading.current_thread().name))
+    _contador.set(None)
+
+def _script_runner():
+    # ScriptRunner do Streamlit que executa o script nesta thread (None fora do Streamlit).
+    # A thread do script roda o método _run_script_thread do próprio ScriptRunner
+    runner = getattr(getattr(threading.current_thread(), "_target", None), "__self__", None)
+    return runner if hasattr(getattr(runner, "on_event", None), "connect") else None
+
+def _fim_da_execucao(sender, event=None, **kwargs):
+    # Chamado pelo ScriptRunner quando o script termina, inclusive por st.stop ou exceção
+    # (SCRIPT_STOPPED_WITH_SUCCESS); st.rerun encerra a execução com SCRIPT_STOPPED_FOR_RERUN
+    try:
+        nome = getattr(event, "name", "")
+        if nome == "SCRIPT_STOPPED_WITH_SUCCESS":
+            page_end()
+        elif nome == "SCRIPT_STOPPED_FOR_RERUN":
+            page_interrupted()
+    except Exception as e: # nunca interromper o ScriptRunner
+        print(f"Error recording page run: {e}")
+
+def page_begin(pagina):
+    """Marca o início de uma execução da página; as consultas seguintes são atribuídas a ela.
+
+    O fim é registrado pelo próprio ScriptRunner (_fim_da_execucao), de modo que execuções
+    encerradas por st.stop ou por uma exceção também são medidas.
+    """
+    sessao = _sessao()
+    contador = [0]
+    _origem.set((pagina, sessao))
+    _contador.set(contador)
+    with _abertas_lock:
+        anterior = _abertas.pop(sessao, None)
+        _abertas[sessao] = (pagina, time.perf_counter(), contador)
+    if anterior is not None:
+        # A execução anterior não foi encerrada (sem ScriptRunner, ex.: modo bare)
+        metricas.registrar_interrompida(anterior[0])
+    runner = _script_runner()
+    if runner is not None:
+        runner.on_event.connect(_fim_da_execucao) # sem efeito se já conectado
+
+def page_interrupted():
+    """Descarta a execução aberta por page_begin, contando-a como interrompida (st.rerun)."""
+    with _abertas_lock:
+        aberta = _abertas.pop(_sessao(), None)
+    if aberta is not None:
+        metricas.registrar_interrompida(aberta[0])
+
+def page_end():
+    """Fecha a execução aberta por page_begin e grava o arquivo Prometheus periodicamente."""
+    global _ultima_gravacao
+    with _abertas_lock:
+        aberta = _abertas.pop(_sessao(), None)
+    if aberta is None:
+        return
+    pagina, inicio, contador = aberta
+    metricas.registrar_pagina(pagina, (time.perf_counter() - inicio) * 1000, contador[0])
+    if time.monotonic() - _ultima_gravacao >= METRICS_INTERVAL:
+        _ultima_gravacao = time.monotonic()
+        try:
+            write_prometheus_file()
+        except OSError as e:
+            print(f"Error writing metrics file {METRICS_FILE}: {e}")
+
+def write_prometheus_file(caminho=None):
+    """Grava as métricas de forma atômica (arquivo temporário + rename). Retorna o caminho."""
+    caminho = caminho or METRICS_FILE
+    diretorio = os.path.dirname(caminho)
+    if diretorio:
+        os.makedirs(diretorio, exist_ok=True)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(metricas.prometheus())
+    os.replace(temporario, caminho)
+    return caminho
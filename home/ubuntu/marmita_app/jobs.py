@@ -0,0 +1,351 @@
+import atexit
+import contextvars
+import hashlib
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import streamlit as st
+
+import database as db
+import instrumentation
+
+# Jobs executados ao mesmo tempo (threads do processo do app)
+JOB_WORKERS = int(os.environ.get("MARMITA_JOB_WORKERS", "2"))
+# Validade (segundos) de um resultado para ser reaproveitado por um job idêntico
+JOB_RESULT_TTL = float(os.environ.get("MARMITA_JOB_RESULT_TTL", "300"))
+# Intervalo mínimo entre gravações do progresso na tabela jobs
+PROGRESS_INTERVAL = 0.5
+# Resultados mantidos em memória (os demais são lidos do JSON gravado na tabela)
+MAX_RESULTADOS_MEMORIA = 32
+# Intervalo (segundos) do heartbeat dos jobs ativos; sem heartbeat por JOB_HEARTBEAT_TIMEOUT,
+# o job de outro processo é considerado interrompido
+JOB_HEARTBEAT_INTERVAL = 30
+JOB_HEARTBEAT_TIMEOUT = float(os.environ.get("MARMITA_JOB_HEARTBEAT_TIMEOUT", "120"))
+
+# Identifica este processo como dono dos jobs que ele executa (o sufixo distingue reinícios com o mesmo PID)
+PROCESSO = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class JobCancelado(Exception):
+    """Levantada dentro do job (em Job.progresso) quando o cancelamento foi pedido."""
+
+# tipo -> (rótulo, função fn(conn, job, **parametros), tabelas de que o resultado depende)
+TAREFAS = {}
+
+def tarefa(tipo, rotulo, *tabelas):
+    """Registra uma função como tipo de job. `tabelas` invalidam o reuso do resultado."""
+    def decorator(fn):
+        TAREFAS[tipo] = (rotulo, fn, tabelas)
+        return fn
+    return decorator
+
+class Job:
+    """Estado em memória de um job ativo, passado à função da tarefa."""
+
+    def __init__(self, job_id, tipo, parametros):
+        self.id = job_id
+        self.tipo = tipo
+        self.parametros = parametros
+        self.status = "pendente"
+        self.fracao = None
+        self.mensagem = None
+        self.future = None
+        self._cancelar = threading.Event()
+        self._ultima_gravacao = 0.0
+
+    @property
+    def cancelado(self):
+        return self._cancelar.is_set()
+
+    def progresso(self, fracao=None, mensagem=None):
+        """Atualiza o progresso (0..1, ou None se indeterminado) e interrompe o job se foi cancelado."""
+        if self.cancelado:
+            raise JobCancelado()
+        self.fracao = fracao
+        self.mensagem = mensagem
+        agora = time.monotonic()
+        if agora - self._ultima_gravacao >= PROGRESS_INTERVAL:
+            self._ultima_gravacao = agora
+            db.update_job(db.get_connection(), self.id, progresso=fracao, mensagem=mensagem)
+
+    def status_dict(self):
+        return {"id": self.id, "tipo": self.tipo, "status": self.status, "progresso": self.fracao,
+                "mensagem": self.mensagem, "erro": None}
+
+def _serializar(valor):
+    if isinstance(valor, pd.DataFrame):
+        return json.dumps({"formato": "dataframe", "dados": json.loads(valor.to_json(orient="split", date_format="iso"))})
+    return json.dumps({"formato": "json", "dados": valor}, default=str)
+
+def _desserializar(texto):
+    if not texto:
+        return None
+    valor = json.loads(texto)
+    if valor["formato"] == "dataframe":
+        return pd.DataFrame(valor["dados"]["data"], columns=valor["dados"]["columns"])
+    return valor["dados"]
+
+def _chave(tipo, parametros):
+    texto = json.dumps([tipo, parametros], sort_keys=True, default=str)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+def _agora():
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime()) # igual a CURRENT_TIMESTAMP
+
+class JobRunner:
+    """Executa jobs num pool de threads, com estado persistido na tabela jobs.
+
+    Jobs idênticos (mesmo tipo e parâmetros) em andamento são compartilhados, e um
+    resultado concluído é reaproveitado enquanto estiver dentro de JOB_RESULT_TTL e
+    nenhuma das tabelas de que depende tiver sido alterada.
+    """
+
+    def __init__(self, workers=JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="marmita-job")
+        self._lock = threading.Lock()
+        self._ativos = {}                  # id -> Job
+        self._por_chave = {}               # chave -> id do job ativo
+        self._concluidos = {}              # chave -> (id, versões das tabelas, concluído em)
+        self._resultados = OrderedDict()   # id -> resultado (LRU)
+        db.fail_interrupted_jobs(db.get_connection(), PROCESSO, JOB_HEARTBEAT_TIMEOUT)
+        self._parar = threading.Event()
+        self._heartbeat = threading.Thread(target=self._renovar_heartbeat, name="marmita-job-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def _renovar_heartbeat(self):
+        while not self._parar.wait(JOB_HEARTBEAT_INTERVAL):
+            with self._lock:
+                if not self._ativos:
+                    continue
+            try:
+                db.heartbeat_jobs(db.get_connection(), PROCESSO)
+            finally:
+                db.release_connection()
+
+    def submit(self, tipo, parametros=None, usar_cache=True, criado_por=None, exclusivo_segundos=None):
+        """Enfileira um job e devolve seu id (ou o id de um job idêntico ativo/recente).
+
+        Com exclusivo_segundos, o job só é criado se nenhum outro processo tiver um do mesmo
+        tipo e criado_por ativo ou concluído nesse intervalo (db.claim_job); caso contrário
+        devolve None.
+        """
+        if tipo not in TAREFAS:
+            raise ValueError(f"Tipo de job desconhecido: {tipo}")
+        parametros = parametros or {}
+        chave = _chave(tipo, parametros)
+        tabelas = TAREFAS[tipo][2] + (None,)
+        with self._lock:
+            if chave in self._por_chave:
+                return self._por_chave[chave]
+            if usar_cache and chave in self._concluidos:
+                job_id, versoes, concluido_em = self._concluidos[chave]
+                if time.monotonic() - concluido_em < JOB_RESULT_TTL and db.query_cache.versions(tabelas) == versoes:
+                    return job_id
+                del self._concluidos[chave]
+            job_id = uuid.uuid4().hex
+            conn = db.get_connection()
+            if exclusivo_segundos is None:
+                registrado = db.add_job(conn, job_id, tipo, json.dumps(parametros, default=str), chave, criado_por, PROCESSO)
+            else:
+                # Jobs de processos que pararam não podem segurar a vez dos outros
+                db.fail_interrupted_jobs(conn, PROCESSO, JOB_HEARTBEAT_TIMEOUT)
+                registrado = db.claim_job(conn, job_id, tipo, json.dumps(parametros, default=str), chave, criado_por,
+                                          PROCESSO, exclusivo_segundos)
+                if registrado is False:
+                    return None
+            if registrado is None:
+                raise RuntimeError("Não foi possível registrar o job no banco de dados.")
+            job = Job(job_id, tipo, parametros)
+            self._ativos[job_id] = job
+            self._por_chave[chave] = job_id
+            # O contexto (página/sessão) acompanha o job para a instrumentação
+            contexto = contextvars.copy_context()
+            job.future = self._executor.submit(contexto.run, self._executar, job, chave, tabelas)
+        return job_id
+
+    def _executar(self, job, chave, tabelas):
+        rotulo, fn, _ = TAREFAS[job.tipo]
+        instrumentation.set_origin(f"Job: {rotulo}")
+        conn = db.get_connection()
+        versoes = db.query_cache.versions(tabelas) # antes de ler: escrita durante o job invalida o resultado
+        job.status = "executando"
+        db.update_job(conn, job.id, status="executando", iniciado_em=_agora())
+        campos = {}
+        try:
+            resultado = fn(conn, job, **job.parametros)
+        except JobCancelado:
+            campos = {"status": "cancelado", "mensagem": "Cancelado pelo usuário"}
+        except Exception as e:
+            print(f"Job {job.id} ({job.tipo}) failed: {e}")
+            traceback.print_exc()
+            campos = {"status": "erro", "erro": str(e) or e.__class__.__name__}
+        else:
+            campos = {"status": "concluido", "progresso": 1.0, "mensagem": job.mensagem, "resultado": _serializar(resultado)}
+            with self._lock:
+                self._resultados[job.id] = resultado
+                while len(self._resultados) > MAX_RESULTADOS_MEMORIA:
+                    self._resultados.popitem(last=False)
+                self._concluidos[chave] = (job.id, versoes, time.monotonic())
+        finally:
+            campos["terminado_em"] = _agora()
+            db.update_job(conn, job.id, **campos)
+            with self._lock:
+                job.status = campos.get("status", "erro")
+                self._ativos.pop(job.id, None)
+                if self._por_chave.get(chave) == job.id:
+                    del self._por_chave[chave]
+            # A thread do executor fica parada até o próximo job: a conexão volta ao pool
+            db.release_connection()
+
+    def cancel(self, job_id):
+        """Pede o cancelamento. Jobs ainda na fila nem chegam a executar."""
+        with self._lock:
+            job = self._ativos.get(job_id)
+        if job is None:
+            return False
+        job._cancelar.set()
+        if job.future is not None and job.future.cancel():
+            # Não começou: _executar não vai rodar, então o estado é fechado aqui
+            db.update_job(db.get_connection(), job_id, status="cancelado", mensagem="Cancelado pelo usuário", terminado_em=_agora())
+            with self._lock:
+                job.status = "cancelado"
+                self._ativos.pop(job_id, None)
+                for chave, ativo in list(self._por_chave.items()):
+                    if ativo == job_id:
+                        del self._por_chave[chave]
+        return True
+
+    def status(self, job_id):
+        """Dict com status, progresso (0..1 ou None), mensagem e erro do job."""
+        with self._lock:
+            job = self._ativos.get(job_id)
+            if job is not None:
+                return job.status_dict()
+        return db.get_job(db.get_connection(), job_id)
+
+    def result(self, job_id):
+        """Resultado de um job concluído (DataFrames são copiados: quem chama pode alterá-los)."""
+        with self._lock:
+            if job_id in self._resultados:
+                self._resultados.move_to_end(job_id)
+                resultado = self._resultados[job_id]
+                return resultado.copy() if isinstance(resultado, pd.DataFrame) else resultado
+        job = db.get_job(db.get_connection(), job_id)
+        if job is None or job["status"] != "concluido":
+            return None
+        resultado = _desserializar(job["resultado"])
+        with self._lock:
+            self._resultados[job_id] = resultado
+            while len(self._resultados) > MAX_RESULTADOS_MEMORIA:
+                self._resultados.popitem(last=False)
+        return resultado.copy() if isinstance(resultado, pd.DataFrame) else resultado
+
+    def shutdown(self):
+        with self._lock:
+            ativos = list(self._ativos)
+        for job_id in ativos:
+            self.cancel(job_id)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._parar.set()
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_runner():
+    # Um executor por processo, criado sob demanda
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
+
+def shutdown():
+    global _runner
+    with _runner_lock:
+        if _runner is not None:
+            _runner.shutdown()
+            _runner = None
+
+# Registrado depois do shutdown de database.py, portanto executado antes dele
+atexit.register(shutdown)
+
+def submit_job(tipo, parametros=None, usar_cache=True, criado_por=None, exclusivo_segundos=None):
+    return get_runner().submit(tipo, parametros, usar_cache, criado_por, exclusivo_segundos)
+
+def cancel_job(job_id):
+    return get_runner().cancel(job_id)
+
+def get_job_status(job_id):
+    return get_runner().status(job_id)
+
+def get_job_result(job_id):
+    return get_runner().result(job_id)
+
+# --- Tarefas Padrão ---
+
+RELATORIOS = {
+    "vendas_por_cliente": db.get_vendas_por_cliente,
+    "vendas_geral": db.get_vendas_geral,
+    "marmitas_mais_vendidas": db.get_marmitas_mais_vendidas,
+}
+
+@tarefa("relatorio", "Relatório", "pedidos", "itens_pedido", "clientes", "marmitas", "semanas")
+def _relatorio(conn, job, nome, semana_id=None):
+    job.progresso(None, "Consultando o banco de dados")
+    df = RELATORIOS[nome](conn, semana_id_filter=semana_id)
+    job.progresso(1.0, f"{len(df)} linhas")
+    return df
+
+@tarefa("manutencao", "Manutenção do banco", "jobs")
+def _manutencao(conn, job, vacuum=True):
+    job.progresso(None, "Otimizando o banco de dados (VACUUM)" if vacuum else "Otimizando o banco de dados")
+    resultado = db.optimize_database(conn, vacuum=vacuum)
+    if resultado is None:
+        raise RuntimeError("Falha ao otimizar o banco de dados.")
+    db.delete_old_jobs(conn)
+    return resultado
+
+# --- Acompanhamento nas Páginas ---
+
+STATUS_ROTULOS = {"pendente": "Na fila", "executando": "Executando", "concluido": "Concluído",
+                  "erro": "Erro", "cancelado": "Cancelado"}
+
+def painel_job(job_id, key):
+    """Mostra o andamento do job (atualizado a cada segundo, com botão Cancelar).
+
+    Retorna o status (dict) quando o job terminou, ou None enquanto estiver na fila/executando.
+    """
+    status = get_job_status(job_id)
+    if status is None:
+        st.error("Job não encontrado.")
+        return None
+    if status["status"] in db.JOB_STATUS_ATIVOS:
+        _painel_ativo(job_id, key)
+        return None
+    if status["status"] == "erro":
+        st.error(f"O job terminou com erro: {status['erro']}")
+    elif status["status"] == "cancelado":
+        st.warning("O job foi cancelado.")
+    return status
+
+@st.fragment(run_every=1.0)
+def _painel_ativo(job_id, key):
+    status = get_job_status(job_id)
+    if status is None or status["status"] not in db.JOB_STATUS_ATIVOS:
+        st.rerun() # terminou: a página inteira roda de novo para mostrar o resultado
+    texto = f"{STATUS_ROTULOS[status['status']]}" + (f": {status['mensagem']}" if status["mensagem"] else "")
+    col_progresso, col_cancelar = st.columns([4, 1])
+    if status["progresso"] is None:
+        col_progresso.info(f"⏳ {texto}")
+    else:
+        col_progresso.progress(min(max(float(status["progresso"]), 0.0), 1.0), text=texto)
+    if col_cancelar.button("Cancelar", key=f"{key}_cancelar"):
+        cancel_job(job_id)
+        st.rerun()
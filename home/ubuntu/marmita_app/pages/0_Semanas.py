@@ -1,21 +1,12 @@
 # Adicionar página para gerenciar Semanas
 import streamlit as st
 import database as db
+import bootstrap
+import formatting
 import pandas as pd
 from datetime import date
 
-# --- Autenticação (copiado de app.py para segurança em cada página) ---
-if "logged_in" not in st.session_state or not st.session_state["logged_in"]:
-    st.error("⚠️ Você precisa fazer login para acessar esta página.")
-    st.stop()
-
-# --- Conexão com Banco de Dados ---
-conn = db.create_connection()
-if not conn:
-    st.error("Falha crítica: Não foi possível conectar ao banco de dados nesta página.")
-    st.stop()
-
-st.set_page_config(page_title="Gerenciar Semanas", page_icon="🗓️", layout="wide")
+conn, _ = bootstrap.setup_page("Semanas", "Gerenciar Semanas", "🗓️") # login, conexão do pool e instrumentação
 
 st.title("🗓️ Gerenciar Semanas de Trabalho/Entrega")
 
@@ -42,7 +33,7 @@ with st.form("semana_form", clear_on_submit=True):
             data_fim = None
             last_id = db.add_semana(conn, nome_semana, data_inicio, data_fim)
             if last_id:
-                st.success(f"Semana 	"{nome_semana}	" adicionada com sucesso! ID: {last_id}")
+                st.success(f"Semana '{nome_semana}' adicionada com sucesso! ID: {last_id}")
                 st.rerun()
             # else: Erro já é mostrado pela função db
 
@@ -57,7 +48,7 @@ if semanas:
     df_semanas = pd.DataFrame(semanas, columns=["ID", "Nome da Semana", "Data Início", "Data Fim"])
     # Ocultar datas se não estiverem sendo usadas
     df_display = df_semanas[["ID", "Nome da Semana"]]
-    st.dataframe(df_display, hide_index=True, use_container_width=True)
+    formatting.tabela(df_display)
 
     st.subheader("Ações")
     semana_id_action = st.selectbox("Selecione o ID da Semana para Excluir", options=[""] + df_semanas["ID"].tolist())
@@ -74,9 +65,5 @@ if semanas:
 else:
     st.info("Nenhuma semana cadastrada ainda.")
 
-# Fechar conexão no final do script (opcional)
-# finally:
-#     if conn:
-#         conn.close()
-#         print("Connection closed in 0_Semanas.py")
 
+# A conexão pertence ao pool de database.py e não deve ser fechada aqui.
@@ -1,14 +1,10 @@
 import streamlit as st
 import database as db
+import bootstrap
+import formatting
 import pandas as pd
 
-# --- Conexão com Banco de Dados ---
-conn = db.create_connection()
-if not conn:
-    st.error("Falha crítica: Não foi possível conectar ao banco de dados nesta página.")
-    st.stop()
-
-st.set_page_config(page_title="Gerenciar Clientes", page_icon="👤", layout="wide")
+conn, _ = bootstrap.setup_page("Clientes", "Gerenciar Clientes", "👤") # login, conexão do pool e instrumentação
 
 st.title("👤 Gerenciar Clientes")
 
@@ -42,7 +38,7 @@ with st.form("cliente_form", clear_on_submit=True):
                 # Atualizar cliente
                 success = db.update_cliente(conn, cliente_id_edit, nome, endereco, complemento, telefone)
                 if success:
-                    st.success(f"Cliente 	'{nome}	' atualizado com sucesso!")
+                    st.success(f"Cliente '{nome}' atualizado com sucesso!")
                     st.session_state.cliente_id_edit = None # Limpa o estado após sucesso
                     st.rerun() # Recarrega para limpar o form e atualizar a lista
                 # else: Erro já é mostrado pela função db
@@ -50,7 +46,7 @@ with st.form("cliente_form", clear_on_submit=True):
                 # Adicionar novo cliente
                 last_id = db.add_cliente(conn, nome, endereco, complemento, telefone)
                 if last_id:
-                    st.success(f"Cliente 	'{nome}	' adicionado com sucesso! ID: {last_id}")
+                    st.success(f"Cliente '{nome}' adicionado com sucesso! ID: {last_id}")
                     st.rerun() # Recarrega para atualizar a lista
                 # else: Erro já é mostrado pela função db
 
@@ -69,8 +65,7 @@ clientes = db.get_all_clientes(conn)
 if clientes:
     df_clientes = pd.DataFrame(clientes, columns=["ID", "Nome", "Endereço", "Complemento", "Telefone"])
 
-    # Usar st.dataframe para melhor visualização e performance
-    st.dataframe(df_clientes, hide_index=True, use_container_width=True)
+    formatting.tabela(df_clientes)
 
     st.subheader("Ações")
     cliente_id_action = st.selectbox("Selecione o ID do Cliente para Editar ou Excluir", options=[""] + df_clientes["ID"].tolist())
@@ -90,7 +85,7 @@ if clientes:
                 # st.warning(f"Tem certeza que deseja excluir {cliente_info[1]}?")
                 # if st.button("Confirmar Exclusão"): ...
                 if db.delete_cliente(conn, cliente_id_action):
-                    st.success(f"Cliente 	'{cliente_info[1]}	' excluído com sucesso.")
+                    st.success(f"Cliente '{cliente_info[1]}' excluído com sucesso.")
                     if st.session_state.get("cliente_id_edit") == cliente_id_action:
                          st.session_state.cliente_id_edit = None # Limpa se estava editando o excluído
                     st.rerun()
@@ -101,9 +96,5 @@ if clientes:
 else:
     st.info("Nenhum cliente cadastrado ainda.")
 
-# Fechar conexão no final do script (opcional)
-# finally:
-#     if conn:
-#         conn.close()
-#         print("Connection closed in 1_Clientes.py")
 
+# A conexão pertence ao pool de database.py e não deve ser fechada aqui.
@@ -1,15 +1,11 @@
 import streamlit as st
 import database as db
+import bootstrap
+import formatting
 import pandas as pd
 import os
 
-# --- Conexão com Banco de Dados ---
-conn = db.create_connection()
-if not conn:
-    st.error("Falha crítica: Não foi possível conectar ao banco de dados nesta página.")
-    st.stop()
-
-st.set_page_config(page_title="Gerenciar Marmitas", page_icon="🍲", layout="wide")
+conn, _ = bootstrap.setup_page("Marmitas", "Gerenciar Marmitas", "🍲") # login, conexão do pool e instrumentação
 
 st.title("🍲 Gerenciar Cardápio Semanal")
 
@@ -52,7 +48,7 @@ with st.form("marmita_form", clear_on_submit=True):
                 # Atualizar marmita
                 success = db.update_marmita(conn, marmita_id_edit, nome, descricao, preco, categoria, disponivel, imagem_path)
                 if success:
-                    st.success(f"Marmita 	'{nome}' atualizada com sucesso!")
+                    st.success(f"Marmita '{nome}' atualizada com sucesso!")
                     st.session_state.marmita_id_edit = None
                     st.rerun()
                 # else: Erro já é mostrado pela função db
@@ -60,7 +56,7 @@ with st.form("marmita_form", clear_on_submit=True):
                 # Adicionar nova marmita
                 last_id = db.add_marmita(conn, nome, descricao, preco, categoria, disponivel, imagem_path)
                 if last_id:
-                    st.success(f"Marmita 	'{nome}' adicionada com sucesso! ID: {last_id}")
+                    st.success(f"Marmita '{nome}' adicionada com sucesso! ID: {last_id}")
                     st.rerun()
                 # else: Erro já é mostrado pela função db
 
@@ -79,13 +75,13 @@ marmitas = db.get_all_marmitas(conn)
 if marmitas:
     # id, nome, descricao, preco, categoria, disponivel_semana, imagem_path
     df_marmitas = pd.DataFrame(marmitas, columns=["ID", "Nome", "Descrição", "Preço ($)", "Categoria", "Disponível", "Imagem Path"])
-    df_marmitas["Disponível"] = df_marmitas["Disponível"].apply(lambda x: "Sim" if x else "Não")
-    df_marmitas["Preço ($)"] = df_marmitas["Preço ($)"].apply(lambda x: f"{x:.2f}")
+    # Tipos nativos (bool/float): o formato vem da configuração das colunas e a ordenação continua numérica
+    df_marmitas["Disponível"] = df_marmitas["Disponível"].astype(bool)
 
     # Selecionar colunas para exibir
     df_display = df_marmitas[["ID", "Nome", "Descrição", "Preço ($)", "Categoria", "Disponível"]]
 
-    st.dataframe(df_display, hide_index=True, use_container_width=True)
+    formatting.tabela(df_display)
 
     st.subheader("Ações")
     marmita_id_action = st.selectbox("Selecione o ID da Marmita para Editar ou Excluir", options=[""] + df_marmitas["ID"].tolist())
@@ -103,7 +99,7 @@ if marmitas:
             if marmita_info:
                 # Adicionar confirmação?
                 if db.delete_marmita(conn, marmita_id_action):
-                    st.success(f"Marmita 	'{marmita_info[1]}' excluída com sucesso.")
+                    st.success(f"Marmita '{marmita_info[1]}' excluída com sucesso.")
                     if st.session_state.get("marmita_id_edit") == marmita_id_action:
                          st.session_state.marmita_id_edit = None
                     st.rerun()
@@ -114,9 +110,5 @@ if marmitas:
 else:
     st.info("Nenhuma marmita cadastrada ainda.")
 
-# Fechar conexão no final do script (opcional)
-# finally:
-#     if conn:
-#         conn.close()
-#         print("Connection closed in 2_Marmitas.py")
 
+# A conexão pertence ao pool de database.py e não deve ser fechada aqui.
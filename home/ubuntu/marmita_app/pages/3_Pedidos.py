@@ -1,144 +1,140 @@
 import streamlit as st
 import database as db
+import bootstrap
+import formatting
+import cart
+import bulk_import
+import export
 import pandas as pd
 from datetime import datetime
 
-# --- Autenticação ---
-if "logged_in" not in st.session_state or not st.session_state["logged_in"]:
-    st.error("⚠️ Você precisa fazer login para acessar esta página.")
-    st.stop()
-
-# --- Conexão com Banco de Dados ---
-conn = db.create_connection()
-if not conn:
-    st.error("Falha crítica: Não foi possível conectar ao banco de dados nesta página.")
-    st.stop()
-
-st.set_page_config(page_title="Registrar Pedidos", page_icon="🛒", layout="wide")
+conn, _ = bootstrap.setup_page("Pedidos", "Registrar Pedidos", "🛒") # login, conexão do pool e instrumentação
 
 st.title("🛒 Registrar e Gerenciar Pedidos")
 
 # --- Formulário para Novo Pedido ---
 st.subheader("Registrar Novo Pedido")
 
-# Carregar dados necessários
-clientes = db.get_all_clientes(conn)
-marmitas_disponiveis = db.get_marmitas_disponiveis(conn)
+# Carregar dados necessários (clientes são buscados sob demanda, não carregados todos)
+total_clientes = db.get_dashboard_metrics(conn).get("total_clientes", 0)
+cardapio = cart.get_cardapio(conn) # marmitas disponíveis, montado só quando a tabela muda
 semanas = db.get_all_semanas(conn)
 
 # Validações
-if not clientes:
-    st.warning("Nenhum cliente cadastrado. Cadastre clientes primeiro na seção 	'Clientes'.")
+if not total_clientes:
+    st.warning("Nenhum cliente cadastrado. Cadastre clientes primeiro na seção 'Clientes'.")
     st.stop()
-if not marmitas_disponiveis:
-    st.warning("Nenhuma marmita marcada como 	'Disponível esta Semana'. Verifique o cadastro em 	'Marmitas'.")
+if not len(cardapio):
+    st.warning("Nenhuma marmita marcada como 'Disponível esta Semana'. Verifique o cadastro em 'Marmitas'.")
     st.stop()
 if not semanas:
-    st.warning("Nenhuma semana cadastrada. Cadastre semanas primeiro na seção 	'Semanas'.")
+    st.warning("Nenhuma semana cadastrada. Cadastre semanas primeiro na seção 'Semanas'.")
     st.stop()
 
+# Busca de cliente fora do formulário para atualizar as opções a cada texto digitado
+busca_cliente = st.text_input("Buscar Cliente", placeholder="Nome, endereço ou telefone", key="busca_cliente_pedido")
+clientes_encontrados = db.search_clientes(conn, busca_cliente) if busca_cliente else []
+# Telefone digitado em qualquer formato: o cliente exato vem primeiro (já fica selecionado)
+cliente_do_telefone = db.get_cliente_by_phone(conn, busca_cliente) if busca_cliente else None
+if cliente_do_telefone:
+    clientes_encontrados = [cliente_do_telefone] + [c for c in clientes_encontrados if c[0] != cliente_do_telefone[0]]
+if busca_cliente and not clientes_encontrados:
+    st.info("Nenhum cliente encontrado para a busca.")
+
 # Mapeamentos para facilitar
-cliente_options = {f"{c[1]} ({c[4]})": c[0] for c in clientes} # "Nome (Telefone)": ID
-marmita_options = {f"{m[1]} (${m[2]:.2f})": {"id": m[0], "preco": m[2]} for m in marmitas_disponiveis} # "Nome ($Preco)": {id, preco}
+cliente_options = {f"{c[1]} ({c[4]})": c[0] for c in clientes_encontrados} # "Nome (Telefone)": ID
 semana_options = {s[1]: s[0] for s in semanas} # "Nome Semana": ID
 
-# Garantir inicialização do estado da sessão para itens do pedido
-if "itens_pedido_atual" not in st.session_state:
-    st.session_state.itens_pedido_atual = []
+# Carrinho do pedido em edição: itens por marmita_id e total mantido a cada alteração
+if "carrinho_pedido" not in st.session_state:
+    st.session_state.carrinho_pedido = cart.Carrinho()
+carrinho = st.session_state.carrinho_pedido
+
+# Itens fora do formulário: os botões de adicionar/remover precisam rodar a página na hora
+st.write("**Itens do Pedido:**")
+cols_item = st.columns([3, 1, 1], vertical_alignment="bottom")
+marmita_id_selecionada = cols_item[0].selectbox("Selecione a Marmita (Disponível)", options=cardapio.ids(),
+                                                format_func=cardapio.rotulo, key="marmita_select")
+quantidade = cols_item[1].number_input("Quantidade", min_value=1, value=1, step=1, key="qtd_select")
+if cols_item[2].button("Adicionar Item", key="add_item_btn", width="stretch"):
+    carrinho.adicionar(cardapio[marmita_id_selecionada], int(quantidade))
+
+if len(carrinho):
+    formatting.tabela(pd.DataFrame(
+        [(item.nome, item.quantidade, item.preco_unitario, item.subtotal) for item in carrinho],
+        columns=["Marmita", "Quantidade", "Preço ($)", "Subtotal ($)"],
+    ))
+    cols_remover = st.columns([3, 1, 1, 1, 1], vertical_alignment="bottom")
+    marmita_id_remover = cols_remover[0].selectbox("Item", options=list(carrinho.itens),
+                                                   format_func=lambda m_id: carrinho.itens[m_id].nome, key="marmita_remover")
+    item_remover = carrinho.itens[marmita_id_remover]
+    # Chave por item e quantidade: ao trocar de item ou alterar o carrinho, o campo mostra a quantidade atual
+    nova_quantidade = cols_remover[1].number_input("Nova Quantidade", min_value=0, step=1, value=item_remover.quantidade,
+                                                   key=f"qtd_item_{marmita_id_remover}_{item_remover.quantidade}",
+                                                   help="0 remove o item.")
+    if cols_remover[2].button("Alterar Quantidade", key="alt_item_btn", width="stretch"):
+        carrinho.definir_quantidade(marmita_id_remover, int(nova_quantidade))
+        st.rerun()
+    if cols_remover[3].button("Remover Item", key="rem_item_btn", width="stretch"):
+        carrinho.remover(marmita_id_remover)
+        st.rerun()
+    if cols_remover[4].button("Limpar Itens", key="limpar_itens_btn", width="stretch"):
+        carrinho.limpar()
+        st.rerun()
+    st.markdown(f"**{carrinho.quantidade_total} marmitas — Valor Total: ${carrinho.total:.2f}**")
+else:
+    st.write("Nenhum item adicionado ainda.")
 
 with st.form("pedido_form"):
     col_form1, col_form2 = st.columns(2)
     with col_form1:
-        cliente_selecionado_nome = st.selectbox("Selecione o Cliente", options=cliente_options.keys())
+        cliente_selecionado_nome = st.selectbox("Selecione o Cliente", options=cliente_options.keys(),
+                                                help=f"Mostra até {db.CLIENTES_BUSCA_LIMITE} clientes encontrados pela busca acima.")
     with col_form2:
         semana_selecionada_nome = st.selectbox("Selecione a Semana do Pedido", options=semana_options.keys())
 
-    st.write("**Itens do Pedido:**")
-
-    cols_item = st.columns([3, 1, 1])
-    marmita_selecionada_nome = cols_item[0].selectbox("Selecione a Marmita (Disponível)", options=marmita_options.keys(), key="marmita_select")
-    quantidade = cols_item[1].number_input("Quantidade", min_value=1, value=1, step=1, key="qtd_select")
-
-    # Botão Adicionar Item fora do loop de exibição
-    if cols_item[2].button("Adicionar Item", key="add_item_btn"):
-        if marmita_selecionada_nome:
-            marmita_info = marmita_options[marmita_selecionada_nome]
-            # Verificar se o item já existe na lista
-            item_existente_index = -1
-            for index, item in enumerate(st.session_state.itens_pedido_atual):
-                if item["marmita_id"] == marmita_info["id"]:
-                    item_existente_index = index
-                    break
-            
-            if item_existente_index != -1:
-                # Atualiza quantidade se item já existe
-                st.session_state.itens_pedido_atual[item_existente_index]["quantidade"] += quantidade
-            else:
-                # Adiciona novo item
-                st.session_state.itens_pedido_atual.append({
-                    "marmita_id": marmita_info["id"],
-                    "nome": marmita_selecionada_nome.split(" ($")[0], # Pega só o nome
-                    "quantidade": quantidade,
-                    "preco_unitario": marmita_info["preco"]
-                })
-            st.rerun() # Recarrega para mostrar item adicionado/atualizado
-
-    # Exibir itens adicionados e permitir remoção
-    valor_total_calculado = 0.0
-    indices_para_remover = []
-    if st.session_state.itens_pedido_atual:
-        st.write("Itens adicionados:")
-        for i, item in enumerate(st.session_state.itens_pedido_atual):
-            cols_show = st.columns([4, 1, 1, 1])
-            item_total = item["quantidade"] * item["preco_unitario"]
-            valor_total_calculado += item_total
-            cols_show[0].write(f"- {item['nome']} (${item['preco_unitario']:.2f})")
-            cols_show[1].write(f"Qtd: {item['quantidade']}")
-            cols_show[2].write(f"Sub: ${item_total:.2f}")
-            # Botão Remover - Apenas marca para remover depois do loop
-            if cols_show[3].button(f"Remover", key=f"rem_{i}"):
-                indices_para_remover.append(i)
-        
-        # Remover itens marcados (fora do loop de exibição)
-        if indices_para_remover:
-            # Remover pelos índices em ordem reversa para não afetar os índices restantes
-            for index in sorted(indices_para_remover, reverse=True):
-                del st.session_state.itens_pedido_atual[index]
-            st.rerun() # Recarrega após remover
-
-        st.markdown(f"**Valor Total: ${valor_total_calculado:.2f}**")
-    else:
-        st.write("Nenhum item adicionado ainda.")
-
     # Outros campos do pedido
     forma_pagamento = st.selectbox("Forma de Pagamento", ["Dinheiro", "Cartão", "Pix", "Outro"])
     status_pagamento = st.selectbox("Status Pagamento", ["Pendente", "Pago"])
-    status_entrega = st.selectbox("Status Entrega", ["Pendente", "Em Preparo", "Saiu para Entrega", "Entregue", "Cancelado"])
+    status_entrega = st.selectbox("Status Entrega", db.STATUS_ENTREGA)
 
     submitted = st.form_submit_button("Registrar Pedido")
 
     if submitted:
-        # Verificar se a lista de itens existe e não está vazia ANTES de acessá-la
-        if "itens_pedido_atual" not in st.session_state or not st.session_state.itens_pedido_atual:
-             st.warning("Adicione pelo menos um item ao pedido.")
+        if not len(carrinho):
+            st.warning("Adicione pelo menos um item ao pedido.")
         elif not cliente_selecionado_nome:
             st.warning("Selecione um cliente.")
         elif not semana_selecionada_nome:
-             st.warning("Selecione a semana do pedido.")
+            st.warning("Selecione a semana do pedido.")
         else:
-            # Agora é seguro acessar st.session_state.itens_pedido_atual
             cliente_id = cliente_options[cliente_selecionado_nome]
             semana_id = semana_options[semana_selecionada_nome]
-            pedido_id = db.add_pedido(conn, cliente_id, semana_id, valor_total_calculado, forma_pagamento, status_pagamento, status_entrega, st.session_state.itens_pedido_atual)
+            pedido_id = db.add_pedido(conn, cliente_id, semana_id, carrinho.total, forma_pagamento, status_pagamento, status_entrega, carrinho.itens_pedido())
             if pedido_id:
                 st.success(f"Pedido #{pedido_id} registrado com sucesso para a {semana_selecionada_nome}!")
-                # Limpar itens do estado da sessão após sucesso
-                st.session_state.itens_pedido_atual = [] 
+                carrinho.limpar() # Carrinho vazio para o próximo pedido
                 st.rerun() # Recarrega para limpar form e atualizar histórico
             # else: Erro já é mostrado pela função db
 
+# --- Importação em Lote ---
+with st.expander("📥 Importar Pedidos em Lote (CSV, JSON ou Excel)"):
+    st.write("Uma linha por item. Linhas com o mesmo número em **pedido** formam um único pedido. "
+             "Cliente pelo **telefone** (ou cliente_id), **semana** pelo nome (ou semana_id) e **marmita** pelo nome (ou marmita_id). "
+             "Sem **preco_unitario**, usa o preço atual da marmita.")
+    st.download_button("Baixar Modelo CSV", data=bulk_import.MODELO_CSV, file_name="modelo_importacao_pedidos.csv", mime="text/csv")
+    arquivo_importacao = st.file_uploader("Arquivo de pedidos", type=["csv", "json", "xlsx"], key="arquivo_importacao")
+    if arquivo_importacao is not None and st.button("Importar Pedidos", key="importar_pedidos_btn"):
+        with st.spinner("Importando pedidos..."):
+            resultado = bulk_import.importar_pedidos(conn, arquivo_importacao, arquivo_importacao.name)
+        if resultado["pedidos_importados"]:
+            st.success(f"{resultado['pedidos_importados']} pedidos ({resultado['itens_importados']} itens) importados em "
+                       f"{resultado['segundos']:.2f}s ({resultado['pedidos_por_segundo']:.0f} pedidos/s).")
+        if resultado["erros"]:
+            st.warning(f"{len(resultado['erros'])} linha(s) com erro. Os pedidos dessas linhas não foram importados.")
+            formatting.tabela(pd.DataFrame(resultado["erros"], columns=["Linha", "Erro"]))
+
 # --- Histórico de Pedidos ---
-# (O restante do código permanece o mesmo, pois o erro estava no registro)
 st.divider()
 st.subheader("Histórico de Pedidos")
 
@@ -149,12 +145,25 @@ semana_filtro_options.update({s[1]: s[0] for s in semanas})
 semana_selecionada_filtro = st.selectbox("Filtrar por Semana:", options=semana_filtro_options.keys())
 semana_id_filtro = semana_filtro_options[semana_selecionada_filtro]
 
-# Passar o filtro para a função que busca os pedidos
-pedidos_df = db.get_all_pedidos_info(conn, semana_id_filter=semana_id_filtro)
+# Paginação keyset: guarda o cursor de início de cada página visitada (a última é a atual)
+col_tamanho, col_expandida = st.columns([1, 2])
+tamanho_pagina = col_tamanho.selectbox("Pedidos por página:", options=[25, 50, 100, 250, 500], index=1, key="hist_tamanho_pagina")
+visao_expandida = col_expandida.toggle("Visão expandida (itens de cada pedido)", key="hist_visao_expandida",
+                                       help="Mostra os itens na própria tabela; todos os itens da página vêm de uma única consulta.")
+chave_paginacao = (semana_id_filtro, tamanho_pagina)
+if st.session_state.get("hist_chave_paginacao") != chave_paginacao:
+    st.session_state.hist_chave_paginacao = chave_paginacao
+    st.session_state.hist_cursores = [None] # Filtro mudou: volta para a primeira página
+
+# Buscar apenas a janela visível (total vem dos contadores mantidos por triggers)
+pedidos_df, proximo_cursor = db.get_pedidos_page(conn, semana_id_filter=semana_id_filtro, page_size=tamanho_pagina, cursor=st.session_state.hist_cursores[-1])
+total_pedidos_filtro = db.count_pedidos(conn, semana_id_filter=semana_id_filtro)
+pagina_atual = len(st.session_state.hist_cursores)
+total_paginas = max(1, -(-total_pedidos_filtro // tamanho_pagina))
 
 if not pedidos_df.empty:
-    # Formatar valor total
-    pedidos_df["valor_total"] = pedidos_df["valor_total"].apply(lambda x: f"${x:.2f}")
+    # Data como datetime (conversão da coluna inteira); o valor continua numérico e é formatado na tabela
+    pedidos_df["data_hora"] = formatting.para_datetime(pedidos_df["data_hora"])
     # Renomear e reordenar colunas
     pedidos_df = pedidos_df.rename(columns={
         "id": "ID",
@@ -170,10 +179,30 @@ if not pedidos_df.empty:
     col_order = ["ID", "Data/Hora", "Semana", "Cliente", "Total ($)", "Pagamento", "Status Pgto", "Status Entrega"]
     pedidos_df = pedidos_df[col_order]
 
-    st.dataframe(pedidos_df, hide_index=True, use_container_width=True)
+    if visao_expandida:
+        itens_pagina = db.get_itens_por_pedidos(conn, tuple(int(p) for p in pedidos_df["ID"]))
+        pedidos_df.insert(4, "Itens", [
+            ", ".join(f"{qtd}x {nome}" for qtd, nome, _ in db.itens_do_pedido(itens_pagina, pedido_id))
+            for pedido_id in pedidos_df["ID"]
+        ])
+
+    formatting.tabela(pedidos_df)
+
+    # Navegação entre páginas
+    col_nav1, col_nav2, col_nav3 = st.columns([1, 3, 1])
+    if col_nav1.button("◀ Anterior", disabled=pagina_atual == 1, key="hist_anterior"):
+        st.session_state.hist_cursores.pop()
+        st.rerun()
+    col_nav2.caption(f"Página {pagina_atual} de {total_paginas} — {total_pedidos_filtro} pedidos")
+    if col_nav3.button("Próxima ▶", disabled=proximo_cursor is None, key="hist_proxima"):
+        st.session_state.hist_cursores.append(proximo_cursor)
+        st.rerun()
+
+    with st.expander("⬇️ Exportar Histórico"):
+        export.botoes_exportacao(conn, ["pedidos", "itens_pedido"], semana_id=semana_id_filtro, key="exportar_historico")
 
     st.subheader("Detalhes e Ações")
-    # Filtrar IDs disponíveis com base no filtro de semana
+    # IDs disponíveis: apenas os pedidos da página visível
     ids_disponiveis = pedidos_df["ID"].tolist()
     pedido_id_detalhe = st.selectbox("Selecione o ID do Pedido para ver detalhes ou alterar status", options=[""] + ids_disponiveis)
 
@@ -221,9 +250,5 @@ if not pedidos_df.empty:
 else:
     st.info("Nenhum pedido registrado ainda" + (f" para a {semana_selecionada_filtro}." if semana_id_filtro else "."))
 
-# Fechar conexão no final do script (opcional)
-# finally:
-#     if conn:
-#         conn.close()
-#         print("Connection closed in 3_Pedidos.py")
 
+# A conexão pertence ao pool de database.py e não deve ser fechada aqui.
@@ -1,19 +1,13 @@
 import streamlit as st
 import database as db
+import bootstrap
+import formatting
+import export
+import analytics
+import jobs
 import pandas as pd
 
-# --- Autenticação ---
-if "logged_in" not in st.session_state or not st.session_state["logged_in"]:
-    st.error("⚠️ Você precisa fazer login para acessar esta página.")
-    st.stop()
-
-# --- Conexão com Banco de Dados ---
-conn = db.create_connection()
-if not conn:
-    st.error("Falha crítica: Não foi possível conectar ao banco de dados nesta página.")
-    st.stop()
-
-st.set_page_config(page_title="Relatórios", page_icon="📊", layout="wide")
+conn, _ = bootstrap.setup_page("Relatórios", "Relatórios", "📊") # login, conexão do pool e instrumentação
 
 st.title("📊 Relatórios de Gestão")
 
@@ -37,25 +31,45 @@ report_type = st.selectbox("Selecione o tipo de relatório:", [
     "Vendas por Cliente",
     "Marmitas por Cliente",
     "Vendas Gerais (por Dia)",
-    "Marmitas Mais Vendidas"
+    "Marmitas Mais Vendidas",
+    "Comparativo Semanal"
 ])
 
 st.divider()
 
 # --- Exibição do Relatório (com filtro de semana aplicado) ---
 
-filtro_aplicado_msg = f" para 	'{semana_selecionada_filtro_nome}	'" if semana_id_filtro else " (Geral)"
+filtro_aplicado_msg = f" para '{semana_selecionada_filtro_nome}'" if semana_id_filtro else " (Geral)"
+
+def carregar_relatorio(nome):
+    """Relatório de uma semana é lido direto; o geral roda como job em segundo plano.
+
+    Retorna o DataFrame, ou None enquanto o job ainda estiver executando (o painel mostra o progresso).
+    """
+    if semana_id_filtro:
+        return jobs.RELATORIOS[nome](conn, semana_id_filter=semana_id_filtro)
+    try:
+        job_id = jobs.submit_job("relatorio", {"nome": nome}, criado_por=st.session_state.get("username"))
+    except (RuntimeError, ValueError) as e:
+        st.error(f"Erro ao iniciar o relatório: {e}")
+        return None
+    status = jobs.painel_job(job_id, key=f"relatorio_{nome}")
+    if not status or status["status"] != "concluido":
+        return None
+    return jobs.get_job_result(job_id)
 
 if report_type == "Vendas por Cliente":
     st.subheader(f"Vendas por Cliente{filtro_aplicado_msg}")
-    df_vendas_cliente = db.get_vendas_por_cliente(conn, semana_id_filter=semana_id_filtro)
-    if not df_vendas_cliente.empty:
-        st.dataframe(df_vendas_cliente, hide_index=True, use_container_width=True)
+    df_vendas_cliente = carregar_relatorio("vendas_por_cliente")
+    if df_vendas_cliente is None:
+        pass # em processamento
+    elif not df_vendas_cliente.empty:
+        formatting.tabela(df_vendas_cliente)
         try:
             total_geral = df_vendas_cliente["Total Gasto ($)"].sum()
             st.metric(f"Total Vendido{filtro_aplicado_msg}", f"${total_geral:.2f}")
         except KeyError:
-            st.warning("Coluna 	'Total Gasto ($)	' não encontrada.")
+            st.warning("Coluna 'Total Gasto ($)' não encontrada.")
         except Exception as e:
             st.error(f"Erro ao calcular total: {e}")
     else:
@@ -63,7 +77,8 @@ if report_type == "Vendas por Cliente":
 
 elif report_type == "Marmitas por Cliente":
     st.subheader(f"Marmitas Consumidas por Cliente{filtro_aplicado_msg}")
-    clientes = db.get_all_clientes(conn)
+    busca_cliente = st.text_input("Buscar Cliente:", placeholder="Nome, endereço ou telefone", key="marmita_cliente_busca")
+    clientes = db.search_clientes(conn, busca_cliente) if busca_cliente else []
     if clientes:
         cliente_options = {f"{c[1]} ({c[4]})": c[0] for c in clientes}
         cliente_selecionado_nome = st.selectbox("Selecione o Cliente:", options=cliente_options.keys(), key="marmita_cliente_select")
@@ -71,24 +86,28 @@ elif report_type == "Marmitas por Cliente":
             cliente_id = cliente_options[cliente_selecionado_nome]
             df_marmitas_cliente = db.get_marmitas_por_cliente(conn, cliente_id, semana_id_filter=semana_id_filtro)
             if not df_marmitas_cliente.empty:
-                st.dataframe(df_marmitas_cliente, hide_index=True, use_container_width=True)
+                formatting.tabela(df_marmitas_cliente)
             else:
-                st.info(f"Nenhum pedido encontrado para o cliente 	'{cliente_selecionado_nome.split(	' (	')[0]}	'{filtro_aplicado_msg}.")
-    else:
+                st.info(f"Nenhum pedido encontrado para o cliente '{cliente_selecionado_nome.split(' (')[0]}'{filtro_aplicado_msg}.")
+    elif busca_cliente:
+        st.info("Nenhum cliente encontrado para a busca.")
+    elif not db.get_dashboard_metrics(conn).get("total_clientes"):
         st.warning("Nenhum cliente cadastrado para gerar este relatório.")
 
 elif report_type == "Vendas Gerais (por Dia)":
     st.subheader(f"Vendas Gerais por Dia{filtro_aplicado_msg}")
-    df_vendas_geral = db.get_vendas_geral(conn, semana_id_filter=semana_id_filtro)
-    if not df_vendas_geral.empty:
-        st.dataframe(df_vendas_geral, hide_index=True, use_container_width=True)
+    df_vendas_geral = carregar_relatorio("vendas_geral")
+    if df_vendas_geral is None:
+        pass # em processamento
+    elif not df_vendas_geral.empty:
+        formatting.tabela(df_vendas_geral)
         try:
-            chart_data = df_vendas_geral.rename(columns={	'Dia	': 	'index	'}).set_index(	'index	')["Vendas ($)"]
+            chart_data = df_vendas_geral.rename(columns={'Dia': 'index'}).set_index('index')["Vendas ($)"]
             st.line_chart(chart_data)
             total_geral = df_vendas_geral["Vendas ($)"].sum()
             st.metric(f"Total Vendido{filtro_aplicado_msg}", f"${total_geral:.2f}")
         except KeyError:
-             st.warning("Coluna 	'Vendas ($)	' ou 	'Dia	' não encontrada.")
+             st.warning("Coluna 'Vendas ($)' ou 'Dia' não encontrada.")
         except Exception as e:
             st.error(f"Erro ao gerar gráfico ou calcular total: {e}")
     else:
@@ -96,22 +115,62 @@ elif report_type == "Vendas Gerais (por Dia)":
 
 elif report_type == "Marmitas Mais Vendidas":
     st.subheader(f"Marmitas Mais Vendidas{filtro_aplicado_msg}")
-    df_mais_vendidas = db.get_marmitas_mais_vendidas(conn, semana_id_filter=semana_id_filtro)
-    if not df_mais_vendidas.empty:
-        st.dataframe(df_mais_vendidas, hide_index=True, use_container_width=True)
+    df_mais_vendidas = carregar_relatorio("marmitas_mais_vendidas")
+    if df_mais_vendidas is None:
+        pass # em processamento
+    elif not df_mais_vendidas.empty:
+        formatting.tabela(df_mais_vendidas)
         try:
-            chart_data = df_mais_vendidas.rename(columns={	'Marmita	': 	'index	'}).set_index(	'index	')["Quantidade"]
+            chart_data = df_mais_vendidas.rename(columns={'Marmita': 'index'}).set_index('index')["Quantidade"]
             st.bar_chart(chart_data)
         except KeyError:
-            st.warning("Coluna 	'Marmita	' ou 	'Quantidade	' não encontrada.")
+            st.warning("Coluna 'Marmita' ou 'Quantidade' não encontrada.")
         except Exception as e:
             st.error(f"Erro ao gerar gráfico: {e}")
     else:
         st.info(f"Nenhum item de pedido registrado para gerar este relatório{filtro_aplicado_msg}.")
 
-# Fechar conexão no final do script (opcional)
-# finally:
-#     if conn:
-#         conn.close()
-#         print("Connection closed in 4_Relatorios.py")
+elif report_type == "Comparativo Semanal":
+    ate_msg = f" até '{semana_selecionada_filtro_nome}'" if semana_id_filtro else ""
+    n_semanas = st.slider("Número de semanas:", min_value=4, max_value=52,
+                          value=analytics.ANALISE_SEMANAS_PADRAO, key="comparativo_n_semanas")
+    st.subheader(f"Comparativo das Últimas {n_semanas} Semanas{ate_msg}")
+    df_tendencias = analytics.get_tendencias_semanais(conn, n_semanas, semana_id_filtro)
+    if not df_tendencias.empty and df_tendencias["Pedidos"].sum():
+        ultima = df_tendencias.iloc[-1]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Receita da Semana", f"${ultima['Receita ($)']:.2f}",
+                    None if pd.isna(ultima["Receita vs Semana Anterior"]) else f"{ultima['Receita vs Semana Anterior']:+.1%}")
+        col2.metric("Pedidos", int(ultima["Pedidos"]),
+                    None if pd.isna(ultima["Pedidos vs Semana Anterior"]) else f"{ultima['Pedidos vs Semana Anterior']:+.1%}")
+        col3.metric("Ticket Médio", "-" if pd.isna(ultima["Ticket Médio ($)"]) else f"${ultima['Ticket Médio ($)']:.2f}",
+                    None if pd.isna(ultima["Ticket vs Semana Anterior"]) else f"{ultima['Ticket vs Semana Anterior']:+.1%}")
+        col4.metric("Retenção", "-" if pd.isna(ultima["Retenção"]) else f"{ultima['Retenção']:.0%}",
+                    help="Fração dos clientes da semana anterior que voltaram a comprar nesta semana.")
+
+        st.markdown("**Receita por Semana**")
+        st.line_chart(df_tendencias, x="Semana", y="Receita ($)")
+        col_clientes, col_retencao = st.columns(2)
+        col_clientes.markdown("**Clientes Novos x Recorrentes**")
+        col_clientes.bar_chart(analytics.formato_longo(df_tendencias, ["Clientes Novos", "Clientes Recorrentes"]),
+                               x="Semana", y="Valor", color="Métrica")
+        col_retencao.markdown("**Retenção**")
+        col_retencao.line_chart(df_tendencias, x="Semana", y="Retenção")
+
+        formatting.tabela(df_tendencias.drop(columns=["ordem", "semana_id"]), colunas={
+            "Retenção": formatting.PERCENTUAL,
+            "Receita vs Semana Anterior": formatting.VARIACAO,
+            "Pedidos vs Semana Anterior": formatting.VARIACAO,
+            "Ticket vs Semana Anterior": formatting.VARIACAO,
+        })
+    else:
+        st.info(f"Nenhum pedido registrado nas semanas do comparativo{ate_msg}.")
+
+# --- Exportação (job em segundo plano, lida do banco em lotes, sem montar DataFrames) ---
+st.divider()
+with st.expander(f"⬇️ Exportar Relatórios{filtro_aplicado_msg}"):
+    export.botoes_exportacao(conn, ["vendas_por_cliente", "vendas_por_dia", "marmitas_mais_vendidas", "pedidos", "itens_pedido"],
+                             semana_id=semana_id_filtro, key="exportar_relatorios")
+
 
+# A conexão pertence ao pool de database.py e não deve ser fechada aqui.
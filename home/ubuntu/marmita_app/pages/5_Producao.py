@@ -0,0 +1,46 @@
+import streamlit as st
+import database as db
+import bootstrap
+import formatting
+import documents
+
+conn, _ = bootstrap.setup_page("Produção", "Produção", "👩‍🍳") # login, conexão do pool e instrumentação
+
+st.title("👩‍🍳 Plano de Produção da Cozinha")
+
+semanas = db.get_all_semanas(conn)
+if not semanas:
+    st.warning("Nenhuma semana cadastrada. Cadastre semanas primeiro na seção 'Semanas'.")
+    st.stop()
+
+semana_options = {s[1]: s[0] for s in semanas} # "Nome Semana": ID (mais recente primeiro)
+col_semana, col_auto = st.columns([3, 1])
+semana_nome = col_semana.selectbox("Semana:", options=semana_options.keys(), key="producao_semana")
+atualizar = col_auto.toggle("Atualizar automaticamente", value=True, key="producao_auto",
+                            help="Relê o plano a cada 5 segundos (leitura da tabela de produção, em milissegundos).")
+
+# Só o plano é reexecutado na atualização automática, não a página inteira
+@st.fragment(run_every=5.0 if atualizar else None)
+def plano(semana_id):
+    df = db.get_plano_producao(conn, semana_id)
+    if df.empty:
+        st.info("Nenhuma marmita pedida nesta semana (pedidos cancelados não entram no plano).")
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("A Produzir", int(df["A Produzir"].sum()), help="Porções de pedidos Pendentes ou Em Preparo.")
+    col2.metric("Total da Semana", int(df["Total"].sum()), help="Todas as porções, exceto de pedidos cancelados.")
+    col3.metric("Marmitas Diferentes", len(df))
+    formatting.tabela(df)
+    st.bar_chart(df.set_index("Marmita")[list(db.STATUS_A_PRODUZIR)])
+
+plano(semana_options[semana_nome])
+
+# --- Comandas e Etiquetas ---
+st.divider()
+st.subheader("🖨️ Comandas e Etiquetas")
+st.caption("Um PDF com a comanda da cozinha (4 por página) e/ou a etiqueta de endereço (folha Avery 5160, 30 por página) "
+           "de cada pedido Pendente ou Em Preparo da semana.")
+documents.botao_documentos(semana_options[semana_nome], key="producao_documentos")
+
+
+# A conexão pertence ao pool de database.py e não deve ser fechada aqui.
@@ -0,0 +1,122 @@
+import streamlit as st
+import database as db
+import bootstrap
+import formatting
+import delivery
+import pandas as pd
+
+conn, _ = bootstrap.setup_page("Entregas", "Entregas", "🚚") # login, conexão do pool e instrumentação
+
+st.title("🚚 Lotes de Entrega")
+
+# Cores dos lotes no mapa (repetidas quando há mais lotes que cores)
+CORES_LOTES = ["#e6194b", "#3cb44b", "#4363d8", "#f58231", "#911eb4", "#42d4f4", "#f032e6", "#9a6324", "#800000", "#000075"]
+
+# --- Tabela de ZIPs (geocodificação offline) ---
+total_zips = db.count_zip_centroides(conn)
+with st.expander(f"🗺️ Tabela de ZIPs ({total_zips} carregados)", expanded=not total_zips):
+    st.caption("As coordenadas dos clientes vêm do centroide do ZIP do endereço, sem serviço externo. "
+               "Envie um CSV/TSV com as colunas zip, latitude e longitude — por exemplo o arquivo "
+               "Gazetteer de ZCTAs do Census (GEOID, INTPTLAT, INTPTLONG).")
+    arquivo_zips = st.file_uploader("Arquivo de ZIPs", type=["csv", "txt", "tsv"], key="arquivo_zips")
+    if arquivo_zips is not None and st.button("Carregar ZIPs"):
+        try:
+            with st.spinner("Carregando..."):
+                gravados = delivery.carregar_zip_centroides(conn, arquivo_zips)
+            st.success(f"{gravados} ZIPs carregados. As coordenadas dos clientes serão recalculadas.")
+            st.rerun()
+        except ValueError as e:
+            st.error(f"Arquivo inválido: {e}")
+
+if not total_zips:
+    st.info("Carregue a tabela de ZIPs para montar os lotes de entrega.")
+    st.stop()
+
+# --- Filtros ---
+semanas = db.get_all_semanas(conn)
+if not semanas:
+    st.warning("Nenhuma semana cadastrada. Cadastre semanas primeiro na seção 'Semanas'.")
+    st.stop()
+semana_options = {s[1]: s[0] for s in semanas}
+col_semana, col_status = st.columns([2, 3])
+semana_nome = col_semana.selectbox("Semana:", options=semana_options.keys(), key="entregas_semana")
+status_selecionados = col_status.multiselect("Pedidos com status:", options=db.STATUS_ENTREGA,
+                                             default=["Pendente", "Em Preparo"], key="entregas_status")
+col_paradas, col_marmitas, col_deposito = st.columns(3)
+max_paradas = col_paradas.number_input("Máx. de paradas por lote", min_value=1, value=delivery.LOTE_MAX_PARADAS, step=1)
+max_marmitas = col_marmitas.number_input("Máx. de marmitas por lote (0 = sem limite)", min_value=0, value=0, step=10)
+zip_deposito = col_deposito.text_input("ZIP de saída dos entregadores", placeholder="Ex.: 32801 (opcional)")
+
+entregas = db.get_entregas_semana(conn, semana_options[semana_nome], tuple(status_selecionados))
+if not entregas:
+    st.info("Nenhuma entrega com esses status nesta semana.")
+    st.stop()
+
+# Clientes desta lista ainda sem coordenada em cache são geocodificados agora (só uma vez)
+sem_cache = [e["cliente_id"] for e in entregas if e["latitude"] is None]
+if sem_cache and delivery.geocodificar_clientes(conn, sem_cache)["geocodificados"]:
+    entregas = db.get_entregas_semana(conn, semana_options[semana_nome], tuple(status_selecionados))
+
+deposito = None
+if zip_deposito.strip():
+    deposito = db.get_zip_centroides(conn, [zip_deposito.strip()]).get(zip_deposito.strip())
+    if deposito is None:
+        st.warning(f"ZIP {zip_deposito} não encontrado na tabela; usando o centro das entregas como ponto de saída.")
+
+lotes = delivery.montar_lotes(entregas, max_paradas=max_paradas, max_marmitas=max_marmitas or None, deposito=deposito)
+sem_localizacao = [e for e in entregas if e["latitude"] is None]
+
+col1, col2, col3, col4 = st.columns(4)
+col1.metric("Paradas", len(entregas) - len(sem_localizacao))
+col2.metric("Lotes", len(lotes))
+col3.metric("Marmitas", sum(l["marmitas"] for l in lotes))
+col4.metric("Distância Estimada", f"{sum(l['distancia_km'] for l in lotes):.1f} km",
+            help="Soma das rotas em linha reta a partir do ponto de saída, entre centroides de ZIP.")
+
+# --- Mapa e Lotes ---
+linhas = []
+for n, lote in enumerate(lotes, start=1):
+    for ordem, parada in enumerate(lote["paradas"], start=1):
+        linhas.append({
+            "Lote": n, "Ordem": ordem, "Cliente": parada["nome"], "Endereço": parada["endereco"],
+            "Complemento": parada["complemento"], "Telefone": parada["telefone"], "Marmitas": parada["marmitas"],
+            "Pedidos": len(parada["pedidos"]), "latitude": parada["latitude"], "longitude": parada["longitude"],
+            "cor": CORES_LOTES[(n - 1) % len(CORES_LOTES)],
+        })
+df_paradas = pd.DataFrame(linhas)
+st.map(df_paradas, latitude="latitude", longitude="longitude", color="cor")
+
+st.subheader("Paradas por Lote")
+formatting.tabela(df_paradas.drop(columns=["latitude", "longitude", "cor"]))
+
+lote_options = {f"Lote {n} — {len(l['paradas'])} paradas, {l['marmitas']} marmitas, {l['distancia_km']:.1f} km": l
+                for n, l in enumerate(lotes, start=1)}
+col_lote, col_botao = st.columns([3, 1])
+lote_nome = col_lote.selectbox("Lote:", options=lote_options.keys(), key="entregas_lote")
+if col_botao.button("Marcar como 'Saiu para Entrega'", width="stretch"):
+    pedido_ids = [p for parada in lote_options[lote_nome]["paradas"] for p in parada["pedidos"]]
+    if db.set_status_entrega(conn, pedido_ids, "Saiu para Entrega"):
+        st.success(f"{len(pedido_ids)} pedidos marcados como 'Saiu para Entrega'.")
+        st.rerun()
+
+with st.expander("📍 Clientes próximos de uma parada"):
+    st.caption("Clientes cadastrados perto da parada (busca na grade espacial), por exemplo para oferecer entrega no mesmo lote.")
+    paradas_options = {f"{l['Cliente']} (Lote {l['Lote']})": (l["latitude"], l["longitude"]) for l in linhas}
+    col_parada, col_raio = st.columns([3, 1])
+    parada_nome = col_parada.selectbox("Parada:", options=paradas_options.keys(), key="entregas_parada_proximos")
+    raio = col_raio.number_input("Raio (km)", min_value=0.5, max_value=50.0, value=2.0, step=0.5)
+    na_semana = {e["cliente_id"] for e in entregas}
+    proximos = [p for p in db.get_clientes_proximos(conn, *paradas_options[parada_nome], raio, limite=50) if p[0] not in na_semana]
+    if proximos:
+        formatting.tabela(pd.DataFrame([p[1:] for p in proximos], columns=["Cliente", "Endereço", "Telefone", "Distância (km)"]))
+    else:
+        st.info("Nenhum outro cliente nesse raio.")
+
+if sem_localizacao:
+    st.subheader("Sem Localização")
+    st.caption("Endereços sem ZIP ou com ZIP fora da tabela: corrija o endereço em 'Clientes' para incluí-los nos lotes.")
+    formatting.tabela(pd.DataFrame([{"Cliente": e["nome"], "Endereço": e["endereco"], "Telefone": e["telefone"],
+                                     "Marmitas": e["marmitas"]} for e in sem_localizacao]))
+
+
+# A conexão pertence ao pool de database.py e não deve ser fechada aqui.
@@ -0,0 +1,142 @@
+import os
+import sqlite3
+import streamlit as st
+import database as db
+import bootstrap
+import instrumentation
+import formatting
+import jobs
+import backup
+import pandas as pd
+from datetime import datetime
+
+conn, _ = bootstrap.setup_page("Desempenho", "Desempenho", "📈") # login, conexão do pool e instrumentação
+
+st.title("📈 Desempenho do Sistema")
+
+if not instrumentation.ENABLED:
+    st.warning("A instrumentação está desligada (MARMITA_INSTRUMENTATION=0). Apenas o cache é exibido.")
+
+metricas = instrumentation.metricas
+consultas = metricas.resumo_consultas()
+paginas = metricas.resumo_paginas()
+lentas = metricas.consultas_lentas()
+cache = db.query_cache.stats()
+
+st.caption(f"Métricas deste processo desde {datetime.fromtimestamp(metricas.desde):%d/%m/%Y %H:%M:%S}.")
+col1, col2, col3, col4, col5 = st.columns(5)
+col1.metric("Consultas SQL", sum(c["chamadas"] for c in consultas))
+col2.metric("Tempo em SQL", f"{sum(c['total_ms'] for c in consultas) / 1000:.2f} s")
+col3.metric("Consultas Lentas", metricas.total_lentas)
+col4.metric("Execuções de Páginas", sum(p["execucoes"] for p in paginas))
+total_cache = cache["hits"] + cache["misses"]
+col5.metric("Acertos do Cache", f"{cache['hits'] / total_cache:.0%}" if total_cache else "-",
+            help=f"{cache['hits']} acertos, {cache['misses']} faltas, {cache['entries']} entradas")
+
+# --- Páginas ---
+st.subheader("Páginas")
+if paginas:
+    formatting.tabela(pd.DataFrame(paginas).rename(columns={
+        "pagina": "Página", "execucoes": "Execuções", "interrompidas": "Interrompidas", "media_ms": "Média (ms)",
+        "p50_ms": "p50 (ms)", "p95_ms": "p95 (ms)", "max_ms": "Máx (ms)", "consultas_por_execucao": "Consultas/Execução",
+    }))
+    st.caption("Interrompidas: execuções que não chegaram ao fim da página (st.stop, st.rerun ou erro).")
+else:
+    st.info("Nenhuma execução de página registrada ainda.")
+
+# --- Consultas ---
+st.subheader("Consultas SQL (por tempo total)")
+if consultas:
+    formatting.tabela(pd.DataFrame(consultas).rename(columns={
+        "id": "ID", "consulta": "Consulta", "chamadas": "Chamadas", "total_ms": "Total (ms)", "media_ms": "Média (ms)",
+        "p50_ms": "p50 (ms)", "p95_ms": "p95 (ms)", "max_ms": "Máx (ms)", "linhas": "Linhas", "erros": "Erros",
+        "paginas": "Páginas",
+    }))
+else:
+    st.info("Nenhuma consulta registrada ainda.")
+
+# --- Consultas Lentas ---
+st.subheader("Consultas Lentas")
+limiar = st.number_input("Limite de consulta lenta (ms)", min_value=1.0, step=10.0,
+                         value=float(instrumentation.get_slow_query_threshold()), key="limiar_consulta_lenta")
+if limiar != instrumentation.get_slow_query_threshold():
+    instrumentation.set_slow_query_threshold(limiar)
+if lentas:
+    formatting.tabela(pd.DataFrame(lentas).rename(columns={
+        "quando": "Quando", "ms": "Duração (ms)", "linhas": "Linhas", "pagina": "Página", "sessao": "Sessão", "sql": "SQL",
+    }))
+else:
+    st.info(f"Nenhuma consulta acima de {instrumentation.get_slow_query_threshold():.0f} ms.")
+
+# --- Jobs em Segundo Plano ---
+st.subheader("Jobs em Segundo Plano")
+col_vacuum, col_otimizar = st.columns(2)
+if col_vacuum.button("Compactar Banco (VACUUM)", help="Reorganiza o arquivo do banco; bloqueia as escritas enquanto roda."):
+    st.session_state["job_manutencao"] = jobs.submit_job("manutencao", {"vacuum": True}, usar_cache=False,
+                                                         criado_por=st.session_state.get("username"))
+if col_otimizar.button("Otimizar Estatísticas (PRAGMA optimize)"):
+    st.session_state["job_manutencao"] = jobs.submit_job("manutencao", {"vacuum": False}, usar_cache=False,
+                                                         criado_por=st.session_state.get("username"))
+if st.session_state.get("job_manutencao"):
+    status = jobs.painel_job(st.session_state["job_manutencao"], key="job_manutencao")
+    if status and status["status"] == "concluido":
+        resultado = jobs.get_job_result(st.session_state["job_manutencao"])
+        st.success(f"Banco otimizado: {resultado['bytes_antes'] / 1e6:.1f} MB → {resultado['bytes_depois'] / 1e6:.1f} MB.")
+
+df_jobs = db.get_recent_jobs(conn)
+if not df_jobs.empty:
+    df_jobs["status"] = df_jobs["status"].map(jobs.STATUS_ROTULOS).fillna(df_jobs["status"])
+    formatting.tabela(df_jobs.rename(columns={
+        "id": "ID", "tipo": "Tipo", "status": "Status", "progresso": "Progresso", "mensagem": "Mensagem", "erro": "Erro",
+        "criado_por": "Usuário", "criado_em": "Criado em", "iniciado_em": "Iniciado em", "terminado_em": "Terminado em",
+    }), colunas={"Progresso": formatting.PERCENTUAL})
+else:
+    st.info("Nenhum job executado ainda.")
+
+# --- Backups ---
+st.subheader("💾 Backups")
+st.caption(f"Diretório: {backup.diretorio_backups()} — mantidos os {backup.BACKUP_RETENTION} mais recentes"
+           + (f", backup automático a cada {backup.BACKUP_INTERVAL_HOURS:g} h." if backup.BACKUP_INTERVAL_HOURS > 0 else "."))
+if st.button("Fazer Backup Agora", help="Cópia online: o sistema continua funcionando durante o backup."):
+    st.session_state["job_backup"] = jobs.submit_job("backup", usar_cache=False, criado_por=st.session_state.get("username"))
+if st.session_state.get("job_backup"):
+    status = jobs.painel_job(st.session_state["job_backup"], key="job_backup")
+    if status and status["status"] == "concluido":
+        resultado = jobs.get_job_result(st.session_state["job_backup"])
+        st.success(f"Backup gravado em {resultado['arquivo']} ({resultado['bytes'] / 1e6:.1f} MB, {resultado['segundos']:.1f} s).")
+
+backups = backup.listar_backups()
+if backups:
+    formatting.tabela(pd.DataFrame(
+        [(os.path.basename(c), t / 1e6, d) for c, t, d in backups], columns=["Arquivo", "Tamanho (MB)", "Data"]
+    ))
+    with st.expander("Restaurar Backup"):
+        st.warning("O banco atual será substituído pelo backup escolhido (um backup do estado atual é feito antes).")
+        opcoes_backup = {os.path.basename(c): c for c, _, _ in backups}
+        escolhido = st.selectbox("Backup:", options=opcoes_backup.keys(), key="backup_restaurar")
+        confirmar = st.checkbox("Confirmo que quero restaurar este backup.", key="backup_confirmar")
+        if st.button("Restaurar", disabled=not confirmar):
+            try:
+                with st.spinner("Restaurando..."):
+                    r = backup.restaurar(opcoes_backup[escolhido])
+                st.success(f"Banco restaurado de {escolhido}. Estado anterior salvo em {os.path.basename(r['backup_anterior'])}.")
+            except (OSError, sqlite3.Error) as e:
+                st.error(f"Erro ao restaurar o backup: {e}")
+else:
+    st.info("Nenhum backup encontrado.")
+
+# --- Exportação / Manutenção ---
+st.divider()
+col_prom, col_baixar, col_zerar = st.columns(3)
+if col_prom.button("Gravar Arquivo Prometheus"):
+    try:
+        caminho = instrumentation.write_prometheus_file()
+        st.success(f"Métricas gravadas em {caminho}.")
+    except OSError as e:
+        st.error(f"Erro ao gravar o arquivo de métricas: {e}")
+col_baixar.download_button("⬇️ Baixar Métricas (Prometheus)", data=metricas.prometheus(),
+                           file_name="marmita_metrics.prom", mime="text/plain")
+if col_zerar.button("Zerar Métricas"):
+    metricas.reset()
+    st.rerun()
+
@@ -0,0 +1,49 @@
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+from starlette.routing import Route
+
+import streamlit as st
+import auth
+import export
+
+# Ponto de entrada do app: `streamlit run server.py`. Além das páginas (app.py e pages/*),
+# serve as rotas que gravam e apagam o cookie HttpOnly com o token de sessão (ver auth.py)
+# e a que entrega os arquivos exportados sem carregá-los na memória (ver export.py).
+
+def _https(request):
+    # Atrás de um proxy (Streamlit Cloud, nginx) o esquema original vem no X-Forwarded-Proto
+    return request.headers.get("x-forwarded-proto", request.url.scheme) == "https"
+
+async def gravar_sessao(request: Request):
+    """Troca o bilhete de uso único (corpo do POST) pelo cookie com o token."""
+    token = auth.consumir_bilhete((await request.body()).decode("ascii", errors="ignore"))
+    if token is None:
+        return Response(status_code=403)
+    resposta = Response(status_code=204)
+    resposta.set_cookie(auth.COOKIE_SESSAO, token, max_age=int(auth.AUTH_TOKEN_TTL_HOURS * 3600), path="/",
+                        httponly=True, samesite="strict", secure=_https(request))
+    return resposta
+
+async def apagar_sessao(request: Request):
+    resposta = Response(status_code=204)
+    resposta.delete_cookie(auth.COOKIE_SESSAO, path="/", httponly=True, samesite="strict",
+                           secure=_https(request))
+    return resposta
+
+async def baixar_arquivo(request: Request):
+    """Arquivo gerado (exportação, PDF) lido do disco em blocos; o bilhete da URL vem de export.registrar_download."""
+    arquivo = export.abrir_download(request.path_params["bilhete"])
+    if arquivo is None:
+        return Response(status_code=404)
+    caminho, nome_arquivo, mime = arquivo
+    return FileResponse(caminho, media_type=mime, filename=nome_arquivo)
+
+# As páginas usam as rotas (cookie de sessão, downloads em streaming) só quando o app sobe por aqui
+auth.rota_sessao_ativa = True
+export.rota_download_ativa = True
+
+app = st.App("app.py", routes=[
+    Route(auth.ROTA_SESSAO, gravar_sessao, methods=["POST"]),
+    Route(auth.ROTA_SAIR, apagar_sessao, methods=["POST"]),
+    Route(export.ROTA_DOWNLOAD + "/{bilhete}", baixar_arquivo, methods=["GET"]),
+])
@@ -0,0 +1,71 @@
+import sqlite3
+
+import pytest
+
+import benchmark
+import database as db
+
+# Cada teste usa um banco novo num diretório temporário, com o schema completo (migrações
+# aplicadas) e a thread de escrita/pool do módulo apontando para ele.
+
+@pytest.fixture
+def conn(tmp_path):
+    db.use_database(str(tmp_path / "marmita_teste.db"))
+    db.reset_schema_state()
+    conexao = db.get_connection()
+    assert db.init_db(conexao)
+    yield conexao
+    db.shutdown()
+    db.reset_schema_state()
+
+@pytest.fixture
+def dados(conn):
+    """Banco com dados sintéticos reproduzíveis (os mesmos do benchmark, em escala pequena)."""
+    return benchmark.gerar_dados(conn, 400, n_semanas=6, n_marmitas=8, seed=7)
+
+def linhas(conn, sql, params=()):
+    """Resultado ordenado da consulta, com valores reais arredondados (somas feitas em ordens diferentes)."""
+    return sorted(tuple(round(v, 6) if isinstance(v, float) else v for v in row) for row in conn.execute(sql, params))
+
+def recalculado(recalcular, sql):
+    """Linhas de `sql` depois de reconstruir as tabelas com recalcular(c), sem gravar nada.
+
+    Usa uma conexão própria e desfaz a transação no fim: o banco do teste fica como estava.
+    """
+    c = sqlite3.connect(db.DB_FILE)
+    try:
+        c.execute("BEGIN")
+        recalcular(c)
+        return linhas(c, sql)
+    finally:
+        c.rollback()
+        c.close()
+
+def movimentar(conn):
+    """Inclui, altera e exclui pedidos, itens, clientes, marmitas e semanas pelas funções do app.
+
+    Passa por todos os caminhos dos triggers (INSERT/UPDATE/DELETE, ON DELETE SET NULL/CASCADE).
+    """
+    pedidos = [r[0] for r in conn.execute("SELECT id FROM pedidos ORDER BY id")]
+    marmita_id, preco = conn.execute("SELECT id, preco FROM marmitas ORDER BY id LIMIT 1").fetchone()
+    cliente_id, semana_id = conn.execute("SELECT cliente_id, semana_id FROM pedidos ORDER BY id DESC LIMIT 1").fetchone()
+
+    db.add_pedido(conn, cliente_id, semana_id, 3 * preco, "Pix", "Pendente", "Pendente",
+                  [{"marmita_id": marmita_id, "quantidade": 3, "preco_unitario": preco}])
+    for pedido_id in pedidos[:40:3]:
+        db.update_pedido_status(conn, pedido_id, "Pendente", "Em Preparo")
+    db.set_status_entrega(conn, pedidos[1:60:4], "Cancelado")
+    for pedido_id in pedidos[5:30:5]:
+        db.delete_pedido(conn, pedido_id)
+    # Itens alterados direto (quantidade, marmita e pedido), como faria uma edição futura
+    db._write(lambda c: c.execute("UPDATE itens_pedido SET quantidade = quantidade + 2 WHERE pedido_id = ?", (pedidos[-1],)),
+              "itens_pedido")
+    db._write(lambda c: c.execute("UPDATE itens_pedido SET marmita_id = ? WHERE pedido_id = ?", (marmita_id, pedidos[-2])),
+              "itens_pedido")
+    db._write(lambda c: c.execute("UPDATE itens_pedido SET pedido_id = ? WHERE pedido_id = ?", (pedidos[-3], pedidos[-4])),
+              "itens_pedido")
+    db._write(lambda c: c.execute("UPDATE pedidos SET semana_id = ?, valor_total = valor_total + 1 WHERE id = ?",
+                                  (semana_id, pedidos[0])), "pedidos")
+    db.delete_cliente(conn, conn.execute("SELECT cliente_id FROM pedidos WHERE cliente_id IS NOT NULL LIMIT 1").fetchone()[0])
+    db.delete_marmita(conn, conn.execute("SELECT id FROM marmitas ORDER BY id DESC LIMIT 1").fetchone()[0])
+    db.delete_semana(conn, conn.execute("SELECT MIN(semana_id) FROM pedidos").fetchone()[0])
@@ -0,0 +1,49 @@
+import math
+
+import pytest
+
+import analytics
+import database as db
+
+@pytest.fixture
+def semanas(conn):
+    # Semana 3 sem pedidos; as semanas são cadastradas fora de ordem (vale a data de início)
+    ids = {}
+    for nome, inicio in [("Semana 2", "2025-01-13"), ("Semana 1", "2025-01-06"), ("Semana 4", "2025-01-27"), ("Semana 3", "2025-01-20")]:
+        ids[nome] = db.add_semana(conn, nome, inicio)
+    clientes = {nome: db.add_cliente(conn, nome, "Rua A", "", f"40755501{i:02d}") for i, nome in enumerate("ABCD")}
+    for semana, cliente, valor in [("Semana 1", "A", 10.0), ("Semana 1", "B", 20.0),
+                                   ("Semana 2", "A", 15.0), ("Semana 2", "A", 5.0), ("Semana 2", "C", 30.0),
+                                   ("Semana 4", "B", 40.0), ("Semana 4", "C", 10.0)]:
+        db.add_pedido(conn, clientes[cliente], ids[semana], valor, "Pix", "Pago", "Entregue", [])
+    return ids, clientes
+
+def _valores(linha, colunas):
+    return tuple(None if isinstance(linha[c], float) and math.isnan(linha[c]) else round(float(linha[c]), 4) for c in colunas)
+
+def test_novos_recorrentes_e_retencao(conn, semanas):
+    df = analytics.get_tendencias_semanais(conn, n_semanas=4)
+    assert list(df["Semana"]) == ["Semana 1", "Semana 2", "Semana 3", "Semana 4"]
+    colunas = ["Receita ($)", "Pedidos", "Clientes", "Clientes Novos", "Clientes Recorrentes", "Retenção"]
+    assert [_valores(linha, colunas) for _, linha in df.iterrows()] == [
+        (30.0, 2, 2, 2, 0, None),
+        (50.0, 3, 2, 1, 1, 0.5),   # A voltou (1 de 2); C é novo
+        (0.0, 0, 0, 0, 0, 0.0),    # ninguém voltou
+        (50.0, 2, 2, 0, 2, None),  # B e C já tinham comprado; semana anterior vazia
+    ]
+    variacoes = ["Receita vs Semana Anterior", "Pedidos vs Semana Anterior", "Ticket vs Semana Anterior"]
+    assert _valores(df.iloc[1], variacoes) == (round(50 / 30 - 1, 4), 0.5, round((50 / 3) / 15 - 1, 4))
+    assert _valores(df.iloc[2], variacoes)[:2] == (-1.0, -1.0)
+
+def test_janela_usa_a_semana_anterior_para_comparar(conn, semanas):
+    ids, _ = semanas
+    df = analytics.get_tendencias_semanais(conn, n_semanas=1, ate_semana_id=ids["Semana 2"])
+    assert list(df["Semana"]) == ["Semana 2"]
+    # Mesmo fora da janela, a Semana 1 define quem é novo e a retenção
+    assert _valores(df.iloc[0], ["Clientes Novos", "Retenção", "Pedidos vs Semana Anterior"]) == (1, 0.5, 0.5)
+
+def test_cliente_excluido_conta_na_receita_mas_nao_nos_clientes(conn, semanas):
+    _, clientes = semanas
+    db.delete_cliente(conn, clientes["A"])
+    df = analytics.get_tendencias_semanais(conn, n_semanas=4)
+    assert _valores(df.iloc[1], ["Receita ($)", "Pedidos", "Clientes", "Clientes Novos", "Retenção"]) == (50.0, 3, 1, 1, 0.0)
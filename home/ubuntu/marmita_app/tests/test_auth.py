@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import time
+
+import pytest
+from starlette.requests import Request
+
+import auth
+import database as db
+import server
+
+SEGREDO = "segredo-de-teste"
+
+@pytest.fixture(autouse=True)
+def kdf_rapido(monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_PBKDF2_ITERATIONS", 1000)
+    auth._tokens_validos.clear()
+
+def test_hash_e_verificacao_de_senha():
+    hash_novo = auth.hash_password("senha")
+    assert hash_novo.startswith("pbkdf2_sha256$1000$")
+    assert hash_novo != auth.hash_password("senha") # sal aleatório
+    assert auth.verificar_senha("senha", hash_novo)
+    assert not auth.verificar_senha("outra", hash_novo)
+    assert not auth.verificar_senha("senha", "")
+
+def test_hash_legado_e_custo_antigo_precisam_atualizar():
+    legado = hashlib.sha256(b"senha").hexdigest()
+    assert auth.verificar_senha("senha", legado)
+    assert auth.precisa_atualizar(legado)
+    assert auth.precisa_atualizar(auth.hash_password("senha", iteracoes=500))
+    assert not auth.precisa_atualizar(auth.hash_password("senha"))
+
+def _validar(token, estado, segredo=SEGREDO):
+    auth._tokens_validos.clear() # sempre confere o estado informado
+    return auth.validar_token(token, segredo, lambda username, jti: (*estado, False) if username == "ana" else None)
+
+def test_token_valido():
+    estado = (0, auth.hash_password("senha"))
+    token = auth.gerar_token("ana", SEGREDO, *estado)
+    assert _validar(token, estado) == "ana"
+    assert auth.gerar_token("ana", SEGREDO, *estado) != token # jti diferente a cada login
+
+def test_token_conferido_fica_em_memoria(monkeypatch):
+    consultas = []
+    def estado_sessao(username, jti):
+        consultas.append(jti)
+        return (0, "hash", False)
+    token = auth.gerar_token("ana", SEGREDO, 0, "hash")
+    assert [auth.validar_token(token, SEGREDO, estado_sessao) for _ in range(3)] == ["ana"] * 3
+    assert len(consultas) == 1
+    # Troca de senha neste processo: a próxima validação consulta o banco
+    auth.invalidar_usuario("ana")
+    assert auth.validar_token(token, SEGREDO, lambda username, jti: (0, "hash-novo", False)) is None
+    # Depois de AUTH_STATE_TTL o banco é consultado de novo (logout feito em outro processo)
+    monkeypatch.setattr(auth, "AUTH_STATE_TTL", 0)
+    assert auth.validar_token(token, SEGREDO, estado_sessao) == "ana"
+    assert auth.validar_token(token, SEGREDO, lambda username, jti: (0, "hash", True)) is None
+
+@pytest.mark.parametrize("alterar", [
+    lambda token: token[:-2] + ("AA" if not token.endswith("AA") else "BB"),
+    lambda token: "x" + token,
+    lambda token: "",
+    lambda token: "sem-ponto",
+])
+def test_token_adulterado(alterar):
+    estado = (0, "hash")
+    assert _validar(alterar(auth.gerar_token("ana", SEGREDO, *estado)), estado) is None
+
+def test_token_de_outro_segredo_ou_expirado():
+    estado = (0, "hash")
+    assert _validar(auth.gerar_token("ana", "outro", *estado), estado) is None
+    assert _validar(auth.gerar_token("ana", SEGREDO, *estado, validade_horas=-1), estado) is None
+
+def test_geracao_e_troca_de_senha_revogam_o_token():
+    token = auth.gerar_token("ana", SEGREDO, 3, "hash-atual")
+    assert _validar(token, (3, "hash-atual")) == "ana"
+    assert _validar(token, (4, "hash-atual")) is None # sair de todos: geração incrementada
+    assert _validar(token, (3, "hash-novo")) is None  # senha trocada
+    assert auth.validar_token(token, SEGREDO, lambda username, jti: None) is None # usuário excluído
+
+def _token(conn, username, segredo):
+    return auth.gerar_token(username, segredo, *db.get_estado_sessao(conn, username)[:2])
+
+def test_logout_revoga_so_o_token_da_sessao(conn):
+    db.add_user(conn, "ana", "senha")
+    segredo = db.get_auth_secret(conn)
+    estado_sessao = lambda username, jti: db.get_estado_sessao(conn, username, jti)
+    sessao, outro_navegador = _token(conn, "ana", segredo), _token(conn, "ana", segredo)
+    for token in (sessao, outro_navegador):
+        assert auth.validar_token(token, segredo, estado_sessao) == "ana"
+    username, _, _, expira, jti = auth._ler_token(sessao, segredo)
+    assert db.revogar_sessao(conn, jti, expira)
+    auth.limpar_cache() # como num processo que não fez o logout, depois de AUTH_STATE_TTL
+    assert auth.validar_token(sessao, segredo, estado_sessao) is None
+    assert auth.validar_token(outro_navegador, segredo, estado_sessao) == "ana"
+    # Revogações de tokens já expirados são apagadas no próximo logout
+    db._write(lambda c: c.execute("UPDATE sessoes_revogadas SET expira_em = 0"), "sessoes_revogadas")
+    assert db.revogar_sessao(conn, "outro-jti", expira)
+    assert conn.execute("SELECT jti FROM sessoes_revogadas").fetchall() == [("outro-jti",)]
+
+def test_sair_de_todos_os_dispositivos(conn):
+    db.add_user(conn, "ana", "senha")
+    segredo = db.get_auth_secret(conn)
+    estado_sessao = lambda username, jti: db.get_estado_sessao(conn, username, jti)
+    token = _token(conn, "ana", segredo)
+    assert auth.validar_token(token, segredo, estado_sessao) == "ana"
+    assert db.encerrar_sessoes(conn, "ana") # descarta também o token em memória
+    assert auth.validar_token(token, segredo, estado_sessao) is None
+    # Login novo depois disso recebe a geração atual
+    assert auth.validar_token(_token(conn, "ana", segredo), segredo, estado_sessao) == "ana"
+
+def test_verify_user_atualiza_hash_legado(conn):
+    db._write(lambda c: c.execute("INSERT INTO usuarios (username, password_hash) VALUES ('bia', ?)",
+                                  (hashlib.sha256(b"senha").hexdigest(),)), "usuarios")
+    assert db.verify_user(conn, "bia", "senha")
+    assert db.get_estado_sessao(conn, "bia")[1].startswith("pbkdf2_sha256$")
+    assert not db.verify_user(conn, "bia", "errada")
+    assert not db.verify_user(conn, "ninguem", "senha")
+
+def test_segredo_gerado_na_migracao(conn, monkeypatch):
+    monkeypatch.delenv("MARMITA_AUTH_SECRET", raising=False)
+    assert len(db.get_auth_secret(conn)) == 64
+
+def _post(body):
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    escopo = {"type": "http", "method": "POST", "path": auth.ROTA_SESSAO, "headers": [], "scheme": "http",
+              "server": ("localhost", 8501), "query_string": b""}
+    return Request(escopo, receive)
+
+def test_bilhete_vira_cookie_httponly_uma_unica_vez():
+    auth._bilhetes.put("bilhete", ("TOKEN", time.time() + auth.BILHETE_TTL))
+    resposta = asyncio.run(server.gravar_sessao(_post(b"bilhete")))
+    assert resposta.status_code == 204
+    cookie = resposta.headers["set-cookie"]
+    assert cookie.startswith(f"{auth.COOKIE_SESSAO}=TOKEN;")
+    assert "HttpOnly" in cookie and "SameSite=strict" in cookie
+    assert asyncio.run(server.gravar_sessao(_post(b"bilhete"))).status_code == 403
+
+def test_bilhete_expirado_ou_desconhecido():
+    auth._bilhetes.put("velho", ("TOKEN", time.time() - 1))
+    assert auth.consumir_bilhete("velho") is None
+    assert auth.consumir_bilhete("inventado") is None
+    assert auth.consumir_bilhete("") is None
@@ -0,0 +1,104 @@
+import gzip
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import backup
+import database as db
+import jobs
+from conftest import linhas
+
+SQL_PEDIDOS = "SELECT id, cliente_id, semana_id, valor_total, status_entrega FROM pedidos"
+
+@pytest.mark.parametrize("comprimir", [False, True])
+def test_backup_e_uma_copia_consistente(conn, dados, tmp_path, comprimir):
+    r = backup.criar_backup(str(tmp_path / "backups"), comprimir=comprimir, paginas_por_passo=8, pausa=0)
+    assert r["paginas"] == conn.execute("PRAGMA page_count").fetchone()[0]
+    arquivo = r["arquivo"]
+    if comprimir:
+        assert arquivo.endswith(".db.gz")
+        with gzip.open(arquivo, "rb") as f_in, open(tmp_path / "copia.db", "wb") as f_out:
+            f_out.write(f_in.read())
+        arquivo = str(tmp_path / "copia.db")
+    copia = sqlite3.connect(arquivo)
+    try:
+        assert copia.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        assert linhas(copia, SQL_PEDIDOS) == linhas(conn, SQL_PEDIDOS)
+    finally:
+        copia.close()
+
+def test_rotacao_mantem_os_mais_recentes(conn, tmp_path):
+    diretorio = str(tmp_path / "backups")
+    criados = [backup.criar_backup(diretorio, comprimir=False)["arquivo"] for _ in range(4)]
+    apagados = backup.rotacionar(diretorio, manter=2)
+    assert sorted(apagados) == sorted(criados[:2])
+    assert [b[0] for b in backup.listar_backups(diretorio)] == criados[:1:-1]
+
+def test_backup_e_restauracao(conn, dados, tmp_path):
+    diretorio = str(tmp_path / "backups")
+    esperado = linhas(conn, SQL_PEDIDOS)
+    totais = db.get_dashboard_metrics(conn)
+    arquivo = backup.criar_backup(diretorio)["arquivo"]
+
+    for pedido_id in [r[0] for r in conn.execute("SELECT id FROM pedidos LIMIT 50")]:
+        db.delete_pedido(conn, pedido_id)
+    assert db.get_dashboard_metrics(conn) != totais
+
+    # Leitura em andamento noutra thread: a restauração espera a conexão dela voltar ao pool
+    pegou, contagem = threading.Event(), []
+    def leitura():
+        c = db.get_connection()
+        pegou.set()
+        time.sleep(0.3)
+        contagem.append(c.execute("SELECT COUNT(*) FROM pedidos").fetchone()[0])
+        db.release_connection()
+    thread = threading.Thread(target=leitura)
+    thread.start()
+    pegou.wait()
+    r = backup.restaurar(arquivo, diretorio)
+    thread.join()
+    assert contagem
+    assert os.path.exists(r["backup_anterior"])
+    # O pool antigo foi fechado; o schema foi verificado de novo
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert db._schema_ready_for == db.DB_FILE
+    conn = db.get_connection()
+    assert linhas(conn, SQL_PEDIDOS) == esperado
+    assert db.get_dashboard_metrics(conn) == totais
+
+@pytest.fixture
+def agendamento(conn, tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setattr(backup, "ESPERA_STATUS", 0.01)
+    runner = jobs.JobRunner(workers=1)
+    monkeypatch.setattr(jobs, "_runner", runner)
+    yield
+    runner.shutdown()
+
+def test_agendamento_espera_o_job_e_so_um_processo_faz_o_backup(agendamento, monkeypatch):
+    agendador = backup.BackupScheduler(24)
+    assert agendador._executar() > 23 * 3600
+    assert len(backup.listar_backups()) == 1
+    # Outra instância do app no mesmo horário: o backup recém-concluído vale por ela
+    monkeypatch.setattr(jobs, "PROCESSO", "outro-processo")
+    assert backup.BackupScheduler(24)._executar() > 23 * 3600
+    assert len(backup.listar_backups()) == 1
+
+def test_agendamento_tenta_de_novo_apos_falha(agendamento, monkeypatch):
+    criar_backup = backup.criar_backup
+    falhas = [OSError("disco cheio")] * 2
+    def criar_ou_falhar(*args, **kwargs):
+        if falhas:
+            raise falhas.pop()
+        return criar_backup(*args, **kwargs)
+    monkeypatch.setattr(backup, "criar_backup", criar_ou_falhar)
+    agendador = backup.BackupScheduler(24)
+    assert agendador._executar() == backup.ESPERA_MINIMA
+    assert agendador._executar() == 2 * backup.ESPERA_MINIMA
+    assert agendador._executar() > 23 * 3600
+    assert agendador.falhas == 0
+    assert len(backup.listar_backups()) == 1
@@ -0,0 +1,126 @@
+import io
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+
+import bulk_import
+import database as db
+
+@pytest.fixture
+def cadastros(conn):
+    db.add_semana(conn, "Semana 1")
+    db.add_cliente(conn, "Ana", "Rua A", "", "+1 407-555-0101")
+    db.add_marmita(conn, "Frango", "", 12.0, "Fit", True)
+    db.add_marmita(conn, "Carne", "", 14.0, "Tradicional", True)
+    return conn
+
+def _importar(conn, texto, **kwargs):
+    return bulk_import.importar_pedidos(conn, io.StringIO(texto), "pedidos.csv", **kwargs)
+
+CABECALHO = "pedido,telefone,semana,marmita,quantidade,forma_pagamento,status_pagamento,status_entrega,data_hora\n"
+
+def test_importa_pedidos_com_varios_itens(cadastros):
+    resultado = _importar(cadastros, CABECALHO
+                          + "A,(407) 555-0101,Semana 1,Frango,2,Pix,Pago,,2025-03-03 12:00:00\n"
+                          + "A,(407) 555-0101,Semana 1,Carne,1,,,,\n"
+                          + "B,4075550101,semana 1,frango,1,,,,\n")
+    assert resultado["erros"] == []
+    assert (resultado["pedidos_importados"], resultado["itens_importados"]) == (2, 3)
+    pedidos = cadastros.execute("""
+        SELECT valor_total, forma_pagamento, status_pagamento, status_entrega, data_hora FROM pedidos ORDER BY id
+    """).fetchall()
+    assert pedidos[0] == (38.0, "Pix", "Pago", "Pendente", datetime(2025, 3, 3, 12, 0))
+    assert pedidos[1][:4] == (12.0, "Outro", "Pendente", "Pendente")
+    # Triggers disparados pela inserção em lote
+    assert db.get_dashboard_metrics(cadastros)["total_pedidos"] == 2
+
+def test_linha_invalida_descarta_o_pedido_inteiro(cadastros):
+    resultado = _importar(cadastros, CABECALHO
+                          + "A,4075550101,Semana 1,Frango,1,,,,\n"
+                          + "A,4075550101,Semana 1,Lasanha,1,,,,\n"
+                          + "B,4075559999,Semana 1,Frango,1,,,,\n"
+                          + "C,4075550101,Semana 1,Carne,0,,,,\n"
+                          + "D,4075550101,Semana 1,Carne,1,Cheque,,,\n"
+                          + "E,4075550101,Semana 1,Carne,1,,,,\n")
+    assert [linha for linha, _ in resultado["erros"]] == [3, 4, 5, 6]
+    assert resultado["pedidos_importados"] == 1
+    assert cadastros.execute("SELECT COUNT(*) FROM itens_pedido").fetchone()[0] == 1
+
+def test_quantidade_deve_ser_inteira(cadastros):
+    resultado = _importar(cadastros, CABECALHO
+                          + "A,4075550101,Semana 1,Frango,2.5,,,,\n"
+                          + "B,4075550101,Semana 1,Frango,2.0,,,,\n")
+    assert [(linha, "2.5" in mensagem) for linha, mensagem in resultado["erros"]] == [(2, True)]
+    assert cadastros.execute("SELECT quantidade FROM itens_pedido").fetchall() == [(2,)]
+
+def test_campos_do_pedido_divergentes_entre_linhas(cadastros):
+    resultado = _importar(cadastros, CABECALHO
+                          + "A,4075550101,Semana 1,Frango,1,Pix,Pago,,\n"
+                          + "A,4075550101,Semana 1,Carne,1,Dinheiro,Pago,,\n"
+                          + "B,4075550101,Semana 1,Frango,1,,,Entregue,\n"
+                          + "B,4075550101,Semana 1,Carne,1,,,Entregue,\n")
+    assert len(resultado["erros"]) == 1
+    linha, mensagem = resultado["erros"][0]
+    assert linha == 3 and "forma de pagamento" in mensagem
+    assert resultado["pedidos_importados"] == 1
+    assert cadastros.execute("SELECT status_entrega FROM pedidos").fetchall() == [("Entregue",)]
+
+def test_data_com_fuso_e_convertida_para_utc(cadastros):
+    resultado = _importar(cadastros, CABECALHO
+                          + "A,4075550101,Semana 1,Frango,1,,,,2025-03-03T09:00:00-05:00\n"
+                          + "B,4075550101,Semana 1,Frango,1,,,,2025-03-03 09:00\n")
+    assert resultado["erros"] == []
+    assert [r[0] for r in cadastros.execute("SELECT data_hora FROM pedidos ORDER BY id")] == [
+        datetime(2025, 3, 3, 14, 0), datetime(2025, 3, 3, 9, 0)]
+
+def test_falta_coluna_obrigatoria(cadastros):
+    resultado = _importar(cadastros, "telefone,marmita\n4075550101,Frango\n")
+    assert resultado["pedidos_importados"] == 0
+    assert "semana" in resultado["erros"][0][1]
+
+def _pedido(conn):
+    cliente_id = conn.execute("SELECT id FROM clientes").fetchone()[0]
+    semana_id, marmita_id = conn.execute("SELECT (SELECT id FROM semanas), (SELECT id FROM marmitas)").fetchone()
+    return {"cliente_id": cliente_id, "semana_id": semana_id, "data_hora": "2025-03-03 12:00:00", "valor_total": 12.0,
+            "forma_pagamento": "Pix", "status_pagamento": "Pago", "status_entrega": "Pendente",
+            "itens": [{"marmita_id": marmita_id, "quantidade": 1, "preco_unitario": 12.0}]}
+
+def test_add_pedidos_bulk_em_lotes(cadastros):
+    ids = db.add_pedidos_bulk(cadastros, [_pedido(cadastros)] * 25, batch_size=10)
+    assert ids == list(range(1, 26))
+    assert cadastros.execute("SELECT COUNT(*) FROM itens_pedido WHERE pedido_id BETWEEN 1 AND 25").fetchone()[0] == 25
+
+def test_add_pedidos_bulk_com_erro_levanta_excecao(cadastros):
+    invalido = dict(_pedido(cadastros), cliente_id=999) # viola a chave estrangeira
+    with pytest.raises(db.ImportacaoInterrompida) as erro:
+        db.add_pedidos_bulk(cadastros, [_pedido(cadastros)] * 10 + [invalido], batch_size=10)
+    assert erro.value.ids == list(range(1, 11))
+    assert cadastros.execute("SELECT COUNT(*) FROM pedidos").fetchone()[0] == 10
+
+def test_add_pedidos_bulk_com_outro_escritor(cadastros):
+    # Outro processo (outra conexão) inserindo pedidos ao mesmo tempo: os IDs não colidem,
+    # porque o próximo ID é lido com o lock de escrita já adquirido
+    pedido = _pedido(cadastros)
+    erros = []
+    def outro_processo():
+        c = sqlite3.connect(db.DB_FILE, timeout=10)
+        try:
+            for _ in range(50):
+                with c:
+                    c.execute("INSERT INTO pedidos (cliente_id, semana_id, valor_total) VALUES (?, ?, 1)",
+                              (pedido["cliente_id"], pedido["semana_id"]))
+        except sqlite3.Error as e:
+            erros.append(e)
+        finally:
+            c.close()
+    thread = threading.Thread(target=outro_processo)
+    thread.start()
+    ids = []
+    for _ in range(10):
+        ids += db.add_pedidos_bulk(cadastros, [pedido] * 20, batch_size=5)
+    thread.join()
+    assert not erros
+    assert len(ids) == 200
+    assert cadastros.execute("SELECT COUNT(*) FROM pedidos").fetchone()[0] == 250
@@ -0,0 +1,68 @@
+import pytest
+
+import cart
+import database as db
+
+FRANGO = cart.MarmitaCardapio(1, "Frango", 12.10)
+CARNE = cart.MarmitaCardapio(2, "Carne", 14.35)
+
+def test_mesma_marmita_soma_a_quantidade():
+    carrinho = cart.Carrinho()
+    carrinho.adicionar(FRANGO, 2)
+    carrinho.adicionar(CARNE)
+    carrinho.adicionar(FRANGO, 3)
+    assert len(carrinho) == 2
+    assert [(i.nome, i.quantidade) for i in carrinho] == [("Frango", 5), ("Carne", 1)]
+    assert carrinho.quantidade_total == 6
+    assert carrinho.itens_pedido() == [{"marmita_id": 1, "quantidade": 5, "preco_unitario": 12.10},
+                                       {"marmita_id": 2, "quantidade": 1, "preco_unitario": 14.35}]
+    with pytest.raises(ValueError):
+        carrinho.adicionar(CARNE, 0)
+
+def test_total_em_centavos_sem_erro_de_arredondamento():
+    carrinho = cart.Carrinho()
+    for _ in range(10):
+        carrinho.adicionar(cart.MarmitaCardapio(3, "Salada", 0.10))
+    assert carrinho.total == 1.0 # em float, 0.1 somado 10 vezes dá 0.9999999999999999
+    carrinho.adicionar(FRANGO, 3)
+    assert carrinho.total == 37.30
+    assert carrinho.total == sum(round(i.subtotal, 2) for i in carrinho)
+
+def test_remover_e_limpar_atualizam_o_total():
+    carrinho = cart.Carrinho()
+    carrinho.adicionar(FRANGO, 2)
+    carrinho.adicionar(CARNE, 2)
+    carrinho.remover(FRANGO.id)
+    carrinho.remover(99) # não está no carrinho
+    assert (len(carrinho), carrinho.total, carrinho.quantidade_total) == (1, 28.70, 2)
+    carrinho.definir_quantidade(CARNE.id, 5)
+    assert (carrinho.total, carrinho.quantidade_total) == (71.75, 5)
+    carrinho.definir_quantidade(CARNE.id, 0)
+    assert (len(carrinho), carrinho.total) == (0, 0)
+    carrinho.adicionar(CARNE)
+    carrinho.limpar()
+    assert (len(carrinho), carrinho.total, carrinho.quantidade_total) == (0, 0, 0)
+
+def test_preco_fica_fixo_depois_de_adicionar():
+    carrinho = cart.Carrinho()
+    carrinho.adicionar(FRANGO)
+    carrinho.adicionar(cart.MarmitaCardapio(1, "Frango", 15.00)) # preço mudou no cardápio
+    assert carrinho.total == 24.20
+
+def test_cardapio_so_tem_marmitas_disponiveis(conn):
+    frango = db.add_marmita(conn, "Frango", "", 12.0, "Fit", True)
+    db.add_marmita(conn, "Carne", "", 14.0, "Tradicional", False)
+    cardapio = cart.get_cardapio(conn)
+    assert cardapio.ids() == [frango] and frango in cardapio
+    assert cardapio.rotulo(frango) == "Frango ($12.00)"
+
+def test_quantidade_total_acompanha_as_alteracoes():
+    carrinho = cart.Carrinho()
+    carrinho.adicionar(FRANGO, 4)
+    carrinho.adicionar(CARNE, 2)
+    carrinho.definir_quantidade(FRANGO.id, 1)
+    carrinho.definir_quantidade(99, 5) # não está no carrinho
+    carrinho.adicionar(CARNE, 3)
+    assert carrinho.quantidade_total == sum(i.quantidade for i in carrinho) == 6
+    carrinho.definir_quantidade(CARNE.id, -1)
+    assert (len(carrinho), carrinho.quantidade_total, carrinho.total) == (1, 1, 12.10)
@@ -0,0 +1,86 @@
+import sqlite3
+
+import database as db
+from conftest import linhas
+
+def _nomes(resultado):
+    return [r[1] for r in resultado]
+
+def _cadastrar(conn):
+    db.add_cliente(conn, "João Antônio", "Rua das Palmeiras 10", "", "(407) 555-0101")
+    db.add_cliente(conn, "Joana Lima", "Av. Central 200", "Apto 3", "407-555-0199")
+    db.add_cliente(conn, "Marcos Pereira", "Rua João Pessoa 5", "", "321 555 7788")
+
+def test_busca_por_prefixo_sem_acentos(conn):
+    _cadastrar(conn)
+    # Ordem por relevância (bm25); "Marcos" entra pelo endereço
+    assert sorted(_nomes(db.search_clientes(conn, "jo"))) == ["Joana Lima", "João Antônio", "Marcos Pereira"]
+    assert _nomes(db.search_clientes(conn, "joao ant")) == ["João Antônio"]
+    assert _nomes(db.search_clientes(conn, "palm")) == ["João Antônio"]
+    assert db.search_clientes(conn, "xyz") == []
+    assert db.search_clientes(conn, "  ") == []
+
+def test_busca_por_telefone_completo_ou_parcial(conn):
+    _cadastrar(conn)
+    assert _nomes(db.search_clientes(conn, "4075550101")) == ["João Antônio"]
+    assert _nomes(db.search_clientes(conn, "(407) 555-0101")) == ["João Antônio"]
+    assert _nomes(db.search_clientes(conn, "0199")) == ["Joana Lima"]
+    assert _nomes(db.search_clientes(conn, "5557788")) == ["Marcos Pereira"]
+
+def test_indice_acompanha_alteracoes(conn):
+    _cadastrar(conn)
+    joana = db.search_clientes(conn, "joana")[0]
+    db.update_cliente(conn, joana[0], "Joana Souza", joana[2], joana[3], joana[4])
+    assert db.search_clientes(conn, "lima") == []
+    assert _nomes(db.search_clientes(conn, "souza")) == ["Joana Souza"]
+    db.delete_cliente(conn, joana[0])
+    assert db.search_clientes(conn, "souza") == []
+
+def test_limite_de_resultados(conn):
+    for i in range(30):
+        db.add_cliente(conn, f"Cliente {i}", "Rua A", "", f"40755501{i:02d}")
+    assert len(db.search_clientes(conn, "cliente", limite=5)) == 5
+
+def test_normalize_phone():
+    assert db.normalize_phone("(407) 555-0101") == "+14075550101"
+    assert db.normalize_phone("+1 407.555.0101") == "+14075550101"
+    assert db.normalize_phone("407-555-0101 ext. 12") == "+14075550101"
+    assert db.normalize_phone("407 555 0101 x3") == "+14075550101"
+    assert db.normalize_phone("0055 11 98765-4321") == "+5511987654321"
+    assert db.normalize_phone("+55 (11) 98765-4321") == "+5511987654321"
+    assert db.normalize_phone("") is None
+    assert db.normalize_phone("sem telefone") is None
+
+def test_telefone_em_outro_formato_e_o_mesmo_cliente(conn):
+    cliente_id = db.add_cliente(conn, "Ana", "Rua A", "", "(407) 555-0101")
+    assert db.get_cliente_by_phone(conn, "+1 407 555 0101")[0] == cliente_id
+    assert db.add_cliente(conn, "Ana 2", "Rua B", "", "4075550101") is None
+    assert conn.execute("SELECT COUNT(*) FROM clientes").fetchone()[0] == 1
+
+def test_migracao_junta_clientes_com_o_mesmo_telefone(tmp_path, monkeypatch):
+    # Banco na versão 5 (antes do telefone normalizado) com o mesmo número em formatos diferentes
+    db.use_database(str(tmp_path / "duplicados.db"))
+    with monkeypatch.context() as m:
+        m.setattr(db, "MIGRATIONS", [mig for mig in db.MIGRATIONS if mig[0] <= 5])
+        db.create_tables(db.get_connection())
+    db.shutdown()
+    c = sqlite3.connect(db.DB_FILE)
+    c.execute("INSERT INTO semanas (id, nome_semana) VALUES (1, 'Semana 1')")
+    c.execute("""INSERT INTO clientes (id, nome, endereco, complemento, telefone) VALUES
+                 (1, 'Ana', '', '', '(407) 555-0101'), (2, 'Ana Souza', 'Rua A', 'Casa', '+1 407 555 0101'),
+                 (3, 'Bia', 'Rua B', '', '407.555.0102')""")
+    c.execute("""INSERT INTO pedidos (id, cliente_id, semana_id, valor_total) VALUES
+                 (1, 1, 1, 10.0), (2, 2, 1, 20.0), (3, 3, 1, 5.0)""")
+    c.commit()
+    c.close()
+
+    try:
+        conn = db.get_connection()
+        assert db.init_db(conn)
+        assert linhas(conn, "SELECT id, nome, endereco, complemento, telefone_normalizado FROM clientes") == [
+            (1, "Ana", "Rua A", "Casa", "+14075550101"), (3, "Bia", "Rua B", "", "+14075550102")]
+        assert linhas(conn, "SELECT id, cliente_id FROM pedidos") == [(1, 1), (2, 1), (3, 3)]
+        assert linhas(conn, "SELECT cliente_id, pedidos, total FROM rollup_vendas_cliente") == [(1, 2, 30.0), (3, 1, 5.0)]
+        assert _nomes(db.search_clientes(conn, "0101")) == ["Ana"]
+    finally:
+        db.shutdown()
@@ -0,0 +1,32 @@
+import database as db
+from conftest import linhas, movimentar, recalculado
+
+SQL_TOTAIS = "SELECT * FROM dashboard_totais"
+
+def test_totais_iniciais_do_banco_vazio(conn):
+    metricas = db.get_dashboard_metrics(conn)
+    assert metricas["total_pedidos"] == 0 and metricas["receita_total"] == 0
+    assert metricas["total_clientes"] == 0
+
+def test_triggers_mantem_os_totais(conn, dados):
+    assert linhas(conn, SQL_TOTAIS) == recalculado(db._recalcular_dashboard, SQL_TOTAIS)
+    movimentar(conn)
+    assert linhas(conn, SQL_TOTAIS) == recalculado(db._recalcular_dashboard, SQL_TOTAIS)
+
+def test_metricas_batem_com_a_tabela_de_pedidos(conn, dados):
+    movimentar(conn)
+    metricas = db.get_dashboard_metrics(conn)
+    total, receita, pendentes = conn.execute("""
+        SELECT COUNT(*), SUM(valor_total), SUM(status_entrega NOT IN ('Entregue', 'Cancelado')) FROM pedidos
+    """).fetchone()
+    assert metricas["total_pedidos"] == total
+    assert round(metricas["receita_total"], 6) == round(receita, 6)
+    assert metricas["entrega_pendente_pedidos"] == pendentes
+    assert metricas["total_clientes"] == conn.execute("SELECT COUNT(*) FROM clientes").fetchone()[0]
+
+def test_refresh_dashboard_metrics_corrige_totais(conn, dados):
+    esperado = linhas(conn, SQL_TOTAIS)
+    conn.execute("UPDATE dashboard_totais SET total_pedidos = 0, receita_total = 0")
+    conn.commit()
+    assert db.refresh_dashboard_metrics(conn)
+    assert linhas(conn, SQL_TOTAIS) == esperado
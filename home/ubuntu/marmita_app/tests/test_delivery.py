@@ -0,0 +1,68 @@
+import io
+import math
+import random
+
+import pytest
+
+import database as db
+import delivery
+
+def test_grade_mais_proximo_igual_a_forca_bruta():
+    rng = random.Random(3)
+    xy = [(rng.uniform(-20, 20), rng.gauss(0, 6)) for _ in range(400)]
+    grade = delivery._Grade(xy, 1.5)
+    restantes = set(range(len(xy)))
+    for passo in range(300):
+        x, y = rng.uniform(-30, 30), rng.uniform(-30, 30)
+        i = grade.mais_proximo(x, y)
+        esperado = min(math.hypot(px - x, py - y) for px, py in (xy[j] for j in restantes))
+        assert math.hypot(xy[i][0] - x, xy[i][1] - y) == pytest.approx(esperado)
+        if passo % 2 == 0: # vai esvaziando a grade, como montar_lotes faz
+            grade.remover(i)
+            restantes.discard(i)
+    for i in list(restantes):
+        grade.remover(i)
+    assert grade.mais_proximo(0, 0) is None
+
+@pytest.mark.parametrize("max_paradas,max_marmitas", [(12, None), (25, 20), (1, None)])
+def test_lotes_respeitam_os_limites(max_paradas, max_marmitas):
+    paradas = delivery.paradas_sinteticas(600, seed=5)
+    lotes = delivery.montar_lotes(paradas, max_paradas, max_marmitas)
+    visitados = [p["cliente_id"] for lote in lotes for p in lote["paradas"]]
+    assert sorted(visitados) == [p["cliente_id"] for p in paradas] # cada parada em exatamente um lote
+    for lote in lotes:
+        assert 1 <= len(lote["paradas"]) <= max_paradas
+        assert lote["marmitas"] == sum(p["marmitas"] for p in lote["paradas"])
+        if max_marmitas and len(lote["paradas"]) > 1:
+            assert lote["marmitas"] <= max_marmitas
+    if max_paradas == 12:
+        # Lotes por proximidade rodam bem menos que lotes na ordem de entrada
+        r = delivery.benchmark_lotes(600, max_paradas=12, seed=5)
+        assert r["distancia_km"] < r["distancia_ordem_entrada_km"] / 2
+
+def test_lote_com_parada_acima_do_limite_de_marmitas():
+    paradas = [{"cliente_id": 1, "latitude": 28.5, "longitude": -81.4, "marmitas": 30},
+               {"cliente_id": 2, "latitude": 28.501, "longitude": -81.4, "marmitas": 2}]
+    lotes = delivery.montar_lotes(paradas, max_paradas=10, max_marmitas=10)
+    assert sorted(len(l["paradas"]) for l in lotes) == [1, 1]
+
+def test_paradas_sem_coordenadas_ficam_de_fora():
+    assert delivery.montar_lotes([]) == []
+    assert delivery.montar_lotes([{"cliente_id": 1, "latitude": None, "longitude": None}]) == []
+
+def test_parse_endereco():
+    assert delivery.parse_endereco("123 Main St, Apt 4, Orlando, FL 32801-1234") == {
+        "logradouro": "123 Main St, Apt 4", "cidade": "Orlando", "estado": "FL", "zip": "32801"}
+    assert delivery.parse_endereco("Rua sem CEP")["zip"] is None
+
+def test_geocodificacao_pelo_centroide_do_zip(conn):
+    arquivo = io.StringIO("GEOID\tALAND\tINTPTLAT\tINTPTLONG\n32801\t1\t28.5400\t-81.3790\n32803\t1\t28.5550\t-81.3470\n")
+    assert delivery.carregar_zip_centroides(conn, arquivo) == 2
+    com_zip = db.add_cliente(conn, "Ana", "10 Main St, Orlando, FL 32801", "", "4075550101")
+    db.add_cliente(conn, "Bia", "20 Oak Ave, Orlando, FL 32999", "", "4075550102")
+    db.add_cliente(conn, "Caio", "Sem endereço", "", "4075550103")
+    assert delivery.geocodificar_clientes(conn) == {"geocodificados": 1, "sem_zip": 1, "zip_desconhecido": 1}
+    # Já em cache: nada a fazer
+    assert delivery.geocodificar_clientes(conn) == {"geocodificados": 0, "sem_zip": 0, "zip_desconhecido": 0}
+    lat, lon = conn.execute("SELECT latitude, longitude FROM clientes_geo WHERE cliente_id = ?", (com_zip,)).fetchone()
+    assert (lat, lon) == (28.54, -81.379)
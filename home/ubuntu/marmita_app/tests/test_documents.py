@@ -0,0 +1,49 @@
+import math
+import re
+import zlib
+
+import pytest
+
+import database as db
+import documents
+
+def _paginas(pdf):
+    """Fluxos de conteúdo (descomprimidos) das páginas, na ordem do arquivo."""
+    return [zlib.decompress(m) for m in re.findall(rb"/FlateDecode >>\nstream\n(.*?)\nendstream", pdf, re.S)]
+
+@pytest.mark.parametrize("tipos,por_pagina", [(("comandas", "etiquetas"), (4, 30)), (("etiquetas",), (30,))])
+def test_pdf_da_semana(conn, dados, tmp_path, tipos, por_pagina):
+    semana_id = conn.execute("SELECT MAX(semana_id) FROM pedidos").fetchone()[0]
+    pendentes = conn.execute("""
+        SELECT COUNT(*) FROM pedidos WHERE semana_id = ? AND status_entrega IN ('Pendente', 'Em Preparo')
+    """, (semana_id,)).fetchone()[0]
+    assert pendentes > 30
+    r = documents.gerar_documentos(conn, semana_id, tipos, destino=str(tmp_path / "semana.pdf"))
+    esperado = sum(math.ceil(pendentes / n) for n in por_pagina)
+    assert (r["pedidos"], r["paginas"]) == (pendentes, esperado)
+
+    with open(r["caminho"], "rb") as f:
+        pdf = f.read()
+    assert pdf.startswith(b"%PDF-1.4") and pdf.rstrip().endswith(b"%%EOF")
+    assert re.search(rb"/Type /Pages /Kids \[.*?\] /Count (\d+)", pdf).group(1) == str(esperado).encode()
+    assert len(re.findall(rb"/Type /Page /Parent", pdf)) == esperado
+    paginas = _paginas(pdf)
+    assert len(paginas) == esperado
+    # Cada pedido aparece no documento (na comanda e/ou na etiqueta)
+    texto = b"".join(paginas)
+    for (pedido_id,) in conn.execute("SELECT id FROM pedidos WHERE semana_id = ? AND status_entrega IN ('Pendente', 'Em Preparo')",
+                                     (semana_id,)):
+        assert b"#%d" % pedido_id in texto
+
+def test_semana_sem_pedidos_pendentes(conn):
+    semana_id = db.add_semana(conn, "Semana vazia")
+    assert documents.gerar_documentos(conn, semana_id)["caminho"] is None
+
+def test_texto_cortado_na_largura():
+    texto = documents._cortar("Marmita de Frango Grelhado com Legumes", "F1", 10, 80)
+    assert documents.largura_texto(texto, "F1", 10) <= 80
+    assert texto.endswith("…") or len(texto) < len("Marmita de Frango Grelhado com Legumes")
+
+def test_benchmark_gera_o_pdf_inteiro():
+    r = documents.benchmark(200)
+    assert r["paginas"] == math.ceil(200 / 4) + math.ceil(200 / 30)
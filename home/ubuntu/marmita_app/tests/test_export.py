@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from starlette.requests import Request
+
+import export
+import server
+
+def _get(url):
+    escopo = {"type": "http", "method": "GET", "path": url, "headers": [], "scheme": "http",
+              "server": ("localhost", 8501), "query_string": b"", "path_params": {"bilhete": url.rsplit("/", 1)[1]}}
+    return Request(escopo)
+
+def _baixar(url):
+    resposta = asyncio.run(server.baixar_arquivo(_get(url)))
+    mensagens = []
+    async def receive(): # cliente nunca desconecta
+        await asyncio.Event().wait()
+    async def send(mensagem):
+        mensagens.append(mensagem)
+    if resposta.status_code == 200:
+        asyncio.run(resposta({"type": "http", "method": "GET", "headers": []}, receive, send))
+    corpo = b"".join(m.get("body", b"") for m in mensagens if m["type"] == "http.response.body")
+    return resposta, corpo
+
+def test_exportacao_servida_pela_rota(conn, dados):
+    caminho, linhas, _ = export.exportar_para_arquivo(conn, "pedidos", "csv")
+    url = export.registrar_download(caminho, "pedidos.csv", "text/csv")
+    assert url.startswith(export.ROTA_DOWNLOAD + "/")
+    resposta, corpo = _baixar(url)
+    assert resposta.status_code == 200
+    assert 'filename="pedidos.csv"' in resposta.headers["content-disposition"]
+    with open(caminho, "rb") as f:
+        assert corpo == f.read()
+    assert corpo.count(b"\n") == linhas + 1 # cabeçalho
+
+def test_bilhete_desconhecido_expirado_ou_sem_arquivo(tmp_path):
+    assert _baixar(export.ROTA_DOWNLOAD + "/inventado")[0].status_code == 404
+    arquivo = tmp_path / "x.csv"
+    arquivo.write_text("a\n")
+    url = export.registrar_download(str(arquivo), "x.csv", "text/csv")
+    arquivo.unlink()
+    assert _baixar(url)[0].status_code == 404
+    arquivo.write_text("a\n")
+    bilhete = export.registrar_download(str(arquivo), "x.csv", "text/csv").rsplit("/", 1)[1]
+    caminho, nome, mime, _ = export._downloads[bilhete]
+    export._downloads[bilhete] = (caminho, nome, mime, time.time() - 1)
+    assert export.abrir_download(bilhete) is None
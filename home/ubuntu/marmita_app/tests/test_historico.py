@@ -0,0 +1,46 @@
+import database as db
+
+def _paginas(conn, semana_id=None, page_size=7):
+    ids, cursor = [], None
+    while True:
+        df, cursor = db.get_pedidos_page(conn, semana_id_filter=semana_id, page_size=page_size, cursor=cursor)
+        assert len(df) <= page_size
+        ids += df["id"].tolist()
+        if cursor is None:
+            return ids
+
+def test_paginas_cobrem_o_historico_em_ordem(conn, dados):
+    esperado = [r[0] for r in conn.execute("SELECT id FROM pedidos ORDER BY data_hora DESC, id DESC")]
+    assert _paginas(conn) == esperado
+
+def test_paginas_com_datas_iguais(conn, dados):
+    # Grupos de 10 pedidos com o mesmo data_hora: os empates atravessam as páginas de 7
+    db._write(lambda c: c.execute("UPDATE pedidos SET data_hora = datetime('2025-01-01', '+' || (id / 10) || ' hours')"), "pedidos")
+    esperado = [r[0] for r in conn.execute("SELECT id FROM pedidos ORDER BY data_hora DESC, id DESC")]
+    assert _paginas(conn) == esperado
+    assert len(set(_paginas(conn, page_size=10))) == len(esperado)
+
+def test_paginas_filtradas_por_semana(conn, dados):
+    semana_id = conn.execute("SELECT MAX(semana_id) FROM pedidos").fetchone()[0]
+    esperado = [r[0] for r in conn.execute("SELECT id FROM pedidos WHERE semana_id = ? ORDER BY data_hora DESC, id DESC", (semana_id,))]
+    assert _paginas(conn, semana_id) == esperado
+    assert db.count_pedidos(conn, semana_id) == len(esperado)
+    assert db.count_pedidos(conn) == conn.execute("SELECT COUNT(*) FROM pedidos").fetchone()[0]
+
+def test_itens_de_varios_pedidos_numa_consulta(conn, dados):
+    semana_id = conn.execute("SELECT MAX(semana_id) FROM pedidos").fetchone()[0]
+    pedido_ids = tuple(r[0] for r in conn.execute("SELECT id FROM pedidos WHERE semana_id = ? ORDER BY id DESC", (semana_id,)))
+    db.delete_marmita(conn, conn.execute("SELECT marmita_id FROM itens_pedido WHERE pedido_id = ?", (pedido_ids[0],)).fetchone()[0])
+    sem_itens = db.add_pedido(conn, *conn.execute("SELECT cliente_id, semana_id FROM pedidos WHERE id = ?", (pedido_ids[0],)).fetchone(),
+                              0, "Pix", "Pendente", "Pendente", [])
+
+    itens = db.get_itens_por_pedidos(conn, pedido_ids + (sem_itens,))
+    assert list(itens["pedido_id"]) == sorted(itens["pedido_id"])
+    assert set(itens["faixas"]) == set(pedido_ids)
+    for pedido_id in pedido_ids:
+        assert sorted(db.itens_do_pedido(itens, pedido_id)) == sorted(tuple(i) for i in db.get_pedido_itens(conn, pedido_id))
+    assert any(nome == "Marmita Excluída" for _, nome, _ in db.itens_do_pedido(itens, pedido_ids[0]))
+    assert db.itens_do_pedido(itens, sem_itens) == []
+    # Pela semana: os mesmos itens
+    assert db.get_itens_por_pedidos(conn, semana_id=semana_id) == itens
+    assert db.get_itens_por_pedidos(conn, ())["faixas"] == {}
@@ -0,0 +1,52 @@
+import sqlite3
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+import instrumentation
+
+@pytest.fixture(autouse=True)
+def metricas_limpas():
+    instrumentation.metricas.reset()
+    yield
+    instrumentation.metricas.reset()
+
+def _consulta(fp):
+    return next(c for c in instrumentation.metricas.resumo_consultas() if c["consulta"] == fp)
+
+def test_iteracao_do_cursor_e_medida():
+    conn = sqlite3.connect(":memory:", factory=instrumentation.InstrumentedConnection)
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(25)])
+    assert sum(x for (x,) in conn.execute("SELECT x FROM t")) == 300
+    consulta = _consulta(instrumentation.fingerprint("SELECT x FROM t"))
+    assert (consulta["chamadas"], consulta["linhas"]) == (1, 25)
+    conn.close()
+
+def _pagina(nome):
+    return next(p for p in instrumentation.metricas.resumo_paginas() if p["pagina"] == nome)
+
+def _script_normal():
+    import instrumentation
+    import streamlit as st
+    instrumentation.page_begin("normal")
+    st.write("ok")
+
+def _script_parado():
+    import instrumentation
+    import streamlit as st
+    instrumentation.page_begin("parada")
+    st.stop()
+
+def _script_com_erro():
+    import instrumentation
+    instrumentation.page_begin("erro")
+    raise RuntimeError("falhou")
+
+@pytest.mark.parametrize("script, pagina", [
+    (_script_normal, "normal"), (_script_parado, "parada"), (_script_com_erro, "erro"),
+])
+def test_execucao_registrada_mesmo_com_stop_ou_excecao(script, pagina):
+    app = AppTest.from_function(script).run()
+    app.run()
+    assert (_pagina(pagina)["execucoes"], _pagina(pagina)["interrompidas"]) == (2, 0)
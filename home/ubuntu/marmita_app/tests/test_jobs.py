@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+import database as db
+import jobs
+
+EXECUCOES = []
+LIBERAR = threading.Event()
+
+@jobs.tarefa("teste_semanas", "Semanas (teste)", "semanas")
+def _semanas(conn, job, prefixo):
+    EXECUCOES.append(prefixo)
+    return pd.DataFrame({"semana": [s[1] for s in db.get_all_semanas(conn) if s[1].startswith(prefixo)]})
+
+@jobs.tarefa("teste_espera", "Espera (teste)")
+def _espera(conn, job, n):
+    EXECUCOES.append(n)
+    while not LIBERAR.wait(0.01):
+        job.progresso(None, "Esperando")
+    return n
+
+@jobs.tarefa("teste_erro", "Erro (teste)")
+def _erro(conn, job):
+    raise ValueError("falhou de propósito")
+
+@pytest.fixture
+def runner(conn):
+    EXECUCOES.clear()
+    LIBERAR.clear()
+    r = jobs.JobRunner(workers=1)
+    yield r
+    LIBERAR.set()
+    r.shutdown()
+
+def _esperar(runner, job_id, timeout=5):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        status = runner.status(job_id)
+        if status["status"] not in db.JOB_STATUS_ATIVOS:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} não terminou: {status}")
+
+def test_job_concluido_grava_status_e_resultado(runner, conn):
+    db.add_semana(conn, "Semana 1")
+    job_id = runner.submit("teste_semanas", {"prefixo": "Semana"})
+    assert _esperar(runner, job_id)["status"] == "concluido"
+    assert list(runner.result(job_id)["semana"]) == ["Semana 1"]
+    # Resultado fora da memória é lido do JSON gravado na tabela jobs
+    runner._resultados.clear()
+    assert list(runner.result(job_id)["semana"]) == ["Semana 1"]
+    assert db.get_job(conn, job_id)["progresso"] == 1.0
+
+def test_resultado_reaproveitado_ate_mudar_a_tabela(runner, conn):
+    db.add_semana(conn, "Semana 1")
+    primeiro = runner.submit("teste_semanas", {"prefixo": "Semana"})
+    _esperar(runner, primeiro)
+    assert runner.submit("teste_semanas", {"prefixo": "Semana"}) == primeiro
+    assert EXECUCOES == ["Semana"]
+    novo = runner.submit("teste_semanas", {"prefixo": "Semana"}, usar_cache=False)
+    assert novo != primeiro
+    _esperar(runner, novo)
+    db.add_semana(conn, "Semana 2")
+    segundo = runner.submit("teste_semanas", {"prefixo": "Semana"})
+    assert segundo != primeiro
+    _esperar(runner, segundo)
+    assert list(runner.result(segundo)["semana"]) == ["Semana 1", "Semana 2"]
+
+def test_job_identico_em_andamento_e_compartilhado(runner):
+    job_id = runner.submit("teste_espera", {"n": 1})
+    assert runner.submit("teste_espera", {"n": 1}) == job_id
+    LIBERAR.set()
+    assert _esperar(runner, job_id)["status"] == "concluido"
+    assert runner.result(job_id) == 1
+    assert EXECUCOES == [1]
+
+def test_cancelar_job_em_execucao_e_na_fila(runner):
+    executando = runner.submit("teste_espera", {"n": 1})
+    na_fila = runner.submit("teste_espera", {"n": 2}) # um worker só: espera o primeiro
+    while not EXECUCOES:
+        time.sleep(0.01)
+    assert runner.cancel(na_fila)
+    assert runner.cancel(executando)
+    assert _esperar(runner, executando)["status"] == "cancelado"
+    assert _esperar(runner, na_fila)["status"] == "cancelado"
+    assert EXECUCOES == [1] # o job da fila nem chegou a rodar
+    assert runner.result(executando) is None
+
+def test_erro_fica_registrado(runner):
+    job_id = runner.submit("teste_erro")
+    status = _esperar(runner, job_id)
+    assert status["status"] == "erro" and "de propósito" in status["erro"]
+    with pytest.raises(ValueError, match="desconhecido"):
+        runner.submit("tipo_inexistente")
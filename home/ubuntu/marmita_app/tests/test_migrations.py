@@ -0,0 +1,84 @@
+import hashlib
+import sqlite3
+
+import database as db
+from conftest import linhas, recalculado
+
+def test_versoes_em_ordem_e_sem_repeticao():
+    versoes = [versao for versao, _, _ in db.MIGRATIONS]
+    assert versoes == sorted(set(versoes))
+    assert db.SCHEMA_VERSION == versoes[-1]
+
+def test_banco_novo_fica_na_versao_atual(conn):
+    assert db.get_schema_version(conn) == db.SCHEMA_VERSION
+    tabelas = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"dashboard_totais", "rollup_vendas_cliente", "rollup_producao", "jobs", "configuracoes"} <= tabelas
+    assert "idx_pedidos_semana_historico" not in {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+def test_migracoes_sao_aplicadas_uma_unica_vez(conn):
+    antes = linhas(conn, "SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL")
+    assert db.apply_migrations(conn) == db.SCHEMA_VERSION
+    db.reset_schema_state()
+    assert db.init_db(conn)
+    assert linhas(conn, "SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL") == antes
+
+def test_init_db_nao_executa_sql_depois_da_primeira_vez(conn):
+    executado = []
+    conn.set_trace_callback(executado.append)
+    try:
+        assert db.init_db(conn)
+    finally:
+        conn.set_trace_callback(None)
+    assert executado == []
+
+def test_admin_padrao_criado_em_banco_ja_migrado(conn):
+    db._write(lambda c: c.execute("DELETE FROM usuarios"), "usuarios")
+    db.reset_schema_state()
+    assert db.init_db(conn)
+    assert db.verify_user(conn, "admin", "admin")
+
+def test_migra_banco_antigo_com_dados(tmp_path, monkeypatch):
+    # Banco como o da versão original do app: só as tabelas base, user_version 0,
+    # senha em SHA-256 puro e telefones sem normalização
+    caminho = str(tmp_path / "antigo.db")
+    db.use_database(caminho)
+    db.reset_schema_state()
+    with monkeypatch.context() as m:
+        m.setattr(db, "MIGRATIONS", [])
+        db.create_tables(db.get_connection())
+    db.shutdown()
+    c = sqlite3.connect(caminho)
+    assert db.get_schema_version(c) == 0
+    c.execute("DELETE FROM usuarios")
+    c.execute("INSERT INTO usuarios (username, password_hash) VALUES ('maria', ?)", (hashlib.sha256(b"segredo").hexdigest(),))
+    c.execute("INSERT INTO semanas (id, nome_semana) VALUES (1, 'Semana 1'), (2, 'Semana 2')")
+    c.execute("INSERT INTO clientes (id, nome, endereco, telefone) VALUES (1, 'Ana', 'Rua A', '(407) 555-0101'), (2, 'Bia', 'Rua B', '407.555.0102')")
+    c.execute("INSERT INTO marmitas (id, nome, preco) VALUES (1, 'Frango', 12.5), (2, 'Carne', 14.0)")
+    c.execute("""INSERT INTO pedidos (id, cliente_id, semana_id, data_hora, valor_total, forma_pagamento, status_pagamento, status_entrega)
+                 VALUES (1, 1, 1, '2025-01-06 12:00:00', 39.0, 'Pix', 'Pago', 'Entregue'),
+                        (2, 2, 2, '2025-01-13 18:30:00', 28.0, 'Dinheiro', 'Pendente', 'Pendente')""")
+    c.execute("INSERT INTO itens_pedido (pedido_id, marmita_id, quantidade, preco_unitario) VALUES (1, 1, 2, 12.5), (1, 2, 1, 14.0), (2, 2, 2, 14.0)")
+    c.commit()
+    c.close()
+
+    try:
+        db.reset_schema_state()
+        conn = db.get_connection()
+        assert db.init_db(conn)
+        assert db.get_schema_version(conn) == db.SCHEMA_VERSION
+        # Totais e rollups calculados na migração a partir dos dados existentes
+        assert db.get_dashboard_metrics(conn) == {
+            "total_clientes": 2, "total_pedidos": 2, "receita_total": 67.0,
+            "pagamento_pendente_pedidos": 1, "pagamento_pendente_valor": 28.0, "entrega_pendente_pedidos": 1,
+        }
+        assert linhas(conn, "SELECT * FROM rollup_marmitas") == recalculado(db._recalcular_rollups, "SELECT * FROM rollup_marmitas")
+        assert linhas(conn, "SELECT * FROM rollup_producao") == [(1, 1, "Entregue", 2), (1, 2, "Entregue", 1), (2, 2, "Pendente", 2)]
+        # Telefones normalizados e indexados
+        assert db.get_cliente_by_phone(conn, "4075550102")[0] == 2
+        # Hash legado aceito e regravado no formato novo
+        assert db.verify_user(conn, "maria", "segredo")
+        assert conn.execute("SELECT password_hash FROM usuarios WHERE username = 'maria'").fetchone()[0].startswith("pbkdf2_sha256$")
+        assert db.verify_user(conn, "maria", "segredo")
+    finally:
+        db.shutdown()
+        db.reset_schema_state()
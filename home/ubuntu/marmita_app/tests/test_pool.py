@@ -0,0 +1,73 @@
+import sqlite3
+import threading
+
+import pytest
+
+import database as db
+
+def _em_thread(fn):
+    resultado = {}
+    thread = threading.Thread(target=lambda: resultado.setdefault("valor", fn()))
+    thread.start()
+    thread.join()
+    return resultado["valor"]
+
+@pytest.fixture
+def pool(tmp_path):
+    p = db.ConnectionPool(str(tmp_path / "pool.db"), max_size=2, timeout=0.3)
+    yield p
+    p.close()
+
+def test_uma_conexao_por_thread(pool):
+    conexao = pool.checkout()
+    assert pool.checkout() is conexao
+    assert _em_thread(pool.checkout) is not conexao
+
+def test_release_devolve_a_conexao_ao_pool(pool):
+    conexao = pool.checkout()
+    pool.release()
+    assert _em_thread(lambda: (pool.checkout(), pool.release())[0]) is conexao
+
+def test_conexao_de_thread_encerrada_volta_ao_pool(pool):
+    conexoes = {_em_thread(pool.checkout), _em_thread(pool.checkout), _em_thread(pool.checkout)}
+    # Threads que terminaram sem release: as conexões são recuperadas, o pool não cresce
+    assert len(conexoes) <= pool.max_size
+    assert pool._size <= pool.max_size
+
+def test_pool_esgotado(pool):
+    liberar = threading.Event()
+    def segurar():
+        pool.checkout()
+        liberar.wait()
+    threads = [threading.Thread(target=segurar) for _ in range(pool.max_size)]
+    for t in threads:
+        t.start()
+    try:
+        while len(pool._in_use) < pool.max_size:
+            liberar.wait(0.01)
+        with pytest.raises(sqlite3.OperationalError, match="exhausted"):
+            pool.checkout()
+    finally:
+        liberar.set()
+        for t in threads:
+            t.join()
+    assert pool.checkout() is not None
+
+def test_release_desfaz_transacao_aberta(pool):
+    conexao = pool.checkout()
+    conexao.execute("CREATE TABLE t (x)")
+    conexao.execute("BEGIN")
+    conexao.execute("INSERT INTO t VALUES (1)")
+    pool.release()
+    assert not conexao.in_transaction
+    assert conexao.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+def test_pool_fechado_recusa_checkout(pool):
+    pool.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        pool.checkout()
+
+def test_get_connection_usa_o_pool_do_banco_atual(conn):
+    assert db.get_connection() is conn
+    db.release_connection()
+    assert db.get_connection() is conn # mesma conexão, reaproveitada do pool
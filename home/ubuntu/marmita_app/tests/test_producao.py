@@ -0,0 +1,33 @@
+import database as db
+from conftest import linhas, movimentar, recalculado
+
+SQL_PRODUCAO = "SELECT * FROM rollup_producao"
+
+def test_triggers_mantem_o_rollup_de_producao(conn, dados):
+    assert linhas(conn, SQL_PRODUCAO) == recalculado(db._recalcular_rollup_producao, SQL_PRODUCAO)
+    movimentar(conn)
+    assert linhas(conn, SQL_PRODUCAO) == recalculado(db._recalcular_rollup_producao, SQL_PRODUCAO)
+    # Linhas zeradas são apagadas pelos triggers
+    assert conn.execute("SELECT COUNT(*) FROM rollup_producao WHERE quantidade <= 0").fetchone()[0] == 0
+
+def test_plano_de_producao_segue_o_status_de_entrega(conn):
+    db.add_semana(conn, "Semana 1")
+    semana_id = conn.execute("SELECT id FROM semanas").fetchone()[0]
+    cliente_id = db.add_cliente(conn, "Ana", "Rua A", "", "4075550101")
+    frango = db.add_marmita(conn, "Frango", "", 12.0, "Fit", True)
+    carne = db.add_marmita(conn, "Carne", "", 14.0, "Tradicional", True)
+    item = lambda marmita_id, quantidade: {"marmita_id": marmita_id, "quantidade": quantidade, "preco_unitario": 12.0}
+    p1 = db.add_pedido(conn, cliente_id, semana_id, 0, "Pix", "Pago", "Pendente", [item(frango, 3), item(carne, 1)])
+    p2 = db.add_pedido(conn, cliente_id, semana_id, 0, "Pix", "Pago", "Pendente", [item(frango, 2)])
+    db.add_pedido(conn, cliente_id, semana_id, 0, "Pix", "Pago", "Cancelado", [item(carne, 5)])
+
+    def plano():
+        df = db.get_plano_producao(conn, semana_id)
+        return {linha["Marmita"]: (linha["A Produzir"], linha["Entregue"], linha["Total"]) for _, linha in df.iterrows()}
+
+    # Pedidos cancelados não entram no plano
+    assert plano() == {"Frango": (5, 0, 5), "Carne": (1, 0, 1)}
+    db.set_status_entrega(conn, [p1], "Entregue")
+    assert plano() == {"Frango": (2, 3, 5), "Carne": (0, 1, 1)}
+    db.delete_pedido(conn, p2)
+    assert plano() == {"Frango": (0, 3, 3), "Carne": (0, 1, 1)}
@@ -0,0 +1,96 @@
+import pytest
+
+import cart
+import database as db
+
+def _contar_consultas(conn, fn):
+    consultas = []
+    conn.set_trace_callback(consultas.append)
+    try:
+        resultado = fn()
+    finally:
+        conn.set_trace_callback(None)
+    return resultado, len(consultas)
+
+def test_leitura_repetida_vem_do_cache(conn):
+    db.add_semana(conn, "Semana 1")
+    primeira, consultas = _contar_consultas(conn, lambda: db.get_all_semanas(conn))
+    assert consultas > 0
+    segunda, consultas = _contar_consultas(conn, lambda: db.get_all_semanas(conn))
+    assert consultas == 0
+    assert segunda == primeira
+
+def test_escrita_invalida_as_leituras_da_tabela(conn):
+    db.add_semana(conn, "Semana 1")
+    assert len(db.get_all_semanas(conn)) == 1
+    db.add_semana(conn, "Semana 2")
+    assert len(db.get_all_semanas(conn)) == 2
+
+def test_escrita_em_outra_tabela_mantem_o_cache(conn):
+    db.add_semana(conn, "Semana 1")
+    db.get_all_semanas(conn)
+    db.add_marmita(conn, "Frango", "", 12.0, "Fit", True)
+    _, consultas = _contar_consultas(conn, lambda: db.get_all_semanas(conn))
+    assert consultas == 0
+
+def test_invalidacao_por_chave_estrangeira(conn):
+    # Excluir um cliente muda pedidos (ON DELETE SET NULL): os relatórios de pedidos são refeitos
+    db.add_semana(conn, "Semana 1")
+    semana_id = db.get_all_semanas(conn)[0][0]
+    cliente_id = db.add_cliente(conn, "Ana", "Rua A", "", "4075550101")
+    db.add_pedido(conn, cliente_id, semana_id, 10.0, "Pix", "Pago", "Entregue", [])
+    assert list(db.get_vendas_por_cliente(conn, semana_id)["Cliente"]) == ["Ana"]
+    db.delete_cliente(conn, cliente_id)
+    assert list(db.get_vendas_por_cliente(conn, semana_id)["Cliente"]) == ["Cliente Excluído"]
+
+def test_resultado_alterado_por_quem_chama_nao_afeta_o_cache(conn):
+    db.add_semana(conn, "Semana 1")
+    db.get_all_semanas(conn).append("alterado")
+    assert "alterado" not in db.get_all_semanas(conn)
+
+def test_valores_aninhados_alterados_nao_afetam_o_cache(conn, dados):
+    semana_id = conn.execute("SELECT MAX(semana_id) FROM pedidos").fetchone()[0]
+    entregas = db.get_entregas_semana(conn, semana_id)
+    nome = entregas[0]["nome"]
+    entregas[0]["nome"] = "alterado"
+    entregas[0]["latitude"] = 1.0
+    itens = db.get_itens_por_pedidos(conn, semana_id=semana_id)
+    with pytest.raises(TypeError): # somente leitura
+        itens["faixas"][-1] = (0, 0)
+    cardapio = cart.get_cardapio(conn)
+    marmita_id = cardapio.ids()[0]
+    cardapio[marmita_id].preco = 0
+    cardapio.marmitas.clear()
+
+    _, consultas = _contar_consultas(conn, lambda: (db.get_entregas_semana(conn, semana_id),
+                                                    db.get_itens_por_pedidos(conn, semana_id=semana_id),
+                                                    cart.get_cardapio(conn)))
+    assert consultas == 0
+    assert db.get_entregas_semana(conn, semana_id)[0]["nome"] == nome
+    assert db.get_entregas_semana(conn, semana_id)[0]["latitude"] is None
+    assert db.get_itens_por_pedidos(conn, semana_id=semana_id)["faixas"]
+    assert cart.get_cardapio(conn)[marmita_id].preco > 0
+
+def test_escrita_durante_a_leitura_nao_grava_resultado_antigo():
+    cache = db.QueryCache()
+    versoes = cache.versions(("pedidos",))
+    cache.invalidate("pedidos") # escrita entre o início e o fim da leitura
+    cache.put("chave", ("pedidos",), versoes, "antigo")
+    assert cache.get("chave") == (False, None)
+
+def test_ttl_e_limite_de_entradas():
+    cache = db.QueryCache(max_entries=2, ttl=-1)
+    cache.put("a", ("semanas",), cache.versions(("semanas",)), 1)
+    assert cache.get("a") == (False, None) # expirada
+    cache = db.QueryCache(max_entries=2, ttl=60)
+    for chave in "abc":
+        cache.put(chave, ("semanas",), cache.versions(("semanas",)), chave)
+    assert cache.get("a") == (False, None) # a menos usada saiu
+    assert cache.get("c") == (True, "c")
+
+def test_bypass_vai_sempre_ao_banco(conn):
+    db.add_semana(conn, "Semana 1")
+    db.get_all_semanas(conn)
+    with db.bypass_query_cache():
+        _, consultas = _contar_consultas(conn, lambda: db.get_all_semanas(conn))
+    assert consultas > 0
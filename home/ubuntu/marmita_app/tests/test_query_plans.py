@@ -0,0 +1,30 @@
+import pytest
+
+import database as db
+
+def _primeiro(conn, sql):
+    return conn.execute(sql).fetchone()[0]
+
+def test_consultas_de_relatorio_usam_indices(conn, dados):
+    semana_id = _primeiro(conn, "SELECT MAX(semana_id) FROM pedidos")
+    cliente_id = _primeiro(conn, "SELECT cliente_id FROM pedidos GROUP BY cliente_id ORDER BY COUNT(*) DESC LIMIT 1")
+    pedido_id = _primeiro(conn, "SELECT MAX(id) FROM pedidos")
+    planos = db.assert_query_plans_use_indexes(conn, semana_id=semana_id, cliente_id=cliente_id, pedido_id=pedido_id)
+    assert set(planos) >= {"get_pedidos_page", "get_pedido_itens", "get_plano_producao"}
+
+def test_consultas_de_relatorio_usam_indices_com_estatisticas(conn, dados):
+    # Com ANALYZE (optimize_database) o planejador ainda deve preferir os índices
+    conn.execute("ANALYZE")
+    db.assert_query_plans_use_indexes(conn, semana_id=_primeiro(conn, "SELECT MAX(semana_id) FROM pedidos"))
+
+def test_historico_paginado_usa_indice_semana_data(conn, dados):
+    planos = db.explain_query_plans(conn, semana_id=_primeiro(conn, "SELECT MAX(semana_id) FROM pedidos"))
+    assert any("idx_pedidos_semana_data" in d for d in planos["get_pedidos_page"])
+
+def test_detecta_varredura_completa(conn, dados):
+    conn.execute("DROP INDEX idx_itens_pedido_pedido")
+    with pytest.raises(AssertionError, match="get_pedido_itens"):
+        db.assert_query_plans_use_indexes(conn, pedido_id=_primeiro(conn, "SELECT MAX(id) FROM pedidos"))
+
+def test_full_table_scans():
+    assert db._full_table_scans(["SCAN p", "SCAN p USING INDEX idx_pedidos_semana_data", "SEARCH ip USING INDEX x (pedido_id=?)"]) == ["SCAN p"]
@@ -0,0 +1,35 @@
+import pytest
+
+import database as db
+from conftest import linhas, movimentar, recalculado
+
+TABELAS = ("rollup_vendas_cliente", "rollup_vendas_dia", "rollup_marmitas")
+
+@pytest.mark.parametrize("tabela", TABELAS)
+def test_triggers_mantem_os_rollups(conn, dados, tabela):
+    sql = f"SELECT * FROM {tabela}"
+    assert linhas(conn, sql) == recalculado(db._recalcular_rollups, sql)
+    movimentar(conn)
+    assert linhas(conn, sql) == recalculado(db._recalcular_rollups, sql)
+
+def test_relatorios_batem_com_os_pedidos(conn, dados):
+    movimentar(conn)
+    semana_id = conn.execute("SELECT MAX(semana_id) FROM pedidos").fetchone()[0]
+    vendas = db.get_vendas_geral(conn, semana_id_filter=semana_id)
+    total, pedidos = conn.execute("SELECT SUM(valor_total), COUNT(*) FROM pedidos WHERE semana_id = ?", (semana_id,)).fetchone()
+    assert vendas["Pedidos"].sum() == pedidos
+    assert vendas["Vendas ($)"].sum() == pytest.approx(total)
+
+    mais_vendidas = db.get_marmitas_mais_vendidas(conn, semana_id_filter=semana_id)
+    quantidade = conn.execute("""
+        SELECT SUM(ip.quantidade) FROM itens_pedido ip JOIN pedidos p ON ip.pedido_id = p.id WHERE p.semana_id = ?
+    """, (semana_id,)).fetchone()[0]
+    assert mais_vendidas["Quantidade"].sum() == quantidade
+
+def test_refresh_rollups_reconstroi_as_tabelas(conn, dados):
+    esperado = {tabela: linhas(conn, f"SELECT * FROM {tabela}") for tabela in TABELAS}
+    for tabela in TABELAS:
+        conn.execute(f"DELETE FROM {tabela}")
+    conn.commit()
+    assert db.refresh_rollups(conn)
+    assert {tabela: linhas(conn, f"SELECT * FROM {tabela}") for tabela in TABELAS} == esperado
@@ -0,0 +1,70 @@
+import sqlite3
+import threading
+
+import pytest
+
+import database as db
+
+def test_conexoes_em_wal_com_pragmas(conn):
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+    assert conn.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+
+def test_escrita_roda_na_thread_de_escrita(conn):
+    nome = db._write(lambda c: threading.current_thread().name)
+    assert nome == "marmita-db-writer"
+
+def test_erro_desfaz_a_transacao_inteira(conn):
+    def _falhar(c):
+        c.execute("INSERT INTO semanas (nome_semana) VALUES ('Semana desfeita')")
+        c.execute("INSERT INTO tabela_inexistente VALUES (1)")
+    with pytest.raises(sqlite3.OperationalError):
+        db._write(_falhar, "semanas")
+    assert conn.execute("SELECT COUNT(*) FROM semanas WHERE nome_semana = 'Semana desfeita'").fetchone()[0] == 0
+    # A thread de escrita continua atendendo depois do erro
+    assert db.add_semana(conn, "Semana seguinte")
+
+def test_escrita_aninhada_nao_trava_a_fila(conn):
+    resultado = db._write(lambda c: db._write(lambda c2: c2 is c))
+    assert resultado is True
+
+def test_escritas_concorrentes_sao_serializadas(conn):
+    db.add_semana(conn, "Semana 1")
+    cliente_id = db.add_cliente(conn, "Ana", "Rua A", "", "4075550101")
+    semana_id = conn.execute("SELECT id FROM semanas").fetchone()[0]
+    erros = []
+    def pedidos():
+        try:
+            for _ in range(25):
+                assert db.add_pedido(db.get_connection(), cliente_id, semana_id, 10.0, "Pix", "Pendente", "Pendente", [])
+        except Exception as e: # repassado ao teste
+            erros.append(e)
+        finally:
+            db.release_connection()
+    threads = [threading.Thread(target=pedidos) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not erros
+    assert conn.execute("SELECT COUNT(*), SUM(valor_total) FROM pedidos").fetchone() == (150, 1500.0)
+    assert db.get_dashboard_metrics(conn)["total_pedidos"] == 150
+
+def test_leitura_nao_espera_transacao_de_escrita(conn):
+    db.add_semana(conn, "Semana 1")
+    dentro = threading.Event()
+    continuar = threading.Event()
+    def _escrita_longa(c):
+        c.execute("INSERT INTO semanas (nome_semana) VALUES ('Semana 2')")
+        dentro.set()
+        continuar.wait(5)
+    escritor = threading.Thread(target=lambda: db._write(_escrita_longa, "semanas"))
+    escritor.start()
+    try:
+        assert dentro.wait(5)
+        # Em WAL o leitor vê o último commit, sem esperar o lock de escrita
+        assert conn.execute("SELECT COUNT(*) FROM semanas").fetchone()[0] == 1
+    finally:
+        continuar.set()
+        escritor.join()
+    assert conn.execute("SELECT COUNT(*) FROM semanas").fetchone()[0] == 2